@@ -1,16 +1,23 @@
 # -*- coding: utf-8 -*-
 from typing import Iterable, Tuple, Optional, Dict
+def apply_fill(qty: float, cost: float, side: str, q: float, p: float, fee: float = 0.0) -> Tuple[float, float, float]:
+    """
+    Один шаг средней себестоимости (как в sync.recompute_position).
+    Возвращает (qty, cost, realized): BUY копит qty/cost (fee в себестоимость),
+    SELL списывает avg*sell_q и фиксирует (p - avg)*sell_q минус пропорцию fee.
+    """
+    if str(side).upper() == "BUY":
+        return qty + q, cost + q * p + fee, 0.0
+    if qty <= 0.0:
+        return 0.0, 0.0, 0.0
+    sell_q = min(qty, q); avg = (cost/qty) if qty > 1e-12 else 0.0
+    fee_part = fee * (sell_q / q) if q > 0 else 0.0
+    return qty - sell_q, cost - avg * sell_q, (p - avg) * sell_q - fee_part
 def compute_position_from_fills(fills: Iterable[Dict]) -> Tuple[float, float]:
     qty = 0.0; cost = 0.0
     for f in fills:
-        side = str(f.get("side","")).upper()
-        q = float(f.get("qty") or 0.0); p = float(f.get("price") or 0.0); fee = float(f.get("fee") or 0.0)
-        if side == "BUY":
-            qty += q; cost += q * p + fee
-        else:
-            if qty <= 0.0: qty = 0.0; cost = 0.0; continue
-            sell_q = min(qty, q); avg = (cost/qty) if qty > 1e-12 else 0.0
-            cost -= avg * sell_q; qty -= sell_q
+        qty, cost, _ = apply_fill(qty, cost, str(f.get("side","")).upper(), float(f.get("qty") or 0.0),
+                                  float(f.get("price") or 0.0), float(f.get("fee") or 0.0))
     avg = (cost/qty) if qty > 1e-12 else 0.0
     return qty, avg
 def estimate_equity_usd(start_capital_usd: float, last_price: Optional[float], qty: float, avg: float, reserve_usd: float = 0.0) -> Tuple[float, float]:
@@ -3,11 +3,12 @@
 
 import time
 import math
-from sqlalchemy import and_
 
 from config import PAIR, BASE_ASSET, MIN_ORDER_USD
-from mexc_client import MexcClient
-from models_trading import SessionT, Order, Position, init_trading_db
+from mexc_client import MexcClient, get_client
+from models_trading import SessionT, Position, init_trading_db
+import cancels
+import intents
 
 def TS():
     return int(time.time())
@@ -17,7 +18,7 @@ def floor6(x: float) -> float:
 
 def main():
     init_trading_db()
-    cli  = MexcClient()
+    cli  = get_client()
     sess = SessionT()
     try:
         # --- позиция (avg, qty) ---
@@ -30,29 +31,10 @@ def main():
 
         target_price = round(pos_avg * 1.01, 6)  # AVG + 1%
 
-        # --- 1) Снять ВСЕ SELL на бирже ---
-        ex_open = cli.open_orders(PAIR) or []
-        for o in ex_open:
-            if str(o.get("symbol")) != PAIR: 
-                continue
-            if (o.get("side","").upper() == "SELL") and o.get("orderId"):
-                try:
-                    cli.cancel_order(PAIR, str(o["orderId"]))
-                except Exception:
-                    pass  # если уже снят — ладно
-
-        # --- 1b) Отметить SELL как CANCELED в БД ---
-        opened_sells = (sess.query(Order)
-                          .filter(and_(Order.pair==PAIR,
-                                       Order.side=="SELL",
-                                       Order.status.in_(("NEW","PARTIALLY_FILLED"))))
-                          .all())
-        for o in opened_sells:
-            o.status  = "CANCELED"
-            o.updated = TS()
-            sess.add(o)
-        if opened_sells:
-            sess.commit()
+        # --- 1) Снять ВСЕ SELL на бирже и отметить CANCELED в БД ---
+        rep = cancels.cancel_side(cli, sess, PAIR, "SELL")
+        if rep.failed:
+            print(f"[avg1] warn: {rep.summary()}")
 
         # --- 2) Рассчитать доступное кол-во KAS для продажи ---
         # берём минимум из позиции и свободного KAS на бирже
@@ -77,17 +59,10 @@ def main():
                 return
 
         # --- 3) Ставим один SELL @ avg*1.01 ---
-        resp = cli.place_order(PAIR, "SELL", price=target_price, qty=qty)
-        oid  = str(resp.get("orderId") or f"SELL_{TS()}")
-
-        o = Order(
-            id=oid, pair=PAIR, side="SELL",
-            price=float(target_price), qty=float(qty),
-            status="NEW", created=TS(), updated=TS(),
-            paper=False, reserved=0.0, filled_qty=0.0, mode="MANUAL_AVG1",
-        )
-        sess.merge(o)
-        sess.commit()
+        r, = intents.place_batch(cli, sess, PAIR, [intents.new("SELL", target_price, qty, mode="MANUAL_AVG1")])
+        if r.error is not None:
+            raise r.error
+        oid = r.order_id
 
         print(f"[avg1] placed SELL {PAIR} @ {target_price:.6f} qty={qty:.6f} (oid={oid})")
 
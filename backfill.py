@@ -0,0 +1,241 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Дозагрузка минутных свечей (minmax) за произвольный интервал.
+
+Интервал режется на куски по BACKFILL_CHUNK свечей (максимум klines за запрос),
+куски качаются параллельно (BACKFILL_WORKERS) под общим ограничителем частоты
+(BACKFILL_RATE_PER_SEC), каждый проверяется на непрерывность (минутная сетка, без
+дублей и чужих минут) и пишется одним INSERT OR REPLACE на кусок.
+
+  python3 backfill.py                                  # от последней свечи до сейчас
+  python3 backfill.py --hours 48
+  python3 backfill.py --from 2024-05-01 --to 2024-05-08 --db /opt/Ebot/hist.db
+  python3 backfill.py --pair KASUSDC --pair BTCUSDC --hours 24 --workers 8
+
+История старше CANDLE_RETENTION_SEC из рабочей БД чистит candles.py — архив для
+backtest удобнее писать в отдельную БД через --db.
+"""
+import sys
+import time
+import sqlite3
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, List, NamedTuple, Optional, Tuple
+
+import metrics
+import rollups
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+DB_PATH               = getattr(CFG, "DB_PATH", "ebot.db")
+BACKFILL_CHUNK        = int(getattr(CFG, "BACKFILL_CHUNK", 1000))      # лимит MEXC klines
+BACKFILL_WORKERS      = int(getattr(CFG, "BACKFILL_WORKERS", 4))
+BACKFILL_RATE_PER_SEC = float(getattr(CFG, "BACKFILL_RATE_PER_SEC", 10.0))
+
+log = logging.getLogger("backfill")
+
+_M_INGESTED = metrics.counter("candles_ingested_total", "1m candles upserted", ("pair", "source"))
+_M_MISSING  = metrics.counter("backfill_missing_minutes_total", "Minutes absent in exchange klines during backfill", ("pair",))
+
+class RateLimiter:
+    """Не чаще rate запросов в секунду на все потоки (равномерные слоты)."""
+    def __init__(self, rate: float):
+        self.step = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        if not self.step:
+            return
+        with self._lock:
+            now = time.monotonic()
+            at = max(now, self._next)
+            self._next = at + self.step
+        if at > now:
+            time.sleep(at - now)
+
+class Report(NamedTuple):
+    pair: str
+    start: int
+    end: int
+    chunks: int
+    candles: int
+    missing: List[int]                  # минуты интервала, которых биржа не вернула
+    errors: List[Tuple[int, Exception]] # (начало куска, ошибка)
+    sec: float
+
+    @property
+    def rate(self) -> float:
+        return self.candles / self.sec if self.sec > 0 else 0.0
+
+    def summary(self) -> str:
+        return (f"[backfill] {self.pair} {_fmt(self.start)}..{_fmt(self.end)}: candles={self.candles} "
+                f"chunks={self.chunks} missing={len(self.missing)} errors={len(self.errors)} "
+                f"{self.sec:.1f}s ({self.rate:.0f}/s)")
+
+def _fmt(t: int) -> str:
+    return datetime.fromtimestamp(t, tz=timezone.utc).strftime("%Y-%m-%d %H:%M")
+
+def chunks(start: int, end: int, size: int = BACKFILL_CHUNK) -> List[Tuple[int, int]]:
+    """Минутные куски [a, b) по size свечей, покрывающие [start, end)."""
+    start, end = start // 60 * 60, end // 60 * 60
+    step = max(1, int(size)) * 60
+    return [(a, min(a + step, end)) for a in range(start, end, step)]
+
+def validate(rows: list, a: int, b: int) -> Tuple[list, List[int]]:
+    """
+    Строки klines -> [(t, min, max, mid, open, close)] строго по сетке [a, b)
+    (чужие минуты и дубли отброшены) + список отсутствующих минут.
+    """
+    got = {}
+    for r in rows or []:
+        try:
+            t = int(r[0]) // 1000
+            o, h, l, c = map(float, (r[1], r[2], r[3], r[4]))
+        except (TypeError, ValueError, IndexError):
+            continue
+        if t % 60 or not (a <= t < b) or h < l:
+            continue
+        got[t] = (t, l, h, (h + l) / 2, o, c)
+    missing = [t for t in range(a, b, 60) if t not in got]
+    return [got[t] for t in sorted(got)], missing
+
+def upsert(conn: sqlite3.Connection, pair: str, candles: list) -> int:
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO minmax(pair, time, min, max, mid, open, close) VALUES(?,?,?,?,?,?,?)",
+            [(pair,) + c for c in candles])
+    return len(candles)
+
+def last_saved_time(conn: sqlite3.Connection, pair: str) -> int:
+    row = conn.execute("SELECT MAX(time) FROM minmax WHERE pair=?", (pair,)).fetchone()
+    return int(row[0] or 0)
+
+def _ensure_table(conn: sqlite3.Connection) -> None:
+    conn.execute("CREATE TABLE IF NOT EXISTS minmax(pair VARCHAR NOT NULL, time INTEGER NOT NULL, "
+                 "min FLOAT, max FLOAT, mid FLOAT, open FLOAT, close FLOAT, PRIMARY KEY (pair, time))")
+    rollups.ensure(conn)
+
+def _default_fetch() -> Callable:
+    from mexc_client import MexcClient
+    cli = MexcClient()
+    return lambda pair, a_ms, b_ms, limit: cli.klines(pair, "1m", startTime=a_ms, endTime=b_ms, limit=limit)
+
+def backfill(pair: str, start: int, end: int, db_path: Optional[str] = None, fetch: Optional[Callable] = None,
+             workers: int = BACKFILL_WORKERS, rate: float = BACKFILL_RATE_PER_SEC, size: int = BACKFILL_CHUNK,
+             progress: Optional[Callable] = None) -> Report:
+    """
+    Свечи пары за [start, end) (сек, UTC) -> minmax. fetch(pair, start_ms, end_ms, limit) -> klines;
+    progress(done_chunks, total_chunks, candles, elapsed_sec) после каждого куска.
+    Куски пишутся по мере прихода (одна запись за раз, из вызывающего потока).
+    """
+    t0 = time.perf_counter()
+    parts = chunks(start, end, size)
+    fetch = fetch or _default_fetch()
+    limiter = RateLimiter(rate)
+
+    def one(ab):
+        a, b = ab
+        limiter.acquire()
+        return fetch(pair, a * 1000, (b - 60) * 1000, b // 60 - a // 60)
+
+    total, missing, errors = 0, [], []
+    conn = sqlite3.connect(db_path or DB_PATH, timeout=30)
+    try:
+        _ensure_table(conn)
+        with ThreadPoolExecutor(max_workers=max(1, min(int(workers), len(parts) or 1))) as ex:
+            futs = {ex.submit(one, ab): ab for ab in parts}
+            for i, f in enumerate(as_completed(futs), 1):
+                a, b = futs[f]
+                try:
+                    rows, miss = validate(f.result(), a, b)
+                except Exception as e:
+                    errors.append((a, e))
+                    log.warning("backfill %s chunk %s failed: %r", pair, _fmt(a), e)
+                else:
+                    total += upsert(conn, pair, rows)
+                    missing.extend(miss)
+                if progress:
+                    progress(i, len(parts), total, time.perf_counter() - t0)
+    finally:
+        conn.close()
+    missing.sort()
+    if total:
+        _M_INGESTED.inc(total, pair=pair, source="backfill")
+    if missing:
+        _M_MISSING.inc(len(missing), pair=pair)
+    return Report(pair, start // 60 * 60, end // 60 * 60, len(parts), total, missing, errors,
+                  time.perf_counter() - t0)
+
+def _parse_ts(s: str) -> int:
+    if s.isdigit():
+        return int(s)
+    dt = datetime.fromisoformat(s)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Дозагрузка минутных свечей MEXC в minmax")
+    ap.add_argument("--pair", action="append", help="пара (можно несколько); по умолчанию все PAIRS")
+    ap.add_argument("--from", dest="start", type=_parse_ts, help="начало (UTC, ISO или unix)")
+    ap.add_argument("--to", dest="end", type=_parse_ts, help="конец, не включая (по умолчанию сейчас)")
+    ap.add_argument("--hours", type=float, help="последние N часов вместо --from")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--workers", type=int, default=BACKFILL_WORKERS)
+    ap.add_argument("--rate", type=float, default=BACKFILL_RATE_PER_SEC, help="запросов в секунду")
+    ap.add_argument("--chunk", type=int, default=BACKFILL_CHUNK, help="свечей в запросе")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    metrics.set_job("backfill")
+
+    if args.pair:
+        pairs = args.pair
+    else:
+        from pairs import load_pairs
+        pairs = [pc.pair for pc in load_pairs()]
+    end = args.end or int(time.time() // 60 * 60)
+
+    def show(done, n, candles, sec):
+        sys.stdout.write(f"\r  {done}/{n} chunks, {candles} candles, {candles / sec if sec else 0:.0f}/s ")
+        sys.stdout.flush()
+
+    failed = 0
+    for pair in pairs:
+        if args.start is not None:
+            start = args.start
+        elif args.hours:
+            start = end - int(args.hours * 3600)
+        else:
+            conn = sqlite3.connect(args.db)
+            try:
+                _ensure_table(conn)
+                last = last_saved_time(conn, pair)
+            finally:
+                conn.close()
+            if not last:
+                ap.error(f"{pair}: в БД нет свечей — задайте --from или --hours")
+            start = last + 60
+        if start >= end:
+            print(f"[backfill] {pair}: nothing to do")
+            continue
+        rep = backfill(pair, start, end, db_path=args.db, workers=args.workers, rate=args.rate,
+                       size=args.chunk, progress=show)
+        print()
+        print(rep.summary())
+        for a, e in rep.errors:
+            print(f"  chunk {_fmt(a)}: {e!r}")
+        failed += bool(rep.errors)
+    metrics.flush()
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бэктест BUY/SELL на исторических минутках (таблица minmax).
+
+Прогоняет свечи через настоящую логику тиков: buy.plan_buys (build_orders_above /
+inchannel / below + ужатие под бюджет) и sell.plan_sells (build_sell_prices, split,
+микросдвиг). Канал у каждой стороны свой — окно и оценщик BUY_/SELL_CHANNEL_WINDOW и
+BUY_/SELL_CHANNEL_ESTIMATOR (как в channels.py, их тоже можно менять через --set).
+Лимитки исполняются по high/low свечей целиком по своей цене; учёт позиции —
+accounting.apply_fill (avg-cost).
+
+Матчинг векторный: между соседними тиками набор ордеров не меняется, поэтому для
+всех открытых ордеров момент исполнения ищется одним searchsorted по накопленному
+min(low)/max(high) отрезка. Кривая капитала — cumsum дельт по индексам свечей.
+
+  python3 backtest.py --db ebot.db --days 365 --out /tmp/bt
+  python3 backtest.py --set SELL_MIN_GAIN=0.02 --set BUY_BELOW_OFFSETS=[0.01,0.02]
+"""
+import os
+import ast
+import csv
+import time
+import random
+import argparse
+import sqlite3
+from typing import Dict, Optional
+
+import numpy as np
+
+import buy
+import sell
+import channels
+import reconcile
+from accounting import apply_fill
+from pairs import strategy_params
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+DAY = 86400
+
+# параметры стратегии, которые run() реально читает (через plan_buys / plan_sells / каналы)
+STRATEGY_PARAMS = frozenset((
+    "MIN_ORDER_USD", "MICRO_OFFSET_MIN", "MICRO_OFFSET_MAX",
+    "BUY_BELOW_OFFSETS", "BUY_INCHANNEL_LEVELS", "BUY_SIZE_BELOW_FIXED_USD",
+    "BUY_SIZE_INCH_MIN_USD", "BUY_SIZE_INCH_MAX_USD", "BUY_SIZE_ABOVE_FIXED_USD",
+    "BUY_CHANNEL_WINDOW", "BUY_CHANNEL_ESTIMATOR",
+    "SELL_SPLIT", "SELL_MIN_GAIN", "SELL_MICROSHIFT",
+    "SELL_CHANNEL_WINDOW", "SELL_CHANNEL_ESTIMATOR",
+))
+
+def load_candles(db_path: str, pair: str, ts_from: Optional[int] = None,
+                 ts_to: Optional[int] = None) -> Dict[str, np.ndarray]:
+    """minmax -> массивы t/lo/hi/mid/close (по возрастанию времени)."""
+    q = "SELECT time, min, max, mid, close FROM minmax WHERE pair=?"
+    args: list = [pair]
+    if ts_from is not None:
+        q += " AND time>=?"; args.append(int(ts_from))
+    if ts_to is not None:
+        q += " AND time<=?"; args.append(int(ts_to))
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute(q + " ORDER BY time", args).fetchall()
+    finally:
+        conn.close()
+    a = np.array(rows, dtype=np.float64).reshape(-1, 5)
+    ok = np.all(np.isfinite(a[:, 1:]), axis=1) & (a[:, 1] > 0)
+    a = a[ok]
+    return {"t": a[:, 0].astype(np.int64), "lo": a[:, 1], "hi": a[:, 2], "mid": a[:, 3], "close": a[:, 4]}
+
+def channel_at(t: np.ndarray, lo: np.ndarray, hi: np.ndarray, mid: np.ndarray,
+               idx: np.ndarray, window: int = DAY, estimator: str = "spread4"):
+    """
+    (lower, upper) на свечах idx: окно t[idx]-window..t[idx] включительно, оценщик —
+    как channels.ChannelEngine.channel. spread4/minmax — векторно (min/max/среднее mid окна),
+    ewma/quantile — прогон свечей через сам ChannelEngine.
+    """
+    if estimator not in channels.ESTIMATORS:
+        raise ValueError(f"unknown channel estimator {estimator!r} (expected one of {channels.ESTIMATORS})")
+    if estimator in ("ewma", "quantile"):
+        return _engine_channel_at(t, lo, hi, mid, idx, window, estimator)
+    start = np.searchsorted(t, t[idx] - window, side="left")
+    end = idx + 1
+    # reduceat по чередующимся [start, end): чётные позиции — ровно наши окна
+    pairs = np.empty(2 * len(idx), dtype=np.int64)
+    pairs[0::2] = start
+    pairs[1::2] = np.minimum(end, len(t) - 1)
+    mn = np.minimum.reduceat(lo, pairs)[0::2]
+    mx = np.maximum.reduceat(hi, pairs)[0::2]
+    last = end == len(t)  # окно до конца массива: reduceat обрезает последний элемент
+    if last.any():
+        mn[last] = [lo[s:].min() for s in start[last]]
+        mx[last] = [hi[s:].max() for s in start[last]]
+    if estimator == "minmax":
+        return np.maximum(0.0, mn), np.maximum(0.0, mx)
+    csum = np.concatenate(([0.0], np.cumsum(mid)))
+    mean = (csum[end] - csum[start]) / np.maximum(end - start, 1)
+    spread = np.maximum(0.0, mx - mn)
+    return np.maximum(0.0, mean - spread / 4.0), np.maximum(0.0, mean + spread / 4.0)
+
+def _engine_channel_at(t, lo, hi, mid, idx, window: int, estimator: str):
+    """EWMA зависит от всей истории, квантили — от гистограммы: свечи по одной в ChannelEngine."""
+    eng = channels.ChannelEngine("backtest", {"w": max(1, int(window) // 60)})
+    lower, upper = np.zeros(len(idx)), np.zeros(len(idx))
+    j = 0
+    for k, i in enumerate(idx):
+        for j in range(j, int(i) + 1):
+            eng.push(int(t[j]), float(lo[j]), float(hi[j]), float(mid[j]))
+        j = int(i) + 1
+        lower[k], upper[k], _ = eng.channel("w", estimator)
+    return lower, upper
+
+def channel_window_sec(name: str) -> int:
+    """Имя окна из CHANNEL_WINDOWS ("24h") -> секунды."""
+    if name not in channels.CHANNEL_WINDOWS:
+        raise ValueError(f"unknown channel window {name!r} (expected one of {sorted(channels.CHANNEL_WINDOWS)})")
+    return int(channels.CHANNEL_WINDOWS[name]) * 60
+
+# временная подмена параметров стратегии (имена из config) в модулях buy/sell
+patched = strategy_params
+
+def run(c: Dict[str, np.ndarray], capital: float = None, buy_interval: int = None,
+        sell_interval: int = None, fee_pct: float = None, warmup: int = DAY,
+        touch: bool = False, seed: int = 0, params: Optional[dict] = None,
+        reconcile_orders: Optional[bool] = None) -> dict:
+    """
+    Прогон по свечам c (см. load_candles). Возвращает dict:
+      equity: t/equity/cash/base по тикам; fills: t/side/price/qty/fee/realized;
+      orders: t/open_buys/open_sells по тикам; summary: итоговые цифры.
+    touch=False — исполнение только при проходе цены сквозь уровень (low < price).
+    reconcile_orders — как в живых buy/sell (по умолчанию ORDER_RECONCILE): тик сверяет
+    лестницу со стоящими ордерами (reconcile.diff) вместо того, чтобы доставлять новые.
+    """
+    reco = reconcile.ORDER_RECONCILE if reconcile_orders is None else bool(reconcile_orders)
+    capital = float(getattr(CFG, "START_CAPITAL_USD", 1000.0) if capital is None else capital)
+    buy_interval = int(buy_interval or getattr(CFG, "EBOT_BUY_INTERVAL_SEC", 300))
+    sell_interval = int(sell_interval or getattr(CFG, "EBOT_SELL_INTERVAL_SEC", 300))
+    fee = float(getattr(CFG, "MAKER_FEE_PCT", 0.0) if fee_pct is None else fee_pct) / 100.0
+    t, lo, hi, close = c["t"], c["lo"], c["hi"], c["close"]
+    n = len(t)
+    if n == 0 or t[-1] - t[0] <= warmup:
+        raise ValueError("not enough candles for warmup")
+
+    # тики: первая свеча, закрывшая очередной интервал buy/sell
+    t0 = int(t[0]) + int(warmup)
+    grid = []
+    for step, flag in ((buy_interval, 1), (sell_interval, 2)):
+        tt = np.arange(t0, int(t[-1]) + 1, step)
+        grid.append((np.searchsorted(t, tt, side="left"), flag))
+    all_idx = np.concatenate([g[0] for g in grid])
+    flags = np.concatenate([np.full(len(g[0]), g[1], dtype=np.int8) for g in grid])
+    keep = all_idx < n
+    tick_idx, inv = np.unique(all_idx[keep], return_inverse=True)
+    tick_flag = np.zeros(len(tick_idx), dtype=np.int8)
+    np.bitwise_or.at(tick_flag, inv, flags[keep])
+
+    random.seed(seed)  # микросдвиги в build_orders_* — воспроизводимо
+    cash, base = capital, 0.0
+    pos_qty, pos_cost, realized_total = 0.0, 0.0, 0.0
+    o_price = np.empty(0); o_qty = np.empty(0); o_buy = np.empty(0, dtype=bool)
+    f_i, f_side, f_price, f_qty, f_fee, f_real = [], [], [], [], [], []
+    oc = np.zeros((len(tick_idx), 2), dtype=np.int64)
+    locked_t = np.zeros(len(tick_idx))  # USD в открытых BUY после тика
+
+    with patched(params):
+        # каналы сторон — по окну/оценщику после подмены параметров (одинаковые считаются раз)
+        chans = {}
+        for w, est in ((buy.BUY_CHANNEL_WINDOW, buy.BUY_CHANNEL_ESTIMATOR),
+                       (sell.SELL_CHANNEL_WINDOW, sell.SELL_CHANNEL_ESTIMATOR)):
+            if (w, est) not in chans:
+                chans[w, est] = channel_at(t, lo, hi, c["mid"], tick_idx, channel_window_sec(w), est)
+        b_lower, b_upper = chans[buy.BUY_CHANNEL_WINDOW, buy.BUY_CHANNEL_ESTIMATOR]
+        s_upper = chans[sell.SELL_CHANNEL_WINDOW, sell.SELL_CHANNEL_ESTIMATOR][1]
+        for k, i in enumerate(tick_idx):
+            last = float(close[i])
+            new_p, new_q, new_b = [], [], []
+            drop = []
+            locked_usd = float(np.dot(o_price[o_buy], o_qty[o_buy])) if o_buy.any() else 0.0
+            if tick_flag[k] & 1:
+                # при сверке весь резерв под BUY — тоже бюджет тика
+                plan = buy.plan_buys(last, float(b_lower[k]), float(b_upper[k]), cash if reco else cash - locked_usd)
+                plan = [(p, buy._floor6(usd / p)) for p, usd in plan if p > 0 and usd >= buy.MIN_ORDER_USD]
+                if reco:
+                    bidx = np.flatnonzero(o_buy)
+                    _, cancel, plan = reconcile.diff(plan, zip(bidx.tolist(), o_price[bidx], o_qty[bidx]))
+                    drop += cancel
+                for p, q in plan:
+                    if q > 0:
+                        new_p.append(p); new_q.append(q); new_b.append(True)
+            if tick_flag[k] & 2 and pos_qty > 0:
+                sells = ~o_buy
+                free_base = base if reco else base - float(o_qty[sells].sum())
+                open_prices = set(np.round(o_price[sells], 6).tolist()) if free_base > 0 and not reco else set()
+                avg = pos_cost / pos_qty if pos_qty > 1e-12 else 0.0
+                plan = sell.plan_sells(last, float(s_upper[k]), pos_qty, avg, free_base, open_prices)
+                if reco:
+                    sidx = np.flatnonzero(sells)
+                    _, cancel, plan = reconcile.diff(plan, zip(sidx.tolist(), o_price[sidx], o_qty[sidx]))
+                    drop += cancel
+                for p, q in plan:
+                    q = sell._floor6(q)
+                    if q > 0 and p * q >= sell.MIN_ORDER_USD:
+                        new_p.append(p); new_q.append(q); new_b.append(False)
+            if drop:
+                alive = np.ones(len(o_price), dtype=bool)
+                alive[drop] = False
+                o_price, o_qty, o_buy = o_price[alive], o_qty[alive], o_buy[alive]
+            if new_p:
+                o_price = np.concatenate((o_price, new_p))
+                o_qty = np.concatenate((o_qty, new_q))
+                o_buy = np.concatenate((o_buy, np.array(new_b, dtype=bool)))
+            oc[k] = (int(o_buy.sum()), int(len(o_buy) - o_buy.sum()))
+            locked_t[k] = float(np.dot(o_price[o_buy], o_qty[o_buy])) if o_buy.any() else 0.0
+
+            # матчинг свечей (i, следующий тик] против текущего набора
+            a = i + 1
+            b = tick_idx[k + 1] + 1 if k + 1 < len(tick_idx) else n
+            if a >= b or not len(o_price):
+                continue
+            runmin = np.minimum.accumulate(lo[a:b])
+            runmax = np.maximum.accumulate(hi[a:b])
+            side = "left" if touch else "right"
+            pos = np.where(o_buy,
+                           np.searchsorted(-runmin, -o_price, side=side),
+                           np.searchsorted(runmax, o_price, side=side))
+            hit = pos < (b - a)
+            if not hit.any():
+                continue
+            order = np.argsort(pos[hit], kind="stable")
+            for j, fi in zip(np.flatnonzero(hit)[order], pos[hit][order]):
+                p, q, is_buy = float(o_price[j]), float(o_qty[j]), bool(o_buy[j])
+                fe = p * q * fee
+                if is_buy:
+                    cash -= p * q + fe; base += q
+                else:
+                    cash += p * q - fe; base -= q
+                s = "BUY" if is_buy else "SELL"
+                pos_qty, pos_cost, r = apply_fill(pos_qty, pos_cost, s, q, p, fe)
+                realized_total += r
+                f_i.append(a + int(fi)); f_side.append(s); f_price.append(p)
+                f_qty.append(q); f_fee.append(fe); f_real.append(r)
+            o_price, o_qty, o_buy = o_price[~hit], o_qty[~hit], o_buy[~hit]
+
+    # кривая капитала: дельты кэша/базы в свечах исполнения -> cumsum
+    fi = np.asarray(f_i, dtype=np.int64)
+    fp = np.asarray(f_price); fq = np.asarray(f_qty); ff = np.asarray(f_fee)
+    sgn = np.where(np.asarray(f_side) == "BUY", 1.0, -1.0) if len(fi) else np.empty(0)
+    d_cash = np.zeros(n); d_base = np.zeros(n)
+    np.add.at(d_cash, fi, -sgn * fp * fq - ff)
+    np.add.at(d_base, fi, sgn * fq)
+    cash_c = capital + np.cumsum(d_cash)
+    base_c = np.cumsum(d_base)
+    eq = cash_c + base_c * close
+    sel = tick_idx
+    peak = np.maximum.accumulate(eq[sel]) if len(sel) else np.empty(0)
+    dd = float(np.max((peak - eq[sel]) / np.maximum(peak, 1e-9))) if len(sel) else 0.0
+    # загрузка капитала: позиция + резерв под BUY от капитала, среднее по тикам
+    util = float(np.mean((base_c[sel] * close[sel] + locked_t) / np.maximum(eq[sel], 1e-9))) if len(sel) else 0.0
+    summary = {
+        "candles": int(n), "ticks": int(len(tick_idx)), "fills": int(len(fi)),
+        "buys": int((sgn > 0).sum()), "sells": int((sgn < 0).sum()),
+        "start_equity": capital, "end_equity": float(eq[-1]),
+        "return_pct": (float(eq[-1]) / capital - 1.0) * 100.0 if capital else 0.0,
+        "max_drawdown_pct": dd * 100.0, "realized_pnl": realized_total,
+        "fees": float(ff.sum()) if len(ff) else 0.0,
+        "end_base": float(base_c[-1]), "end_cash": float(cash_c[-1]),
+        "max_open_orders": int(oc.sum(axis=1).max()) if len(oc) else 0,
+        "utilization_pct": util * 100.0,
+    }
+    return {
+        "equity": {"t": t[sel], "equity": eq[sel], "cash": cash_c[sel], "base": base_c[sel]},
+        "fills": {"t": t[fi] if len(fi) else np.empty(0, dtype=np.int64), "side": f_side,
+                  "price": fp, "qty": fq, "fee": ff, "realized": np.asarray(f_real)},
+        "orders": {"t": t[tick_idx], "open_buys": oc[:, 0], "open_sells": oc[:, 1]},
+        "summary": summary,
+    }
+
+def _write_csv(path: str, cols: dict) -> None:
+    keys = list(cols)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.writer(f)
+        w.writerow(keys)
+        for row in zip(*(cols[k] for k in keys)):
+            w.writerow([x.item() if hasattr(x, "item") else x for x in row])
+
+def parse_params(items) -> dict:
+    """--set NAME=VALUE (VALUE — python-литерал: 0.02, [5,10,15])."""
+    out = {}
+    for it in items or []:
+        k, _, v = it.partition("=")
+        try:
+            out[k.strip()] = ast.literal_eval(v.strip())
+        except (ValueError, SyntaxError):
+            out[k.strip()] = v.strip()
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Бэктест BUY/SELL на минутках minmax")
+    ap.add_argument("--db", default=getattr(CFG, "DB_PATH", "ebot.db"))
+    ap.add_argument("--pair", default=getattr(CFG, "PAIR", "KASUSDC"))
+    ap.add_argument("--days", type=float, default=0, help="последние N дней (0 — всё)")
+    ap.add_argument("--capital", type=float, default=None, help="стартовый USD (по умолчанию START_CAPITAL_USD)")
+    ap.add_argument("--buy-interval", type=int, default=None)
+    ap.add_argument("--sell-interval", type=int, default=None)
+    ap.add_argument("--fee-pct", type=float, default=None, help="комиссия мейкера, %% (по умолчанию MAKER_FEE_PCT)")
+    ap.add_argument("--touch", action="store_true", help="исполнять при касании уровня (по умолчанию — только сквозь)")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--no-reconcile", action="store_true", help="старое поведение: каждый тик доставляет ордера")
+    ap.add_argument("--set", action="append", metavar="NAME=VALUE", help="переопределить параметр стратегии")
+    ap.add_argument("--out", default="", help="каталог для equity.csv / fills.csv / orders.csv")
+    args = ap.parse_args()
+
+    db = args.db
+    if "/" not in db and not os.path.exists(db):
+        db = os.path.join("/opt/Ebot", db)  # как в models.py
+    ts_from = int(time.time() - args.days * DAY) if args.days > 0 else None
+    t0 = time.perf_counter()
+    c = load_candles(db, args.pair, ts_from)
+    t1 = time.perf_counter()
+    res = run(c, capital=args.capital, buy_interval=args.buy_interval, sell_interval=args.sell_interval,
+              fee_pct=args.fee_pct, touch=args.touch, seed=args.seed, params=parse_params(args.set),
+              reconcile_orders=False if args.no_reconcile else None)
+    t2 = time.perf_counter()
+
+    s = res["summary"]
+    print(f"BACKTEST {args.pair}: candles={s['candles']} ticks={s['ticks']} load={t1-t0:.2f}s run={t2-t1:.2f}s")
+    print(f"equity: {s['start_equity']:.2f} -> {s['end_equity']:.2f} ({s['return_pct']:+.2f}%) "
+          f"maxDD={s['max_drawdown_pct']:.2f}% util={s['utilization_pct']:.1f}%")
+    print(f"fills={s['fills']} (BUY={s['buys']} SELL={s['sells']}) realized={s['realized_pnl']:+.2f} "
+          f"fees={s['fees']:.2f} max_open={s['max_open_orders']}")
+    print(f"end: cash={s['end_cash']:.2f} base={s['end_base']:.6f}")
+    if args.out:
+        os.makedirs(args.out, exist_ok=True)
+        _write_csv(os.path.join(args.out, "equity.csv"), res["equity"])
+        _write_csv(os.path.join(args.out, "fills.csv"), res["fills"])
+        _write_csv(os.path.join(args.out, "orders.csv"), res["orders"])
+        print(f"written: {args.out}/equity.csv fills.csv orders.csv")
+
+if __name__ == "__main__":
+    main()
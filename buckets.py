@@ -6,14 +6,16 @@ import time
 import math
 import random
 from typing import List, Tuple
-from sqlalchemy import and_
 
 from config import (
     PAIR, MIN_ORDER_USD, QUOTE_ASSET,
 )
-from mexc_client import MexcClient
-from models_trading import SessionT, Order, init_trading_db
+from mexc_client import MexcClient, get_client
+from models_trading import SessionT, init_trading_db
 from notify import send_error
+import marketdata
+import cancels
+import intents
 
 def NOW():
     return int(time.time())
@@ -33,37 +35,11 @@ def usage():
     )
 
 def cancel_all_buys(sess: SessionT, cli: MexcClient) -> int:
-    # Биржа
-    ex = cli.open_orders(PAIR) or []
-    buy_ids = [str(o.get("orderId")) for o in ex if (o.get("side","").upper()=="BUY")]
-    # Пытаемся отменить на бирже
-    canceled = 0
-    for oid in buy_ids:
-        try:
-            cli.cancel_order(PAIR, oid)
-        except Exception:
-            pass
-        canceled += 1
-    # Локально переводим в CANCELED
-    stale = (sess.query(Order)
-             .filter(and_(Order.pair==PAIR,
-                          Order.side=="BUY",
-                          Order.status.in_(("NEW","PARTIALLY_FILLED"))))
-             .all())
-    for o in stale:
-        o.status = "CANCELED"
-        o.updated = NOW()
-        sess.add(o)
-    if stale:
-        sess.commit()
-    # Подождать применения на бирже и освободить баланс
-    t0 = time.time()
-    while time.time()-t0 < 5.0:
-        oo = cli.open_orders(PAIR) or []
-        if not any(o.get("side","").upper()=="BUY" for o in oo):
-            break
-        time.sleep(0.5)
-    return canceled
+    # Все BUY на бирже — параллельно, подтверждение одним open_orders; локально CANCELED одним UPDATE
+    rep = cancels.cancel_side(cli, sess, PAIR, "BUY")
+    if rep.results:
+        print(rep.summary())
+    return len(rep.canceled)
 
 def get_free_usdc(cli: MexcClient) -> float:
     acct = cli.account()
@@ -134,37 +110,30 @@ def place_ladder(sess: SessionT, cli: MexcClient,
     if not filt:
         return 0, 0.0
 
-    placed = 0
-    spent  = 0.0
+    # до бюджета — заранее, чтобы вся лестница ушла одной пачкой
+    batch, spent = [], 0.0
     for price, usd in filt:
         if usd < MIN_ORDER_USD:
             continue
         qty = _floor6(usd / price)
         if qty <= 0:
             continue
-        try:
-            resp = cli.place_order(PAIR, "BUY", price=price, qty=qty)
-            oid  = str(resp.get("orderId") or f"B_{NOW()}")
-        except Exception as e:
+        batch.append(intents.new("BUY", price, qty, reserved=usd, mode="BUCKET"))
+        spent += usd
+        if spent >= budget_usd * 0.999:  # чуть-чуть запас
+            break
+
+    # журнал намерений + один коммит результатов на всю лестницу
+    placed, spent = 0, 0.0
+    for r in intents.place_batch(cli, sess, PAIR, batch):
+        if r.error is not None:
             try:
-                send_error("buckets.place", e)
+                send_error("buckets.place", r.error)
             except Exception:
                 pass
             continue
-
-        o = Order(
-            id=oid, pair=PAIR, side="BUY",
-            price=float(price), qty=float(qty),
-            status="NEW", created=NOW(), updated=NOW(),
-            paper=False, reserved=float(usd), filled_qty=0.0, mode="BUCKET",
-        )
-        sess.merge(o)
-        sess.commit()
         placed += 1
-        spent += usd
-
-        if spent >= budget_usd * 0.999:  # чуть-чуть запас
-            break
+        spent += r.intent.reserved
 
     return placed, spent
 
@@ -186,7 +155,7 @@ def main():
 
     init_trading_db()
     sess = SessionT()
-    cli  = MexcClient()
+    cli  = get_client()
     try:
         # 1) Отменяем все BUY
         canceled = cancel_all_buys(sess, cli)
@@ -196,7 +165,7 @@ def main():
         budget = free_usdc * (M_percent/100.0)
 
         # 3) Определяем верхнюю границу: last * 0.99
-        last = float(cli.price(PAIR))
+        last = marketdata.last_price(cli, PAIR)
         top  = last * 0.99
         if top <= N_start:
             # почти нет диапазона — отступим 0.3% вниз от last
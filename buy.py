@@ -4,8 +4,6 @@ import math
 import time
 import random
 # removed: timezone,timedelta (unused)
-from statistics import mean
-from sqlalchemy import and_
 
 from config import (
     PAIR,
@@ -22,10 +20,17 @@ from config import (
     MICRO_OFFSET_MAX,
 )
 
-from models import SessionLocal, MinMax
-from models_trading import SessionT, Order, Capital, init_trading_db
-from mexc_client import MexcClient
+import channels
+from channels import BUY_CHANNEL_WINDOW, BUY_CHANNEL_ESTIMATOR
+from models_trading import SessionT, Capital, init_trading_db
+from mexc_client import MexcClient, get_client
 from notify import send_error
+import intents
+import marketdata
+import reconcile
+import tracing
+from orderbook import OrderBook
+from pairs import get_pair, strategy_params
 
 def now_ts():
     return int(time.time())
@@ -36,55 +41,43 @@ def _floor6(x: float) -> float:
 def micro_shift() -> float:
     return random.uniform(MICRO_OFFSET_MIN, MICRO_OFFSET_MAX)
 
-def last_price(cli: MexcClient) -> float:
-    return float(cli.price(PAIR))
+def last_price(cli: MexcClient, pair: str = PAIR) -> float:
+    # локальная запись candles.py (shared memory), REST — если она устарела
+    return marketdata.last_price(cli, pair)
 
-def channel_24h() -> tuple[float, float, float]:
-    """Возвращает (lower, upper, mid24) как mid±spread/4 за 24ч по MinMax."""
-    s = SessionLocal()
-    try:
-        cutoff = now_ts() - 86400
-        rows = (s.query(MinMax)
-                  .filter(and_(MinMax.pair == PAIR, MinMax.time >= cutoff))
-                  .all())
-        if not rows:
-            return 0.0, 0.0, 0.0
-        min24 = min(r.min for r in rows)
-        max24 = max(r.max for r in rows)
-        mid24 = mean(r.mid for r in rows)
-        spread = max(0.0, max24 - min24)
-        lower = max(0.0, mid24 - spread/4.0)
-        upper = max(0.0, mid24 + spread/4.0)
-        return lower, upper, mid24
-    finally:
-        s.close()
+def channel(pair: str = PAIR) -> tuple[float, float, float]:
+    """
+    (lower, upper, mid) канала по окну BUY_CHANNEL_WINDOW и оценщику BUY_CHANNEL_ESTIMATOR
+    (по умолчанию 24h, mid±spread/4). Если данных нет — (0,0,0). См. channels.py.
+    """
+    return channels.channel(pair, BUY_CHANNEL_WINDOW, BUY_CHANNEL_ESTIMATOR)
+
+channel_24h = channel   # прежнее имя
 
-def get_capital(sessT: SessionT) -> float:
-    cap = sessT.query(Capital).filter(Capital.pair == PAIR).first()
+def get_capital(sessT: SessionT, pair: str = PAIR) -> float:
+    cap = sessT.query(Capital).filter(Capital.pair == pair).first()
     return float(cap.available_usd) if cap else 0.0
 
-def place_limit_buy(cli: MexcClient, sessT: SessionT, price: float, usd_size: float):
-    """Отправляет лимитную покупку и фиксирует в локальной БД."""
+def buy_intent(price: float, usd_size: float):
+    """Намерение лимитной покупки на usd_size или None (мельче MIN_ORDER_USD / нулевое кол-во)."""
     price = max(0.0, float(price))
     usd_size = max(0.0, float(usd_size))
     if price <= 0 or usd_size < MIN_ORDER_USD:
-        return False
+        return None
 
     qty = _floor6(usd_size / price)
     if qty <= 0:
-        return False
+        return None
+    return intents.new("BUY", price, qty, reserved=usd_size, mode="GRID")
 
-    resp = cli.place_order(PAIR, "BUY", price=price, qty=qty)
-    oid = str(resp.get("orderId") or f"BUY_{now_ts()}")
-
-    o = Order(
-        id=oid, pair=PAIR, side="BUY",
-        price=float(price), qty=float(qty),
-        status="NEW", created=now_ts(), updated=now_ts(),
-        paper=False, reserved=float(usd_size), filled_qty=0.0, mode="GRID",
-    )
-    sessT.merge(o)
-    sessT.commit()
+def place_limit_buy(cli: MexcClient, sessT: SessionT, price: float, usd_size: float, pair: str = PAIR):
+    """Отправляет лимитную покупку и фиксирует в локальной БД."""
+    it = buy_intent(price, usd_size)
+    if it is None:
+        return False
+    r, = intents.place_batch(cli, sessT, pair, [it])
+    if r.error is not None:
+        raise r.error
     return True
 
 # === Построение цен ===
@@ -130,60 +123,82 @@ def build_orders_below(last: float) -> list[tuple[float, float]]:
         out.append((target, BUY_SIZE_BELOW_FIXED_USD))
     return out
 
-def main():
+def plan_buys(last: float, lower: float, upper: float, avail_usd: float) -> list[tuple[float, float]]:
+    """
+    Чистая логика тика BUY: [(price, usd)] к постановке при данном канале и доступном кэше.
+    Используется и в main(), и в backtest.py.
+    """
+    # 1) Формируем набор согласно положению цены
+    if lower > 0 and upper > 0:
+        if last > upper:
+            orders = build_orders_above(last, upper)    # 2 ордера (mid и upper)
+        elif last < lower:
+            orders = build_orders_below(last)            # 3 ордера
+        else:
+            orders = build_orders_inchannel(last)        # 3 ордера
+    else:
+        orders = build_orders_inchannel(last)
+
+    # 2) Бюджет
+    if avail_usd <= 0:
+        return []
+
+    # выбросим совсем мелкие
+    orders = [(p, sz) for (p, sz) in orders if sz >= MIN_ORDER_USD]
+    if not orders:
+        return []
+
+    need = sum(sz for _, sz in orders)
+
+    # Особое правило для ветки "над каналом":
+    # если денег меньше, чем на 2 ордера, но ≥ MIN_ORDER_USD — ставим один ордер на mid и всем бюджетом.
+    if (lower > 0 and upper > 0 and last > upper) and (avail_usd < need) and (avail_usd >= MIN_ORDER_USD):
+        p_mid = (last + upper) / 2.0
+        return [(p_mid, avail_usd)]
+
+    # Иначе — просто пропорционально ужимаем до доступного кэша
+    if need > avail_usd:
+        k = avail_usd / need if need > 0 else 0.0
+        orders = [(p, sz*k) for (p, sz) in orders if sz*k >= MIN_ORDER_USD]
+    return orders
+
+@tracing.traced("buy.main")
+def main(pair: str = PAIR, cli: MexcClient = None):
+    """Тик BUY по паре pair (engine.py передаёт общий клиент)."""
     init_trading_db()
-    cli = MexcClient()
+    cli = cli or get_client()
     sessT = SessionT()
 
     try:
-        last = last_price(cli)
-        lower, upper, _ = channel_24h()
-
-        # 1) Формируем набор согласно положению цены
-        if lower > 0 and upper > 0:
-            if last > upper:
-                orders = build_orders_above(last, upper)    # 2 ордера (mid и upper)
-            elif last < lower:
-                orders = build_orders_below(last)            # 3 ордера
-            else:
-                orders = build_orders_inchannel(last)        # 3 ордера
+        intents.recover(cli, sessT, pair)
+        last = last_price(cli, pair)
+        lower, upper, _ = channel(pair)
+        avail_usd = get_capital(sessT, pair)
+
+        if reconcile.ORDER_RECONCILE:
+            # желаемая лестница на весь бюджет, включая резерв под нашими же BUY
+            book = OrderBook.load(sessT, pair)
+            resting = book.buys.filter(lambda o: o.mode in reconcile.MANAGED_MODES)
+            rem = {o.id: max(0.0, float(o.qty or 0.0) - float(o.filled_qty or 0.0)) for o in resting}
+            budget = avail_usd + sum(float(o.price or 0.0) * rem[o.id] for o in resting)
+            target = [(p, _floor6(usd / p), usd) for p, usd in plan_buys(last, lower, upper, budget) if p > 0]
+            _, cancel, place = reconcile.diff(target, [(o.id, float(o.price or 0.0), rem[o.id]) for o in resting])
+            by_id = {o.id: o for o in resting}
+            if cancel:
+                n = reconcile.cancel_orders(cli, sessT, pair, [by_id[k] for k in cancel],
+                                            on_error=lambda e: send_error("buy.cancel", e), book=book)
+                if n < len(cancel):
+                    return  # резерв не освободился целиком — доставим на следующем тике после sync
+            orders = [(p, usd) for p, _, usd in place]
         else:
-            orders = build_orders_inchannel(last)
-
-        # 2) Бюджет
-        avail_usd = get_capital(sessT)
-        if avail_usd <= 0:
-            return
-
-        # выбросим совсем мелкие
-        orders = [(p, sz) for (p, sz) in orders if sz >= MIN_ORDER_USD]
-        if not orders:
-            return
-
-        need = sum(sz for _, sz in orders)
-
-        # Особое правило для ветки "над каналом":
-        # если денег меньше, чем на 2 ордера, но ≥ MIN_ORDER_USD — ставим один ордер на mid и всем бюджетом.
-        if (lower > 0 and upper > 0 and last > upper) and (avail_usd < need) and (avail_usd >= MIN_ORDER_USD):
-            p_mid = (last + upper) / 2.0
-            place_limit_buy(cli, sessT, p_mid, avail_usd)
-            return
-
-        # Иначе — просто пропорционально ужимаем до доступного кэша
-        if need > avail_usd:
-            k = avail_usd / need if need > 0 else 0.0
-            orders = [(p, sz*k) for (p, sz) in orders if sz*k >= MIN_ORDER_USD]
-
-        if not orders:
-            return
-
-        # 3) Ставим
-        for price, usd in orders:
-            try:
-                place_limit_buy(cli, sessT, price, usd)
-            except Exception as e:
+            orders = plan_buys(last, lower, upper, avail_usd)
+
+        # 3) Ставим (журнал намерений + один коммит результатов на пачку)
+        batch = [it for it in (buy_intent(p, usd) for p, usd in orders) if it is not None]
+        for r in intents.place_batch(cli, sessT, pair, batch):
+            if r.error is not None:
                 try:
-                    send_error("buy.place_order", e)
+                    send_error("buy.place_order", r.error)
                 except Exception:
                     pass
 
@@ -197,4 +212,10 @@ def main():
         sessT.close()
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    ap = argparse.ArgumentParser(description="BUY tick")
+    ap.add_argument("--pair", default=PAIR, help="символ пары (по умолчанию config.PAIR)")
+    args = ap.parse_args()
+    pc = get_pair(args.pair)
+    with strategy_params(pc.params):
+        main(pc.pair)
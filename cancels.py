@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Массовая отмена ордеров.
+
+  rep = cancels.cancel_side(cli, sess, PAIR, "BUY")     # все BUY пары на бирже
+  rep = cancels.cancel_orders(cli, sess, PAIR, orders)  # конкретные (Order или id)
+  rep.canceled, rep.failed, rep.released_sec, rep.results["123"].state
+
+- Запросы идут параллельно (CANCEL_WORKERS потоков на общий keep-alive пул клиента);
+  если снимается вся книга символа (side=None или другой стороны нет) — один
+  DELETE /api/v3/openOrders.
+- Подтверждение — один сверочный open_orders после отмен вместо опроса в цикле:
+  ордер, которого там нет, больше не держит баланс.
+- Локально снятые нами — CANCELED одним UPDATE; исчезнувшие сами (исполнены или сняты
+  раньше) не трогаем — их статус выставит sync по fills.
+
+state в результате: CANCELED — снят нами; GONE — отмена не прошла, но на бирже его
+уже нет; OPEN — всё ещё открыт; ERROR — отмена не прошла, сверки не было.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from models_trading import Order
+import metrics
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+CANCEL_WORKERS = int(getattr(CFG, "CANCEL_WORKERS", 8))
+STATUS_OPEN = ("NEW", "PARTIALLY_FILLED")
+_UPDATE_CHUNK = 500   # id в одном IN (...) — с запасом под лимит переменных SQLite
+
+_M_BULK = metrics.histogram("bulk_cancel_seconds", "Bulk cancel wall time to confirmed release", ("method",))
+
+class CancelResult(NamedTuple):
+    order_id: str
+    side: str
+    ok: bool                      # снят нашим запросом и не висит на бирже
+    state: str                    # CANCELED | GONE | OPEN | ERROR
+    error: Optional[Exception]
+    sec: float                    # время запроса отмены
+
+class CancelReport(NamedTuple):
+    results: Dict[str, CancelResult]
+    method: str                   # each | bulk | none
+    released_sec: Optional[float] # от старта до подтверждения, что ни один не висит (None — что-то осталось)
+    marked: int                   # локальных строк -> CANCELED
+
+    @property
+    def canceled(self) -> List[str]:
+        return [k for k, r in self.results.items() if r.ok]
+
+    @property
+    def failed(self) -> List[str]:
+        return [k for k, r in self.results.items() if r.state in ("OPEN", "ERROR")]
+
+    @property
+    def gone(self) -> List[str]:
+        return [k for k, r in self.results.items() if r.state == "GONE"]
+
+    def summary(self) -> str:
+        rel = f"{self.released_sec:.2f}s" if self.released_sec is not None else "n/a"
+        return (f"cancel[{self.method}]: ok={len(self.canceled)} gone={len(self.gone)} "
+                f"failed={len(self.failed)} released={rel}")
+
+def _oid(o) -> str:
+    return str(o.get("orderId") if isinstance(o, dict) else getattr(o, "id", o))
+
+def _side(o) -> str:
+    v = o.get("side") if isinstance(o, dict) else getattr(o, "side", "")
+    return str(v or "").upper()
+
+def _cancel_each(cli, pair: str, orders: list, workers: int) -> Dict[str, tuple]:
+    """{id: (side, error|None, sec)} — параллельные DELETE /api/v3/order."""
+    def one(o):
+        oid, side = _oid(o), _side(o)
+        t0 = time.perf_counter()
+        try:
+            cli.cancel_order(pair, oid, side=side)
+            return oid, (side, None, time.perf_counter() - t0)
+        except Exception as e:
+            return oid, (side, e, time.perf_counter() - t0)
+    if not orders:
+        return {}
+    if len(orders) == 1 or workers <= 1:
+        return dict(one(o) for o in orders)
+    with ThreadPoolExecutor(max_workers=min(int(workers), len(orders))) as ex:
+        return dict(ex.map(one, orders))
+
+def mark_canceled(sess, ids: Iterable[str]) -> int:
+    """Открытые локальные строки с этими id -> CANCELED (UPDATE на каждые _UPDATE_CHUNK id)."""
+    ids = list(ids)
+    n, now = 0, int(time.time())
+    for i in range(0, len(ids), _UPDATE_CHUNK):
+        n += (sess.query(Order)
+                  .filter(Order.id.in_(ids[i:i + _UPDATE_CHUNK]), Order.status.in_(STATUS_OPEN))
+                  .update({Order.status: "CANCELED", Order.updated: now}, synchronize_session="fetch"))
+    if ids:
+        sess.commit()
+    return n
+
+def _finish(cli, sess, pair: str, raw: Dict[str, tuple], method: str, t0: float, confirm: bool) -> CancelReport:
+    still = None
+    if confirm and raw:
+        try:
+            still = {_oid(it) for it in (cli.open_orders(pair) or [])}
+        except Exception:
+            still = None
+    results = {}
+    for oid, (side, err, sec) in raw.items():
+        if still is not None and oid in still:
+            state = "OPEN"
+        elif err is None:
+            state = "CANCELED"
+        else:
+            state = "GONE" if still is not None else "ERROR"
+        results[oid] = CancelResult(oid, side, state == "CANCELED", state, err, sec)
+    released = time.perf_counter() - t0
+    if any(r.state in ("OPEN", "ERROR") for r in results.values()):
+        released = None
+    marked = mark_canceled(sess, [k for k, r in results.items() if r.ok]) if sess is not None else 0
+    if released is not None and raw:
+        _M_BULK.observe(released, method=method)
+    return CancelReport(results, method if raw else "none", released, marked)
+
+def cancel_orders(cli, sess, pair: str, orders: Iterable, workers: int = CANCEL_WORKERS,
+                  confirm: bool = False) -> CancelReport:
+    """
+    Снять конкретные ордера (models_trading.Order, dict из open_orders или id).
+    confirm=True — сверить одним open_orders (иначе верим ответам отмены).
+    """
+    t0 = time.perf_counter()
+    raw = _cancel_each(cli, pair, list(orders), workers)
+    return _finish(cli, sess, pair, raw, "each", t0, confirm)
+
+def cancel_side(cli, sess, pair: str, side: Optional[str] = None, workers: int = CANCEL_WORKERS,
+                confirm: bool = True) -> CancelReport:
+    """Снять все открытые ордера пары на бирже (side=BUY/SELL — только эту сторону)."""
+    t0 = time.perf_counter()
+    side = side.upper() if side else None
+    ex = cli.open_orders(pair) or []
+    targets = [it for it in ex if side is None or _side(it) == side]
+    if not targets:
+        return CancelReport({}, "none", 0.0, 0)
+    raw: Dict[str, tuple] = {}
+    method = "each"
+    if len(targets) > 1 and len(targets) == len(ex) and hasattr(cli, "cancel_open_orders"):
+        # снимается вся книга символа — одним запросом
+        t1 = time.perf_counter()
+        try:
+            rows = cli.cancel_open_orders(pair) or []
+            sec = time.perf_counter() - t1
+            done = {_oid(r) for r in rows}
+            for it in targets:
+                oid = _oid(it)
+                if oid in done:
+                    raw[oid] = (_side(it), None, sec)
+            method = "bulk"
+        except Exception:
+            raw = {}
+    rest = [it for it in targets if _oid(it) not in raw]
+    raw.update(_cancel_each(cli, pair, rest, workers))
+    return _finish(cli, sess, pair, raw, method, t0, confirm)
@@ -1,234 +1,369 @@
+"""
+Сервис минутных свечей и локальных рыночных данных (ebot-candles.service).
+
+Один цикл asyncio:
+  ws      — WS MEXC: подписки (kline, deals/bookTicker), повтор подписок после
+            переподключения, прикладной PING, переподключение с экспоненциальной
+            задержкой и джиттером (WS_BACKOFF_BASE_SEC..WS_BACKOFF_MAX_SEC);
+  minute  — раз в минуту (одно пробуждение) последняя закрытая свеча каждой пары по HTTP;
+  writer  — очередь записи в БД: minmax пишется в пуле потоков, медленный SQLite не
+            задерживает разбор кадров. При старте он же закрывает пропуски (backfill.py).
+Кадры deals/bookTicker сразу уходят в shared memory (marketdata.py), без БД.
+"""
 import json
 import sys
 import time
-import threading
-import logging
-from logging.handlers import TimedRotatingFileHandler
-import requests
+import random
 import signal
-import websocket
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
 
-from config import (
-    PAIR, MEXC_HTTP_URL, MEXC_WS_URL,
-    MAX_CANDLE_GAP
-)
+import requests
+import websockets
+
+from config import PAIR, MEXC_HTTP_URL, MEXC_WS_URL
 from models import SessionLocal, MinMax, init_db
 from notify import send_error
-import os
-os.makedirs("/opt/Ebot/logs", exist_ok=True)
+from pairs import load_pairs
+from channels import CHANNEL_WINDOWS
+import backfill
+import marketdata
+import metrics
 
 # --- optional config values with safe defaults ---
 try:
     from config import HTTP_TIMEOUT  # optional
 except Exception:
     HTTP_TIMEOUT = 10  # seconds (default)
+try:
+    from config import WS_BACKOFF_BASE_SEC, WS_BACKOFF_MAX_SEC
+except Exception:
+    WS_BACKOFF_BASE_SEC, WS_BACKOFF_MAX_SEC = 1.0, 60.0
+
+# --- хранение: не короче суток и самого длинного окна канала (channels.py) ---
+try:
+    from config import CANDLE_RETENTION_SEC
+except Exception:
+    CANDLE_RETENTION_SEC = max([86400] + [int(m) * 60 for m in CHANNEL_WINDOWS.values()])
+
+# --- пары: все kline-подписки идут через одно WS-соединение ---
+PAIRS = [pc.pair for pc in load_pairs()]
+WS_MAX_STREAMS = 30  # лимит подписок MEXC на одно соединение
+
+# --- последняя сделка / bid-ask -> shared memory (marketdata.py) ---
+MD_STREAMS = ("spot@public.aggre.deals.v3.api.pb@100ms@{}", "spot@public.aggre.bookTicker.v3.api.pb@100ms@{}")
 
 # --- keepalive ---
 SOCKET_PING_INTERVAL = 15
 SOCKET_PING_TIMEOUT  = 10
 APP_PING_INTERVAL    = 20
+APP_IDLE_TIMEOUT     = APP_PING_INTERVAL * 3   # тишина дольше — соединение считаем мёртвым
+MINUTE_FETCH_DELAY   = 0.2                     # сек после начала минуты
 
-# --- logging ---
+IO_THREADS = 4   # HTTP и запись в БД
+
+# --- logging (хэндлеры ставит logging_config.setup_logging в run()) ---
 logger = logging.getLogger("candles")
-logger.setLevel(logging.INFO)
-fh = TimedRotatingFileHandler("/opt/Ebot/logs/candles.log", when="W0", backupCount=8, encoding="utf-8")
-fh.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
-sh = logging.StreamHandler()
-sh.setFormatter(logging.Formatter("%(asctime)s [%(levelname)s] %(message)s"))
-logger.addHandler(fh)
-logger.addHandler(sh)
 
-init_db()
+_M_LAG      = metrics.gauge("candle_ingest_lag_seconds", "Age of the newest stored 1m candle close at ingest", ("pair",))
+_M_INGESTED = metrics.counter("candles_ingested_total", "1m candles upserted", ("pair", "source"))
+_M_QUEUE    = metrics.gauge("candle_write_queue", "Candle batches waiting for the DB writer")
+_M_RECONN   = metrics.counter("ws_reconnects_total", "WS reconnect attempts by reason", ("reason",))
 
 # ================== БАЗА ДАННЫХ ==================
 
-def insert_candles_rest(rows):
+def insert_candles_rest(rows, pair: str = PAIR):
     """
     rows: [[openTime(ms), open, high, low, close, volume, closeTime, ...], ...]
     """
     s = SessionLocal()
     try:
+        newest = 0
         for r in rows:
             t = int(r[0]) // 1000
             o, h, l, c = map(float, (r[1], r[2], r[3], r[4]))
-            s.merge(MinMax(pair=PAIR, time=t, min=l, max=h, mid=(h+l)/2, open=o, close=c))
-        # удалить старше 24ч
-        expire = int(time.time()) - 86400
+            s.merge(MinMax(pair=pair, time=t, min=l, max=h, mid=(h+l)/2, open=o, close=c))
+            newest = max(newest, t)
+        # удалить старше CANDLE_RETENTION_SEC
+        expire = int(time.time()) - CANDLE_RETENTION_SEC
         s.query(MinMax).filter(MinMax.time < expire).delete()
         s.commit()
     finally:
         s.close()
+    if rows:
+        # свеча [t, t+60) закрыта в t+60 — лаг считаем от закрытия
+        _M_LAG.set(max(0.0, time.time() - (newest + 60)), pair=pair)
+        _M_INGESTED.inc(len(rows), pair=pair, source="rest")
 
-def last_saved_time():
+def last_saved_time(pair: str = PAIR):
     s = SessionLocal()
     try:
-        row = s.query(MinMax).filter(MinMax.pair == PAIR).order_by(MinMax.time.desc()).first()
+        row = s.query(MinMax).filter(MinMax.pair == pair).order_by(MinMax.time.desc()).first()
         return row.time if row else 0
     finally:
         s.close()
 
-# ================== ДОЗАГРУЗКА ПРОПУСКОВ ==================
+# ================== HTTP ==================
 
 def fetch_missing(pair, last_t):
+    """Все закрытые свечи после last_t (не глубже CANDLE_RETENTION_SEC) — см. backfill.py."""
     now_aligned = int(time.time() // 60 * 60)
-    gap = (now_aligned - last_t) // 60
-    if gap <= 0:
+    start = max(int(last_t) + 60, now_aligned - CANDLE_RETENTION_SEC)
+    if start >= now_aligned:
         return
-    if gap > MAX_CANDLE_GAP:
-        gap = MAX_CANDLE_GAP
-    logger.info(f"[SYNC] Fetching {gap} missing candles via HTTP...")
+    logger.info(f"[SYNC] {pair} fetching {(now_aligned - start) // 60} missing candles via HTTP...")
     try:
-        r = requests.get(MEXC_HTTP_URL, params={"symbol": pair.upper(), "interval": "1m", "limit": gap}, timeout=HTTP_TIMEOUT)
-        r.raise_for_status()
-        insert_candles_rest(r.json())
+        rep = backfill.backfill(pair, start, now_aligned)
+        logger.info(rep.summary())
+        if rep.missing:
+            logger.warning(f"[SYNC] {pair} exchange returned no candle for {len(rep.missing)} minute(s)")
+        if rep.errors:
+            raise rep.errors[0][1]
+        if rep.candles:
+            _M_LAG.set(max(0.0, time.time() - now_aligned), pair=pair)
     except Exception as e:
         logger.error("HTTP fetch error: %r", e)
         try: send_error("candles HTTP fetch", e)
         except Exception: pass
 
 def fetch_last_closed(pair):
-    """Подтягивает последнюю закрытую 1m свечу (limit=1) и сохраняет её."""
-    try:
-        r = requests.get(MEXC_HTTP_URL, params={"symbol": pair.upper(), "interval": "1m", "limit": 1}, timeout=HTTP_TIMEOUT)
-        r.raise_for_status()
-        data = r.json()
-        if isinstance(data, list) and data:
-            insert_candles_rest(data)
-            t = int(data[-1][0]) // 1000
-            ts = datetime.fromtimestamp(t, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
-            logger.info(f"[RECV] {PAIR} {ts} stored last closed candle")
-    except Exception as e:
-        logger.error("fetch_last_closed error: %r", e)
-        try: send_error("candles last_closed", e)
-        except Exception: pass
+    """Последняя закрытая 1m свеча (limit=1) — строки klines."""
+    r = requests.get(MEXC_HTTP_URL, params={"symbol": pair.upper(), "interval": "1m", "limit": 1}, timeout=HTTP_TIMEOUT)
+    r.raise_for_status()
+    data = r.json()
+    return data if isinstance(data, list) else []
 
-# ================== МИНУТНЫЙ ТИКЕР ==================
+def _send_error_quiet(context, exc):
+    try: send_error(context, exc)
+    except Exception: pass
 
-_tick_stop = threading.Event()
+# ================== WS ==================
 
-def minute_tick_loop():
-    """Каждую новую минуту подтягиваем последнюю закрытую свечу по HTTP."""
-    now = time.time()
-    next_minute = int(now // 60 + 1) * 60
-    delay = max(0.5, next_minute - now + 0.2)
-    _tick_stop.wait(delay)
+def _streams(pairs=None):
+    pairs = PAIRS if pairs is None else pairs
+    out = [f"spot@public.kline.v3.api.pb@{p.upper()}@Min1" for p in pairs]  # protobuf канал
+    if marketdata.MD_ENABLED:
+        out += [fmt.format(p.upper()) for p in pairs for fmt in MD_STREAMS]
+    return out
 
-    last_min = int(time.time() // 60)
-    logger.info("Minute ticker started")
-    while not _tick_stop.is_set():
-        cur_min = int(time.time() // 60)
-        if cur_min != last_min:
-            fetch_last_closed(PAIR)
-            last_min = cur_min
-        _tick_stop.wait(0.5)
+def pong_for(payload):
+    """Ответ на прикладной ping сервера (JSON) или None."""
+    if not isinstance(payload, dict):
+        return None
+    if str(payload.get("method", "")).upper() == "PING":
+        return {"method": "PONG", "id": payload.get("id", 1)}
+    if str(payload.get("op", "")).lower() == "ping":
+        return {"op": "pong", "ts": payload.get("ts")}
+    if "ping" in payload:
+        return {"pong": payload["ping"]}
+    return None
 
-# ================== WS HEARTBEAT ==================
+def backoff_delay(attempt: int, base: float = None, cap: float = None) -> float:
+    """Экспоненциальная задержка с джиттером: [0.5, 1] × min(cap, base·2^(attempt-1))."""
+    base = WS_BACKOFF_BASE_SEC if base is None else base
+    cap = WS_BACKOFF_MAX_SEC if cap is None else cap
+    return min(cap, base * (2 ** max(0, attempt - 1))) * random.uniform(0.5, 1.0)
 
-_ws = None
-_hb_stop = threading.Event()
+class CandleService:
+    """
+    pairs — пары; fetch(pair) -> klines последней закрытой свечи; write(rows, pair) — запись
+    в БД (в пуле потоков); startup(pair) — закрыть пропуски при старте (None — не надо).
+    """
+    def __init__(self, pairs=None, url: str = MEXC_WS_URL, fetch=fetch_last_closed, write=insert_candles_rest,
+                 startup=lambda pair: fetch_missing(pair, last_saved_time(pair)), md_dir: str = None):
+        self.pairs = list(PAIRS if pairs is None else pairs)
+        self.url = url
+        self.fetch, self.write, self.startup = fetch, write, startup
+        self.md_dir = md_dir
+        self.stop = asyncio.Event()
+        self.writes: asyncio.Queue = asyncio.Queue()
+        self.writers = {}
+        self.connects = 0
+        self.subscribed = 0
+        self.last_rx = 0.0
+        self.written = 0
+
+    # ---------------- кадры ----------------
+    def _md_writer(self, symbol):
+        w = self.writers.get(symbol)
+        if w is None and symbol in self.pairs:
+            w = self.writers[symbol] = marketdata.Writer(symbol, self.md_dir)
+        return w
+
+    def on_pb_frame(self, message):
+        """deals/bookTicker -> запись пары в shared memory; kline идут через минутный HTTP."""
+        try:
+            m = marketdata.decode_push(message)
+        except Exception as e:
+            logger.debug("[PB] undecodable frame %d bytes: %r", len(message), e)
+            return
+        if not (m["deals"] or m["book"]):
+            return
+        w = self._md_writer(m["symbol"].upper())
+        if w is None:
+            return
+        if m["deals"]:
+            price, _, _, t_ms = max(m["deals"], key=lambda d: d[3])
+            w.update(last=price, trade_ms=t_ms)
+        if m["book"]:
+            bid, bid_qty, ask, ask_qty = m["book"]
+            w.update(bid=bid, bid_qty=bid_qty, ask=ask, ask_qty=ask_qty)
 
-def hb_loop():
-    while not _hb_stop.is_set():
+    async def on_message(self, ws, message):
+        self.last_rx = time.monotonic()
+        # .pb канал отдаёт бинарь; текстом прилетает только служебный JSON
+        if isinstance(message, (bytes, bytearray)):
+            logger.debug("[PB] frame %d bytes", len(message))
+            self.on_pb_frame(message)
+            return
         try:
-            if _ws:
-                _ws.send(json.dumps({"method": "PING", "id": 999}))
+            payload = json.loads(message)
         except Exception:
-            pass
-        _hb_stop.wait(APP_PING_INTERVAL)
+            return
+        pong = pong_for(payload)
+        if pong is not None:
+            await ws.send(json.dumps(pong))
+            return
+        if isinstance(payload, dict) and payload.get("code") == 0 and payload.get("id") == 1:
+            self.subscribed += 1
+            logger.info("SUB ACK")
 
-def maybe_pong(ws, payload):
-    if not isinstance(payload, dict):
-        return False
-    if payload.get("method", "").upper() == "PING":
-        ws.send(json.dumps({"method": "PONG", "id": payload.get("id", 1)})); return True
-    if payload.get("op", "").lower() == "ping":
-        ws.send(json.dumps({"op": "pong", "ts": payload.get("ts")})); return True
-    if "ping" in payload:
-        ws.send(json.dumps({"pong": payload["ping"]})); return True
-    return False
-
-# ================== WS CALLBACKS ==================
-
-def on_open(ws):
-    logger.info("Connected to WebSocket")
-    sub = {
-        "method": "SUBSCRIPTION",
-        "params": [f"spot@public.kline.v3.api.pb@{PAIR.upper()}@Min1"],  # protobuf канал
-        "id": 1
-    }
-    ws.send(json.dumps(sub))
-    _hb_stop.clear()
-    threading.Thread(target=hb_loop, daemon=True).start()
-
-def on_message(ws, message):
-    # .pb канал отдаёт бинарь; текстом прилетает только служебный JSON
-    if isinstance(message, (bytes, bytearray)):
-        tstr = datetime.now(timezone.utc).strftime("%H:%M:%S")
-        logger.info(f"[PB] frame {len(message)} bytes @ {tstr}")
-        return
-    try:
-        payload = json.loads(message)
-    except Exception:
-        return
-    if maybe_pong(ws, payload):
-        return
-    if isinstance(payload, dict) and payload.get("code") == 0 and payload.get("id") == 1:
-        logger.info("SUB ACK")
+    # ---------------- задачи ----------------
+    async def _app_ping(self, ws):
+        while True:
+            await asyncio.sleep(APP_PING_INTERVAL)
+            if time.monotonic() - self.last_rx > APP_IDLE_TIMEOUT:
+                logger.warning("WS idle for %.0fs — reconnecting", time.monotonic() - self.last_rx)
+                await ws.close()
+                return
+            await ws.send(json.dumps({"method": "PING", "id": 999}))
 
-def on_close(ws, *_):
-    logger.info("WebSocket closed")
-    _hb_stop.set()
+    async def ws_loop(self):
+        attempt = 0
+        loop = asyncio.get_running_loop()
+        while not self.stop.is_set():
+            reason = "closed"
+            try:
+                async with websockets.connect(self.url, ping_interval=SOCKET_PING_INTERVAL,
+                                              ping_timeout=SOCKET_PING_TIMEOUT, max_size=None) as ws:
+                    self.connects += 1
+                    self.last_rx = time.monotonic()
+                    logger.info("Connected to WebSocket")
+                    streams = _streams(self.pairs)
+                    if len(streams) > WS_MAX_STREAMS:
+                        logger.warning("%d streams > %d per connection: extra ones are not subscribed",
+                                       len(streams), WS_MAX_STREAMS)
+                    # после переподключения подписки повторяются целиком
+                    await ws.send(json.dumps({"method": "SUBSCRIPTION", "params": streams[:WS_MAX_STREAMS], "id": 1}))
+                    pinger = asyncio.create_task(self._app_ping(ws))
+                    try:
+                        async for message in ws:
+                            attempt = 0      # соединение живое — задержка снова с минимума
+                            await self.on_message(ws, message)
+                    finally:
+                        pinger.cancel()
+                logger.info("WebSocket closed")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                reason = type(e).__name__
+                logger.error("WS error: %r", e)
+                loop.run_in_executor(None, _send_error_quiet, "candles WS error", e)
+            if self.stop.is_set():
+                break
+            attempt += 1
+            delay = backoff_delay(attempt)
+            _M_RECONN.inc(reason=reason)
+            logger.info("WS reconnect #%d in %.1fs", attempt, delay)
+            try:
+                await asyncio.wait_for(self.stop.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
 
-def on_error(ws, error):
-    logger.error("WS error: %r", error)
-    try: send_error("candles WS error", error)
-    except Exception: pass
+    async def minute_loop(self):
+        """
+        В начале каждой минуты — последняя закрытая свеча всех пар (одно пробуждение в минуту).
+        Там же раз в цикл сливаются метрики (записи прошлой минуты), а не на каждую запись свечи.
+        """
+        logger.info("Minute ticker started")
+        while not self.stop.is_set():
+            now = time.time()
+            try:
+                await asyncio.wait_for(self.stop.wait(), (now // 60 + 1) * 60 + MINUTE_FETCH_DELAY - now)
+                break
+            except asyncio.TimeoutError:
+                pass
+            await asyncio.to_thread(metrics.flush)
+            res = await asyncio.gather(*(asyncio.to_thread(self.fetch, p) for p in self.pairs),
+                                       return_exceptions=True)
+            for pair, rows in zip(self.pairs, res):
+                if isinstance(rows, Exception):
+                    logger.error("fetch_last_closed error: %r", rows)
+                    asyncio.get_running_loop().run_in_executor(None, _send_error_quiet, "candles last_closed", rows)
+                elif rows:
+                    self.writes.put_nowait((pair, rows))
+                    _M_QUEUE.set(self.writes.qsize())
+
+    async def writer_loop(self):
+        """Единственный писатель БД: пропуски при старте, затем очередь минуток."""
+        if self.startup is not None:
+            for pair in self.pairs:
+                await asyncio.to_thread(self.startup, pair)
+        while True:
+            item = await self.writes.get()
+            if item is None:
+                return
+            pair, rows = item
+            try:
+                await asyncio.to_thread(self.write, rows, pair)
+                self.written += len(rows)
+                t = int(rows[-1][0]) // 1000
+                ts = datetime.fromtimestamp(t, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+                logger.info(f"[RECV] {pair} {ts} stored last closed candle")
+            except Exception as e:
+                logger.error("candle write error: %r", e)
+                asyncio.get_running_loop().run_in_executor(None, _send_error_quiet, "candles write", e)
+            _M_QUEUE.set(self.writes.qsize())
+
+    async def run(self):
+        writer = asyncio.create_task(self.writer_loop())
+        tasks = [asyncio.create_task(self.ws_loop()), asyncio.create_task(self.minute_loop())]
+        await self.stop.wait()
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self.writes.put_nowait(None)     # дописать то, что уже в очереди
+        await writer
+        await asyncio.to_thread(metrics.flush)
 
 # ================== MAIN ==================
 
-def _handle_term(signum, frame):
-    try:
-        _hb_stop.set(); _tick_stop.set()
-        ws = _ws
-        if ws: ws.close()
-    finally:
-        sys.exit(0)
+async def _main():
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(max_workers=IO_THREADS, thread_name_prefix="candles-io"))
+    svc = CandleService()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(sig, svc.stop.set)
+    await svc.run()
 
 def run():
-    signal.signal(signal.SIGTERM, _handle_term)
-    global _ws
-    # стартуем минутный тикер
-    _tick_stop.clear()
-    threading.Thread(target=minute_tick_loop, daemon=True).start()
-
-    # дозагружаем пропуски при старте
-    fetch_missing(PAIR, last_saved_time())
-
-    while True:
-        ws = websocket.WebSocketApp(
-            MEXC_WS_URL,
-            on_open=on_open,
-            on_message=on_message,
-            on_error=on_error,
-            on_close=on_close
-        )
-        _ws = ws
-        try:
-            ws.run_forever(ping_interval=SOCKET_PING_INTERVAL, ping_timeout=SOCKET_PING_TIMEOUT)
-        except KeyboardInterrupt:
-            logger.info("Interrupted by user — exiting")
-            _hb_stop.set()
-            _tick_stop.set()
-            try:
-                ws.close()
-            finally:
-                break
-        except Exception as e:
-            logger.error("WS crash: %r", e)
-            try: send_error("candles crash", e)
-            except Exception: pass
-        time.sleep(5)
+    try:
+        from logging_config import setup_logging
+        setup_logging(service="candles")
+    except Exception:
+        logging.basicConfig(level=logging.INFO)
+    metrics.set_job("candles")
+    init_db()
+    try:
+        asyncio.run(_main())
+    except Exception as e:
+        logger.error("candles crash: %r", e)
+        _send_error_quiet("candles crash", e)
+        raise
+    logger.info("Stopped")
+    sys.exit(0)
 
 if __name__ == "__main__":
     run()
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+"""
+Канал цены по нескольким окнам на кольцевом буфере минутных свечей.
+
+Свечи пары (t, min, max, mid) лежат в памяти в кольце NumPy ёмкостью под самое длинное
+окно; каждое окно (по умолчанию 1h/4h/24h/7d) обновляется инкрементально на каждую
+новую свечу — стоимость O(1) на свечу и на запрос, независимо от длины окна:
+  min/max  — монотонные деки индексов (амортизированно O(1));
+  mean     — скользящая сумма mid;
+  ewma     — EWMA mid и дисперсии, alpha = 2/(N+1), N — длина окна в минутах;
+  quantile — гистограмма mid по лог-сетке шага CHANNEL_QUANT_STEP_PCT (точность = шаг,
+             запрос идёт по корзинам, а их число задаёт ширина диапазона цены, не окно).
+
+Оценщики канала -> (lower, upper, mid):
+  spread4  — mean ± (max-min)/4 (как прежний channel_24h);
+  minmax   — min / max, mid = mean;
+  ewma     — ewma ± CHANNEL_EWMA_K·σ;
+  quantile — квантили mid CHANNEL_Q_LOW / CHANNEL_Q_HIGH, mid = медиана.
+
+  lower, upper, mid = channels.channel("KASUSDC", "4h", "ewma")
+
+Движок на пару живёт в процессе: первый запрос читает из minmax самое длинное окно,
+дальше — только свечи новее последней. Окно отсчитывается от текущего времени:
+в него входят свечи с time >= now - окно.
+"""
+import math
+import time
+import sqlite3
+import threading
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+DB_PATH              = getattr(CFG, "DB_PATH", "ebot.db")
+CHANNEL_WINDOWS      = dict(getattr(CFG, "CHANNEL_WINDOWS", {"1h": 60, "4h": 240, "24h": 1440, "7d": 10080}))
+CHANNEL_WINDOW       = getattr(CFG, "CHANNEL_WINDOW", "24h")
+CHANNEL_ESTIMATOR    = getattr(CFG, "CHANNEL_ESTIMATOR", "spread4")
+BUY_CHANNEL_WINDOW     = getattr(CFG, "BUY_CHANNEL_WINDOW", CHANNEL_WINDOW)
+BUY_CHANNEL_ESTIMATOR  = getattr(CFG, "BUY_CHANNEL_ESTIMATOR", CHANNEL_ESTIMATOR)
+SELL_CHANNEL_WINDOW    = getattr(CFG, "SELL_CHANNEL_WINDOW", CHANNEL_WINDOW)
+SELL_CHANNEL_ESTIMATOR = getattr(CFG, "SELL_CHANNEL_ESTIMATOR", CHANNEL_ESTIMATOR)
+CHANNEL_EWMA_K       = float(getattr(CFG, "CHANNEL_EWMA_K", 2.0))
+CHANNEL_Q_LOW        = float(getattr(CFG, "CHANNEL_Q_LOW", 0.25))
+CHANNEL_Q_HIGH       = float(getattr(CFG, "CHANNEL_Q_HIGH", 0.75))
+CHANNEL_QUANT_STEP_PCT = float(getattr(CFG, "CHANNEL_QUANT_STEP_PCT", 0.05))
+
+ESTIMATORS = ("spread4", "minmax", "ewma", "quantile")
+
+class _Hist:
+    """Счётчики по лог-корзинам цены: add/remove O(1), quantile — проход по корзинам."""
+    def __init__(self, step_pct: float):
+        self.ls = math.log1p(step_pct / 100.0)
+        self.cnt: Dict[int, int] = {}
+        self.n = 0
+        self._keys = None
+
+    def _k(self, x: float) -> int:
+        return int(math.floor(math.log(x) / self.ls)) if x > 0 else -(1 << 62)
+
+    def add(self, x: float) -> None:
+        k = self._k(x)
+        c = self.cnt.get(k, 0)
+        if not c:
+            self._keys = None
+        self.cnt[k] = c + 1
+        self.n += 1
+
+    def remove(self, x: float) -> None:
+        k = self._k(x)
+        c = self.cnt[k] - 1
+        if c:
+            self.cnt[k] = c
+        else:
+            del self.cnt[k]
+            self._keys = None
+        self.n -= 1
+
+    def quantile(self, q: float) -> float:
+        if not self.n:
+            return 0.0
+        if self._keys is None:
+            self._keys = sorted(self.cnt)
+        rank = min(self.n - 1, max(0, int(q * (self.n - 1))))
+        acc = 0
+        for k in self._keys:
+            acc += self.cnt[k]
+            if acc > rank:
+                return math.exp((k + 0.5) * self.ls) if k > -(1 << 62) else 0.0
+        return 0.0
+
+class _Window:
+    __slots__ = ("sec", "start", "sum", "n", "dmin", "dmax", "alpha", "ew", "ev", "hist")
+
+    def __init__(self, minutes: int, step_pct: float):
+        self.sec = int(minutes) * 60
+        self.start = 0                # абсолютный номер первой свечи окна
+        self.sum = 0.0
+        self.n = 0
+        self.dmin: deque = deque()    # номера свечей, lo возрастает
+        self.dmax: deque = deque()    # номера свечей, hi убывает
+        self.alpha = 2.0 / (int(minutes) + 1.0)
+        self.ew = None
+        self.ev = 0.0
+        self.hist = _Hist(step_pct)
+
+class ChannelEngine:
+    """Кольцо свечей одной пары и окна поверх него."""
+
+    def __init__(self, pair: str, windows: Optional[Dict[str, int]] = None,
+                 step_pct: float = CHANNEL_QUANT_STEP_PCT):
+        self.pair = pair
+        self.windows = {name: _Window(m, step_pct) for name, m in (windows or CHANNEL_WINDOWS).items()}
+        cap = max(w.sec for w in self.windows.values()) // 60 + 2
+        self.t = np.zeros(cap, dtype=np.int64)
+        self.lo = np.zeros(cap)
+        self.hi = np.zeros(cap)
+        self.mid = np.zeros(cap)
+        self.seq = 0                  # номер следующей свечи
+        self.last_t = None
+        self.lock = threading.Lock()
+
+    # ---------------- кольцо ----------------
+    def _grow(self) -> None:
+        cap = len(self.t)
+        idx = np.arange(self.seq - cap, self.seq) % cap
+        for name in ("t", "lo", "hi", "mid"):
+            a = getattr(self, name)[idx]
+            b = np.zeros(cap * 2, dtype=a.dtype)
+            # новое положение номера s: s % (2*cap)
+            b[np.arange(self.seq - cap, self.seq) % (cap * 2)] = a
+            setattr(self, name, b)
+
+    def _evict(self, w: _Window, cutoff: int) -> None:
+        cap = len(self.t)
+        while w.start < self.seq and self.t[w.start % cap] < cutoff:
+            i = w.start % cap
+            m = float(self.mid[i])
+            w.sum -= m
+            w.n -= 1
+            w.hist.remove(m)
+            if w.dmin and w.dmin[0] == w.start:
+                w.dmin.popleft()
+            if w.dmax and w.dmax[0] == w.start:
+                w.dmax.popleft()
+            w.start += 1
+
+    def push(self, t: int, lo: float, hi: float, mid: float) -> bool:
+        """Новая закрытая свеча (t строго растёт; повтор/старая — игнор)."""
+        t = int(t)
+        if self.last_t is not None and t <= self.last_t:
+            return False
+        oldest = min(w.start for w in self.windows.values())
+        if self.seq - oldest >= len(self.t):
+            self._grow()
+        cap = len(self.t)
+        s = self.seq
+        i = s % cap
+        self.t[i], self.lo[i], self.hi[i], self.mid[i] = t, lo, hi, mid
+        self.seq += 1
+        self.last_t = t
+        for w in self.windows.values():
+            w.sum += mid
+            w.n += 1
+            w.hist.add(mid)
+            while w.dmin and self.lo[w.dmin[-1] % cap] >= lo:
+                w.dmin.pop()
+            w.dmin.append(s)
+            while w.dmax and self.hi[w.dmax[-1] % cap] <= hi:
+                w.dmax.pop()
+            w.dmax.append(s)
+            if w.ew is None:
+                w.ew = mid
+            else:
+                d = mid - w.ew
+                w.ew += w.alpha * d
+                w.ev = (1.0 - w.alpha) * (w.ev + w.alpha * d * d)
+            self._evict(w, t - w.sec)
+        return True
+
+    def advance(self, now: float) -> None:
+        """Выкинуть из окон свечи старше now - окно."""
+        for w in self.windows.values():
+            self._evict(w, int(now) - w.sec)
+
+    # ---------------- загрузка ----------------
+    def refresh(self, now: Optional[float] = None, db_path: Optional[str] = None) -> int:
+        """Дочитать из minmax свечи новее последней. Возвращает число добавленных."""
+        now = time.time() if now is None else now
+        since = self.last_t + 1 if self.last_t is not None else int(now) - max(w.sec for w in self.windows.values())
+        conn = sqlite3.connect(db_path or DB_PATH)
+        try:
+            rows = conn.execute(
+                "SELECT time, min, max, mid FROM minmax WHERE pair=? AND time>=? ORDER BY time",
+                (self.pair, since)).fetchall()
+        finally:
+            conn.close()
+        n = 0
+        with self.lock:
+            for t, lo, hi, mid in rows:
+                if lo is None or hi is None or mid is None:
+                    continue
+                n += self.push(t, float(lo), float(hi), float(mid))
+            self.advance(now)
+        return n
+
+    # ---------------- запросы ----------------
+    def stats(self, window: str) -> dict:
+        w = self.windows[window]
+        if not w.n:
+            return {"n": 0, "min": 0.0, "max": 0.0, "mean": 0.0, "ewma": 0.0, "ewstd": 0.0}
+        cap = len(self.t)
+        return {"n": w.n, "min": float(self.lo[w.dmin[0] % cap]), "max": float(self.hi[w.dmax[0] % cap]),
+                "mean": w.sum / w.n, "ewma": float(w.ew), "ewstd": math.sqrt(max(0.0, w.ev))}
+
+    def quantile(self, window: str, q: float) -> float:
+        return self.windows[window].hist.quantile(q)
+
+    def channel(self, window: str = CHANNEL_WINDOW, estimator: str = CHANNEL_ESTIMATOR) -> Tuple[float, float, float]:
+        """(lower, upper, mid) окна; (0,0,0), если свечей нет."""
+        if estimator not in ESTIMATORS:
+            raise ValueError(f"unknown channel estimator {estimator!r} (expected one of {ESTIMATORS})")
+        st = self.stats(window)
+        if not st["n"]:
+            return 0.0, 0.0, 0.0
+        mid = st["mean"]
+        if estimator == "spread4":
+            half = max(0.0, st["max"] - st["min"]) / 4.0
+            lower, upper = mid - half, mid + half
+        elif estimator == "minmax":
+            lower, upper = st["min"], st["max"]
+        elif estimator == "ewma":
+            mid = st["ewma"]
+            lower, upper = mid - CHANNEL_EWMA_K * st["ewstd"], mid + CHANNEL_EWMA_K * st["ewstd"]
+        else:
+            lower, upper, mid = (self.quantile(window, CHANNEL_Q_LOW), self.quantile(window, CHANNEL_Q_HIGH),
+                                 self.quantile(window, 0.5))
+        return max(0.0, lower), max(0.0, upper), mid
+
+_ENGINES: Dict[str, ChannelEngine] = {}
+_LOCK = threading.Lock()
+
+def get(pair: str) -> ChannelEngine:
+    with _LOCK:
+        eng = _ENGINES.get(pair)
+        if eng is None:
+            eng = _ENGINES[pair] = ChannelEngine(pair)
+        return eng
+
+def channel(pair: str, window: Optional[str] = None, estimator: Optional[str] = None,
+            now: Optional[float] = None) -> Tuple[float, float, float]:
+    """Канал пары по окну/оценщику (по умолчанию CHANNEL_WINDOW / CHANNEL_ESTIMATOR)."""
+    eng = get(pair)
+    eng.refresh(now)
+    with eng.lock:
+        return eng.channel(window or CHANNEL_WINDOW, estimator or CHANNEL_ESTIMATOR)
@@ -6,10 +6,19 @@ PAIR    = "KASUSDC"
 BASE_ASSET  = "KAS"
 QUOTE_ASSET = "USDC"
 
+# Мультипарный режим (engine.py + candles.py): список пар, по умолчанию — одна PAIR выше.
+# quote_share — доля свободного QUOTE на пару (по умолчанию поровну), params — свои параметры стратегии.
+# PAIRS = [
+#     {"pair": "KASUSDC", "base": "KAS", "quote": "USDC"},
+#     {"pair": "ALPHUSDC", "base": "ALPH", "quote": "USDC", "params": {"SELL_MIN_GAIN": 0.015}},
+# ]
+
 # === MEXC endpoints (REAL) ===
 MEXC_API_URL  = "https://api.mexc.com"
 MEXC_HTTP_URL = "https://api.mexc.com/api/v3/klines"
 MEXC_WS_URL   = "wss://wbs.mexc.com/ws"
+WS_BACKOFF_BASE_SEC = 1.0   # candles.py: переподключение WS — экспонента с джиттером
+WS_BACKOFF_MAX_SEC  = 60.0
 
 # === Telegram ===
 TG_BOT_TOKEN = "REPLACE_ME"
@@ -21,15 +30,28 @@ API_KEY    = "REPLACE_ME"
 API_SECRET = "REPLACE_ME"
 
 # === Modes / toggles ===
-PAPER_TRADE   = False
+PAPER_TRADE   = False          # True — локальная paper-биржа (paper_client.py) вместо MEXC
 PAUSE_TRADING = False          # глобальная пауза торговли (оркестратор её уважает)
+PAPER_DB_PATH       = "paper.db"   # состояние paper-биржи (балансы/ордера/сделки)
+PAPER_PRICE_SOURCE  = "db"         # "db" — минутки minmax (candles.py), "rest" — тикер MEXC
+PAPER_START_USD     = 1000.0       # стартовый баланс QUOTE_ASSET
+PAPER_FILL_ON_TOUCH = False        # исполнять при касании уровня (иначе — только сквозь)
+
+# === Local market data (candles.py -> shared memory, см. marketdata.py) ===
+MD_ENABLED     = True    # candles.py подписывается на deals/bookTicker; buy/sell читают цену локально
+MD_MAX_AGE_SEC = 5.0     # запись старше — цена через REST /ticker/price
+MD_SHM_DIR     = ""      # "" — /dev/shm (или системный tmp)
 
 # === Capital / accounting (для репортов/лимитов) ===
 START_CAPITAL_USD = 1000.0
 MAKER_FEE_PCT     = 0.000
 
 # === Market data / Range builder ===
-MAX_CANDLE_GAP = 60
+# дозагрузка пропусков свечей (backfill.py; candles.py при старте) — без верхнего предела
+BACKFILL_CHUNK        = 1000     # свечей на запрос klines (максимум MEXC)
+BACKFILL_WORKERS      = 4        # параллельных запросов
+BACKFILL_RATE_PER_SEC = 10       # общий лимит запросов в секунду
+# CANDLE_RETENTION_SEC = 604800  # хранение minmax; по умолчанию max(сутки, самое длинное CHANNEL_WINDOWS)
 GRID_STEPS     = 30
 
 # === Глобальные лимиты/квантизация ===
@@ -55,8 +77,18 @@ SELL_MIN_GAIN   = 0.01
 SELL_MICROSHIFT = 0.0001
 MAX_OPEN_SELLS  = 50
 
+# === Order reconcile (buy/sell: сверка желаемых ордеров с открытыми, см. reconcile.py) ===
+ORDER_RECONCILE         = True    # False — старое поведение: каждый тик доставляет ордера
+RECONCILE_PRICE_TOL_PCT = 0.3     # ордер ближе этого к целевой цене (%) не переставляем
+RECONCILE_SIZE_TOL_PCT  = 30.0    # ... и если остаток qty отличается не больше чем на %
+PRICE_TICK              = 0.000001
+
 # === Sync settings ===
 SYNC_WINDOW_MIN = 5
+
+# --- Bulk cancel (cancels.py: buckets / avg1 / reconcile / consolidate) ---
+CANCEL_WORKERS = 8                 # параллельных DELETE /api/v3/order
+INTENT_RECOVER_AFTER_SEC = 60      # PENDING-намерения старше — сверять с open_orders (intents.py)
 POSITION_ZERO_QTY_THRESH = 1e-6
 
 # === Orchestrator (ebot.py) — интервалы ===
@@ -65,6 +97,14 @@ EBOT_BUY_INTERVAL_SEC    = 300
 EBOT_SELL_INTERVAL_SEC   = 300
 EBOT_REPORT_INTERVAL_SEC = 1800
 
+ENGINE_ENABLED     = False  # True — sync/buy/sell по всем PAIRS ведёт engine.py (ebot.py их не запускает)
+ENGINE_MIN_GAP_SEC = 2.0    # минимум между тиками разных пар в engine.py (делят rate limit)
+ENGINE_EVENT_MODE    = False  # True — buy/sell в engine.py будятся событиями (см. EVENT_*), таймер — страховка
+EVENT_MOVE_PCT       = 0.5    # тик, если цена ушла на % от цены прошлого тика пары
+EVENT_DEBOUNCE_SEC   = 20     # не чаще одного тика пары за это время
+EVENT_MAX_STALE_SEC  = 900    # тик по таймеру, если событий не было
+EVENT_PRICE_POLL_SEC = 5      # опрос цены для событий
+
 ENABLE_SYNC   = True
 ENABLE_BUY    = True
 ENABLE_SELL   = True
@@ -75,15 +115,51 @@ REPORT_PERIOD_MIN = 30
 
 # --- Sync extras ---
 SYNC_OPEN_LIMIT = 500
-SYNC_WINDOW_MIN = 5
+SYNC_WINDOW_MIN = 5                # окно первого импорта сделок пары (дальше — курсор trade_import.py)
+TRADES_PAGE_LIMIT = 1000           # сделок в ответе myTrades
+TRADES_MAX_SPAN_SEC = 86400        # максимальный интервал startTime..endTime одного запроса
+TRADES_MAX_PAGES = 100             # запросов за один прогон импорта (догоним за несколько прогонов)
+TRADES_OVERLAP_SEC = 60            # перекрытие с прошлым прогоном (сделки, видимые с задержкой)
+ALLORDERS_PAGE_LIMIT = 1000        # ордеров в ответе allOrders (order_history.py)
+ALLORDERS_MAX_SPAN_SEC = 86400     # максимальный интервал startTime..endTime одного запроса allOrders
+ALLORDERS_MAX_PAGES = 20           # запросов allOrders за прогон
+ORDER_LOOKUP_MAX = 20              # запросов ордера по id за прогон (не нашлись в allOrders)
+ORDER_RESOLVE_BATCH = 500          # пропавших ордеров за прогон (самые старые)
+ORDER_RESOLVE_MAX_TRIES = 5        # безуспешных запросов по id — дальше остаётся статус по filled_qty
+ORDER_TIME_PAD_SEC = 60            # допуск между локальным created и временем ордера на бирже
 
 # ===== BUY ABOVE-CHANNEL SETTINGS =====
 BUY_ABOVE_PCT = 0.01
 
+# ===== CHANNEL (channels.py: окна на кольцевом буфере свечей) =====
+CHANNEL_WINDOWS   = {"1h": 60, "4h": 240, "24h": 1440, "7d": 10080}   # имя -> минут
+CHANNEL_WINDOW    = "24h"        # окно по умолчанию для buy/sell
+CHANNEL_ESTIMATOR = "spread4"    # spread4 | minmax | ewma | quantile
+# BUY_CHANNEL_WINDOW / BUY_CHANNEL_ESTIMATOR / SELL_CHANNEL_WINDOW / SELL_CHANNEL_ESTIMATOR —
+# переопределение по стороне (по умолчанию общие выше)
+CHANNEL_EWMA_K    = 2.0          # ewma: полуширина в σ
+CHANNEL_Q_LOW     = 0.25         # quantile: нижняя / верхняя границы
+CHANNEL_Q_HIGH    = 0.75
+CHANNEL_QUANT_STEP_PCT = 0.05    # шаг гистограммы квантилей, %
+
 # ===== CONSOLIDATOR (collapse BUY orders) =====
 ENABLE_CONSOLIDATE       = True
 CONSOLIDATE_CHECK_EVERY_SEC = 900
 CONSOLIDATE_LIMIT_OVER   = 100
 CONSOLIDATE_TO_CANCEL    = 60
 CONSOLIDATE_PLACE_COUNT  = 30
+CONSOLIDATE_BUCKET_BUDGET  = 2.0   # потолок notional кластера, × среднего (consolidate.py)
+CONSOLIDATE_CANCEL_WORKERS = 8     # параллельных отмен (по умолчанию CANCEL_WORKERS)
 SCHEDULER_JITTER_MAX_SEC = 7
+
+# ===== METRICS (Prometheus text format) =====
+METRICS_ENABLED   = True
+METRICS_DIR       = "/opt/Ebot/logs/metrics"   # <job>.json + общий ebot.prom
+METRICS_HTTP_PORT = 0                          # >0 -> оркестратор отдаёт http://127.0.0.1:PORT/metrics
+
+# ===== TRACING (spans -> logs/trace.jsonl; сводка: tools/trace_summary.py) =====
+TRACE_ENABLED     = False      # env EBOT_TRACE=1 перекрывает
+TRACE_SAMPLE_RATE = 1.0        # доля тиков, попадающих в трассу (env EBOT_TRACE_SAMPLE)
+
+# ===== LOGGING =====
+LOG_JSON = False               # JSON-строки вместо текста (env EBOT_LOG_JSON=1)
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+"""Общие настройки тестов: без config.py подставляем config.example.py, метрики не пишем."""
+import importlib.util
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("EBOT_METRICS", "0")
+os.environ.setdefault("EBOT_TRACE", "0")
+
+try:
+    import config  # noqa: F401
+except Exception:
+    _p = os.path.join(os.path.dirname(os.path.abspath(__file__)), "config.example.py")
+    _spec = importlib.util.spec_from_file_location("config", _p)
+    _mod = importlib.util.module_from_spec(_spec)
+    _spec.loader.exec_module(_mod)
+    sys.modules["config"] = _mod
+
+collect_ignore = ["test_consolidate.py"]  # скрипт под живой /opt/Ebot, не pytest-тест
+
+
+@pytest.fixture
+def sess():
+    """Сессия ORM на пустой торговой БД в памяти (все таблицы models_trading)."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+    import models_trading as mt
+    eng = create_engine("sqlite://")
+    mt.Base.metadata.create_all(eng)
+    s = sessionmaker(bind=eng)()
+    yield s
+    s.close()
+    eng.dispose()
@@ -1,15 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import os
 import sys
-import glob
 import sqlite3
 import argparse
 import types
-from importlib.machinery import SourceFileLoader
 from typing import Optional, Tuple
 
+import consolidate
+import order_stats
+
 try:
     from config import DB_PATH, PAIR
 except Exception:
@@ -19,31 +19,17 @@ except Exception:
 STATUS_OPEN = ("NEW", "PARTIALLY_FILLED")
 
 def _load_impl_module():
-    candidates = sorted(glob.glob("/opt/Ebot/consolidate.py.bak.*"))
-    if not candidates:
-        fallback = "/opt/Ebot/consolidate.py"
-        if os.path.exists(fallback):
-            candidates = [fallback]
-        else:
-            raise RuntimeError("Нет исходника: /opt/Ebot/consolidate.py(.bak.*)")
-    src = candidates[-1]
-    mod = SourceFileLoader("cons_impl", src).load_module()
-    for name in ("init_trading_db","SessionT","MexcClient","consolidate_buys","consolidate_sells"):
-        if not hasattr(mod, name):
-            raise RuntimeError(f"В {src} нет символа: {name}")
-    return mod
+    # раньше — последний /opt/Ebot/consolidate.py.bak.* через SourceFileLoader
+    return consolidate
 
 def _count_open_orders(db_path: str, pair: str, side: str) -> int:
+    # одна строка order_stats (ведут триггеры), без неё — COUNT по orders
     try:
         conn = sqlite3.connect(db_path)
-        cur = conn.cursor()
-        cur.execute(
-            f"SELECT COUNT(*) FROM orders WHERE pair=? AND side=? AND status IN ({','.join('?'*len(STATUS_OPEN))})",
-            (pair, side, *STATUS_OPEN),
-        )
-        n = int(cur.fetchone()[0] or 0)
-        conn.close()
-        return n
+        try:
+            return order_stats.open_count(conn, pair, side)
+        finally:
+            conn.close()
     except Exception:
         return 0
 
@@ -80,7 +66,7 @@ def run(buy_limit: Optional[int], sell_limit: Optional[int], dry_run: bool) -> i
 
     impl.init_trading_db()
     sess = impl.SessionT()
-    cli  = impl.MexcClient()
+    cli  = impl.get_client()
 
     rc = 0
     try:
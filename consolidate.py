@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Консолидация открытых ордеров: когда ордеров стороны больше CONSOLIDATE_*_LIMIT_OVER,
+дальние от рынка TO_CANCEL штук собираются в PLACE_COUNT кластеров по оси цены и
+каждый кластер заменяется одним ордером.
+
+Кластеры — непрерывные отрезки цены: старт с равного notional на кластер, затем
+несколько шагов 1-D k-means (взвешенного по notional) с потолком notional кластера
+CONSOLIDATE_BUCKET_BUDGET × среднего. Замена стоит по VWAP кластера с суммарным
+остатком qty — сохраняются и объём, и notional, и форма распределения. Кластер из
+одного ордера не трогаем (минимальный план). SELL не ставим ниже avg*(1+SELL_MIN_GAIN).
+
+Отмены — cancels.cancel_orders (параллельно, локально — одним UPDATE); замена ставится только на
+реально снятые ордера кластера.
+
+  python3 consolidate.py --dry-run          # только печать плана
+  python3 consolidate.py --side BUY
+"""
+import math
+import time
+import bisect
+import argparse
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from mexc_client import MexcClient, get_client
+from models_trading import SessionT, init_trading_db, Position
+from orderbook import OrderBook, remaining
+import cancels
+import intents
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+PAIR          = getattr(CFG, "PAIR", "KASUSDC")
+MIN_ORDER_USD = float(getattr(CFG, "MIN_ORDER_USD", 1.0))
+SELL_MIN_GAIN = float(getattr(CFG, "SELL_MIN_GAIN", 0.01))
+
+_LIMIT_OVER  = int(getattr(CFG, "CONSOLIDATE_LIMIT_OVER", 100))
+_TO_CANCEL   = int(getattr(CFG, "CONSOLIDATE_TO_CANCEL", 60))
+_PLACE_COUNT = int(getattr(CFG, "CONSOLIDATE_PLACE_COUNT", 30))
+CONSOLIDATE_BUY_ENABLED      = bool(getattr(CFG, "CONSOLIDATE_BUY_ENABLED", True))
+CONSOLIDATE_BUY_LIMIT_OVER   = int(getattr(CFG, "CONSOLIDATE_BUY_LIMIT_OVER", _LIMIT_OVER))
+CONSOLIDATE_BUY_TO_CANCEL    = int(getattr(CFG, "CONSOLIDATE_BUY_TO_CANCEL", _TO_CANCEL))
+CONSOLIDATE_BUY_PLACE_COUNT  = int(getattr(CFG, "CONSOLIDATE_BUY_PLACE_COUNT", _PLACE_COUNT))
+CONSOLIDATE_SELL_ENABLED     = bool(getattr(CFG, "CONSOLIDATE_SELL_ENABLED", True))
+CONSOLIDATE_SELL_LIMIT_OVER  = int(getattr(CFG, "CONSOLIDATE_SELL_LIMIT_OVER", _LIMIT_OVER))
+CONSOLIDATE_SELL_TO_CANCEL   = int(getattr(CFG, "CONSOLIDATE_SELL_TO_CANCEL", _TO_CANCEL))
+CONSOLIDATE_SELL_PLACE_COUNT = int(getattr(CFG, "CONSOLIDATE_SELL_PLACE_COUNT", _PLACE_COUNT))
+CONSOLIDATE_BUCKET_BUDGET    = float(getattr(CFG, "CONSOLIDATE_BUCKET_BUDGET", 2.0))
+CONSOLIDATE_CANCEL_WORKERS   = int(getattr(CFG, "CONSOLIDATE_CANCEL_WORKERS", cancels.CANCEL_WORKERS))
+
+MODE = "CONSOLIDATE"
+
+def now_ts() -> int:
+    return int(time.time())
+
+def _floor6(x: float) -> float:
+    return math.floor(float(x) * 1_000_000) / 1_000_000
+
+# ---------------- clustering ----------------
+def cluster(prices: Sequence[float], weights: Sequence[float], k: int,
+            budget: float = CONSOLIDATE_BUCKET_BUDGET, iters: int = 20) -> List[Tuple[int, int]]:
+    """
+    prices — по возрастанию, weights — notional. Возвращает k отрезков [start, end)
+    индексов: равный notional на старте, затем шаги взвешенного 1-D k-means
+    (граница — середина между центроидами соседей), пока ни один кластер не превышает
+    budget × total/k. O(iters · k · log n) на префиксных суммах.
+    """
+    n = len(prices)
+    k = max(1, min(int(k), n))
+    cw, cpw = [0.0], [0.0]
+    for p, w in zip(prices, weights):
+        cw.append(cw[-1] + w)
+        cpw.append(cpw[-1] + p * w)
+    total = cw[-1]
+    cap = budget * total / k if budget > 0 else float("inf")
+
+    # старт: равный notional (квантили накопленного веса), каждый кластер непустой
+    cuts = [0]
+    for j in range(1, k):
+        c = bisect.bisect_left(cw, total * j / k, lo=1)
+        cuts.append(min(max(c, cuts[-1] + 1), n - (k - j)))
+    cuts.append(n)
+
+    def centroid(a, b):
+        w = cw[b] - cw[a]
+        return (cpw[b] - cpw[a]) / w if w > 0 else (prices[a] + prices[b - 1]) / 2.0
+
+    for _ in range(iters):
+        cen = [centroid(cuts[j], cuts[j + 1]) for j in range(k)]
+        new = [0]
+        for j in range(1, k):
+            c = bisect.bisect_right(prices, (cen[j - 1] + cen[j]) / 2.0)
+            new.append(min(max(c, new[-1] + 1), n - (k - j)))
+        new.append(n)
+        if new == cuts or any(cw[new[j + 1]] - cw[new[j]] > cap and new[j + 1] - new[j] > 1 for j in range(k)):
+            break
+        cuts = new
+    return [(cuts[j], cuts[j + 1]) for j in range(k)]
+
+# ---------------- plan ----------------
+class Bucket(NamedTuple):
+    orders: list       # снимаемые ордера кластера
+    price: float       # цена замены (VWAP, для SELL — не ниже floor)
+    qty: float         # суммарный остаток
+    usd: float         # суммарный notional
+
+class Plan(NamedTuple):
+    side: str
+    open_count: int
+    buckets: List[Bucket]
+
+    @property
+    def cancel(self) -> list:
+        return [o for b in self.buckets for o in b.orders]
+
+def make_bucket(side: str, orders: list, price_floor: float = 0.0) -> Optional[Bucket]:
+    qty = sum(remaining(o) for o in orders)
+    usd = sum(float(o.price) * remaining(o) for o in orders)
+    if qty <= 0:
+        return None
+    price = usd / qty
+    if side == "SELL" and price < price_floor:
+        price = price_floor
+    price = round(price, 6)
+    if price <= 0 or price * qty < MIN_ORDER_USD:
+        return None
+    return Bucket(list(orders), price, _floor6(qty), usd)
+
+def plan_side(orders, side: str, to_cancel: int, place_count: int,
+              price_floor: float = 0.0, budget: float = CONSOLIDATE_BUCKET_BUDGET) -> Plan:
+    """
+    orders — открытые ордера (любые с id/side/price/qty/filled_qty) или OrderBook.
+    Берём to_cancel дальних ордеров стороны и сводим в ≤ place_count замен.
+    """
+    book = orders if isinstance(orders, OrderBook) else OrderBook(orders)
+    sb = book.side(side)
+    far = [o for o in sb.far(max(0, int(to_cancel))) if remaining(o) > 0]
+    far.sort(key=lambda o: float(o.price))
+    k = min(int(place_count), len(far) // 2)
+    if k <= 0:
+        return Plan(side, len(sb), [])
+    prices = [float(o.price) for o in far]
+    weights = [float(o.price) * remaining(o) for o in far]
+    buckets = []
+    for a, b in cluster(prices, weights, k, budget):
+        if b - a < 2:
+            continue   # одиночку не переставляем
+        bk = make_bucket(side, far[a:b], price_floor)
+        if bk is not None:
+            buckets.append(bk)
+    return Plan(side, len(sb), buckets)
+
+def format_plan(plan: Plan, pair: str = PAIR) -> str:
+    lines = [f"[{pair}] {plan.side}: open={plan.open_count} cancel={len(plan.cancel)} "
+             f"place={len(plan.buckets)} -> open≈{plan.open_count - len(plan.cancel) + len(plan.buckets)}"]
+    for i, b in enumerate(plan.buckets, 1):
+        lo = min(float(o.price) for o in b.orders)
+        hi = max(float(o.price) for o in b.orders)
+        lines.append(f"  #{i:<3} {len(b.orders):>4} orders {lo:.6f}..{hi:.6f} -> {b.price:.6f} "
+                     f"qty={b.qty:.6f} usd={b.usd:.4f}")
+    return "\n".join(lines)
+
+# ---------------- execution ----------------
+def _intent(side: str, price: float, qty: float, usd: float):
+    if side == "BUY":
+        qty = _floor6(usd / price)
+    if qty <= 0 or price * qty < MIN_ORDER_USD:
+        return None
+    return intents.new(side, price, qty, reserved=float(usd) if side == "BUY" else 0.0, mode=MODE)
+
+def execute(cli: MexcClient, sess: SessionT, plan: Plan, pair: str = PAIR, price_floor: float = 0.0) -> dict:
+    """Снимает ордера плана и ставит замены на фактически снятый объём (одной пачкой, см. intents.py)."""
+    rep = cancels.cancel_orders(cli, sess, pair, plan.cancel, workers=CONSOLIDATE_CANCEL_WORKERS)
+    done = set(rep.canceled)
+    batch = []
+    for b in plan.buckets:
+        bk = make_bucket(plan.side, [o for o in b.orders if str(o.id) in done], price_floor)
+        it = bk and _intent(plan.side, bk.price, bk.qty, bk.usd)
+        if it:
+            batch.append(it)
+    res = intents.place_batch(cli, sess, pair, batch)
+    errors = [r.error for r in res if r.error is not None]
+    return {"canceled": len(done), "cancel_failed": len(rep.results) - len(done),
+            "placed": len(res) - len(errors), "place_errors": errors}
+
+def _sell_floor(sess: SessionT, pair: str) -> float:
+    pos = sess.query(Position).filter(Position.pair == pair).first()
+    avg = float(pos.avg or 0.0) if pos else 0.0
+    return avg * (1.0 + SELL_MIN_GAIN) if avg > 0 else 0.0
+
+def _consolidate(cli, sess, side: str, enabled: bool, limit_over: int, to_cancel: int,
+                 place_count: int, dry: bool, pair: str) -> str:
+    if not enabled:
+        return f"{side}: disabled"
+    book = OrderBook.load(sess, pair)
+    n = len(book.side(side))
+    if n <= limit_over:
+        return f"{side}: open={n} <= limit({limit_over}) — skip"
+    floor = _sell_floor(sess, pair) if side == "SELL" else 0.0
+    plan = plan_side(book, side, to_cancel, place_count, floor)
+    print(format_plan(plan, pair))
+    if dry or not plan.buckets:
+        return f"{side}: planned cancel={len(plan.cancel)} place={len(plan.buckets)} dry={dry}"
+    r = execute(cli, sess, plan, pair, floor)
+    return (f"{side}: canceled={r['canceled']} failed={r['cancel_failed']} placed={r['placed']}"
+            f"{' place_errors=' + str(len(r['place_errors'])) if r['place_errors'] else ''} dry={dry}")
+
+def consolidate_buys(cli: MexcClient, sess: SessionT, dry: bool, pair: str = PAIR) -> str:
+    return _consolidate(cli, sess, "BUY", CONSOLIDATE_BUY_ENABLED, CONSOLIDATE_BUY_LIMIT_OVER,
+                        CONSOLIDATE_BUY_TO_CANCEL, CONSOLIDATE_BUY_PLACE_COUNT, dry, pair)
+
+def consolidate_sells(cli: MexcClient, sess: SessionT, dry: bool, pair: str = PAIR) -> str:
+    return _consolidate(cli, sess, "SELL", CONSOLIDATE_SELL_ENABLED, CONSOLIDATE_SELL_LIMIT_OVER,
+                        CONSOLIDATE_SELL_TO_CANCEL, CONSOLIDATE_SELL_PLACE_COUNT, dry, pair)
+
+def main():
+    ap = argparse.ArgumentParser(description="Консолидация открытых ордеров (кластеры по цене)")
+    ap.add_argument("--dry-run", action="store_true", help="только напечатать план")
+    ap.add_argument("--side", choices=("BUY", "SELL", "both"), default="both")
+    ap.add_argument("--pair", default=PAIR)
+    args = ap.parse_args()
+
+    init_trading_db()
+    sess = SessionT()
+    cli = get_client()
+    try:
+        out = []
+        if args.side in ("BUY", "both"):
+            out.append(consolidate_buys(cli, sess, args.dry_run, args.pair))
+        if args.side in ("SELL", "both"):
+            out.append(consolidate_sells(cli, sess, args.dry_run, args.pair))
+        print(" | ".join(out))
+    finally:
+        sess.close()
+
+if __name__ == "__main__":
+    main()
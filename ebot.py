@@ -9,8 +9,12 @@ import shlex
 import sys
 import atexit
 import logging
+import re
+import hashlib
 from datetime import datetime
 
+import metrics
+
 PID_FILE = "/tmp/ebot.pid"
 
 def check_singleton():
@@ -45,6 +49,14 @@ except Exception:
     ENABLE_CONSOLIDATE = True
     CONSOLIDATE_CHECK_EVERY_SEC = 300
 
+try:
+    from config import ENGINE_ENABLED
+except Exception:
+    ENGINE_ENABLED = False
+if ENGINE_ENABLED:
+    # sync/buy/sell по всем парам (config.PAIRS) ведёт engine.py в одном процессе
+    ENABLE_SYNC = ENABLE_BUY = ENABLE_SELL = False
+
 _CONS_BUY_LIMIT = None
 _CONS_SELL_LIMIT = None
 _CONS_DRY_RUN   = False
@@ -81,23 +93,62 @@ def _jitter(seconds: int) -> float:
     j = max(1.0, float(seconds) * 0.1)
     return max(1.0, float(seconds) + random.uniform(-j, j))
 
+_M_TASK_SEC  = metrics.histogram("task_duration_seconds", "Orchestrator task wall time", ("task",))
+_M_TASK_RUNS = metrics.counter("task_runs_total", "Orchestrator task runs by result", ("task", "result"))
+
+log = logging.getLogger("ebot")
+
+# --- вывод дочерних задач: дедупликация и лимит ---
+CHILD_LOG_MAX_LINES = int(os.getenv("EBOT_CHILD_LOG_MAX_LINES", "40"))
+CHILD_LOG_DEDUP_SEC = int(os.getenv("EBOT_CHILD_LOG_DEDUP_SEC", "600"))
+_NUM_RE = re.compile(r"\d+(?:\.\d+)?")
+_child_seen: dict = {}  # (task, stream) -> [signature, last_logged_ts, suppressed]
+
+def _clip(text: str, max_lines: int = CHILD_LOG_MAX_LINES) -> str:
+    lines = text.splitlines()
+    if len(lines) <= max_lines:
+        return text
+    return "\n".join(lines[:max_lines] + [f"... (+{len(lines) - max_lines} lines)"])
+
+def _log_child_output(name: str, stream: str, text: str, dt: float) -> None:
+    """
+    Одинаковый по форме вывод (числа маскируются) пишем не чаще раза в
+    CHILD_LOG_DEDUP_SEC, остальное считаем и сообщаем при следующей записи.
+    """
+    if not text:
+        return
+    sig = hashlib.sha1(_NUM_RE.sub("#", text).encode("utf-8", "ignore")).hexdigest()
+    now = time.time()
+    st = _child_seen.get((name, stream))
+    if st and st[0] == sig and now - st[1] < CHILD_LOG_DEDUP_SEC:
+        st[2] += 1
+        return
+    suppressed = st[2] if st else 0
+    _child_seen[(name, stream)] = [sig, now, 0]
+    note = f" ({suppressed} repeats of previous output suppressed)" if suppressed else ""
+    lvl = logging.WARNING if stream == "STDERR" else logging.INFO
+    log.log(lvl, "[%s] %.2fs %s%s:\n%s", name, dt, stream, note, _clip(text))
+
 def run_cmd(name: str, argv: list[str]) -> None:
+    result = "error"
+    t0 = time.time()
     try:
-        t0 = time.time()
         res = subprocess.run(argv, cwd=ROOT, capture_output=True, text=True, timeout=None)
         dt = time.time() - t0
+        result = "ok" if res.returncode == 0 else "fail"
         if res.returncode != 0:
             msg = f"{name} exit={res.returncode} in {dt:.2f}s\nSTDOUT:\n{res.stdout}\nSTDERR:\n{res.stderr}"
+            log.error("%s exit=%s in %.2fs\nSTDERR:\n%s", name, res.returncode, dt, _clip((res.stderr or "").strip()))
             _send_error(name, msg)
         else:
-            out = (res.stdout or "").strip()
-            err = (res.stderr or "").strip()
-            if out:
-                print(f"[{name}] {dt:.2f}s STDOUT:\n{out}")
-            if err:
-                print(f"[{name}] {dt:.2f}s STDERR:\n{err}")
+            _log_child_output(name, "STDOUT", (res.stdout or "").strip(), dt)
+            _log_child_output(name, "STDERR", (res.stderr or "").strip(), dt)
     except Exception as e:
         _send_error(name, f"{e}\n{traceback.format_exc()}")
+    finally:
+        _M_TASK_SEC.observe(time.time() - t0, task=name)
+        _M_TASK_RUNS.inc(task=name, result=result)
+        metrics.flush()
 
 def task_sync(): run_cmd("sync", [PYBIN, os.path.join(ROOT, "sync.py")])
 def task_buy(): run_cmd("buy", [PYBIN, os.path.join(ROOT, "buy.py")])
@@ -116,7 +167,7 @@ def _build_cons_argv() -> list[str]:
 
 def task_consolidate():
     argv = _build_cons_argv()
-    print(f"[consolidate] run: {shlex.join(argv)}")
+    log.info("[consolidate] run: %s", shlex.join(argv))
     run_cmd("consolidate", argv)
 
 def _now(): return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
@@ -164,4 +215,9 @@ if __name__ == "__main__":
         pass
     logging.getLogger(__name__).info("ebot starting up")
     check_singleton()
+    metrics.set_job("ebot")
+    try:
+        metrics.serve()  # METRICS_HTTP_PORT=0 -> только textfile
+    except Exception as e:
+        logging.getLogger(__name__).warning("metrics http disabled: %r", e)
     main()
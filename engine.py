@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Мультипарный движок: sync/buy/sell по всем парам из config.PAIRS в одном процессе
+с одним клиентом биржи (mexc_client.get_client — общий пул keep-alive соединений).
+Свечи по всем парам пишет candles.py (одно WS на все kline-подписки).
+
+Планировщик разносит тики пар по интервалу задачи: пара i из N стартует со сдвигом
+i*interval/N, а между любыми двумя тиками выдерживается ENGINE_MIN_GAP_SEC. Запросы
+к REST идут ровным потоком и делят rate limit, а не бьют пачкой раз в интервал.
+
+Событийный режим (ENGINE_EVENT_MODE): buy/sell будятся событиями шины events.bus —
+пересечение границы канала, ход цены на EVENT_MOVE_PCT %, новые сделки из sync —
+не чаще EVENT_DEBOUNCE_SEC на пару; таймер остаётся страховкой раз в EVENT_MAX_STALE_SEC.
+Цену опрашивает events.PriceFeed раз в EVENT_PRICE_POLL_SEC; каналы buy/sell пары он
+считает по её окну/оценщику (feed_channels).
+
+При ENGINE_ENABLED=True ebot.py не запускает sync/buy/sell сам (report/consolidate — как раньше).
+
+  python3 engine.py                 # все пары из PAIRS
+  python3 engine.py --pair KASUSDC  # подмножество
+"""
+import sys
+import time
+import queue
+import heapq
+import random
+import logging
+import threading
+import argparse
+from typing import Callable, Dict, List, Optional, Tuple
+
+import metrics
+from pairs import PairConfig, load_pairs, strategy_params
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+ENABLE_SYNC = bool(getattr(CFG, "ENABLE_SYNC", True))
+ENABLE_BUY  = bool(getattr(CFG, "ENABLE_BUY", True))
+ENABLE_SELL = bool(getattr(CFG, "ENABLE_SELL", True))
+EBOT_SYNC_INTERVAL_SEC = float(getattr(CFG, "EBOT_SYNC_INTERVAL_SEC", 60))
+EBOT_BUY_INTERVAL_SEC  = float(getattr(CFG, "EBOT_BUY_INTERVAL_SEC", 300))
+EBOT_SELL_INTERVAL_SEC = float(getattr(CFG, "EBOT_SELL_INTERVAL_SEC", 300))
+ENGINE_MIN_GAP_SEC     = float(getattr(CFG, "ENGINE_MIN_GAP_SEC", 2.0))
+ENGINE_EVENT_MODE      = bool(getattr(CFG, "ENGINE_EVENT_MODE", False))
+EVENT_MOVE_PCT         = float(getattr(CFG, "EVENT_MOVE_PCT", 0.5))
+EVENT_DEBOUNCE_SEC     = float(getattr(CFG, "EVENT_DEBOUNCE_SEC", 20))
+EVENT_MAX_STALE_SEC    = float(getattr(CFG, "EVENT_MAX_STALE_SEC", 900))
+EVENT_PRICE_POLL_SEC   = float(getattr(CFG, "EVENT_PRICE_POLL_SEC", 5))
+SCHEDULER_JITTER_MAX_SEC = float(getattr(CFG, "SCHEDULER_JITTER_MAX_SEC", 7))
+
+log = logging.getLogger("engine")
+
+_M_TICK_SEC  = metrics.histogram("engine_tick_seconds", "Per-pair tick duration", ("task", "pair"))
+_M_TICK_RUNS = metrics.counter("engine_ticks_total", "Per-pair ticks by result", ("task", "pair", "result"))
+_M_TRIGGERS  = metrics.counter("engine_triggers_total", "Event-mode ticks woken early by reason", ("pair", "reason"))
+
+# задачи, которые в событийном режиме будятся событиями (sync — всегда по таймеру)
+EVENT_TASKS = ("buy", "sell")
+
+class Scheduler:
+    """
+    Очередь тиков (task, pair) по времени. Тик задачи с интервалом T для пары i из N
+    впервые срабатывает в start + i*T/N, дальше каждые T (+джиттер). due() отдаёт
+    не более одного тика и не раньше min_gap после предыдущего; kick() переносит
+    тик пары на «сейчас» (событийный режим), но не чаще debounce после его прошлого запуска.
+    """
+
+    def __init__(self, min_gap: float = ENGINE_MIN_GAP_SEC, jitter: float = 0.0, rng=None):
+        self.min_gap = max(0.0, float(min_gap))
+        self.jitter = max(0.0, float(jitter))
+        self.rng = rng or random.Random()
+        self._heap: List[Tuple[float, int, str, int]] = []
+        self._at: Dict[Tuple[str, int], Tuple[float, int]] = {}   # актуальная запись (время, seq)
+        self._ran: Dict[Tuple[str, int], float] = {}
+        self._interval: Dict[str, float] = {}
+        self._seq = 0
+        self._last = float("-inf")
+
+    def add(self, task: str, interval: float, n_pairs: int, start: float) -> None:
+        self._interval[task] = float(interval)
+        step = float(interval) / max(1, n_pairs)
+        for i in range(n_pairs):
+            self._push(start + i * step, task, i)
+
+    def _push(self, at: float, task: str, idx: int) -> None:
+        self._seq += 1
+        self._at[(task, idx)] = (at, self._seq)
+        heapq.heappush(self._heap, (at, self._seq, task, idx))
+
+    def _top(self):
+        # записи, перекрытые kick(), выбрасываем лениво
+        while self._heap:
+            at, seq, task, idx = self._heap[0]
+            if self._at.get((task, idx)) == (at, seq):
+                return self._heap[0]
+            heapq.heappop(self._heap)
+        return None
+
+    def next_at(self) -> Optional[float]:
+        top = self._top()
+        if top is None:
+            return None
+        return max(top[0], self._last + self.min_gap)
+
+    def due(self, now: float) -> Optional[Tuple[str, int]]:
+        at = self.next_at()
+        if at is None or now < at:
+            return None
+        sched, _, task, idx = heapq.heappop(self._heap)
+        self._last = now
+        self._ran[(task, idx)] = now
+        # от плановой точки, а не от now: сдвиги пар друг относительно друга не расползаются
+        nxt = sched + self._interval[task]
+        if nxt <= now:
+            nxt = now + self._interval[task]
+        if self.jitter:
+            nxt += self.rng.uniform(0.0, self.jitter)
+        self._push(nxt, task, idx)
+        return task, idx
+
+    def kick(self, task: str, idx: int, now: float, debounce: float = 0.0) -> bool:
+        """Тик (task, idx) — как можно раньше, но не ближе debounce к прошлому запуску."""
+        cur = self._at.get((task, idx))
+        if cur is None:
+            return False
+        at = max(now, self._ran.get((task, idx), float("-inf")) + max(0.0, debounce))
+        if at >= cur[0]:
+            return False
+        self._push(at, task, idx)
+        return True
+
+class Triggers:
+    """
+    Событийный режим: какие события шины будят тики buy/sell пары.
+      channel — цена пересекла границу канала buy или sell пары;
+      move    — цена ушла на EVENT_MOVE_PCT % от цены последнего тика пары;
+      fill    — sync импортировал новые сделки по паре.
+    Срабатывания копятся в очереди pending (pair, reason) — её разбирает цикл engine.
+    """
+
+    def __init__(self, move_pct: float = EVENT_MOVE_PCT):
+        self.move_pct = float(move_pct)
+        self.pending: "queue.SimpleQueue[Tuple[str, str]]" = queue.SimpleQueue()
+        self._ref: Dict[str, float] = {}
+        self._last: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def attach(self, bus) -> None:
+        bus.subscribe("price", self.on_price)
+        bus.subscribe("channel", self.on_channel)
+        bus.subscribe("fill", self.on_fill)
+
+    def on_price(self, ev: dict) -> None:
+        pair, price = ev["pair"], float(ev["price"])
+        with self._lock:
+            self._last[pair] = price
+            ref = self._ref.setdefault(pair, price)
+            if self.move_pct <= 0 or ref <= 0 or abs(price - ref) / ref * 100.0 < self.move_pct:
+                return
+            self._ref[pair] = price
+        self.pending.put((pair, "move"))
+
+    def on_channel(self, ev: dict) -> None:
+        chan = ev.get("chan")
+        self.pending.put((ev["pair"], f"channel_{chan}_{ev['side']}" if chan else f"channel_{ev['side']}"))
+
+    def on_fill(self, ev: dict) -> None:
+        self.pending.put((ev["pair"], "fill"))
+
+    def rearm(self, pair: str) -> None:
+        """После тика пары отсчёт move — от текущей цены."""
+        with self._lock:
+            if pair in self._last:
+                self._ref[pair] = self._last[pair]
+
+def _tick_sync(cli, pc: PairConfig) -> None:
+    import sync
+    sync.sync_pair(cli, pc)
+
+def _tick_buy(cli, pc: PairConfig) -> None:
+    import buy
+    with strategy_params(pc.params):
+        buy.main(pc.pair, cli=cli)
+
+def _tick_sell(cli, pc: PairConfig) -> None:
+    import sell
+    with strategy_params(pc.params):
+        sell.main(pc.pair, pc.base, cli=cli)
+
+def feed_channels(pairs: List[PairConfig]) -> Dict[str, Callable[[str], tuple]]:
+    """
+    {"buy": f, "sell": f}, f(pair) -> (lower, upper, mid) для events.PriceFeed. Окно и оценщик
+    каждой пары — из её params (иначе channels.BUY_/SELL_CHANNEL_*) и передаются явно:
+    buy.channel читает глобалы модуля, а их в главном потоке подменяет тик другой пары.
+    """
+    import channels
+    out = {}
+    for side in ("BUY", "SELL"):
+        spec = {pc.pair: (pc.params.get(f"{side}_CHANNEL_WINDOW", getattr(channels, f"{side}_CHANNEL_WINDOW")),
+                          pc.params.get(f"{side}_CHANNEL_ESTIMATOR", getattr(channels, f"{side}_CHANNEL_ESTIMATOR")))
+                for pc in pairs}
+        out[side.lower()] = lambda pair, spec=spec: channels.channel(pair, *spec[pair])
+    return out
+
+TASKS: Dict[str, Tuple[bool, float, Callable]] = {
+    "sync": (ENABLE_SYNC, EBOT_SYNC_INTERVAL_SEC, _tick_sync),
+    "buy":  (ENABLE_BUY,  EBOT_BUY_INTERVAL_SEC,  _tick_buy),
+    "sell": (ENABLE_SELL, EBOT_SELL_INTERVAL_SEC, _tick_sell),
+}
+
+def run_tick(task: str, cli, pc: PairConfig) -> bool:
+    t0 = time.time()
+    result = "error"
+    try:
+        TASKS[task][2](cli, pc)
+        result = "ok"
+        return True
+    except Exception as e:
+        log.exception("[%s %s] tick failed", task, pc.pair)
+        try:
+            from notify import send_error
+            send_error(f"engine.{task} {pc.pair}", e)
+        except Exception:
+            pass
+        return False
+    finally:
+        _M_TICK_SEC.observe(time.time() - t0, task=task, pair=pc.pair)
+        _M_TICK_RUNS.inc(task=task, pair=pc.pair, result=result)
+        metrics.flush()
+
+def main(pairs: List[PairConfig], event_mode: bool = ENGINE_EVENT_MODE) -> None:
+    from mexc_client import get_client
+    cli = get_client()
+    sch = Scheduler(ENGINE_MIN_GAP_SEC, SCHEDULER_JITTER_MAX_SEC)
+    trig = None
+    if event_mode:
+        import buy
+        import events
+        trig = Triggers(EVENT_MOVE_PCT)
+        trig.attach(events.bus)
+        events.PriceFeed(events.bus, [p.pair for p in pairs], lambda s: buy.last_price(cli, s),
+                         feed_channels(pairs), poll_sec=EVENT_PRICE_POLL_SEC).start()
+    idx_by_pair = {p.pair: i for i, p in enumerate(pairs)}
+    now = time.time()
+    # sync раньше buy/sell: тикам нужен свежий capital/position
+    for k, (task, (enabled, interval, _)) in enumerate(TASKS.items()):
+        if enabled:
+            if trig is not None and task in EVENT_TASKS:
+                interval = EVENT_MAX_STALE_SEC  # по таймеру — только страховка от «тишины»
+            sch.add(task, interval, len(pairs), now + k * ENGINE_MIN_GAP_SEC)
+    log.info("engine: %d pairs (%s), min_gap=%.1fs, event_mode=%s", len(pairs),
+             ", ".join(p.pair for p in pairs), ENGINE_MIN_GAP_SEC, bool(trig))
+    while True:
+        job = sch.due(time.time())
+        if job is None:
+            at = sch.next_at()
+            if at is None:
+                return
+            wait = min(1.0, max(0.05, at - time.time()))
+            if trig is None:
+                time.sleep(wait)
+                continue
+            try:
+                pair, reason = trig.pending.get(timeout=wait)
+            except queue.Empty:
+                continue
+            idx = idx_by_pair.get(pair)
+            if idx is None:
+                continue
+            for task in EVENT_TASKS:
+                if TASKS[task][0] and sch.kick(task, idx, time.time(), EVENT_DEBOUNCE_SEC):
+                    _M_TRIGGERS.inc(pair=pair, reason=reason)
+                    log.info("[%s %s] triggered by %s", task, pair, reason)
+            continue
+        task, idx = job
+        run_tick(task, cli, pairs[idx])
+        if trig is not None and task in EVENT_TASKS:
+            trig.rearm(pairs[idx].pair)
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Мультипарный движок sync/buy/sell в одном процессе")
+    ap.add_argument("--pair", action="append", help="только эти пары из PAIRS (можно несколько раз)")
+    ap.add_argument("--events", action="store_true", default=ENGINE_EVENT_MODE,
+                    help="событийный режим (как ENGINE_EVENT_MODE=True)")
+    args = ap.parse_args()
+    try:
+        from logging_config import setup_logging
+        setup_logging(service="engine")
+    except Exception:
+        logging.basicConfig(level=logging.INFO)
+    metrics.set_job("engine")
+    pairs = load_pairs()
+    if args.pair:
+        want = {p.upper() for p in args.pair}
+        pairs = [p for p in pairs if p.pair in want]
+        if not pairs:
+            sys.exit(f"no such pairs in PAIRS: {', '.join(sorted(want))}")
+    main(pairs, event_mode=args.events)
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Шина событий внутри процесса (engine.py) и источник ценовых событий.
+
+Темы и поля:
+  "price"   — pair, price, ts                         каждый опрос цены (PriceFeed)
+  "channel" — pair, side, prev, price, lower, upper,  цена сменила положение относительно
+              chan                                    канала chan ("buy"/"sell", "" — единственный
+                                                      канал): below / in / above
+  "fill"    — pair, n                                 sync импортировал n новых сделок
+
+Подписчики вызываются синхронно в потоке издателя; исключение одного подписчика
+логируется и не мешает остальным.
+"""
+import time
+import logging
+import threading
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+log = logging.getLogger("events")
+
+class Bus:
+    def __init__(self):
+        self._subs: Dict[str, List[Callable]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def subscribe(self, topic: str, fn: Callable[[dict], None]) -> Callable[[], None]:
+        """Подписка на тему; возвращает функцию отписки."""
+        with self._lock:
+            self._subs[topic].append(fn)
+
+        def unsubscribe():
+            with self._lock:
+                if fn in self._subs[topic]:
+                    self._subs[topic].remove(fn)
+        return unsubscribe
+
+    def publish(self, topic: str, **event) -> int:
+        with self._lock:
+            subs = list(self._subs.get(topic, ()))
+        for fn in subs:
+            try:
+                fn(event)
+            except Exception:
+                log.exception("subscriber %r failed on %s", fn, topic)
+        return len(subs)
+
+# общая шина процесса: sync публикует "fill", PriceFeed — "price"/"channel"
+bus = Bus()
+
+def channel_side(price: float, lower: float, upper: float) -> str:
+    """Положение цены относительно канала, как ветки buy.plan_buys."""
+    if not (lower > 0 and upper > 0):
+        return "in"
+    if price > upper:
+        return "above"
+    if price < lower:
+        return "below"
+    return "in"
+
+class PriceFeed:
+    """
+    Поток-опросчик цены по парам: публикует "price" и при смене положения
+    относительно канала — "channel". read_price(pair) -> float; channel(pair) ->
+    (lower, upper, mid) или {имя: channel} — несколько каналов (buy/sell), положение
+    отслеживается по каждому. Канал перечитывается раз в channel_ttl секунд.
+    """
+
+    def __init__(self, bus: Bus, pairs: List[str], read_price: Callable[[str], float],
+                 channel, poll_sec: float = 5.0, channel_ttl: float = 60.0):
+        self.bus = bus
+        self.pairs = list(pairs)
+        self.read_price = read_price
+        self.channels: Dict[str, Callable[[str], tuple]] = dict(channel) if isinstance(channel, dict) else {"": channel}
+        self.poll_sec = max(0.2, float(poll_sec))
+        self.channel_ttl = float(channel_ttl)
+        self._chan: Dict[tuple, tuple] = {}
+        self._side: Dict[tuple, str] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _channel(self, name: str, pair: str, now: float) -> tuple:
+        hit = self._chan.get((name, pair))
+        if hit is None or now - hit[0] >= self.channel_ttl:
+            lower, upper, _ = self.channels[name](pair)
+            hit = self._chan[(name, pair)] = (now, float(lower), float(upper))
+        return hit[1], hit[2]
+
+    def poll_once(self, now: Optional[float] = None) -> None:
+        now = time.time() if now is None else now
+        for pair in self.pairs:
+            try:
+                price = float(self.read_price(pair))
+            except Exception as e:
+                log.warning("price read failed for %s: %r", pair, e)
+                continue
+            if price <= 0:
+                continue
+            self.bus.publish("price", pair=pair, price=price, ts=now)
+            for name in self.channels:
+                try:
+                    lower, upper = self._channel(name, pair, now)
+                except Exception as e:
+                    log.warning("channel %s read failed for %s: %r", name or "-", pair, e)
+                    continue
+                side = channel_side(price, lower, upper)
+                prev = self._side.get((name, pair))
+                self._side[(name, pair)] = side
+                if prev is not None and side != prev:
+                    self.bus.publish("channel", pair=pair, side=side, prev=prev,
+                                     price=price, lower=lower, upper=upper, chan=name)
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            self.poll_once()
+            self._stop.wait(self.poll_sec)
+
+    def start(self) -> "PriceFeed":
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="price-feed", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
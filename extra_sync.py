@@ -2,27 +2,32 @@
 # -*- coding: utf-8 -*-
 
 import sys
-from mexc_client import MexcClient
+import time
+from mexc_client import MexcClient, get_client
 from models_trading import SessionT, init_trading_db
-from sync import sync_trades, sync_open_orders, sync_balance, recompute_position
+from sync import sync_open_orders, sync_balance, recompute_position
+from trade_import import import_trades
+from config import PAIR, SYNC_OPEN_LIMIT
 
 def run(window_min: int):
     """
     Дополнительный «глубокий» синк:
-      1) myTrades за окно window_min минут (upsert в fills)
-      2) openOrders (upsert/закрытие в orders)
+      1) myTrades заново за window_min минут (курсор назад, постранично до «сейчас»)
+      2) openOrders (upsert/закрытие в orders, до SYNC_OPEN_LIMIT)
       3) баланс (capital.available_usd)
       4) пересчёт позиции из всех fills (position.qty/avg)
     """
     init_trading_db()
     sess = SessionT()
-    cli  = MexcClient()
+    cli  = get_client()
     try:
-        inserted = sync_trades(sess, cli, window_min)
-        sync_open_orders(sess, cli, window_min)
+        rep = import_trades(sess, cli, PAIR, since_ms=int(time.time() * 1000) - int(window_min) * 60_000)
+        inserted = rep.inserted
+        sync_open_orders(sess, cli, SYNC_OPEN_LIMIT)
         sync_balance(sess, cli)
         qty, avg = recompute_position(sess)
-        print(f"RESYNC: window={window_min}m | trades+{inserted} | pos qty={qty:.6f} avg={avg}")
+        print(f"RESYNC: window={window_min}m | trades+{inserted} pages={rep.pages}"
+              f"{'' if rep.caught_up else ' (not caught up)'} | pos qty={qty:.6f} avg={avg}")
     finally:
         sess.close()
 
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Дневной свод fills_daily(pair, day, side): n, Σqty, Σprice*qty, Σfee — его ведут триггеры на fills.
+
+Схему ставит models_trading.init_trading_db (как order_stats): новая таблица один раз
+заполняется из fills в той же write-транзакции, что и триггеры, — новые сделки не
+теряются и не задваиваются. Читает свод scripts/calc_balances.py (полные дни — из свода,
+неполные края диапазона — по fills).
+
+  python3 fills_daily.py                  # сверить с полным проходом по fills (код 1 — расхождение)
+  python3 fills_daily.py --rebuild        # пересчитать из fills и сверить
+"""
+import sys
+import sqlite3
+import argparse
+from typing import List
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+DB_PATH = getattr(CFG, "DB_PATH", "ebot.db")
+
+DDL = """
+CREATE TABLE IF NOT EXISTS fills_daily (
+  pair  TEXT    NOT NULL,
+  day   INTEGER NOT NULL,          -- ts // 86400 (UTC)
+  side  TEXT    NOT NULL,
+  n     INTEGER NOT NULL DEFAULT 0,
+  qty   REAL    NOT NULL DEFAULT 0,
+  quote REAL    NOT NULL DEFAULT 0, -- SUM(price*qty)
+  fee   REAL    NOT NULL DEFAULT 0,
+  PRIMARY KEY (pair, day, side)
+);
+CREATE TRIGGER IF NOT EXISTS trg_fills_daily_ins AFTER INSERT ON fills BEGIN
+  INSERT INTO fills_daily(pair, day, side, n, qty, quote, fee)
+  VALUES (NEW.pair, NEW.ts / 86400, UPPER(NEW.side), 1, NEW.qty, NEW.price * NEW.qty, COALESCE(NEW.fee, 0))
+  ON CONFLICT(pair, day, side) DO UPDATE SET
+    n = n + 1, qty = qty + excluded.qty, quote = quote + excluded.quote, fee = fee + excluded.fee;
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fills_daily_del AFTER DELETE ON fills BEGIN
+  UPDATE fills_daily SET n = n - 1, qty = qty - OLD.qty, quote = quote - OLD.price * OLD.qty,
+                         fee = fee - COALESCE(OLD.fee, 0)
+   WHERE pair = OLD.pair AND day = OLD.ts / 86400 AND side = UPPER(OLD.side);
+END;
+CREATE TRIGGER IF NOT EXISTS trg_fills_daily_upd AFTER UPDATE OF pair, side, price, qty, fee, ts ON fills BEGIN
+  UPDATE fills_daily SET n = n - 1, qty = qty - OLD.qty, quote = quote - OLD.price * OLD.qty,
+                         fee = fee - COALESCE(OLD.fee, 0)
+   WHERE pair = OLD.pair AND day = OLD.ts / 86400 AND side = UPPER(OLD.side);
+  INSERT INTO fills_daily(pair, day, side, n, qty, quote, fee)
+  VALUES (NEW.pair, NEW.ts / 86400, UPPER(NEW.side), 1, NEW.qty, NEW.price * NEW.qty, COALESCE(NEW.fee, 0))
+  ON CONFLICT(pair, day, side) DO UPDATE SET
+    n = n + 1, qty = qty + excluded.qty, quote = quote + excluded.quote, fee = fee + excluded.fee;
+END;
+"""
+
+_SCAN_SQL = ("SELECT pair, ts / 86400, UPPER(side), COUNT(*), SUM(qty), SUM(price * qty), SUM(COALESCE(fee, 0)) "
+             "FROM fills GROUP BY pair, ts / 86400, UPPER(side)")
+
+def exists(conn) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='fills_daily'").fetchone() is not None
+
+def _split_ddl(ddl: str) -> List[str]:
+    """Режем по ';' верхнего уровня (внутри BEGIN..END ';' не режем)."""
+    out, buf, depth = [], [], 0
+    for line in ddl.strip().splitlines():
+        buf.append(line)
+        u = line.strip().upper()
+        if u.endswith(" BEGIN") or u == "BEGIN":
+            depth += 1
+        if u == "END;":
+            depth -= 1
+        if depth == 0 and u.endswith(";"):
+            out.append("\n".join(buf))
+            buf = []
+    return out
+
+def ensure(conn) -> bool:
+    """Свод и триггеры (идемпотентно). True — если свод только что заполнен из fills."""
+    if exists(conn):
+        return False
+    conn.commit()
+    # одна write-транзакция: новые fills не потеряются и не задвоятся между заполнением и триггерами
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        if exists(conn):
+            conn.execute("ROLLBACK")
+            return False
+        for stmt in _split_ddl(DDL):
+            conn.execute(stmt)
+        conn.execute(f"INSERT INTO fills_daily(pair, day, side, n, qty, quote, fee) {_SCAN_SQL}")
+        conn.execute("COMMIT")
+        return True
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+def rebuild(conn) -> int:
+    """Пересчитать свод из fills. Возвращает число строк."""
+    if ensure(conn):
+        return conn.execute("SELECT COUNT(*) FROM fills_daily").fetchone()[0]
+    conn.execute("DELETE FROM fills_daily")
+    conn.execute(f"INSERT INTO fills_daily(pair, day, side, n, qty, quote, fee) {_SCAN_SQL}")
+    conn.commit()
+    return conn.execute("SELECT COUNT(*) FROM fills_daily").fetchone()[0]
+
+def verify(conn, tol: float = 1e-6) -> List[str]:
+    """Сверка со сканом fills; пустой список — всё сходится (пустые строки n=0 не в счёт)."""
+    scan = {tuple(r[:3]): r[3:] for r in conn.execute(_SCAN_SQL).fetchall()}
+    have = {tuple(r[:3]): r[3:] for r in conn.execute(
+        "SELECT pair, day, side, n, qty, quote, fee FROM fills_daily WHERE n != 0").fetchall()}
+    out = []
+    for key in sorted(set(scan) | set(have)):
+        exp, got = scan.get(key, (0, 0.0, 0.0, 0.0)), have.get(key, (0, 0.0, 0.0, 0.0))
+        if exp[0] != got[0] or any(abs(float(a or 0) - float(b or 0)) > tol * max(1.0, abs(float(a or 0)))
+                                   for a, b in zip(exp[1:], got[1:])):
+            out.append(f"{key[0]} day={key[1]} {key[2]}: scan={tuple(exp)} rollup={tuple(got)}")
+    return out
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Дневной свод fills_daily (триггеры SQLite)")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--rebuild", action="store_true", help="пересчитать из fills")
+    args = ap.parse_args(argv)
+    conn = sqlite3.connect(args.db)
+    try:
+        ensure(conn)
+        if args.rebuild:
+            print(f"[fills_daily] rebuilt {rebuild(conn)} rows")
+        bad = verify(conn)
+        for line in bad:
+            print(f"[fills_daily] MISMATCH {line}")
+        print(f"[fills_daily] verify: {'OK' if not bad else f'{len(bad)} mismatches (run --rebuild)'}")
+        return 1 if bad else 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+"""
+Журнал намерений для постановки ордеров.
+
+  items = [intents.new("BUY", price, qty, reserved=usd, mode="GRID"), ...]
+  res = intents.place_batch(cli, sess, PAIR, items)     # [Placed(intent, order_id, error)]
+  intents.recover(cli, sess, PAIR)                      # на старте тика
+
+Пачка стоит два коммита независимо от размера:
+1) намерения (PENDING, с client_id = newClientOrderId) — до первого запроса на биржу;
+2) результаты — Order для поставленных и удаление их намерений одной транзакцией.
+
+Отказ биржи (HTTP 4xx / ошибка API) — намерение удаляется: ордера нет. Неизвестный исход
+(сеть, таймаут, 5xx) и падение процесса между запросом и вторым коммитом оставляют
+PENDING; recover() через INTENT_RECOVER_AFTER_SEC ищет их в open_orders по clientOrderId:
+найденные становятся Order, ненайденные — LOST (исполненный ордер приведёт sync по fills).
+"""
+import time
+import uuid
+from typing import List, NamedTuple, Optional, Sequence
+
+from models_trading import Order, OrderIntent
+from mexc_client import MexcHTTPError
+import metrics
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+INTENT_RECOVER_AFTER_SEC = int(getattr(CFG, "INTENT_RECOVER_AFTER_SEC", 60))
+
+_M_INTENTS = metrics.counter("order_intents_total", "Order intents by outcome", ("pair", "outcome"))
+
+class Intent(NamedTuple):
+    client_id: str
+    side: str
+    price: float
+    qty: float
+    reserved: float
+    mode: str
+
+class Placed(NamedTuple):
+    intent: Intent
+    order_id: Optional[str]       # None — ордер не поставлен (или исход неизвестен)
+    error: Optional[Exception]
+
+def new(side: str, price: float, qty: float, reserved: float = 0.0, mode: str = "GRID") -> Intent:
+    return Intent("eb" + uuid.uuid4().hex[:30], side.upper(), float(price), float(qty), float(reserved), mode)
+
+def definite_reject(e: Exception) -> bool:
+    """Биржа ответила отказом — ордера точно нет."""
+    status = getattr(e, "status", None)
+    return isinstance(e, MexcHTTPError) and status is not None and status < 500
+
+def now_ts() -> int:
+    return int(time.time())
+
+def _order(pair: str, it, oid: str, paper: bool, ts: int) -> Order:
+    return Order(id=oid, pair=pair, side=it.side, price=float(it.price), qty=float(it.qty),
+                 status="NEW", created=ts, updated=ts, paper=paper,
+                 reserved=float(it.reserved), filled_qty=0.0, mode=it.mode)
+
+def place_batch(cli, sess, pair: str, items: Sequence[Intent]) -> List[Placed]:
+    """Поставить пачку ордеров: журнал -> запросы -> один коммит результатов."""
+    items = list(items)
+    if not items:
+        return []
+    paper, ts = getattr(cli, "paper", False), now_ts()
+    sess.add_all([OrderIntent(client_id=it.client_id, pair=pair, side=it.side, price=it.price, qty=it.qty,
+                              reserved=it.reserved, mode=it.mode, paper=paper, status="PENDING",
+                              error="", created=ts, updated=ts) for it in items])
+    sess.commit()
+
+    out = []
+    for it in items:
+        try:
+            resp = cli.place_order(pair, it.side, price=it.price, qty=it.qty, client_id=it.client_id)
+            out.append(Placed(it, str(resp.get("orderId") or f"{it.side}_{now_ts()}"), None))
+        except Exception as e:
+            out.append(Placed(it, None, e))
+
+    ts = now_ts()
+    for r in out:
+        if r.order_id is not None:
+            sess.merge(_order(pair, r.intent, r.order_id, paper, ts))
+            outcome = "placed"
+        elif definite_reject(r.error):
+            outcome = "rejected"
+        else:
+            sess.query(OrderIntent).filter(OrderIntent.client_id == r.intent.client_id).update(
+                {OrderIntent.error: str(r.error)[:500], OrderIntent.updated: ts}, synchronize_session=False)
+            _M_INTENTS.inc(pair=pair, outcome="unknown")
+            continue
+        sess.query(OrderIntent).filter(OrderIntent.client_id == r.intent.client_id).delete(synchronize_session=False)
+        _M_INTENTS.inc(pair=pair, outcome=outcome)
+    sess.commit()
+    return out
+
+def recover(cli, sess, pair: str, grace: int = None) -> dict:
+    """Разобрать PENDING старше grace сек по open_orders (один запрос). {'restored': n, 'lost': m}."""
+    grace = INTENT_RECOVER_AFTER_SEC if grace is None else int(grace)
+    ts = now_ts()
+    stale = (sess.query(OrderIntent)
+             .filter(OrderIntent.pair == pair, OrderIntent.status == "PENDING", OrderIntent.created <= ts - grace)
+             .all())
+    if not stale:
+        return {"restored": 0, "lost": 0}
+    by_cid = {str(o.get("clientOrderId")): o for o in cli.open_orders(pair) or [] if o.get("clientOrderId")}
+    restored = lost = 0
+    for it in stale:
+        o = by_cid.get(it.client_id)
+        if o is not None:
+            sess.merge(_order(pair, it, str(o.get("orderId")), bool(it.paper), ts))
+            sess.delete(it)
+            restored += 1
+        else:
+            it.status, it.updated = "LOST", ts
+            lost += 1
+    sess.commit()
+    if restored:
+        _M_INTENTS.inc(restored, pair=pair, outcome="restored")
+    if lost:
+        _M_INTENTS.inc(lost, pair=pair, outcome="lost")
+    return {"restored": restored, "lost": lost}
@@ -1,10 +1,20 @@
 # -*- coding: utf-8 -*-
 import os
+import json
+import queue
+import atexit
 import logging
-import logging.config
+import logging.handlers
 from pathlib import Path
+from typing import Optional
 
 LOG_DIR_DEFAULT = "/opt/Ebot/logs"
+LOG_FORMAT      = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+LOG_DATEFMT     = "%Y-%m-%d %H:%M:%S"
+
+# слушатели очередей (файлы/консоль пишутся в их потоках, не в вызывающем)
+_listeners: list = []
+_root_configured = False
 
 def _ensure_dir(path: str) -> None:
     try:
@@ -12,60 +22,116 @@ def _ensure_dir(path: str) -> None:
     except Exception:
         pass
 
-def setup_logging(log_dir: str | None = None, level: str = "INFO") -> None:
+def _env_flag(name: str, default: bool) -> bool:
+    v = os.getenv(name)
+    if v is None:
+        return default
+    return v.strip().lower() in ("1", "true", "yes", "on")
+
+def _json_default() -> bool:
+    try:
+        import config as CFG
+        dflt = bool(getattr(CFG, "LOG_JSON", False))
+    except Exception:
+        dflt = False
+    return _env_flag("EBOT_LOG_JSON", dflt)
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись = одна JSON-строка (для jq/loki)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        d = {
+            "ts": self.formatTime(record, LOG_DATEFMT),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "pid": record.process,
+        }
+        if record.exc_info:
+            d["exc"] = self.formatException(record.exc_info)
+        return json.dumps(d, ensure_ascii=False)
+
+class _NameFilter(logging.Filter):
+    """Пропускает только логгер name и его потомков (name.*)."""
+
+    def __init__(self, name: str):
+        super().__init__()
+        self._n = name
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.name == self._n or record.name.startswith(self._n + ".")
+
+def _stop_listeners() -> None:
+    while _listeners:
+        try:
+            _listeners.pop().stop()  # дописывает хвост очереди
+        except Exception:
+            pass
+
+atexit.register(_stop_listeners)
+
+def make_async_handler(*handlers: logging.Handler) -> logging.Handler:
+    """
+    QueueHandler + QueueListener поверх переданных хэндлеров: вызывающий поток
+    только кладёт запись в очередь, запись на диск/в консоль — в фоне.
     """
-    Инициализирует единый логгер с ротацией по размеру.
+    q: queue.SimpleQueue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(q, *handlers, respect_handler_level=True)
+    listener.start()
+    _listeners.append(listener)
+    return logging.handlers.QueueHandler(q)
+
+def setup_logging(log_dir: str | None = None, level: str = "INFO",
+                  service: Optional[str] = None, json_format: Optional[bool] = None) -> None:
+    """
+    Инициализирует единый асинхронный логгер с ротацией по размеру.
     - info.log: уровень INFO и выше
     - error.log: уровень ERROR и выше
+    - <service>.log: только логгер service (и service.*), недельная ротация
+    Повторный вызов в том же процессе ничего не делает.
     """
+    global _root_configured
+    if _root_configured:
+        return
     d = log_dir or os.getenv("EBOT_LOG_DIR", LOG_DIR_DEFAULT)
     _ensure_dir(d)
+    lvl = getattr(logging, str(level).upper(), logging.INFO)
+    if json_format is None:
+        json_format = _json_default()
+    fmt = JsonFormatter() if json_format else logging.Formatter(LOG_FORMAT, datefmt=LOG_DATEFMT)
 
-    info_path = os.path.join(d, "info.log")
-    err_path = os.path.join(d, "error.log")
-
-    config = {
-        "version": 1,
-        "disable_existing_loggers": False,
-        "formatters": {
-            "standard": {
-                "format": "%(asctime)s %(levelname)s %(name)s: %(message)s",
-                "datefmt": "%Y-%m-%d %H:%M:%S",
-            }
-        },
-        "handlers": {
-            "info_file": {
-                "class": "logging.handlers.RotatingFileHandler",
-                "level": "INFO",
-                "formatter": "standard",
-                "filename": info_path,
-                "maxBytes": 5 * 1024 * 1024,
-                "backupCount": 5,
-                "encoding": "utf-8",
-            },
-            "error_file": {
-                "class": "logging.handlers.RotatingFileHandler",
-                "level": "ERROR",
-                "formatter": "standard",
-                "filename": err_path,
-                "maxBytes": 5 * 1024 * 1024,
-                "backupCount": 5,
-                "encoding": "utf-8",
-            },
-            "console": {
-                "class": "logging.StreamHandler",
-                "level": level,
-                "formatter": "standard",
-            },
-        },
-        "root": {
-            "level": level,
-            "handlers": ["info_file", "error_file", "console"],
-        },
-    }
     try:
-        logging.config.dictConfig(config)
-    except Exception:
-        logging.basicConfig(level=getattr(logging, level.upper(), logging.INFO))
+        handlers: list[logging.Handler] = []
 
+        info_h = logging.handlers.RotatingFileHandler(
+            os.path.join(d, "info.log"), maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8")
+        info_h.setLevel(logging.INFO)
+        handlers.append(info_h)
 
+        err_h = logging.handlers.RotatingFileHandler(
+            os.path.join(d, "error.log"), maxBytes=5 * 1024 * 1024, backupCount=5, encoding="utf-8")
+        err_h.setLevel(logging.ERROR)
+        handlers.append(err_h)
+
+        if service:
+            svc_h = logging.handlers.TimedRotatingFileHandler(
+                os.path.join(d, f"{service}.log"), when="W0", backupCount=8, encoding="utf-8")
+            svc_h.setLevel(lvl)
+            svc_h.addFilter(_NameFilter(service))
+            handlers.append(svc_h)
+
+        console = logging.StreamHandler()
+        console.setLevel(lvl)
+        handlers.append(console)
+
+        for h in handlers:
+            h.setFormatter(fmt)
+
+        root = logging.getLogger()
+        for h in list(root.handlers):
+            root.removeHandler(h)
+        root.addHandler(make_async_handler(*handlers))
+        root.setLevel(lvl)
+        _root_configured = True
+    except Exception:
+        logging.basicConfig(level=lvl)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Локальные рыночные данные: candles.py пишет последнюю сделку и лучший bid/ask каждой
+пары (WS deals/bookTicker) в запись в shared memory, торговый код читает её без сети.
+
+Запись — 64 байта на пару в MD_SHM_DIR/ebot_md_<PAIR> под seqlock:
+  seq u64 | ts_ms i64 | trade_ms i64 | last f64 | bid f64 | bid_qty f64 | ask f64 | ask_qty f64
+Писатель делает seq нечётным, пишет поля, делает seq чётным; читатель повторяет
+чтение, пока seq до и после не совпадут и не будут чётными. Писатель один (candles.py).
+
+  px = marketdata.last_price(cli, "KASUSDC")   # локально, если запись свежая, иначе REST
+  q  = marketdata.read("KASUSDC")              # Quote(...) или None
+
+Кадры WS — protobuf (каналы *.api.pb): decode_push() разбирает нужные поля обёртки
+PushDataV3ApiWrapper без сгенерированных классов.
+"""
+import os
+import mmap
+import time
+import struct
+import logging
+import tempfile
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import metrics
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+MD_ENABLED     = bool(getattr(CFG, "MD_ENABLED", True))
+MD_MAX_AGE_SEC = float(getattr(CFG, "MD_MAX_AGE_SEC", 5.0))
+MD_SHM_DIR     = getattr(CFG, "MD_SHM_DIR", "") or ("/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir())
+
+_FMT  = "<Qqqddddd"
+_SIZE = struct.calcsize(_FMT)   # 64
+_SEQ  = struct.Struct("<Q")
+_BODY = struct.Struct("<qqddddd")
+
+log = logging.getLogger("marketdata")
+
+_M_READS = metrics.counter("md_price_reads_total", "Last-price reads by source (local shm / REST fallback)", ("pair", "source"))
+
+class Quote(NamedTuple):
+    ts_ms: int        # время последнего обновления записи
+    trade_ms: int     # время последней сделки
+    last: float
+    bid: float
+    bid_qty: float
+    ask: float
+    ask_qty: float
+
+    def age(self, now: Optional[float] = None) -> float:
+        return (time.time() if now is None else now) - self.ts_ms / 1000.0
+
+def shm_path(pair: str, base_dir: Optional[str] = None) -> str:
+    return os.path.join(base_dir or MD_SHM_DIR, f"ebot_md_{str(pair).upper()}")
+
+# ---------------- seqlock record ----------------
+class Writer:
+    """Писатель записи пары (один на пару — candles.py)."""
+
+    def __init__(self, pair: str, base_dir: Optional[str] = None):
+        self.path = shm_path(pair, base_dir)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < _SIZE:
+                os.ftruncate(fd, _SIZE)
+            self._mm = mmap.mmap(fd, _SIZE, access=mmap.ACCESS_WRITE)
+        finally:
+            os.close(fd)
+        seq, *vals = struct.unpack_from(_FMT, self._mm, 0)
+        self._seq = seq + (seq & 1)   # после падения посреди записи
+        self._vals = list(vals)
+
+    def update(self, last: float = None, bid: float = None, bid_qty: float = None,
+               ask: float = None, ask_qty: float = None, trade_ms: int = None,
+               ts_ms: Optional[int] = None) -> None:
+        v = self._vals
+        v[0] = int(ts_ms if ts_ms is not None else time.time() * 1000)
+        if trade_ms is not None: v[1] = int(trade_ms)
+        if last is not None: v[2] = float(last)
+        if bid is not None: v[3] = float(bid)
+        if bid_qty is not None: v[4] = float(bid_qty)
+        if ask is not None: v[5] = float(ask)
+        if ask_qty is not None: v[6] = float(ask_qty)
+        self._seq += 1
+        _SEQ.pack_into(self._mm, 0, self._seq)          # нечётный — запись идёт
+        _BODY.pack_into(self._mm, 8, *v)
+        self._seq += 1
+        _SEQ.pack_into(self._mm, 0, self._seq)
+
+    def close(self) -> None:
+        self._mm.close()
+
+class Reader:
+    """Читатель записи пары; файл может появиться позже (candles.py ещё не стартовал)."""
+
+    def __init__(self, pair: str, base_dir: Optional[str] = None):
+        self.path = shm_path(pair, base_dir)
+        self._mm: Optional[mmap.mmap] = None
+
+    def _open(self) -> bool:
+        try:
+            fd = os.open(self.path, os.O_RDONLY)
+        except OSError:
+            return False
+        try:
+            if os.fstat(fd).st_size < _SIZE:
+                return False
+            self._mm = mmap.mmap(fd, _SIZE, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        return True
+
+    def read(self, retries: int = 100) -> Optional[Quote]:
+        if self._mm is None and not self._open():
+            return None
+        mm = self._mm
+        for _ in range(retries):
+            s1 = _SEQ.unpack_from(mm, 0)[0]
+            if s1 & 1:
+                continue
+            body = _BODY.unpack_from(mm, 8)
+            if _SEQ.unpack_from(mm, 0)[0] == s1:
+                return Quote(*body) if s1 else None   # seq=0 — ещё ничего не писали
+        return None
+
+_READERS: Dict[str, Reader] = {}
+
+def read(pair: str) -> Optional[Quote]:
+    r = _READERS.get(pair)
+    if r is None:
+        r = _READERS[pair] = Reader(pair)
+    return r.read()
+
+def last_price(cli, pair: str, max_age: float = None) -> float:
+    """
+    Цена последней сделки: из локальной записи, если она не старше max_age
+    (MD_MAX_AGE_SEC), иначе REST cli.price(). Paper-клиент всегда спрашиваем сам:
+    он исполняет ордера по своей цене.
+    """
+    if MD_ENABLED and not getattr(cli, "paper", False):
+        q = read(pair)
+        if q is not None and q.last > 0 and q.age() <= (MD_MAX_AGE_SEC if max_age is None else max_age):
+            _M_READS.inc(pair=pair, source="local")
+            return q.last
+    _M_READS.inc(pair=pair, source="rest")
+    return float(cli.price(pair))
+
+# ---------------- protobuf (PushDataV3ApiWrapper) ----------------
+_F_CHANNEL, _F_SYMBOL, _F_SEND_TIME = 1, 3, 6
+_DEALS_FIELDS = (301, 314)   # publicDeals / publicAggreDeals: repeated item = 1 {price, quantity, tradeType, time}
+_BOOK_FIELDS  = (305, 315)   # publicBookTicker / publicAggreBookTicker: bidPrice, bidQuantity, askPrice, askQuantity
+
+def _varint(buf: bytes, i: int) -> Tuple[int, int]:
+    out = shift = 0
+    while True:
+        b = buf[i]
+        i += 1
+        out |= (b & 0x7F) << shift
+        if b < 0x80:
+            return out, i
+        shift += 7
+
+def _fields(buf: bytes):
+    """(номер поля, значение): varint -> int, length-delimited -> bytes; fixed32/64 пропускаем."""
+    i, n = 0, len(buf)
+    while i < n:
+        key, i = _varint(buf, i)
+        no, wt = key >> 3, key & 7
+        if wt == 0:
+            v, i = _varint(buf, i)
+            yield no, v
+        elif wt == 2:
+            ln, i = _varint(buf, i)
+            yield no, bytes(buf[i:i + ln])
+            i += ln
+        elif wt == 1:
+            i += 8
+        elif wt == 5:
+            i += 4
+        else:
+            raise ValueError(f"unsupported wire type {wt}")
+
+def _num(b) -> float:
+    try:
+        return float(b.decode() if isinstance(b, bytes) else b)
+    except (ValueError, UnicodeDecodeError):
+        return 0.0
+
+def decode_push(frame: bytes) -> dict:
+    """
+    -> {"channel", "symbol", "send_ms", "deals": [(price, qty, trade_type, time_ms)],
+        "book": (bid, bid_qty, ask, ask_qty) | None}
+    """
+    out = {"channel": "", "symbol": "", "send_ms": 0, "deals": [], "book": None}
+    for no, v in _fields(frame):
+        if no == _F_CHANNEL:
+            out["channel"] = v.decode(errors="replace")
+        elif no == _F_SYMBOL:
+            out["symbol"] = v.decode(errors="replace")
+        elif no == _F_SEND_TIME:
+            out["send_ms"] = int(v)
+        elif no in _DEALS_FIELDS:
+            deals: List[tuple] = []
+            for fno, item in _fields(v):
+                if fno != 1:
+                    continue
+                d = {k: val for k, val in _fields(item)}
+                deals.append((_num(d.get(1, b"0")), _num(d.get(2, b"0")), int(d.get(3, 0)), int(d.get(4, 0))))
+            out["deals"] = deals
+        elif no in _BOOK_FIELDS:
+            d = {k: val for k, val in _fields(v)}
+            out["book"] = (_num(d.get(1, b"0")), _num(d.get(2, b"0")), _num(d.get(3, b"0")), _num(d.get(4, b"0")))
+    if not out["symbol"] and "@" in out["channel"]:
+        out["symbol"] = out["channel"].rsplit("@", 1)[-1]
+    return out
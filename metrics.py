@@ -0,0 +1,370 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Мини-реестр метрик в текстовом формате Prometheus (без внешних зависимостей).
+
+Сервисы у нас короткоживущие (buy/sell/sync запускаются оркестратором как
+подпроцессы), поэтому каждый процесс при выходе сливает свои дельты в
+<METRICS_DIR>/<job>.json (счётчики и гистограммы суммируются, gauge — заменяются),
+а затем пересобирает общий <METRICS_DIR>/ebot.prom для textfile-коллектора.
+
+Чтение:
+  python3 metrics.py                 # напечатать текущие метрики
+  python3 metrics.py --serve 9108    # локальный HTTP /metrics
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import bisect
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterable, List, Optional, Tuple
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+def _env_flag(name: str, default: bool) -> bool:
+    v = os.getenv(name)
+    if v is None:
+        return default
+    return v.strip().lower() not in ("0", "false", "no", "off", "")
+
+METRICS_ENABLED   = _env_flag("EBOT_METRICS", bool(getattr(CFG, "METRICS_ENABLED", True)))
+METRICS_DIR       = os.getenv("EBOT_METRICS_DIR") or getattr(CFG, "METRICS_DIR", None) or \
+                    os.path.join(os.getenv("EBOT_LOG_DIR", "/opt/Ebot/logs"), "metrics")
+METRICS_HTTP_PORT = int(getattr(CFG, "METRICS_HTTP_PORT", 0) or 0)
+METRICS_PREFIX    = "ebot_"
+PROM_FILE         = "ebot.prom"
+
+# секунды: от быстрых SQL до медленных REST с ретраями
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_lock = threading.RLock()
+
+def _fmt(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+def _esc(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels_str(names: Iterable[str], values: Iterable[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_esc(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_esc(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+# ================== ТИПЫ МЕТРИК ==================
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help_: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help_
+        self.labelnames = tuple(labelnames)
+        self._series: Dict[Tuple[str, ...], object] = {}
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name}: labels {sorted(labels)} != {sorted(self.labelnames)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if amount < 0:
+            raise ValueError("counter can only increase")
+        k = self._key(labels)
+        with _lock:
+            self._series[k] = float(self._series.get(k, 0.0)) + float(amount)
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        k = self._key(labels)
+        with _lock:
+            self._series[k] = float(value)
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        k = self._key(labels)
+        with _lock:
+            self._series[k] = float(self._series.get(k, 0.0)) + float(amount)
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_: str, labelnames: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        k = self._key(labels)
+        v = float(value)
+        with _lock:
+            st = self._series.get(k)
+            if st is None:
+                # [счётчики по корзинам (не кумулятивные) ..., +Inf, sum, count]
+                st = [0.0] * (len(self.buckets) + 3)
+                self._series[k] = st
+            st[bisect.bisect_left(self.buckets, v)] += 1
+            st[-2] += v
+            st[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0, **labels)
+
+# ================== РЕЕСТР ==================
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def _get(self, cls, name: str, help_: str, labelnames: Iterable[str], **kw) -> _Metric:
+        full = name if name.startswith(METRICS_PREFIX) else METRICS_PREFIX + name
+        with _lock:
+            m = self._metrics.get(full)
+            if m is None:
+                m = cls(full, help_, labelnames, **kw)
+                self._metrics[full] = m
+            elif not isinstance(m, cls):
+                raise ValueError(f"metric {full} already registered as {m.kind}")
+            return m
+
+    def counter(self, name: str, help_: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get(Counter, name, help_, labelnames)
+
+    def gauge(self, name: str, help_: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help_, labelnames)
+
+    def histogram(self, name: str, help_: str, labelnames: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help_, labelnames, buckets=buckets)
+
+    def snapshot(self, reset: bool = False) -> dict:
+        """Сериализуемое состояние; reset=True обнуляет счётчики/гистограммы (дельты уже сняты)."""
+        out = {}
+        with _lock:
+            for m in self._metrics.values():
+                if not m._series:
+                    continue
+                d = {"type": m.kind, "help": m.help, "labelnames": list(m.labelnames),
+                     "series": {json.dumps(list(k)): (list(v) if isinstance(v, list) else v)
+                                for k, v in m._series.items()}}
+                if isinstance(m, Histogram):
+                    d["buckets"] = list(m.buckets)
+                out[m.name] = d
+                if reset and m.kind != "gauge":
+                    m._series.clear()
+        return out
+
+REGISTRY = Registry()
+counter   = REGISTRY.counter
+gauge     = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+# ================== СЛИЯНИЕ / ЭКСПОРТ ==================
+
+def merge_state(old: dict, delta: dict) -> dict:
+    """Счётчики и гистограммы суммируются, gauge — перезаписываются."""
+    out = dict(old or {})
+    for name, d in (delta or {}).items():
+        prev = out.get(name)
+        if not prev or prev.get("type") != d["type"] or prev.get("buckets") != d.get("buckets"):
+            out[name] = d
+            continue
+        series = dict(prev.get("series") or {})
+        for k, v in d["series"].items():
+            if d["type"] == "gauge" or k not in series:
+                series[k] = v
+            elif d["type"] == "counter":
+                series[k] = float(series[k]) + float(v)
+            else:
+                series[k] = [a + b for a, b in zip(series[k], v)]
+        out[name] = dict(d, series=series)
+    return out
+
+def render(states: Dict[str, dict]) -> str:
+    """states: {job: state}. Все серии получают label job=..., TYPE/HELP — по одному разу."""
+    by_name: Dict[str, List[Tuple[str, dict]]] = {}
+    for job in sorted(states):
+        for name, d in states[job].items():
+            by_name.setdefault(name, []).append((job, d))
+
+    lines: List[str] = []
+    for name in sorted(by_name):
+        items = by_name[name]
+        kind = items[0][1]["type"]
+        lines.append(f"# HELP {name} {items[0][1].get('help', '')}")
+        lines.append(f"# TYPE {name} {kind}")
+        for job, d in items:
+            if d["type"] != kind:
+                continue
+            names = d.get("labelnames") or []
+            for k in sorted(d["series"]):
+                vals = json.loads(k)
+                v = d["series"][k]
+                if kind != "histogram":
+                    lines.append(f"{name}{_labels_str(names, vals, ('job', job))} {_fmt(v)}")
+                    continue
+                acc = 0.0
+                for ub, c in zip(list(d["buckets"]) + [float("inf")], v[:-2]):
+                    acc += c
+                    lines.append(f"{name}_bucket{_labels_str(list(names) + ['le'], list(vals) + [_fmt(ub)], ('job', job))} {_fmt(acc)}")
+                lines.append(f"{name}_sum{_labels_str(names, vals, ('job', job))} {_fmt(v[-2])}")
+                lines.append(f"{name}_count{_labels_str(names, vals, ('job', job))} {_fmt(v[-1])}")
+    return "\n".join(lines) + ("\n" if lines else "")
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def load_states(metrics_dir: Optional[str] = None) -> Dict[str, dict]:
+    d = metrics_dir or METRICS_DIR
+    out = {}
+    try:
+        names = sorted(os.listdir(d))
+    except Exception:
+        return out
+    for fn in names:
+        if fn.endswith(".json"):
+            out[fn[:-5]] = _read_json(os.path.join(d, fn))
+    return out
+
+def _default_job() -> str:
+    base = os.path.basename(sys.argv[0] or "") or "python"
+    return base[:-3] if base.endswith(".py") else base
+
+_job = os.getenv("EBOT_METRICS_JOB") or None
+
+def set_job(name: str) -> None:
+    global _job
+    _job = str(name)
+
+def flush(job: Optional[str] = None, metrics_dir: Optional[str] = None) -> Optional[str]:
+    """Сливает накопленные дельты в <dir>/<job>.json и пересобирает <dir>/ebot.prom."""
+    if not METRICS_ENABLED:
+        return None
+    job = job or _job or _default_job()
+    d = metrics_dir or METRICS_DIR
+    with _lock:
+        delta = REGISTRY.snapshot(reset=True)
+        if not delta:
+            return None
+        try:
+            os.makedirs(d, exist_ok=True)
+            path = os.path.join(d, f"{job}.json")
+            _write_atomic(path, json.dumps(merge_state(_read_json(path), delta), ensure_ascii=False))
+            prom = os.path.join(d, PROM_FILE)
+            _write_atomic(prom, render(load_states(d)))
+            return prom
+        except Exception:
+            # метрики не должны ронять торговлю
+            return None
+
+def _flush_quiet():
+    try:
+        flush()
+    except Exception:
+        pass
+
+atexit.register(_flush_quiet)
+
+# ================== HTTP ==================
+
+def serve(port: int = METRICS_HTTP_PORT, host: str = "127.0.0.1", metrics_dir: Optional[str] = None):
+    """Поднимает /metrics в daemon-потоке. Возвращает сервер (или None, если порт не задан)."""
+    if not port:
+        return None
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _H(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?", 1)[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            flush(metrics_dir=metrics_dir)
+            body = render(load_states(metrics_dir)).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *_):
+            pass
+
+    srv = ThreadingHTTPServer((host, int(port)), _H)
+    threading.Thread(target=srv.serve_forever, name="metrics-http", daemon=True).start()
+    return srv
+
+# ================== SQLAlchemy ==================
+
+def instrument_engine(engine, db: str) -> None:
+    """Время SQL-запросов -> ebot_db_query_seconds{db,op}."""
+    try:
+        from sqlalchemy import event
+    except Exception:
+        return
+    h = histogram("db_query_seconds", "SQL statement latency", ("db", "op"))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("_ebot_t0", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("_ebot_t0")
+        if not stack:
+            return
+        dt = time.perf_counter() - stack.pop()
+        op = (statement.lstrip().split(None, 1) or ["?"])[0].lower()
+        h.observe(dt, db=db, op=op)
+
+    @event.listens_for(engine, "handle_error")
+    def _err(ctx):
+        # упавший запрос after_cursor_execute не зовёт — снять его отметку, иначе стек растёт
+        stack = ctx.connection.info.get("_ebot_t0") if ctx.connection is not None else None
+        if stack:
+            stack.pop()
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Метрики Ebot: печать или локальный HTTP /metrics")
+    ap.add_argument("--dir", default=None, help=f"каталог состояний (по умолчанию {METRICS_DIR})")
+    ap.add_argument("--serve", type=int, default=0, help="порт HTTP (127.0.0.1)")
+    args = ap.parse_args()
+    if args.serve:
+        serve(args.serve, metrics_dir=args.dir)
+        print(f"metrics: http://127.0.0.1:{args.serve}/metrics")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            pass
+    else:
+        sys.stdout.write(render(load_states(args.dir)))
@@ -8,7 +8,15 @@ import random
 import requests
 from urllib.parse import urlencode
 
+import os
+
 from config import MEXC_API_URL, API_KEY, API_SECRET, PAIR
+try:
+    from config import PAPER_TRADE
+except ImportError:
+    PAPER_TRADE = False
+import metrics
+import tracing
 
 # --- настройки HTTP/Retry (можно вынести в config при желании) ---
 HTTP_TIMEOUT_SEC      = 15          # базовый timeout одного запроса
@@ -16,9 +24,19 @@ RETRY_MAX_ATTEMPTS    = 3           # всего попыток (1 + 2 повт
 RETRY_BACKOFF_BASE    = 0.6         # старт задержки перед повтором, сек
 RETRY_BACKOFF_JITTER  = 0.25        # случайная примесь к задержке
 
+_M_LATENCY = metrics.histogram("api_request_seconds", "MEXC REST call latency incl. retries", ("method", "endpoint"))
+_M_CALLS   = metrics.counter("api_requests_total", "MEXC REST calls by outcome", ("method", "endpoint", "outcome"))
+_M_RETRIES = metrics.counter("api_retries_total", "MEXC REST retries by reason", ("method", "endpoint", "reason"))
+_M_ORDERS  = metrics.counter("orders_total", "Orders placed/cancelled/rejected", ("side", "action"))
+
 class MexcHTTPError(Exception):
-    """Исключение уровня транспорта/HTTP/API."""
-    pass
+    """
+    Исключение уровня транспорта/HTTP/API. status — HTTP-код ответа биржи
+    (200 — ошибка в теле); None — ответа не было (сеть/таймаут), исход запроса неизвестен.
+    """
+    def __init__(self, msg: str = "", status: int = None):
+        super().__init__(msg)
+        self.status = status
 
 def _now_ms() -> int:
     return int(time.time() * 1000)
@@ -42,6 +60,8 @@ def _is_retriable_api_payload(payload) -> bool:
     return False
 
 class MexcClient:
+    paper = False
+
     def __init__(self, api_key: str = None, api_secret: str = None, base_url: str = None,
                  timeout: int = HTTP_TIMEOUT_SEC):
         self.base_url   = (base_url or MEXC_API_URL).rstrip("/")
@@ -81,6 +101,18 @@ class MexcClient:
         time.sleep(delay)
 
     def _request(self, method: str, path: str, params: dict = None, json: dict = None, signed: bool = False):
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            with tracing.span("api", method=method, endpoint=path):
+                data = self._request_once(method, path, params=params, json=json, signed=signed)
+            outcome = "ok"
+            return data
+        finally:
+            _M_LATENCY.observe(time.perf_counter() - t0, method=method, endpoint=path)
+            _M_CALLS.inc(method=method, endpoint=path, outcome=outcome)
+
+    def _request_once(self, method: str, path: str, params: dict = None, json: dict = None, signed: bool = False):
         url = f"{self.base_url}{path}"
         params = dict(params or {})
 
@@ -106,6 +138,7 @@ class MexcClient:
                 # сетевые/таймаут — пробуем повторить
                 last_exc = e
                 if attempt < RETRY_MAX_ATTEMPTS:
+                    _M_RETRIES.inc(method=method, endpoint=path, reason="network")
                     self._sleep_backoff(attempt)
                     continue
                 raise MexcHTTPError(f"{method} {path} request failed: {e}")
@@ -120,18 +153,20 @@ class MexcClient:
             if r.status_code != 200:
                 # если ретраибельно — повторим
                 if _is_retriable_status(r.status_code) and attempt < RETRY_MAX_ATTEMPTS:
+                    _M_RETRIES.inc(method=method, endpoint=path, reason=f"http_{r.status_code}")
                     self._sleep_backoff(attempt)
                     continue
-                raise MexcHTTPError(f"{method} {path} {r.status_code}: {data}")
+                raise MexcHTTPError(f"{method} {path} {r.status_code}: {data}", status=r.status_code)
 
             # Уровень API (200 OK, но ошибка в теле)
             if isinstance(data, dict) and "code" in data and data["code"] not in (0, "0"):
                 # бизнес-ошибки НЕ ретраим (например Oversold/30005)
                 # но если захотим ловить временные — используем _is_retriable_api_payload
                 if _is_retriable_api_payload(data) and attempt < RETRY_MAX_ATTEMPTS:
+                    _M_RETRIES.inc(method=method, endpoint=path, reason="api")
                     self._sleep_backoff(attempt)
                     continue
-                raise MexcHTTPError(f"{method} {path} API error: {data}")
+                raise MexcHTTPError(f"{method} {path} API error: {data}", status=r.status_code)
 
             return data
 
@@ -146,6 +181,17 @@ class MexcClient:
         # Ответ вида {'symbol': 'KASUSDC', 'price': '0.086142'}
         return float(data.get("price", 0.0))
 
+    def klines(self, symbol: str, interval: str = "1m", startTime: int = None, endTime: int = None,
+               limit: int = 1000) -> list:
+        """[[openTime(ms), open, high, low, close, volume, closeTime, quoteVolume], ...]"""
+        params = {"symbol": symbol, "interval": interval, "limit": int(limit)}
+        if startTime is not None:
+            params["startTime"] = int(startTime)
+        if endTime is not None:
+            params["endTime"] = int(endTime)
+        data = self._request("GET", "/api/v3/klines", params=params, signed=False)
+        return data if isinstance(data, list) else []
+
     def exchange_info(self, symbol: str = None) -> dict:
         params = {"symbol": symbol} if symbol else {}
         return self._request("GET", "/api/v3/exchangeInfo", params=params, signed=False)
@@ -171,11 +217,28 @@ class MexcClient:
         data = self._request("GET", "/api/v3/myTrades", params=params, signed=True)
         return data if isinstance(data, list) else []
 
-    def place_order(self, symbol: str, side: str, price: float, qty: float, tif: str = "GTC") -> dict:
+    def all_orders(self, symbol: str, startTime: int = None, endTime: int = None, limit: int = 1000) -> list:
+        """История ордеров (любой статус) по времени создания: GET /api/v3/allOrders."""
+        params = {"symbol": symbol, "limit": int(limit)}
+        if startTime:
+            params["startTime"] = int(startTime)
+        if endTime:
+            params["endTime"] = int(endTime)
+        data = self._request("GET", "/api/v3/allOrders", params=params, signed=True)
+        return data if isinstance(data, list) else []
+
+    def query_order(self, symbol: str, order_id: str) -> dict:
+        """Один ордер по id (GET /api/v3/order); неизвестный — MexcHTTPError со status 400."""
+        data = self._request("GET", "/api/v3/order", params={"symbol": symbol, "orderId": order_id}, signed=True)
+        return data if isinstance(data, dict) else {}
+
+    def place_order(self, symbol: str, side: str, price: float, qty: float, tif: str = "GTC",
+                    client_id: str = None) -> dict:
         """
         Лимитный ордер (как мы используем в боте):
         - type=LIMIT
         - timeInForce: GTC
+        - client_id -> newClientOrderId (по нему intents.recover находит ордер после сбоя)
         """
         params = {
             "symbol": symbol,
@@ -185,17 +248,62 @@ class MexcClient:
             "price": _fmt_num(price),
             "quantity": _fmt_num(qty),
         }
-        return self._request("POST", "/api/v3/order", params=params, signed=True)
+        if client_id:
+            params["newClientOrderId"] = client_id
+        try:
+            resp = self._request("POST", "/api/v3/order", params=params, signed=True)
+        except MexcHTTPError:
+            _M_ORDERS.inc(side=side.upper(), action="rejected")
+            raise
+        _M_ORDERS.inc(side=side.upper(), action="placed")
+        return resp
 
-    def cancel_order(self, symbol: str, order_id: str) -> dict:
+    def cancel_order(self, symbol: str, order_id: str, side: str = "") -> dict:
         params = {"symbol": symbol, "orderId": order_id}
-        return self._request("DELETE", "/api/v3/order", params=params, signed=True)
+        resp = self._request("DELETE", "/api/v3/order", params=params, signed=True)
+        _M_ORDERS.inc(side=(side or (resp or {}).get("side") or "?").upper(), action="cancelled")
+        return resp
+
+    def cancel_open_orders(self, symbol: str) -> list:
+        """Все открытые ордера символа одним запросом (DELETE /api/v3/openOrders)."""
+        resp = self._request("DELETE", "/api/v3/openOrders", params={"symbol": symbol}, signed=True)
+        rows = resp if isinstance(resp, list) else []
+        for r in rows:
+            _M_ORDERS.inc(side=str(r.get("side") or "?").upper(), action="cancelled")
+        return rows
+
+
+_SHARED: dict = {}
+
+def get_client(shared: bool = True):
+    """
+    Клиент биржи для buy/sell/sync/buckets/avg1: при PAPER_TRADE (или EBOT_PAPER=1)
+    — локальная paper-биржа (paper_client.PaperMexcClient), иначе реальный MEXC.
+    Один экземпляр на процесс (общий пул keep-alive соединений на все пары в engine.py);
+    shared=False — отдельный клиент.
+    """
+    paper = os.getenv("EBOT_PAPER")
+    is_paper = (paper.strip().lower() in ("1", "true", "yes", "on")) if paper else bool(PAPER_TRADE)
+    if shared and is_paper in _SHARED:
+        return _SHARED[is_paper]
+    if is_paper:
+        from paper_client import PaperMexcClient
+        cli = PaperMexcClient()
+    else:
+        cli = MexcClient()
+    if shared:
+        _SHARED[is_paper] = cli
+    return cli
 
 
 # Быстрая проверка модуля (локально)
 if __name__ == "__main__":
+    import marketdata
     c = MexcClient()
-    print("LAST:", c.price(PAIR))
+    q = marketdata.read(PAIR)
+    if q is not None:
+        print(f"LOCAL: last={q.last} bid={q.bid} ask={q.ask} age={q.age():.1f}s")
+    print("LAST:", marketdata.last_price(c, PAIR))
     try:
         a = c.account()
         usdc = next((float(b.get("free", 0)) for b in a.get("balances", []) if b.get("asset") == "USDC"), 0.0)
@@ -0,0 +1,737 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальная MEXC для нагрузочных и soak-прогонов: REST (всё, что зовёт MexcClient, плюс
+klines для candles/backfill) и WS (подписки, PING/PONG, protobuf-пуши deals/bookTicker/kline).
+
+  python3 mexc_mock.py --pair KASUSDC --speed 60 --usd 1000
+  python3 mexc_mock.py --path sine --latency-ms 80 --jitter-ms 40 --p429 0.02 --p5xx 0.01 --partial 0.3
+  python3 mexc_mock.py --path replay --replay-db /opt/Ebot/ebot.db --speed 600 --watch-db /opt/Ebot/ebot.db
+
+В config.py бота (ключи API любые — подпись мок не проверяет):
+  MEXC_API_URL  = "http://127.0.0.1:18080"
+  MEXC_HTTP_URL = "http://127.0.0.1:18080/api/v3/klines"
+  MEXC_WS_URL   = "ws://127.0.0.1:18081/ws"
+
+Ускорение (--speed): за секунду стены цена проходит speed секунд пути (walk/sine/replay).
+Свечи и время ответов — по часам стены, поэтому бот работает как обычно, но за час видит
+рынок speed часов: столько же пересечений уровней, исполнений и переустановок.
+
+Сбои: задержка (--latency-ms ± --jitter-ms), доля 429/5xx (--p429/--p5xx), общий лимит
+запросов в секунду (--rate-limit, сверх — 429), частичные исполнения (--partial — доля
+касаний, исполняющих 20–80% остатка), обрыв всех WS раз в --ws-drop-sec. Всё меняется
+на ходу: POST /mock/config {"p429": 0.1, "speed": 120}; скачок цены — POST /mock/price
+{"symbol": "KASUSDC", "price": 0.08}; счётчики — GET /mock/stats.
+
+Раз в --report-every сек печатается строка статистики (запросы/с, ордера, сделки, WS-кадры,
+размер --watch-db с приростом); --stats-out пишет те же снимки JSON-строками.
+"""
+import os
+import sys
+import json
+import math
+import time
+import random
+import signal
+import sqlite3
+import asyncio
+import argparse
+import threading
+from collections import Counter, OrderedDict
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit, parse_qs
+
+import websockets
+
+from mexc_client import _fmt_num
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+PAIR          = getattr(CFG, "PAIR", "KASUSDC")
+MAKER_FEE_PCT = float(getattr(CFG, "MAKER_FEE_PCT", 0.0))
+TAKER_FEE_PCT = float(getattr(CFG, "TAKER_FEE_PCT", MAKER_FEE_PCT))
+
+_QUOTES = ("USDC", "USDT", "USDE", "BTC", "ETH")
+MAX_CANDLES = 100_000        # минуток на символ в памяти
+TICK_SEC = 0.1               # шаг рынка по стене
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+def split_symbol(symbol: str):
+    s = str(symbol).upper()
+    for q in _QUOTES:
+        if s.endswith(q) and len(s) > len(q):
+            return s[:-len(q)], q
+    return None
+
+class ApiError(Exception):
+    def __init__(self, status: int, code: int, msg: str):
+        super().__init__(msg)
+        self.status, self.code, self.msg = status, code, msg
+
+# ---------------- protobuf (PushDataV3ApiWrapper) ----------------
+def _pb_varint(n: int) -> bytes:
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if not n:
+            out.append(b)
+            return bytes(out)
+        out.append(b | 0x80)
+
+def _pb_ld(no: int, payload) -> bytes:
+    payload = payload.encode() if isinstance(payload, str) else payload
+    return _pb_varint(no << 3 | 2) + _pb_varint(len(payload)) + payload
+
+def _pb_int(no: int, v: int) -> bytes:
+    return _pb_varint(no << 3) + _pb_varint(int(v))
+
+def _pb_push(channel: str, symbol: str, field: int, body: bytes) -> bytes:
+    return _pb_ld(1, channel) + _pb_ld(3, symbol) + _pb_int(6, _now_ms()) + _pb_ld(field, body)
+
+def pb_deals(symbol: str, deals) -> bytes:
+    """deals: [(price, qty, trade_type 1=buy/2=sell, time_ms)] -> publicAggreDeals (314)."""
+    items = b"".join(_pb_ld(1, _pb_ld(1, _fmt_num(p)) + _pb_ld(2, _fmt_num(q)) + _pb_int(3, tt) + _pb_int(4, t))
+                     for p, q, tt, t in deals)
+    return _pb_push(f"spot@public.aggre.deals.v3.api.pb@100ms@{symbol}", symbol, 314, items)
+
+def pb_book(symbol: str, bid: float, bid_qty: float, ask: float, ask_qty: float) -> bytes:
+    body = b"".join(_pb_ld(i, _fmt_num(v)) for i, v in enumerate((bid, bid_qty, ask, ask_qty), 1))
+    return _pb_push(f"spot@public.aggre.bookTicker.v3.api.pb@100ms@{symbol}", symbol, 315, body)
+
+def pb_kline(symbol: str, t: int, o: float, h: float, l: float, c: float, v: float) -> bytes:
+    body = (_pb_ld(1, "Min1") + _pb_int(2, t) + b"".join(_pb_ld(i, _fmt_num(x)) for i, x in ((3, o), (4, c), (5, h), (6, l), (7, v)))
+            + _pb_ld(8, _fmt_num(v * c)) + _pb_int(9, t + 60))
+    return _pb_push(f"spot@public.kline.v3.api.pb@{symbol}@Min1", symbol, 308, body)
+
+# ---------------- ценовые пути ----------------
+class PricePath:
+    """
+    walk   — геометрическое блуждание, vol — σ за минуту пути;
+    sine   — base·(1 + amp·sin(2πt/period)) плюс шум vol;
+    replay — mid минуток из minmax (replay_db), по кругу.
+    """
+    def __init__(self, kind: str = "walk", price: float = 0.09, vol: float = 0.002, amp: float = 0.03,
+                 period_sec: float = 6 * 3600, replay: Optional[List[float]] = None, seed: Optional[int] = None):
+        self.kind, self.base, self.price = kind, float(price), float(price)
+        self.vol, self.amp, self.period = float(vol), float(amp), float(period_sec)
+        self.replay = replay or []
+        self.t = 0.0
+        self.rng = random.Random(seed)
+        if kind == "replay":
+            if not self.replay:
+                raise ValueError("replay path needs candles (--replay-db)")
+            self.price = self.replay[0]
+
+    def step(self, dt: float) -> float:
+        """Сдвинуть путь на dt секунд; новая цена."""
+        self.t += dt
+        noise = self.vol * math.sqrt(max(dt, 0.0) / 60.0) * self.rng.gauss(0.0, 1.0)
+        if self.kind == "walk":
+            self.price *= math.exp(noise)
+        elif self.kind == "sine":
+            self.price = self.base * (1.0 + self.amp * math.sin(2 * math.pi * self.t / self.period)) * math.exp(noise)
+        else:
+            self.price = self.replay[int(self.t // 60) % len(self.replay)]
+        return self.price
+
+    def jump(self, price: float) -> None:
+        self.price = self.base = float(price)
+
+def load_replay(db_path: str, pair: str, limit: int = 10 * 1440) -> List[float]:
+    conn = sqlite3.connect(db_path)
+    try:
+        rows = conn.execute("SELECT mid FROM minmax WHERE pair=? AND mid > 0 ORDER BY time DESC LIMIT ?",
+                            (pair, int(limit))).fetchall()
+    finally:
+        conn.close()
+    return [float(r[0]) for r in reversed(rows)]
+
+# ---------------- биржа ----------------
+class Faults:
+    FIELDS = ("latency_ms", "jitter_ms", "p429", "p5xx", "rate_limit", "partial", "ws_drop_sec", "speed")
+
+    def __init__(self, **kw):
+        self.latency_ms = self.jitter_ms = self.p429 = self.p5xx = self.rate_limit = 0.0
+        self.partial = self.ws_drop_sec = 0.0
+        self.speed = 1.0
+        self.update(kw)
+
+    def update(self, kw: dict) -> dict:
+        for k, v in kw.items():
+            if k not in self.FIELDS:
+                raise ApiError(400, 400, f"unknown field {k!r}")
+            setattr(self, k, float(v))
+        return self.as_dict()
+
+    def as_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.FIELDS}
+
+class MockExchange:
+    """Состояние «биржи» в памяти; все методы потокобезопасны."""
+    def __init__(self, pairs: List[str], paths: Dict[str, PricePath], usd: float = 1000.0, base_qty: float = 0.0,
+                 faults: Optional[Faults] = None, history_min: int = 1440, seed: Optional[int] = None):
+        self.lock = threading.RLock()
+        self.faults = faults or Faults()
+        self.rng = random.Random(seed)
+        self.paths = paths
+        self.pairs = [p.upper() for p in pairs]
+        self.balances: Dict[str, List[float]] = {}       # asset -> [free, locked]
+        self.orders: "OrderedDict[str, dict]" = OrderedDict()
+        self.open: Dict[str, Dict[str, dict]] = {p: {} for p in self.pairs}
+        self.trades: Dict[str, List[dict]] = {p: [] for p in self.pairs}
+        self.candles: Dict[str, "OrderedDict[int, list]"] = {p: OrderedDict() for p in self.pairs}
+        self.last: Dict[str, float] = {}
+        self.seq = self.trade_seq = 0
+        self.stats = Counter()
+        self.calls = Counter()
+        self.started = time.time()
+        self._rl_window, self._rl_count = 0, 0
+        for p in self.pairs:
+            base, quote = split_symbol(p)
+            self.balances.setdefault(quote, [0.0, 0.0])[0] = float(usd)
+            self.balances.setdefault(base, [0.0, 0.0])[0] = float(base_qty)
+            self._prefill(p, history_min)
+
+    def _prefill(self, sym: str, minutes: int) -> None:
+        now_m = int(time.time()) // 60 * 60
+        path = self.paths[sym]
+        for t in range(now_m - minutes * 60, now_m, 60):
+            o = path.price
+            hi = lo = o
+            for _ in range(4):
+                px = path.step(15.0)
+                hi, lo = max(hi, px), min(lo, px)
+            self.candles[sym][t] = [o, hi, lo, path.price, self.rng.uniform(1000, 5000)]
+        self.last[sym] = path.price
+
+    # ---------- рынок ----------
+    def tick(self, wall_dt: float) -> Dict[str, dict]:
+        """Сдвинуть цены на wall_dt·speed, обновить минутку, исполнить пересечённые ордера."""
+        out = {}
+        with self.lock:
+            now = time.time()
+            t_min = int(now) // 60 * 60
+            for sym in self.pairs:
+                px = self.paths[sym].step(wall_dt * self.faults.speed)
+                self.last[sym] = px
+                c = self.candles[sym]
+                closed = None
+                if t_min not in c:
+                    if c:
+                        lt = next(reversed(c))
+                        closed = (lt, c[lt])
+                    c[t_min] = [px, px, px, px, 0.0]
+                    while len(c) > MAX_CANDLES:
+                        c.popitem(last=False)
+                bar = c[t_min]
+                bar[1], bar[2], bar[3] = max(bar[1], px), min(bar[2], px), px
+                q = round(self.rng.uniform(10, 500), 2)
+                bar[4] += q
+                fills = self._match(sym, px)
+                out[sym] = {"price": px, "deal": (px, q, 1 if self.rng.random() < 0.5 else 2, _now_ms()),
+                            "closed": closed, "fills": fills}
+        return out
+
+    def _fill(self, o: dict, qty: float, price: float, maker: bool) -> dict:
+        base, quote = split_symbol(o["symbol"])
+        fee = price * qty * (MAKER_FEE_PCT if maker else TAKER_FEE_PCT) / 100.0
+        bq, bb = self.balances.setdefault(quote, [0.0, 0.0]), self.balances.setdefault(base, [0.0, 0.0])
+        if o["side"] == "BUY":
+            bq[1] -= o["price"] * qty
+            bq[0] += (o["price"] - price) * qty - fee
+            bb[0] += qty
+        else:
+            bb[1] -= qty
+            bq[0] += price * qty - fee
+        o["executedQty"] = round(o["executedQty"] + qty, 9)
+        o["updateTime"] = _now_ms()
+        done = o["executedQty"] >= o["origQty"] - 1e-12
+        o["status"] = "FILLED" if done else "PARTIALLY_FILLED"
+        if done:
+            self.open[o["symbol"]].pop(o["orderId"], None)
+        self.trade_seq += 1
+        tr = {"symbol": o["symbol"], "id": f"MT{self.trade_seq}", "orderId": o["orderId"], "price": price, "qty": qty,
+              "commission": fee, "commissionAsset": quote, "time": o["updateTime"], "isBuyer": o["side"] == "BUY",
+              "isMaker": maker}
+        self.trades[o["symbol"]].append(tr)
+        self.stats["fills"] += 1
+        self.stats["partial_fills"] += not done
+        return tr
+
+    def _match(self, sym: str, px: float) -> list:
+        fills = []
+        for o in list(self.open[sym].values()):
+            if (o["side"] == "BUY" and px <= o["price"]) or (o["side"] == "SELL" and px >= o["price"]):
+                rem = o["origQty"] - o["executedQty"]
+                if self.rng.random() < self.faults.partial:
+                    part = math.floor(rem * self.rng.uniform(0.2, 0.8) * 1e6) / 1e6
+                    rem = part if part > 0 else rem
+                fills.append(self._fill(o, rem, o["price"], True))
+        return fills
+
+    def jump(self, sym: str, price: float) -> list:
+        with self.lock:
+            self.paths[sym].jump(price)
+            self.last[sym] = float(price)
+            return self._match(sym, float(price))
+
+    # ---------- сбои ----------
+    def before_request(self) -> None:
+        f = self.faults
+        if f.latency_ms or f.jitter_ms:
+            time.sleep(max(0.0, f.latency_ms + self.rng.uniform(-f.jitter_ms, f.jitter_ms)) / 1000.0)
+        if f.rate_limit:
+            with self.lock:
+                sec = int(time.time())
+                if sec != self._rl_window:
+                    self._rl_window, self._rl_count = sec, 0
+                self._rl_count += 1
+                over = self._rl_count > f.rate_limit
+            if over:
+                self.stats["rate_limited"] += 1
+                raise ApiError(429, 429, "Too Many Requests")
+        r = self.rng.random()
+        if r < f.p429:
+            self.stats["injected_429"] += 1
+            raise ApiError(429, 429, "Too Many Requests (injected)")
+        if r < f.p429 + f.p5xx:
+            self.stats["injected_5xx"] += 1
+            raise ApiError(503, 503, "Service Unavailable (injected)")
+
+    # ---------- REST ----------
+    def _sym(self, q: dict) -> str:
+        sym = str(q.get("symbol") or "").upper()
+        if sym not in self.open:
+            raise ApiError(400, -1121, "Invalid symbol.")
+        return sym
+
+    def ticker_price(self, q):
+        sym = self._sym(q)
+        return {"symbol": sym, "price": _fmt_num(self.last[sym])}
+
+    def klines(self, q):
+        sym = self._sym(q)
+        limit = max(1, min(1000, int(q.get("limit") or 500)))
+        a, b = q.get("startTime"), q.get("endTime")
+        cur = int(time.time()) // 60 * 60
+        with self.lock:
+            rows = [(t, bar) for t, bar in self.candles[sym].items() if t < cur]
+        if a is not None:
+            rows = [r for r in rows if r[0] * 1000 >= int(a)]
+        if b is not None:
+            rows = [r for r in rows if r[0] * 1000 <= int(b)]
+        rows = rows[:limit] if a is not None else rows[-limit:]
+        return [[t * 1000, _fmt_num(o), _fmt_num(h), _fmt_num(l), _fmt_num(c), _fmt_num(v), t * 1000 + 59_999,
+                 _fmt_num(v * c)] for t, (o, h, l, c, v) in rows]
+
+    def exchange_info(self, q):
+        syms = [str(q["symbol"]).upper()] if q.get("symbol") else self.pairs
+        return {"timezone": "CST", "serverTime": _now_ms(),
+                "symbols": [{"symbol": s, "status": "1", "baseAsset": split_symbol(s)[0], "quoteAsset": split_symbol(s)[1],
+                             "baseAssetPrecision": 6, "quotePrecision": 6, "orderTypes": ["LIMIT"],
+                             "isSpotTradingAllowed": True} for s in syms if s in self.open]}
+
+    def account(self, q):
+        with self.lock:
+            return {"canTrade": True, "accountType": "SPOT", "updateTime": _now_ms(),
+                    "balances": [{"asset": a, "free": _fmt_num(max(0.0, f)), "locked": _fmt_num(max(0.0, l))}
+                                 for a, (f, l) in sorted(self.balances.items())]}
+
+    @staticmethod
+    def _order_out(o: dict) -> dict:
+        return dict(o, price=_fmt_num(o["price"]), origQty=_fmt_num(o["origQty"]),
+                    executedQty=_fmt_num(o["executedQty"]), cummulativeQuoteQty=_fmt_num(o["executedQty"] * o["price"]),
+                    isWorking=o["status"] in ("NEW", "PARTIALLY_FILLED"))
+
+    def open_orders(self, q):
+        sym = self._sym(q)
+        with self.lock:
+            rows = [self._order_out(o) for o in self.open[sym].values()]
+        return rows[: int(q["limit"])] if q.get("limit") else rows
+
+    def my_trades(self, q):
+        sym = self._sym(q)
+        a, b = int(q.get("startTime") or 0), int(q.get("endTime") or 0)
+        limit = max(1, min(1000, int(q.get("limit") or 1000)))
+        with self.lock:
+            rows = [t for t in self.trades[sym] if t["time"] >= a and (not b or t["time"] <= b)]
+        return [dict(t, price=_fmt_num(t["price"]), qty=_fmt_num(t["qty"]), quoteQty=_fmt_num(t["price"] * t["qty"]),
+                     commission=_fmt_num(t["commission"]), isBestMatch=True) for t in rows[:limit]]
+
+    def all_orders(self, q):
+        sym = self._sym(q)
+        a, b = int(q.get("startTime") or 0), int(q.get("endTime") or 0)
+        limit = max(1, min(1000, int(q.get("limit") or 500)))
+        with self.lock:
+            rows = [self._order_out(o) for o in self.orders.values()
+                    if o["symbol"] == sym and o["time"] >= a and (not b or o["time"] <= b)]
+        return rows[:limit]
+
+    def query_order(self, q):
+        sym = self._sym(q)
+        with self.lock:
+            o = self.orders.get(str(q.get("orderId")))
+            if o is None or o["symbol"] != sym:
+                raise ApiError(400, -2013, "Order does not exist")
+            return self._order_out(o)
+
+    def place_order(self, q):
+        sym = self._sym(q)
+        side = str(q.get("side") or "").upper()
+        try:
+            price, qty = float(q.get("price")), float(q.get("quantity"))
+        except (TypeError, ValueError):
+            raise ApiError(400, 700004, "invalid price/quantity")
+        if side not in ("BUY", "SELL") or price <= 0 or qty <= 0:
+            raise ApiError(400, 700004, "invalid price/quantity")
+        base, quote = split_symbol(sym)
+        with self.lock:
+            if side == "BUY":
+                b = self.balances.setdefault(quote, [0.0, 0.0])
+                if b[0] + 1e-9 < price * qty:
+                    raise ApiError(400, 30004, "Insufficient position")
+                b[0] -= price * qty; b[1] += price * qty
+            else:
+                b = self.balances.setdefault(base, [0.0, 0.0])
+                if b[0] + 1e-9 < qty:
+                    raise ApiError(400, 30005, "Oversold")
+                b[0] -= qty; b[1] += qty
+            self.seq += 1
+            now = _now_ms()
+            o = {"symbol": sym, "orderId": f"M{self.seq}", "clientOrderId": q.get("newClientOrderId"),
+                 "price": price, "origQty": qty, "executedQty": 0.0, "status": "NEW", "timeInForce": "GTC",
+                 "type": "LIMIT", "side": side, "time": now, "updateTime": now}
+            self.orders[o["orderId"]] = o
+            self.open[sym][o["orderId"]] = o
+            self.stats["orders_placed"] += 1
+            last = self.last[sym]
+            if (side == "BUY" and price >= last) or (side == "SELL" and price <= last):
+                self._fill(o, qty, last, False)          # маркетабельная — сразу тейкером
+            return {"symbol": sym, "orderId": o["orderId"], "clientOrderId": o["clientOrderId"], "orderListId": -1,
+                    "price": _fmt_num(price), "origQty": _fmt_num(qty), "type": "LIMIT", "side": side,
+                    "transactTime": now}
+
+    def _cancel(self, o: dict) -> dict:
+        base, quote = split_symbol(o["symbol"])
+        rem = o["origQty"] - o["executedQty"]
+        if o["side"] == "BUY":
+            b = self.balances[quote]; b[0] += o["price"] * rem; b[1] -= o["price"] * rem
+        else:
+            b = self.balances[base]; b[0] += rem; b[1] -= rem
+        o["status"], o["updateTime"] = "CANCELED", _now_ms()
+        self.open[o["symbol"]].pop(o["orderId"], None)
+        self.stats["orders_canceled"] += 1
+        return self._order_out(o)
+
+    def cancel_order(self, q):
+        sym = self._sym(q)
+        with self.lock:
+            o = self.open[sym].get(str(q.get("orderId")))
+            if o is None:
+                raise ApiError(400, -2011, "Unknown order id")
+            return self._cancel(o)
+
+    def cancel_open_orders(self, q):
+        sym = self._sym(q)
+        with self.lock:
+            return [self._cancel(o) for o in list(self.open[sym].values())]
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"uptime": round(time.time() - self.started, 1), "calls": dict(self.calls),
+                    "stats": dict(self.stats), "open": {s: len(v) for s, v in self.open.items()},
+                    "orders": len(self.orders), "trades": sum(len(v) for v in self.trades.values()),
+                    "last": dict(self.last), "faults": self.faults.as_dict()}
+
+ROUTES = {
+    ("GET", "/api/v3/ping"):         lambda ex, q: {},
+    ("GET", "/api/v3/time"):         lambda ex, q: {"serverTime": _now_ms()},
+    ("GET", "/api/v3/ticker/price"): MockExchange.ticker_price,
+    ("GET", "/api/v3/klines"):       MockExchange.klines,
+    ("GET", "/api/v3/exchangeInfo"): MockExchange.exchange_info,
+    ("GET", "/api/v3/account"):      MockExchange.account,
+    ("GET", "/api/v3/openOrders"):   MockExchange.open_orders,
+    ("GET", "/api/v3/myTrades"):     MockExchange.my_trades,
+    ("GET", "/api/v3/allOrders"):    MockExchange.all_orders,
+    ("GET", "/api/v3/order"):        MockExchange.query_order,
+    ("POST", "/api/v3/order"):       MockExchange.place_order,
+    ("DELETE", "/api/v3/order"):     MockExchange.cancel_order,
+    ("DELETE", "/api/v3/openOrders"): MockExchange.cancel_open_orders,
+}
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"          # keep-alive, как у requests.Session
+
+    def log_message(self, *args):
+        pass
+
+    def _reply(self, status: int, body) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method: str) -> None:
+        ex: MockExchange = self.server.exchange
+        u = urlsplit(self.path)
+        q = {k: v[-1] for k, v in parse_qs(u.query).items()}
+        n = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(n) if n else b""
+        try:
+            if u.path.startswith("/mock/"):
+                return self._reply(200, self._control(ex, method, u.path, raw))
+            fn = ROUTES.get((method, u.path))
+            with ex.lock:
+                ex.calls[f"{method} {u.path}"] += 1
+            if fn is None:
+                raise ApiError(404, 404, f"no route {method} {u.path}")
+            ex.before_request()
+            self._reply(200, fn(ex, q))
+        except ApiError as e:
+            with ex.lock:
+                ex.calls[f"{method} {u.path} {e.status}"] += 1
+            self._reply(e.status, {"code": e.code, "msg": e.msg})
+
+    @staticmethod
+    def _control(ex: MockExchange, method: str, path: str, raw: bytes):
+        body = json.loads(raw or b"{}")
+        if path == "/mock/stats":
+            return ex.snapshot()
+        if path == "/mock/config" and method == "POST":
+            with ex.lock:
+                return ex.faults.update(body)
+        if path == "/mock/price" and method == "POST":
+            sym = str(body.get("symbol") or ex.pairs[0]).upper()
+            if sym not in ex.paths:
+                raise ApiError(400, -1121, "Invalid symbol.")
+            return {"symbol": sym, "fills": len(ex.jump(sym, float(body["price"])))}
+        raise ApiError(404, 404, f"no route {method} {path}")
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_DELETE(self):
+        self._handle("DELETE")
+
+# ---------------- WS ----------------
+class WsHub:
+    """Подписки и рассылка protobuf-пушей; работает в своём asyncio-цикле."""
+    def __init__(self, ex: MockExchange):
+        self.ex = ex
+        self.clients: Dict[object, set] = {}
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    async def handler(self, ws):
+        subs: set = set()
+        self.clients[ws] = subs
+        self.ex.stats["ws_connects"] += 1
+        try:
+            async for msg in ws:
+                try:
+                    req = json.loads(msg)
+                except (TypeError, ValueError):
+                    continue
+                m = str(req.get("method", "")).upper()
+                if m == "PING":
+                    await ws.send(json.dumps({"id": req.get("id", 0), "code": 0, "msg": "PONG"}))
+                elif m == "PONG":
+                    continue
+                elif m in ("SUBSCRIPTION", "UNSUBSCRIPTION"):
+                    params = [str(p) for p in req.get("params") or []]
+                    (subs.update if m == "SUBSCRIPTION" else subs.difference_update)(params)
+                    await ws.send(json.dumps({"id": req.get("id", 0), "code": 0, "msg": ",".join(params)}))
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self.clients.pop(ws, None)
+
+    def publish(self, channel: str, frame: bytes) -> None:
+        """Из любого потока."""
+        if self.loop is not None and self.clients:
+            self.loop.call_soon_threadsafe(self._send, channel, frame)
+
+    def _send(self, channel: str, frame: bytes) -> None:
+        for ws, subs in list(self.clients.items()):
+            if channel in subs:
+                self.ex.stats["ws_frames"] += 1
+                asyncio.ensure_future(self._safe_send(ws, frame))
+
+    @staticmethod
+    async def _safe_send(ws, frame):
+        try:
+            await ws.send(frame)
+        except websockets.ConnectionClosed:
+            pass
+
+    def drop_all(self) -> None:
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(lambda: [asyncio.ensure_future(ws.close(1001, "mock drop"))
+                                                    for ws in list(self.clients)])
+
+# ---------------- сервер ----------------
+class MockServer:
+    """REST + WS + тик рынка в фоновых потоках. start() -> (api_url, ws_url); stop()."""
+    def __init__(self, ex: MockExchange, host: str = "127.0.0.1", http_port: int = 0, ws_port: int = 0):
+        self.ex, self.host = ex, host
+        self.http = ThreadingHTTPServer((host, http_port), _Handler)
+        self.http.daemon_threads = True
+        self.http.exchange = ex
+        self.hub = WsHub(ex)
+        self.ws_port = ws_port
+        self._stop = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self._ws_ready = threading.Event()
+
+    @property
+    def api_url(self) -> str:
+        return f"http://{self.host}:{self.http.server_address[1]}"
+
+    @property
+    def ws_url(self) -> str:
+        return f"ws://{self.host}:{self.ws_port}/ws"
+
+    def _ws_thread(self) -> None:
+        async def main():
+            self.hub.loop = asyncio.get_running_loop()
+            async with websockets.serve(self.hub.handler, self.host, self.ws_port) as srv:
+                self.ws_port = srv.sockets[0].getsockname()[1]
+                self._ws_ready.set()
+                while not self._stop.is_set():
+                    await asyncio.sleep(0.1)
+        asyncio.run(main())
+
+    def _market_thread(self) -> None:
+        prev, last_drop = time.monotonic(), time.monotonic()
+        while not self._stop.wait(TICK_SEC):
+            now = time.monotonic()
+            for sym, ev in self.ex.tick(now - prev).items():
+                px = ev["price"]
+                self.hub.publish(f"spot@public.aggre.deals.v3.api.pb@100ms@{sym}", pb_deals(sym, [ev["deal"]]))
+                self.hub.publish(f"spot@public.aggre.bookTicker.v3.api.pb@100ms@{sym}",
+                                 pb_book(sym, px * 0.9995, 1000.0, px * 1.0005, 1000.0))
+                if ev["closed"]:
+                    t, (o, h, l, c, v) = ev["closed"]
+                    self.hub.publish(f"spot@public.kline.v3.api.pb@{sym}@Min1", pb_kline(sym, t, o, h, l, c, v))
+            prev = now
+            drop = self.ex.faults.ws_drop_sec
+            if drop and now - last_drop >= drop:
+                last_drop = now
+                self.ex.stats["ws_drops"] += 1
+                self.hub.drop_all()
+
+    def start(self):
+        for fn in (self.http.serve_forever, self._ws_thread, self._market_thread):
+            t = threading.Thread(target=fn, daemon=True)
+            t.start()
+            self._threads.append(t)
+        if not self._ws_ready.wait(10):
+            raise RuntimeError("mock WS did not start")
+        return self.api_url, self.ws_url
+
+    def stop(self) -> None:
+        self._stop.set()
+        self.http.shutdown()
+        self.http.server_close()
+        for t in self._threads:
+            t.join(timeout=5)
+
+# ---------------- отчёт ----------------
+def _db_size(path: str) -> int:
+    return sum(os.path.getsize(p) for p in (path, path + "-wal") if os.path.exists(p))
+
+class Reporter:
+    """Снимки нагрузки: запросов/с, ордера, сделки, WS-кадры, рост наблюдаемых БД."""
+    def __init__(self, ex: MockExchange, watch: List[str] = (), out: Optional[str] = None):
+        self.ex, self.watch, self.out = ex, list(watch), out
+        self.prev_calls, self.prev_t = 0, time.monotonic()
+        self.sizes0 = {p: _db_size(p) for p in self.watch}
+
+    def report(self) -> dict:
+        snap = self.ex.snapshot()
+        now = time.monotonic()
+        calls = sum(v for k, v in snap["calls"].items() if k.count(" ") == 1)
+        snap["rps"] = round((calls - self.prev_calls) / max(now - self.prev_t, 1e-9), 2)
+        self.prev_calls, self.prev_t = calls, now
+        snap["db"] = {p: {"bytes": _db_size(p), "growth": _db_size(p) - self.sizes0[p]} for p in self.watch}
+        st = snap["stats"]
+        line = (f"[mock] up={snap['uptime']:.0f}s calls={calls} rps={snap['rps']} orders={snap['orders']} "
+                f"open={sum(snap['open'].values())} fills={st.get('fills', 0)} (partial {st.get('partial_fills', 0)}) "
+                f"429={st.get('injected_429', 0) + st.get('rate_limited', 0)} 5xx={st.get('injected_5xx', 0)} "
+                f"ws={st.get('ws_connects', 0)}/{st.get('ws_frames', 0)}")
+        for p, d in snap["db"].items():
+            line += f" {os.path.basename(p)}={d['bytes'] / 1e6:.1f}MB(+{d['growth'] / 1e6:.1f})"
+        print(line, flush=True)
+        if self.out:
+            with open(self.out, "a") as f:
+                f.write(json.dumps(dict(snap, ts=int(time.time()))) + "\n")
+        return snap
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Локальный мок MEXC (REST + WS) для нагрузочных прогонов")
+    ap.add_argument("--pair", action="append", help="символ (можно несколько; по умолчанию config.PAIR)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--http-port", type=int, default=18080)
+    ap.add_argument("--ws-port", type=int, default=18081)
+    ap.add_argument("--usd", type=float, default=1000.0, help="стартовый баланс котируемой валюты")
+    ap.add_argument("--base", type=float, default=0.0, help="стартовый баланс базовой валюты")
+    ap.add_argument("--path", choices=("walk", "sine", "replay"), default="walk")
+    ap.add_argument("--price", type=float, default=0.09, help="стартовая цена (walk/sine)")
+    ap.add_argument("--vol", type=float, default=0.002, help="σ цены за минуту пути")
+    ap.add_argument("--amp", type=float, default=0.03, help="амплитуда sine, доля")
+    ap.add_argument("--period-min", type=float, default=360, help="период sine, минут пути")
+    ap.add_argument("--replay-db", help="БД с minmax для --path replay")
+    ap.add_argument("--history-min", type=int, default=1440, help="минуток истории для klines на старте")
+    ap.add_argument("--seed", type=int)
+    for k, d, h in (("speed", 1.0, "секунд пути за секунду стены"), ("latency-ms", 0.0, "задержка ответа"),
+                    ("jitter-ms", 0.0, "разброс задержки ±"), ("p429", 0.0, "доля ответов 429"),
+                    ("p5xx", 0.0, "доля ответов 503"), ("rate-limit", 0.0, "запросов в секунду, сверх — 429"),
+                    ("partial", 0.0, "доля частичных исполнений"), ("ws-drop-sec", 0.0, "рвать все WS раз в N сек")):
+        ap.add_argument(f"--{k}", type=float, default=d, help=h)
+    ap.add_argument("--report-every", type=float, default=60.0)
+    ap.add_argument("--watch-db", action="append", default=[], help="БД, рост которой показывать")
+    ap.add_argument("--stats-out", help="JSON-строки снимков статистики")
+    args = ap.parse_args(argv)
+
+    pairs = [p.upper() for p in (args.pair or [PAIR])]
+    if any(split_symbol(p) is None for p in pairs):
+        ap.error(f"unknown quote asset in {pairs}")
+    paths = {}
+    for i, p in enumerate(pairs):
+        seed = None if args.seed is None else args.seed + i
+        replay = load_replay(args.replay_db, p) if args.path == "replay" else None
+        if args.path == "replay" and not replay:
+            ap.error(f"{p}: no candles in {args.replay_db}")
+        paths[p] = PricePath(args.path, args.price, args.vol, args.amp, args.period_min * 60, replay, seed)
+    faults = Faults(speed=args.speed, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, p429=args.p429,
+                    p5xx=args.p5xx, rate_limit=args.rate_limit, partial=args.partial, ws_drop_sec=args.ws_drop_sec)
+    ex = MockExchange(pairs, paths, usd=args.usd, base_qty=args.base, faults=faults, history_min=args.history_min,
+                      seed=args.seed)
+    srv = MockServer(ex, args.host, args.http_port, args.ws_port)
+    api, ws = srv.start()
+    print(f'MEXC_API_URL  = "{api}"\nMEXC_HTTP_URL = "{api}/api/v3/klines"\nMEXC_WS_URL   = "{ws}"', flush=True)
+
+    stop = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    rep = Reporter(ex, args.watch_db, args.stats_out)
+    while not stop.wait(args.report_every):
+        rep.report()
+    rep.report()
+    srv.stop()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
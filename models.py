@@ -1,6 +1,8 @@
 from sqlalchemy import Column, String, Float, Integer, create_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 from config import DB_PATH
+import metrics
+import tracing
 
 Base = declarative_base()
 
@@ -24,6 +26,15 @@ class Range24h(Base):
 
 engine = create_engine(f"sqlite:///{DB_PATH}", echo=False, future=True)
 SessionLocal = sessionmaker(bind=engine)
+metrics.instrument_engine(engine, "market")
+tracing.instrument_engine(engine, "market")
 
 def init_db():
     Base.metadata.create_all(bind=engine)
+    # агрегаты 5m..1d и триггеры, которые их ведут (rollups.py)
+    import rollups
+    raw = engine.raw_connection()
+    try:
+        rollups.ensure(raw)
+    finally:
+        raw.close()
@@ -1,9 +1,11 @@
 # models_trading.py — trading DB models (SQLite + SQLAlchemy)
-from sqlalchemy import create_engine, Column, String, Float, Integer, Boolean
+from sqlalchemy import create_engine, Column, String, Float, Integer, Boolean, Index
 from sqlalchemy.orm import sessionmaker, declarative_base
 from contextlib import contextmanager
 from typing import List
 from config import DB_PATH
+import metrics
+import tracing
 
 Base = declarative_base()
 
@@ -21,6 +23,7 @@ class Order(Base):
     paper      = Column(Boolean, default=True, nullable=False)
     reserved   = Column(Float, default=0.0, nullable=False)  # USD reserved for BUY
     mode       = Column(String, default="", nullable=False)  # "", "GRID", "ABOVE"
+    quote_qty  = Column(Float, default=0.0, server_default="0", nullable=False)  # cummulativeQuoteQty из истории биржи (order_history.py)
 
 class Fill(Base):
     __tablename__ = "fills"
@@ -49,6 +52,55 @@ class Capital(Base):
     realized_pnl = Column(Float, default=0.0, nullable=False)
     updated      = Column(Integer, default=0, nullable=False)
 
+class PnlLedger(Base):
+    """Реализованный PnL по каждому fill (avg-cost), в порядке (ts, fill_id)."""
+    __tablename__ = "pnl_ledger"
+    fill_id      = Column(String, primary_key=True)
+    pair         = Column(String, nullable=False)
+    ts           = Column(Integer, nullable=False)
+    side         = Column(String, nullable=False)
+    qty          = Column(Float, nullable=False)
+    price        = Column(Float, nullable=False)
+    fee          = Column(Float, default=0.0, nullable=False)
+    realized     = Column(Float, default=0.0, nullable=False)  # PnL этого fill (ненулевой только у SELL)
+    realized_cum = Column(Float, default=0.0, nullable=False)  # нарастающий итог по паре
+    pos_qty      = Column(Float, default=0.0, nullable=False)  # позиция после fill
+    pos_cost     = Column(Float, default=0.0, nullable=False)
+    __table_args__ = (Index("ix_pnl_ledger_pair_ts", "pair", "ts", "fill_id"),)
+
+class OrderIntent(Base):
+    """Журнал намерений: строка пишется до отправки ордера и снимается вместе с записью результата (intents.py)."""
+    __tablename__ = "order_intents"
+    client_id = Column(String, primary_key=True)       # newClientOrderId
+    pair      = Column(String, index=True, nullable=False)
+    side      = Column(String, nullable=False)
+    price     = Column(Float, nullable=False)
+    qty       = Column(Float, nullable=False)
+    reserved  = Column(Float, default=0.0, nullable=False)
+    mode      = Column(String, default="", nullable=False)
+    paper     = Column(Boolean, default=True, nullable=False)
+    status    = Column(String, default="PENDING", nullable=False)  # PENDING / LOST
+    error     = Column(String, default="", nullable=False)
+    created   = Column(Integer, default=0, nullable=False)
+    updated   = Column(Integer, default=0, nullable=False)
+
+class TradeCursor(Base):
+    """Докуда импортированы myTrades пары (trade_import.py): всё раньше last_time уже в fills."""
+    __tablename__ = "trade_cursors"
+    pair      = Column(String, primary_key=True)
+    last_time = Column(Integer, default=0, nullable=False)   # ms, граница импортированного окна
+    last_id   = Column(String, default="", nullable=False)   # последняя вставленная сделка
+    updated   = Column(Integer, default=0, nullable=False)
+
+class VanishedOrder(Base):
+    """Ордер пропал из openOrders — ждёт финального статуса из allOrders (order_history.py)."""
+    __tablename__ = "vanished_orders"
+    order_id = Column(String, primary_key=True)
+    pair     = Column(String, index=True, nullable=False)
+    created  = Column(Integer, default=0, index=True, nullable=False)   # ms, создание ордера (окно allOrders)
+    seen     = Column(Integer, default=0, nullable=False)               # когда заметили пропажу
+    attempts = Column(Integer, default=0, nullable=False)               # неудачных запросов по id
+
 # --- engine / session ---
 _engine = create_engine(
     f"sqlite:////opt/Ebot/{DB_PATH}" if "/" not in DB_PATH else f"sqlite:///{DB_PATH}",
@@ -56,6 +108,8 @@ _engine = create_engine(
     pool_pre_ping=True,
 )
 SessionT = sessionmaker(bind=_engine, autocommit=False, autoflush=False)
+metrics.instrument_engine(_engine, "trading")
+tracing.instrument_engine(_engine, "trading")
 
 # --- helpers ---
 def _colnames(conn, table: str) -> List[str]:
@@ -80,11 +134,12 @@ def init_trading_db():
         conn.close()
 
     with _engine.begin() as conn2:
-        # orders: reserved, mode, paper, updated
+        # orders: reserved, mode, paper, updated, quote_qty
         _ensure_column(conn2, "orders", "reserved", "REAL NOT NULL DEFAULT 0.0")
         _ensure_column(conn2, "orders", "mode",     "TEXT NOT NULL DEFAULT ''")
         _ensure_column(conn2, "orders", "paper",    "INTEGER NOT NULL DEFAULT 1")
         _ensure_column(conn2, "orders", "updated",  "INTEGER NOT NULL DEFAULT 0")
+        _ensure_column(conn2, "orders", "quote_qty", "REAL NOT NULL DEFAULT 0.0")
         # fills: fee, mode
         _ensure_column(conn2, "fills", "fee",  "REAL NOT NULL DEFAULT 0.0")
         _ensure_column(conn2, "fills", "mode", "TEXT NOT NULL DEFAULT ''")
@@ -93,6 +148,16 @@ def init_trading_db():
         # capital: realized_pnl, updated
         _ensure_column(conn2, "capital", "realized_pnl", "REAL NOT NULL DEFAULT 0.0")
         _ensure_column(conn2, "capital", "updated",      "INTEGER NOT NULL DEFAULT 0")
+    # сводка открытых ордеров по стороне (order_stats.py) и дневной свод fills (fills_daily.py)
+    # с триггерами, которые их ведут
+    import order_stats
+    import fills_daily
+    raw = _engine.raw_connection()
+    try:
+        order_stats.ensure(raw)
+        fills_daily.ensure(raw)
+    finally:
+        raw.close()
 
 # optional: context manager if нужно быстро открыть/закрыть сессию
 @contextmanager
@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Финальный статус ордеров, пропавших из openOrders (allOrders вместо догадки).
+
+sync.sync_open_orders кладёт пропавшие ордера в очередь vanished_orders (статус по
+filled_qty ставится как предварительный). resolve() читает allOrders только по тем
+интервалам времени создания, где лежат ордера очереди (±ORDER_TIME_PAD_SEC, соседние
+склеены в куски не длиннее ALLORDERS_MAX_SPAN_SEC, полная страница — дочитываем её
+кромки, как trade_import). Очередь и есть курсор: самый старый неразобранный ордер — откуда читать
+историю; разобранные уходят из неё. Кого не нашли в истории — GET /api/v3/order, не больше
+ORDER_LOOKUP_MAX за прогон. status/executedQty/cummulativeQuoteQty пишутся одним bulk
+UPDATE и одним commit вместе с чисткой очереди.
+
+  python3 order_history.py                  # разобрать очередь всех PAIRS
+  python3 order_history.py --status
+"""
+import sys
+import time
+import logging
+import argparse
+from typing import Dict, List, NamedTuple, Tuple
+
+from models_trading import Order, VanishedOrder
+from mexc_client import MexcHTTPError
+import metrics
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+ALLORDERS_PAGE_LIMIT     = int(getattr(CFG, "ALLORDERS_PAGE_LIMIT", 1000))
+ALLORDERS_MAX_SPAN_SEC   = int(getattr(CFG, "ALLORDERS_MAX_SPAN_SEC", 86400))
+ALLORDERS_MAX_PAGES      = int(getattr(CFG, "ALLORDERS_MAX_PAGES", 20))
+ORDER_LOOKUP_MAX         = int(getattr(CFG, "ORDER_LOOKUP_MAX", 20))
+ORDER_RESOLVE_BATCH      = int(getattr(CFG, "ORDER_RESOLVE_BATCH", 500))
+ORDER_RESOLVE_MAX_TRIES  = int(getattr(CFG, "ORDER_RESOLVE_MAX_TRIES", 5))
+ORDER_TIME_PAD_SEC       = int(getattr(CFG, "ORDER_TIME_PAD_SEC", 60))
+
+OPEN_STATUSES = ("NEW", "PARTIALLY_FILLED")
+
+log = logging.getLogger("order_history")
+
+_M_REQ = metrics.counter("order_history_requests_total", "allOrders / order-by-id requests", ("pair", "kind"))
+_M_RES = metrics.counter("order_history_resolved_total", "Vanished orders resolved from exchange history",
+                         ("pair", "status"))
+_M_QUEUE = metrics.gauge("order_history_queue", "Vanished orders still waiting for a final status", ("pair",))
+
+class ResolveReport(NamedTuple):
+    pair: str
+    queued: int           # в очереди на старте (в пределах batch)
+    resolved: int         # получили финальный статус
+    reopened: int         # биржа говорит — ещё открыт (openOrders обрезан limit)
+    pages: int            # запросов allOrders
+    lookups: int          # запросов по id
+    dropped: int          # сдались после ORDER_RESOLVE_MAX_TRIES — остаётся догадка
+    left: int             # осталось в очереди
+
+    def summary(self) -> str:
+        return (f"[orders] {self.pair}: queued={self.queued} resolved={self.resolved} reopened={self.reopened} "
+                f"pages={self.pages} lookups={self.lookups} dropped={self.dropped} left={self.left}")
+
+def _to_float(x) -> float:
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return 0.0
+
+def enqueue(sess, orders: List[Order], now: int = None) -> int:
+    """Пропавшие из openOrders -> vanished_orders (merge, без commit)."""
+    now = int(time.time()) if now is None else int(now)
+    for o in orders:
+        sess.merge(VanishedOrder(order_id=o.id, pair=o.pair, created=int(o.created or 0) * 1000, seen=now, attempts=0))
+    return len(orders)
+
+def _windows(times_ms: List[int], pad_ms: int, span_ms: int) -> List[Tuple[int, int]]:
+    """
+    Интервалы [a, b) вокруг времён создания: соседние склеиваются, пока кусок не длиннее
+    span_ms (запросов — по объёму истории, а не по числу ордеров); пустые промежутки пропущены.
+    """
+    out: List[Tuple[int, int]] = []
+    for t in sorted(times_ms):
+        a, b = t - pad_ms, t + pad_ms + 1
+        if out and b - out[-1][0] <= span_ms:
+            out[-1] = (out[-1][0], max(out[-1][1], b))
+        else:
+            out.append((max(a, out[-1][1]) if out else a, b))
+    return out
+
+def _fetch_history(cli, pair: str, want: Dict[str, int], limit: int, span_sec: int, max_pages: int,
+                   pad_ms: int) -> Tuple[Dict[str, dict], int]:
+    """allOrders по окнам вокруг want {order_id: created_ms}; -> (найденные, страниц)."""
+    found: Dict[str, dict] = {}
+
+    def needed(a: int, b: int) -> bool:
+        return any(oid not in found and a < t + pad_ms + 1 and t - pad_ms < b for oid, t in want.items())
+
+    stack = _windows(list(want.values()), pad_ms, max(1, int(span_sec)) * 1000)[::-1]
+    pages = 0
+    while stack and pages < max_pages:
+        a, b = stack.pop()
+        if not needed(a, b):
+            continue
+        rows = cli.all_orders(pair, a, b - 1, limit) or []
+        pages += 1
+        for r in rows:
+            oid = str(r.get("orderId") or "")
+            if oid in want:
+                found[oid] = r
+        if len(rows) >= limit:
+            ts = [int(r.get("time") or a) for r in rows]
+            t0, t1 = max(min(ts), a), min(max(ts), b - 1)
+            if t0 == t1:
+                t1 += 1
+            stack += [(t1, b), (a, t0 + 1)]
+    if pages:
+        _M_REQ.inc(pages, pair=pair, kind="all_orders")
+    return found, pages
+
+def resolve(sess, cli, pair: str, limit: int = ALLORDERS_PAGE_LIMIT, span_sec: int = ALLORDERS_MAX_SPAN_SEC,
+            max_pages: int = ALLORDERS_MAX_PAGES, max_lookups: int = ORDER_LOOKUP_MAX,
+            batch: int = ORDER_RESOLVE_BATCH, max_tries: int = ORDER_RESOLVE_MAX_TRIES,
+            pad_sec: int = ORDER_TIME_PAD_SEC) -> ResolveReport:
+    """Разобрать очередь пары: финальные статусы из истории биржи -> orders (один commit)."""
+    queue = (sess.query(VanishedOrder).filter(VanishedOrder.pair == pair)
+                 .order_by(VanishedOrder.created, VanishedOrder.order_id).limit(int(batch)).all())
+    if not queue:
+        _M_QUEUE.set(0, pair=pair)
+        return ResolveReport(pair, 0, 0, 0, 0, 0, 0, 0)
+    # история уже читалась и по id не нашли — дальше только по id
+    want = {v.order_id: int(v.created or 0) for v in queue if not v.attempts}
+    found, pages = _fetch_history(cli, pair, want, int(limit), span_sec, int(max_pages), int(pad_sec) * 1000)
+
+    # кого нет в истории (время создания не совпало, страницы кончились) — по id, ограниченно
+    lookups = 0
+    failed = set()
+    for v in queue:
+        if v.order_id in found:
+            continue
+        if lookups >= max_lookups:
+            break
+        lookups += 1
+        try:
+            r = cli.query_order(pair, v.order_id)
+        except MexcHTTPError as e:
+            if e.status is None or e.status >= 500:
+                log.warning("order lookup %s %s: %s — stop for this run", pair, v.order_id, e)
+                break
+            r = None
+        if r and str(r.get("orderId") or v.order_id) == v.order_id:
+            found[v.order_id] = r
+        else:
+            failed.add(v.order_id)
+    if lookups:
+        _M_REQ.inc(lookups, pair=pair, kind="order")
+
+    now = int(time.time())
+    updates, reopened = [], 0
+    for oid, r in found.items():
+        status = str(r.get("status") or "").upper()
+        if not status:
+            continue
+        upd = int(r.get("updateTime") or 0) // 1000 or now
+        updates.append({"id": oid, "status": status, "filled_qty": _to_float(r.get("executedQty")),
+                        "quote_qty": _to_float(r.get("cummulativeQuoteQty")), "updated": upd})
+        reopened += status in OPEN_STATUSES
+        _M_RES.inc(pair=pair, status=status)
+    if updates:
+        sess.bulk_update_mappings(Order, updates)
+    done = [u["id"] for u in updates]
+    if done:
+        sess.query(VanishedOrder).filter(VanishedOrder.order_id.in_(done)).delete(synchronize_session=False)
+    dropped = 0
+    for v in queue:
+        if v.order_id in failed:
+            v.attempts = int(v.attempts or 0) + 1
+            if v.attempts >= max_tries:
+                log.warning("order %s %s: no exchange history after %d lookups — keeping local guess",
+                            pair, v.order_id, v.attempts)
+                sess.delete(v)
+                dropped += 1
+    sess.commit()
+    left = sess.query(VanishedOrder).filter(VanishedOrder.pair == pair).count()
+    _M_QUEUE.set(left, pair=pair)
+    return ResolveReport(pair, len(queue), len(updates) - reopened, reopened, pages, lookups, dropped, left)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Финальные статусы пропавших ордеров из allOrders")
+    ap.add_argument("--pair", action="append", help="пара (можно несколько); по умолчанию все PAIRS")
+    ap.add_argument("--status", action="store_true", help="только показать очередь")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    metrics.set_job("order_history")
+
+    from models_trading import SessionT, init_trading_db
+    from mexc_client import get_client
+    if args.pair:
+        pairs = args.pair
+    else:
+        from pairs import load_pairs
+        pairs = [pc.pair for pc in load_pairs()]
+    init_trading_db()
+    sess = SessionT()
+    try:
+        if args.status:
+            for p in pairs:
+                n = sess.query(VanishedOrder).filter(VanishedOrder.pair == p).count()
+                print(f"[orders] {p}: {n} waiting for final status")
+            return 0
+        cli = get_client()
+        left = 0
+        for p in pairs:
+            rep = resolve(sess, cli, p)
+            print(rep.summary())
+            left += rep.left
+    finally:
+        sess.close()
+    metrics.flush()
+    return 1 if left else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сводка ордеров по (pair, side) в таблице order_stats — её ведут триггеры SQLite.
+
+order_stats(pair, side, open_n, open_notional, reserved_usd, total_n, updated):
+открытых (NEW/PARTIALLY_FILLED) штук, Σ price*qty и Σ reserved по открытым, всего строк
+стороны, время последнего изменения. Вставка/удаление/правка orders добавляет дельту
+строки (правка — минус OLD, плюс NEW), поэтому сводку держит любой писатель: ORM,
+sqlite3, ручные правки. Когда открытых не осталось, суммы обнуляются — ошибка
+округления float не копится. Читатели (cons, reports.core) берут одну строку вместо
+COUNT/SUM по orders.
+
+  st = order_stats.get(conn, "KASUSDC")        # {"BUY": Stats(...), "SELL": Stats(...)} или None
+  order_stats.open_count(conn, "KASUSDC", "BUY")
+
+  python3 order_stats.py                  # показать сводку
+  python3 order_stats.py --verify         # сверить с полным проходом по orders (код 1 — расхождение)
+  python3 order_stats.py --rebuild        # пересчитать из orders
+"""
+import sys
+import time
+import sqlite3
+import argparse
+from typing import Dict, List, NamedTuple, Optional
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+DB_PATH = getattr(CFG, "DB_PATH", "ebot.db")
+
+STATUS_OPEN = ("NEW", "PARTIALLY_FILLED")
+SIDES = ("BUY", "SELL")
+_OPEN_SQL = "({}.status IN ('NEW','PARTIALLY_FILLED'))"
+
+class Stats(NamedTuple):
+    open_n: int
+    open_notional: float   # Σ price*qty открытых (резерв BUY в отчёте)
+    reserved_usd: float    # Σ orders.reserved открытых
+    total_n: int           # всех строк стороны, любой статус
+    updated: int
+
+EMPTY = Stats(0, 0.0, 0.0, 0, 0)
+
+def _delta_sql(ref: str, sign: str) -> str:
+    is_open = _OPEN_SQL.format(ref)
+    return (f"INSERT INTO order_stats(pair, side, open_n, open_notional, reserved_usd, total_n, updated) "
+            f"VALUES({ref}.pair, {ref}.side, {sign}{is_open}, {sign}({is_open} * {ref}.price * {ref}.qty), "
+            f"{sign}({is_open} * {ref}.reserved), {sign}1, CAST(strftime('%s','now') AS INTEGER)) "
+            f"ON CONFLICT(pair, side) DO UPDATE SET "
+            f"open_n = open_n + excluded.open_n, "
+            f"open_notional = CASE WHEN open_n + excluded.open_n = 0 THEN 0.0 "
+            f"ELSE open_notional + excluded.open_notional END, "
+            f"reserved_usd = CASE WHEN open_n + excluded.open_n = 0 THEN 0.0 "
+            f"ELSE reserved_usd + excluded.reserved_usd END, "
+            f"total_n = total_n + excluded.total_n, updated = excluded.updated;")
+
+# (событие, тело): UPDATE — только когда меняется то, что входит в сводку
+_TRIGGERS = (
+    ("insert", "AFTER INSERT ON orders", _delta_sql("NEW", "")),
+    ("delete", "AFTER DELETE ON orders", _delta_sql("OLD", "-")),
+    ("update", "AFTER UPDATE OF pair, side, status, price, qty, reserved ON orders",
+     _delta_sql("OLD", "-") + " " + _delta_sql("NEW", "")),
+)
+
+def _exists(conn, name: str) -> bool:
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE name=?", (name,)).fetchone() is not None
+
+def ensure(conn) -> None:
+    """Таблица и триггеры (идемпотентно); новая таблица сразу заполняется из orders."""
+    fresh = not _exists(conn, "order_stats")
+    cur = conn.cursor()
+    cur.execute("CREATE TABLE IF NOT EXISTS order_stats(pair VARCHAR NOT NULL, side VARCHAR NOT NULL, "
+                "open_n INTEGER NOT NULL DEFAULT 0, open_notional FLOAT NOT NULL DEFAULT 0, "
+                "reserved_usd FLOAT NOT NULL DEFAULT 0, total_n INTEGER NOT NULL DEFAULT 0, "
+                "updated INTEGER NOT NULL DEFAULT 0, PRIMARY KEY (pair, side))")
+    for name, when, body in _TRIGGERS:
+        cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_order_stats_{name} {when} BEGIN {body} END")
+    conn.commit()
+    if fresh:
+        rebuild(conn)
+
+_SCAN_SQL = ("SELECT pair, side, SUM(status IN ('NEW','PARTIALLY_FILLED')) AS o, "
+             "SUM((status IN ('NEW','PARTIALLY_FILLED')) * price * qty) AS n, "
+             "SUM((status IN ('NEW','PARTIALLY_FILLED')) * reserved) AS r, COUNT(*) AS t FROM orders")
+
+def rebuild(conn, pair: Optional[str] = None) -> int:
+    """Пересчитать из orders (после сбоя/ручной правки). Возвращает число строк сводки."""
+    if not _exists(conn, "order_stats"):
+        ensure(conn)                         # пустая таблица заполнится в ensure
+        return conn.execute("SELECT COUNT(*) FROM order_stats").fetchone()[0]
+    flt, args = (" WHERE pair = ?", (pair,)) if pair else ("", ())
+    cur = conn.cursor()
+    cur.execute(f"DELETE FROM order_stats{flt}", args)
+    cur.execute(f"INSERT INTO order_stats(pair, side, open_n, open_notional, reserved_usd, total_n, updated) "
+                f"SELECT pair, side, o, n, r, t, ? FROM ({_SCAN_SQL}{flt} GROUP BY pair, side)",
+                (int(time.time()),) + args)
+    conn.commit()
+    return cur.execute(f"SELECT COUNT(*) FROM order_stats{flt}", args).fetchone()[0]
+
+def get(conn, pair: str) -> Optional[Dict[str, Stats]]:
+    """{side: Stats} пары (нет строк — EMPTY); None — таблицы нет (БД не мигрирована)."""
+    try:
+        rows = conn.execute("SELECT side, open_n, open_notional, reserved_usd, total_n, updated "
+                            "FROM order_stats WHERE pair = ?", (pair,)).fetchall()
+    except sqlite3.OperationalError:
+        return None
+    out = {s: EMPTY for s in SIDES}
+    for side, *vals in rows:
+        out[str(side)] = Stats(int(vals[0]), float(vals[1]), float(vals[2]), int(vals[3]), int(vals[4]))
+    return out
+
+def open_count(conn, pair: str, side: str) -> int:
+    """Открытых ордеров стороны: строка сводки, без неё — COUNT по orders."""
+    st = get(conn, pair)
+    if st is not None:
+        return st.get(side.upper(), EMPTY).open_n
+    r = conn.execute(f"SELECT COUNT(*) FROM orders WHERE pair=? AND side=? AND status IN "
+                     f"({','.join('?' * len(STATUS_OPEN))})", (pair, side.upper(), *STATUS_OPEN)).fetchone()
+    return int(r[0] or 0)
+
+def verify(conn, pair: Optional[str] = None, tol: float = 1e-6) -> List[str]:
+    """Сверка с полным проходом по orders; пустой список — всё сходится."""
+    flt, args = (" WHERE pair = ?", (pair,)) if pair else ("", ())
+    scan = {(p, s): (int(o or 0), float(n or 0.0), float(r or 0.0), int(t))
+            for p, s, o, n, r, t in conn.execute(f"{_SCAN_SQL}{flt} GROUP BY pair, side", args).fetchall()}
+    have = {(p, s): (int(o), float(n), float(r), int(t)) for p, s, o, n, r, t in conn.execute(
+        f"SELECT pair, side, open_n, open_notional, reserved_usd, total_n FROM order_stats{flt}", args).fetchall()}
+    out = []
+    for key in sorted(set(scan) | set(have)):
+        exp, got = scan.get(key, (0, 0.0, 0.0, 0)), have.get(key, (0, 0.0, 0.0, 0))
+        if exp[0] != got[0] or exp[3] != got[3] or any(abs(a - b) > tol * max(1.0, abs(a))
+                                                        for a, b in zip(exp[1:3], got[1:3])):
+            out.append(f"{key[0]} {key[1]}: scan open={exp[0]} notional={exp[1]:.6f} reserved={exp[2]:.6f} "
+                       f"total={exp[3]} | stats open={got[0]} notional={got[1]:.6f} reserved={got[2]:.6f} "
+                       f"total={got[3]}")
+    return out
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Сводка ордеров order_stats (триггеры SQLite)")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--pair", default=None, help="только эта пара")
+    ap.add_argument("--verify", action="store_true", help="сверить с полным проходом по orders")
+    ap.add_argument("--rebuild", action="store_true", help="пересчитать из orders")
+    args = ap.parse_args(argv)
+    conn = sqlite3.connect(args.db)
+    try:
+        ensure(conn)
+        if args.rebuild:
+            t0 = time.perf_counter()
+            n = rebuild(conn, args.pair)
+            print(f"[order_stats] rebuilt {n} rows in {time.perf_counter() - t0:.3f}s")
+        if args.verify:
+            bad = verify(conn, args.pair)
+            for line in bad:
+                print(f"[order_stats] MISMATCH {line}")
+            print(f"[order_stats] verify: {'OK' if not bad else f'{len(bad)} mismatches (run --rebuild)'}")
+            return 1 if bad else 0
+        flt, qargs = (" WHERE pair = ?", (args.pair,)) if args.pair else ("", ())
+        for p, s, o, n, r, t, u in conn.execute(
+                f"SELECT pair, side, open_n, open_notional, reserved_usd, total_n, updated FROM order_stats{flt} "
+                f"ORDER BY pair, side", qargs).fetchall():
+            print(f"[order_stats] {p} {s}: open={o} notional=${n:.2f} reserved=${r:.2f} total={t} updated={u}")
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
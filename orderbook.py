@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+"""
+Индекс открытых ордеров в памяти: по стороне — отсортированные квантованные уровни
+цены (bisect), на уровне — ордера. Грузится одним запросом на тик
+(OrderBook.load / OrderBook.from_rows) и дальше обновляется add/remove без БД.
+
+  book = OrderBook.load(sess, PAIR)
+  book.sells.is_taken(p)            # уровень занят? (как round(p, 6) in set)
+  book.sells.nearest(p)             # ближайший занятый уровень: (price, [orders])
+  book.buys.between(lo, hi)         # ордера в диапазоне цен
+  book.buys.far(10)                 # дальние от рынка: BUY — снизу, SELL — сверху
+
+Элемент — всё, у чего есть id/price/qty (models_trading.Order или _Row из from_rows).
+"""
+import bisect
+from typing import Dict, Iterable, List, Optional, Tuple
+
+STATUS_OPEN = ("NEW", "PARTIALLY_FILLED")
+PRICE_TICK = 0.000001  # 6 знаков, как _floor6 / round(p, 6) в buy/sell
+
+def level(price: float) -> int:
+    return int(round(float(price) / PRICE_TICK))
+
+def level_price(lv: int) -> float:
+    return round(lv * PRICE_TICK, 6)
+
+class _Row:
+    """Лёгкая запись ордера для raw sqlite3 (отчёты, скрипты)."""
+    __slots__ = ("id", "side", "price", "qty", "filled_qty", "mode")
+
+    def __init__(self, id, side, price, qty, filled_qty=0.0, mode=""):
+        self.id = str(id); self.side = str(side).upper()
+        self.price = float(price or 0.0); self.qty = float(qty or 0.0)
+        self.filled_qty = float(filled_qty or 0.0); self.mode = mode or ""
+
+def remaining(o) -> float:
+    return max(0.0, float(o.qty or 0.0) - float(getattr(o, "filled_qty", 0.0) or 0.0))
+
+class SideBook:
+    """Одна сторона: отсортированные уровни + ордера на уровне + индекс по id."""
+
+    def __init__(self, side: str):
+        self.side = side
+        self._levels: List[int] = []            # по возрастанию
+        self._at: Dict[int, list] = {}
+        self._by_id: Dict[str, Tuple[int, object]] = {}
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def __iter__(self):
+        """Ордера по возрастанию цены."""
+        for lv in self._levels:
+            yield from self._at[lv]
+
+    def __contains__(self, price) -> bool:
+        # позволяет передавать SideBook туда, где раньше был set округлённых цен
+        return self.is_taken(price)
+
+    def add(self, o) -> None:
+        oid = str(o.id)
+        if oid in self._by_id:
+            self.remove(oid)
+        lv = level(o.price)
+        at = self._at.get(lv)
+        if at is None:
+            bisect.insort(self._levels, lv)
+            at = self._at[lv] = []
+        at.append(o)
+        self._by_id[oid] = (lv, o)
+
+    def remove(self, oid) -> Optional[object]:
+        hit = self._by_id.pop(str(oid), None)
+        if hit is None:
+            return None
+        lv, o = hit
+        at = self._at[lv]
+        at.remove(o)
+        if not at:
+            del self._at[lv]
+            del self._levels[bisect.bisect_left(self._levels, lv)]
+        return o
+
+    def get(self, oid) -> Optional[object]:
+        hit = self._by_id.get(str(oid))
+        return hit[1] if hit else None
+
+    def is_taken(self, price: float) -> bool:
+        return level(price) in self._at
+
+    def at(self, price: float) -> list:
+        return list(self._at.get(level(price), ()))
+
+    def nearest(self, price: float) -> Optional[Tuple[float, list]]:
+        """Ближайший занятый уровень к price: (цена уровня, [ордера]) или None."""
+        if not self._levels:
+            return None
+        lv = level(price)
+        i = bisect.bisect_left(self._levels, lv)
+        best = None
+        for j in (i - 1, i):
+            if 0 <= j < len(self._levels):
+                if best is None or abs(self._levels[j] - lv) < abs(best - lv):
+                    best = self._levels[j]
+        return level_price(best), list(self._at[best])
+
+    def between(self, lo: float, hi: float) -> list:
+        """Ордера с ценой в [lo, hi] (по возрастанию)."""
+        i = bisect.bisect_left(self._levels, level(lo))
+        j = bisect.bisect_right(self._levels, level(hi))
+        return [o for lv in self._levels[i:j] for o in self._at[lv]]
+
+    def far(self, n: Optional[int] = None) -> list:
+        """Дальние от рынка первыми: BUY — самые низкие, SELL — самые высокие."""
+        lvls = self._levels if self.side == "BUY" else reversed(self._levels)
+        out = []
+        for lv in lvls:
+            out.extend(self._at[lv])
+            if n is not None and len(out) >= n:
+                return out[:n]
+        return out
+
+    def best(self) -> Optional[float]:
+        """Ближайший к рынку уровень: верхний BUY / нижний SELL."""
+        if not self._levels:
+            return None
+        return level_price(self._levels[-1] if self.side == "BUY" else self._levels[0])
+
+    def remaining_qty(self) -> float:
+        return sum(remaining(o) for o in self)
+
+    def notional(self) -> float:
+        """Сумма price*qty открытых ордеров (как резерв BUY в отчёте)."""
+        return sum(float(o.price or 0.0) * float(o.qty or 0.0) for o in self)
+
+    def filter(self, pred) -> list:
+        return [o for o in self if pred(o)]
+
+class OrderBook:
+    def __init__(self, orders: Iterable = ()):
+        self.buys = SideBook("BUY")
+        self.sells = SideBook("SELL")
+        for o in orders:
+            self.add(o)
+
+    def side(self, side: str) -> SideBook:
+        return self.buys if str(side).upper() == "BUY" else self.sells
+
+    def add(self, o) -> None:
+        self.side(o.side).add(o)
+
+    def remove(self, oid) -> Optional[object]:
+        return self.buys.remove(oid) or self.sells.remove(oid)
+
+    def __len__(self) -> int:
+        return len(self.buys) + len(self.sells)
+
+    @classmethod
+    def load(cls, sess, pair: str) -> "OrderBook":
+        """Один запрос открытых ордеров пары (SQLAlchemy-сессия models_trading)."""
+        from models_trading import Order
+        return cls(sess.query(Order)
+                       .filter(Order.pair == pair, Order.status.in_(STATUS_OPEN))
+                       .all())
+
+    @classmethod
+    def from_rows(cls, rows: Iterable) -> "OrderBook":
+        """rows: (id, side, price, qty, filled_qty, mode) — из raw sqlite3."""
+        return cls(_Row(*r) for r in rows)
+
+    @classmethod
+    def from_sqlite(cls, conn, pair: str) -> "OrderBook":
+        cur = conn.execute(
+            "SELECT id, side, price, qty, filled_qty, mode FROM orders "
+            "WHERE pair=? AND status IN ('NEW','PARTIALLY_FILLED')", (pair,))
+        return cls.from_rows(cur.fetchall())
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+Список торгуемых пар (config.PAIRS) для мультипарного режима (engine.py, candles.py).
+
+  PAIRS = [
+      {"pair": "KASUSDC", "base": "KAS", "quote": "USDC"},
+      {"pair": "ALPHUSDT", "base": "ALPH", "quote": "USDT", "quote_share": 0.3,
+       "params": {"BUY_SIZE_BELOW_FIXED_USD": 3.0, "SELL_MIN_GAIN": 0.015}},
+  ]
+
+Без PAIRS — одна пара из PAIR / BASE_ASSET / QUOTE_ASSET (как раньше).
+quote_share — доля свободного QUOTE, которую sync пишет в capital.available_usd пары;
+по умолчанию котировка делится поровну между парами с тем же QUOTE.
+params — переопределения параметров стратегии (имена из config, как в backtest --set).
+"""
+import contextlib
+from typing import Dict, List, NamedTuple, Optional
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+class PairConfig(NamedTuple):
+    pair: str
+    base: str
+    quote: str
+    quote_share: float = 1.0
+    params: Dict[str, object] = {}
+
+def _split(symbol: str, quote: str = ""):
+    s = str(symbol).upper()
+    for q in ((quote,) if quote else ()) + ("USDC", "USDT", "USDE", "BTC", "ETH"):
+        if q and s.endswith(q.upper()) and len(s) > len(q):
+            return s[:-len(q)], q.upper()
+    raise ValueError(f"cannot split symbol {symbol!r}: set base/quote explicitly")
+
+def load_pairs(raw: Optional[list] = None) -> List[PairConfig]:
+    """config.PAIRS (список dict или строк-символов) -> [PairConfig]."""
+    if raw is None:
+        raw = getattr(CFG, "PAIRS", None)
+    if not raw:
+        raw = [{"pair": getattr(CFG, "PAIR", "KASUSDC"),
+                "base": getattr(CFG, "BASE_ASSET", ""),
+                "quote": getattr(CFG, "QUOTE_ASSET", "")}]
+    items = []
+    for it in raw:
+        d = {"pair": it} if isinstance(it, str) else dict(it)
+        pair = str(d["pair"]).upper()
+        base, quote = str(d.get("base") or "").upper(), str(d.get("quote") or "").upper()
+        if not (base and quote):
+            b, q = _split(pair, quote)
+            base, quote = base or b, quote or q
+        items.append((pair, base, quote, d.get("quote_share"), dict(d.get("params") or {})))
+
+    seen = set()
+    for pair, *_ in items:
+        if pair in seen:
+            raise ValueError(f"duplicate pair in PAIRS: {pair}")
+        seen.add(pair)
+
+    per_quote: Dict[str, int] = {}
+    for _, _, quote, share, _ in items:
+        if share is None:
+            per_quote[quote] = per_quote.get(quote, 0) + 1
+    out = []
+    for pair, base, quote, share, params in items:
+        if share is None:
+            share = 1.0 / per_quote[quote]
+        out.append(PairConfig(pair, base, quote, max(0.0, min(1.0, float(share))), params))
+    return out
+
+def get_pair(pair: Optional[str] = None, pairs: Optional[List[PairConfig]] = None) -> PairConfig:
+    """Конфиг пары по символу (None — первая/основная пара)."""
+    pairs = load_pairs() if pairs is None else pairs
+    if pair is None:
+        return pairs[0]
+    p = str(pair).upper()
+    for pc in pairs:
+        if pc.pair == p:
+            return pc
+    # пара не из списка (ручной запуск --pair) — без переопределений, весь QUOTE
+    base, quote = _split(p)
+    return PairConfig(p, base, quote)
+
+@contextlib.contextmanager
+def strategy_params(params: Optional[dict]):
+    """Временно подменяет параметры стратегии (имена из config) в модулях buy/sell."""
+    import buy
+    import sell
+    saved = []
+    try:
+        for k, v in (params or {}).items():
+            hit = False
+            for mod in (buy, sell):
+                if hasattr(mod, k):
+                    saved.append((mod, k, getattr(mod, k)))
+                    setattr(mod, k, v)
+                    hit = True
+            if not hit:
+                raise KeyError(f"unknown strategy param: {k}")
+        yield
+    finally:
+        for mod, k, v in reversed(saved):
+            setattr(mod, k, v)
@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Локальная «биржа» для PAPER_TRADE: тот же интерфейс, что у MexcClient
+(price / exchange_info / account / open_orders / my_trades / place_order / cancel_order),
+но балансы, стакан открытых лимиток и сделки живут в SQLite (PAPER_DB_PATH).
+
+Лимитки исполняются целиком по своей цене, когда цена проходит сквозь уровень:
+  - PAPER_PRICE_SOURCE="db"   — закрытые минутки из minmax (их пишет candles.py),
+                                 low/high каждой свечи после постановки ордера;
+  - PAPER_PRICE_SOURCE="rest" — публичный тикер MEXC (ключи не нужны).
+Маркетабельная лимитка (BUY >= last / SELL <= last) исполняется сразу по last как тейкер.
+Комиссия MAKER_FEE_PCT (%) — в котируемой валюте, как её учитывает sync/accounting.
+
+  python3 paper_client.py            # балансы/ордера
+  python3 paper_client.py --reset --usd 1000
+"""
+import os
+import time
+import sqlite3
+import argparse
+import contextlib
+import threading
+from typing import Optional, Tuple
+
+from mexc_client import MexcClient, MexcHTTPError, _M_ORDERS, _fmt_num
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+PAIR          = getattr(CFG, "PAIR", "KASUSDC")
+QUOTE_ASSET   = getattr(CFG, "QUOTE_ASSET", "USDC")
+DB_PATH       = getattr(CFG, "DB_PATH", "ebot.db")
+PAPER_DB_PATH = os.getenv("EBOT_PAPER_DB") or getattr(CFG, "PAPER_DB_PATH", "paper.db")
+PAPER_PRICE_SOURCE = getattr(CFG, "PAPER_PRICE_SOURCE", "db")
+PAPER_START_USD    = float(getattr(CFG, "PAPER_START_USD", getattr(CFG, "START_CAPITAL_USD", 1000.0)))
+PAPER_FILL_ON_TOUCH = bool(getattr(CFG, "PAPER_FILL_ON_TOUCH", False))
+MAKER_FEE_PCT = float(getattr(CFG, "MAKER_FEE_PCT", 0.0))
+TAKER_FEE_PCT = float(getattr(CFG, "TAKER_FEE_PCT", MAKER_FEE_PCT))
+
+_QUOTES = ("USDC", "USDT", "USDE", "BTC", "ETH")
+
+def _abs_db(path: str) -> str:
+    # как в models.py: голое имя файла — относительно /opt/Ebot
+    return path if "/" in path else os.path.join("/opt/Ebot", path)
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+def split_symbol(symbol: str) -> Tuple[str, str]:
+    """KASUSDC -> (KAS, USDC)."""
+    s = str(symbol).upper()
+    for q in (QUOTE_ASSET,) + _QUOTES:
+        if s.endswith(q) and len(s) > len(q):
+            return s[:-len(q)], q
+    raise MexcHTTPError(f"unknown symbol: {symbol}")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS paper_balances(
+    asset  TEXT PRIMARY KEY,
+    free   REAL NOT NULL DEFAULT 0,
+    locked REAL NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS paper_orders(
+    seq          INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id     TEXT UNIQUE NOT NULL,
+    symbol       TEXT NOT NULL,
+    side         TEXT NOT NULL,
+    price        REAL NOT NULL,
+    qty          REAL NOT NULL,
+    executed_qty REAL NOT NULL DEFAULT 0,
+    status       TEXT NOT NULL,
+    time         INTEGER NOT NULL,
+    update_time  INTEGER NOT NULL,
+    client_id    TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS ix_paper_orders_open ON paper_orders(symbol, status);
+CREATE TABLE IF NOT EXISTS paper_trades(
+    id               INTEGER PRIMARY KEY AUTOINCREMENT,
+    order_id         TEXT NOT NULL,
+    symbol           TEXT NOT NULL,
+    side             TEXT NOT NULL,
+    price            REAL NOT NULL,
+    qty              REAL NOT NULL,
+    commission       REAL NOT NULL,
+    commission_asset TEXT NOT NULL,
+    is_maker         INTEGER NOT NULL,
+    time             INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_paper_trades_sym_time ON paper_trades(symbol, time);
+CREATE TABLE IF NOT EXISTS paper_meta(
+    key   TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+class PaperMexcClient:
+    paper = True
+
+    def __init__(self, db_path: str = None, market_db: str = None, price_source: str = None,
+                 start_usd: float = None):
+        self.db_path = _abs_db(db_path or PAPER_DB_PATH)
+        self.market_db = _abs_db(market_db or DB_PATH)
+        self.price_source = (price_source or PAPER_PRICE_SOURCE or "db").lower()
+        self._rest: Optional[MexcClient] = None
+        self._lock = threading.Lock()
+        d = os.path.dirname(self.db_path)
+        if d:
+            os.makedirs(d, exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        if "client_id" not in [r[1] for r in self._conn.execute("PRAGMA table_info(paper_orders)")]:
+            self._conn.execute("ALTER TABLE paper_orders ADD COLUMN client_id TEXT NOT NULL DEFAULT ''")
+        with self._tx() as c:
+            if c.execute("SELECT value FROM paper_meta WHERE key='created'").fetchone() is None:
+                c.execute("INSERT INTO paper_meta(key, value) VALUES('created', ?)", (str(_now_ms()),))
+                c.execute("INSERT OR REPLACE INTO paper_balances(asset, free, locked) VALUES(?, ?, 0)",
+                          (QUOTE_ASSET, PAPER_START_USD if start_usd is None else float(start_usd)))
+
+    # ---------------- storage ----------------
+    @contextlib.contextmanager
+    def _tx(self):
+        """BEGIN IMMEDIATE: buy/sell/sync — разные процессы над одним файлом."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+
+    @staticmethod
+    def _add_balance(c, asset: str, free: float = 0.0, locked: float = 0.0) -> None:
+        c.execute("INSERT INTO paper_balances(asset, free, locked) VALUES(?, 0, 0) ON CONFLICT(asset) DO NOTHING", (asset,))
+        c.execute("UPDATE paper_balances SET free = free + ?, locked = locked + ? WHERE asset=?",
+                  (float(free), float(locked), asset))
+
+    @staticmethod
+    def _free(c, asset: str) -> float:
+        r = c.execute("SELECT free FROM paper_balances WHERE asset=?", (asset,)).fetchone()
+        return float(r[0]) if r else 0.0
+
+    # ---------------- price feed ----------------
+    def _candles_since(self, symbol: str, since_sec: int) -> list:
+        """Закрытые минутки (time, low, high) начиная с since_sec."""
+        try:
+            m = sqlite3.connect(f"file:{self.market_db}?mode=ro", uri=True, timeout=5)
+        except sqlite3.Error:
+            return []
+        try:
+            return m.execute(
+                "SELECT time, min, max FROM minmax WHERE pair=? AND time>=? AND time+60<=? ORDER BY time",
+                (symbol, int(since_sec), int(time.time()))).fetchall()
+        except sqlite3.Error:
+            return []
+        finally:
+            m.close()
+
+    def _last_from_db(self, symbol: str) -> float:
+        try:
+            m = sqlite3.connect(f"file:{self.market_db}?mode=ro", uri=True, timeout=5)
+            try:
+                r = m.execute("SELECT close FROM minmax WHERE pair=? ORDER BY time DESC LIMIT 1", (symbol,)).fetchone()
+            finally:
+                m.close()
+            return float(r[0]) if r and r[0] else 0.0
+        except sqlite3.Error:
+            return 0.0
+
+    def _last_from_rest(self, symbol: str) -> float:
+        if self._rest is None:
+            self._rest = MexcClient()
+        return float(self._rest.price(symbol))
+
+    def _crosses(self, side: str, price: float, lo: float, hi: float) -> bool:
+        if side == "BUY":
+            return lo <= price if PAPER_FILL_ON_TOUCH else lo < price
+        return hi >= price if PAPER_FILL_ON_TOUCH else hi > price
+
+    def _fill(self, c, o, px: float, ts_ms: int, maker: bool) -> None:
+        """Полное исполнение ордера o (row из paper_orders) по px."""
+        seq, oid, symbol, side, price, qty = o[0], o[1], o[2], o[3], float(o[4]), float(o[5])
+        base, quote = split_symbol(symbol)
+        fee = px * qty * (MAKER_FEE_PCT if maker else TAKER_FEE_PCT) / 100.0
+        if side == "BUY":
+            # блокировали price*qty (+комиссия по цене ордера), списываем фактическое
+            reserved = price * qty * (1.0 + MAKER_FEE_PCT / 100.0)
+            self._add_balance(c, quote, free=reserved - px * qty - fee, locked=-reserved)
+            self._add_balance(c, base, free=qty)
+        else:
+            self._add_balance(c, base, locked=-qty)
+            self._add_balance(c, quote, free=px * qty - fee)
+        c.execute("UPDATE paper_orders SET executed_qty=qty, status='FILLED', update_time=? WHERE seq=?", (ts_ms, seq))
+        c.execute("INSERT INTO paper_trades(order_id, symbol, side, price, qty, commission, commission_asset, is_maker, time)"
+                  " VALUES(?, ?, ?, ?, ?, ?, ?, ?, ?)", (oid, symbol, side, px, qty, fee, quote, int(maker), ts_ms))
+
+    def match(self, symbol: str = None) -> int:
+        """Прогоняет открытые лимитки против ленты цен. Возвращает число исполнений."""
+        with self._tx() as c:
+            q = "SELECT seq, order_id, symbol, side, price, qty, time FROM paper_orders WHERE status='NEW'"
+            args: tuple = ()
+            if symbol:
+                q += " AND symbol=?"; args = (symbol,)
+            rows = c.execute(q + " ORDER BY seq", args).fetchall()
+            if not rows:
+                return 0
+            n = 0
+            by_sym: dict = {}
+            for o in rows:
+                by_sym.setdefault(o[2], []).append(o)
+            for sym, orders in by_sym.items():
+                rest = self.price_source == "rest"
+                if rest:
+                    px = self._last_from_rest(sym)
+                    ticks = [(int(time.time()), px, px)] if px > 0 else []
+                else:
+                    # только свечи целиком после постановки: начало >= времени ордера
+                    ticks = self._candles_since(sym, min(int(o[6]) // 1000 for o in orders))
+                for o in orders:
+                    placed = int(o[6]) // 1000
+                    for t, lo, hi in ticks:
+                        if not rest and t < placed:
+                            continue
+                        if self._crosses(o[3], float(o[4]), float(lo), float(hi)):
+                            ts_ms = _now_ms() if rest else (int(t) + 60) * 1000 - 1
+                            self._fill(c, o, float(o[4]), ts_ms, maker=True)
+                            n += 1
+                            break
+            return n
+
+    # ---------------- public ----------------
+    def price(self, symbol: str) -> float:
+        if self.price_source == "rest":
+            return self._last_from_rest(symbol)
+        px = self._last_from_db(symbol)
+        return px if px > 0 else self._last_from_rest(symbol)
+
+    def exchange_info(self, symbol: str = None) -> dict:
+        syms = [symbol or PAIR]
+        out = []
+        for s in syms:
+            base, quote = split_symbol(s)
+            out.append({"symbol": s, "status": "1", "baseAsset": base, "quoteAsset": quote,
+                        "baseAssetPrecision": 6, "quotePrecision": 6, "orderTypes": ["LIMIT"],
+                        "isSpotTradingAllowed": True})
+        return {"timezone": "CST", "serverTime": _now_ms(), "symbols": out}
+
+    # ---------------- signed ----------------
+    def account(self) -> dict:
+        self.match()
+        rows = self._conn.execute("SELECT asset, free, locked FROM paper_balances ORDER BY asset").fetchall()
+        return {"canTrade": True, "accountType": "SPOT", "updateTime": _now_ms(),
+                "balances": [{"asset": a, "free": _fmt_num(max(0.0, f)), "locked": _fmt_num(max(0.0, l))}
+                             for a, f, l in rows]}
+
+    @staticmethod
+    def _order_dict(r) -> dict:
+        oid, symbol, side, price, qty, exe, status, t, ut, cid = r
+        return {"symbol": symbol, "orderId": oid, "clientOrderId": cid or None, "price": _fmt_num(price), "origQty": _fmt_num(qty),
+                "executedQty": _fmt_num(exe), "cummulativeQuoteQty": _fmt_num(exe * price),
+                "status": status, "timeInForce": "GTC", "type": "LIMIT", "side": side,
+                "time": t, "updateTime": ut, "isWorking": status == "NEW"}
+
+    _ORDER_COLS = "order_id, symbol, side, price, qty, executed_qty, status, time, update_time, client_id"
+
+    def open_orders(self, symbol: str, limit: int = None) -> list:
+        self.match(symbol)
+        q = f"SELECT {self._ORDER_COLS} FROM paper_orders WHERE symbol=? AND status='NEW' ORDER BY seq"
+        args: tuple = (symbol,)
+        if limit:
+            q += " LIMIT ?"; args = (symbol, int(limit))
+        return [self._order_dict(r) for r in self._conn.execute(q, args).fetchall()]
+
+    def my_trades(self, symbol: str, startTime: int = None, endTime: int = None, limit: int = 1000) -> list:
+        self.match(symbol)
+        q = ("SELECT t.id, t.order_id, t.side, t.price, t.qty, t.commission, t.commission_asset, t.is_maker, t.time"
+             " FROM paper_trades t WHERE t.symbol=?")
+        args: list = [symbol]
+        if startTime:
+            q += " AND t.time>=?"; args.append(int(startTime))
+        if endTime:
+            q += " AND t.time<=?"; args.append(int(endTime))
+        q += " ORDER BY t.time, t.id LIMIT ?"; args.append(int(limit))
+        out = []
+        for tid, oid, side, px, qty, fee, fee_asset, maker, ts in self._conn.execute(q, args).fetchall():
+            out.append({"symbol": symbol, "id": f"PT{tid}", "orderId": oid, "price": _fmt_num(px),
+                        "qty": _fmt_num(qty), "quoteQty": _fmt_num(px * qty), "commission": _fmt_num(fee),
+                        "commissionAsset": fee_asset, "time": ts, "isBuyer": side == "BUY",
+                        "isMaker": bool(maker), "isBestMatch": True})
+        return out
+
+    def all_orders(self, symbol: str, startTime: int = None, endTime: int = None, limit: int = 1000) -> list:
+        self.match(symbol)
+        q = f"SELECT {self._ORDER_COLS} FROM paper_orders WHERE symbol=?"
+        args: list = [symbol]
+        if startTime:
+            q += " AND time>=?"; args.append(int(startTime))
+        if endTime:
+            q += " AND time<=?"; args.append(int(endTime))
+        q += " ORDER BY time, seq LIMIT ?"; args.append(int(limit))
+        return [self._order_dict(r) for r in self._conn.execute(q, args).fetchall()]
+
+    def query_order(self, symbol: str, order_id: str) -> dict:
+        self.match(symbol)
+        r = self._conn.execute(f"SELECT {self._ORDER_COLS} FROM paper_orders WHERE order_id=? AND symbol=?",
+                               (str(order_id), symbol)).fetchone()
+        if not r:
+            raise MexcHTTPError(f"GET /api/v3/order API error: {{'code': -2013, 'msg': 'Order does not exist'}}", status=400)
+        return self._order_dict(r)
+
+    def place_order(self, symbol: str, side: str, price: float, qty: float, tif: str = "GTC",
+                    client_id: str = None) -> dict:
+        side = side.upper()
+        price = float(price); qty = float(qty)
+        if price <= 0 or qty <= 0:
+            _M_ORDERS.inc(side=side, action="rejected")
+            raise MexcHTTPError(f"POST /api/v3/order API error: {{'code': 700004, 'msg': 'invalid price/quantity'}}", status=400)
+        base, quote = split_symbol(symbol)
+        last = self.price(symbol)
+        self.match(symbol)
+        now = _now_ms()
+        with self._tx() as c:
+            if side == "BUY":
+                need = price * qty * (1.0 + MAKER_FEE_PCT / 100.0)
+                if self._free(c, quote) + 1e-9 < need:
+                    _M_ORDERS.inc(side=side, action="rejected")
+                    raise MexcHTTPError(f"POST /api/v3/order API error: {{'code': 30004, 'msg': 'Insufficient position'}}", status=400)
+                self._add_balance(c, quote, free=-need, locked=need)
+            else:
+                if self._free(c, base) + 1e-12 < qty:
+                    _M_ORDERS.inc(side=side, action="rejected")
+                    raise MexcHTTPError(f"POST /api/v3/order API error: {{'code': 30005, 'msg': 'Oversold'}}", status=400)
+                self._add_balance(c, base, free=-qty, locked=qty)
+            cur = c.execute("INSERT INTO paper_orders(order_id, symbol, side, price, qty, executed_qty, status, time, update_time, client_id)"
+                            " VALUES('', ?, ?, ?, ?, 0, 'NEW', ?, ?, ?)", (symbol, side, price, qty, now, now, client_id or ""))
+            oid = f"PAPER{cur.lastrowid}"
+            c.execute("UPDATE paper_orders SET order_id=? WHERE seq=?", (oid, cur.lastrowid))
+            # маркетабельная лимитка — сразу по рынку (тейкер)
+            if last > 0 and ((side == "BUY" and price >= last) or (side == "SELL" and price <= last)):
+                o = (cur.lastrowid, oid, symbol, side, price, qty, now)
+                self._fill(c, o, last, now, maker=False)
+        _M_ORDERS.inc(side=side, action="placed")
+        return {"symbol": symbol, "orderId": oid, "clientOrderId": client_id, "orderListId": -1, "price": _fmt_num(price),
+                "origQty": _fmt_num(qty), "type": "LIMIT", "side": side, "transactTime": now}
+
+    def cancel_order(self, symbol: str, order_id: str, side: str = "") -> dict:
+        self.match(symbol)
+        with self._tx() as c:
+            r = c.execute(f"SELECT seq, {self._ORDER_COLS} FROM paper_orders WHERE order_id=? AND symbol=?",
+                          (str(order_id), symbol)).fetchone()
+            if not r or r[7] != "NEW":
+                raise MexcHTTPError(f"DELETE /api/v3/order API error: {{'code': -2011, 'msg': 'Unknown order id'}}")
+            seq, oid, _, o_side, price, qty = r[0], r[1], r[2], r[3], float(r[4]), float(r[5])
+            base, quote = split_symbol(symbol)
+            if o_side == "BUY":
+                reserved = price * qty * (1.0 + MAKER_FEE_PCT / 100.0)
+                self._add_balance(c, quote, free=reserved, locked=-reserved)
+            else:
+                self._add_balance(c, base, free=qty, locked=-qty)
+            now = _now_ms()
+            c.execute("UPDATE paper_orders SET status='CANCELED', update_time=? WHERE seq=?", (now, seq))
+            row = c.execute(f"SELECT {self._ORDER_COLS} FROM paper_orders WHERE seq=?", (seq,)).fetchone()
+        _M_ORDERS.inc(side=(side or o_side).upper(), action="cancelled")
+        return self._order_dict(row)
+
+    def cancel_open_orders(self, symbol: str) -> list:
+        """Как DELETE /api/v3/openOrders: снять все NEW ордера символа."""
+        self.match(symbol)
+        ids = [r[0] for r in self._conn.execute(
+            "SELECT order_id FROM paper_orders WHERE symbol=? AND status='NEW' ORDER BY seq", (symbol,)).fetchall()]
+        out = []
+        for oid in ids:
+            try:
+                out.append(self.cancel_order(symbol, oid))
+            except MexcHTTPError:
+                continue  # исполнился между выборкой и отменой
+        return out
+
+    # ---------------- maintenance ----------------
+    def reset(self, usd: float = None) -> None:
+        with self._tx() as c:
+            for t in ("paper_balances", "paper_orders", "paper_trades", "paper_meta"):
+                c.execute(f"DELETE FROM {t}")
+            c.execute("INSERT INTO paper_meta(key, value) VALUES('created', ?)", (str(_now_ms()),))
+            c.execute("INSERT INTO paper_balances(asset, free, locked) VALUES(?, ?, 0)",
+                      (QUOTE_ASSET, PAPER_START_USD if usd is None else float(usd)))
+
+def main():
+    ap = argparse.ArgumentParser(description="Paper-биржа: состояние/сброс")
+    ap.add_argument("--db", default=None, help="файл состояния (по умолчанию PAPER_DB_PATH)")
+    ap.add_argument("--reset", action="store_true", help="очистить ордера/сделки и выставить стартовый баланс")
+    ap.add_argument("--usd", type=float, default=None, help="стартовый баланс для --reset")
+    args = ap.parse_args()
+
+    cli = PaperMexcClient(db_path=args.db)
+    if args.reset:
+        cli.reset(args.usd)
+        print(f"PAPER reset: {cli.db_path}")
+    bals = cli.account().get("balances", [])
+    opened = cli.open_orders(PAIR)
+    n_tr = cli._conn.execute("SELECT COUNT(*) FROM paper_trades WHERE symbol=?", (PAIR,)).fetchone()[0]
+    print(f"PAPER {cli.db_path} | feed={cli.price_source}")
+    for b in bals:
+        print(f"  {b['asset']}: free={b['free']} locked={b['locked']}")
+    print(f"  open: BUY={sum(o['side'] == 'BUY' for o in opened)} SELL={sum(o['side'] == 'SELL' for o in opened)} | trades={n_tr}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""
+Сверка «желаемой лестницы» с открытыми ордерами (desired state).
+
+Тик buy/sell строит целевой набор [(price, qty)], а reconcile.diff сопоставляет его
+с уже стоящими ордерами той же стороны по квантованному уровню цены с допусками:
+совпавшие остаются, лишние снимаются, недостающие ставятся. Так за тик уходит
+минимум запросов, а число открытых ордеров не растёт бесконечно.
+
+Допуски (config):
+  RECONCILE_PRICE_TOL_PCT — отклонение цены, % (не меньше одного шага PRICE_TICK);
+  RECONCILE_SIZE_TOL_PCT  — отклонение остатка qty, %.
+"""
+from typing import Iterable, List, Sequence, Tuple
+
+import cancels
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+ORDER_RECONCILE         = bool(getattr(CFG, "ORDER_RECONCILE", True))
+RECONCILE_PRICE_TOL_PCT = float(getattr(CFG, "RECONCILE_PRICE_TOL_PCT", 0.3))
+RECONCILE_SIZE_TOL_PCT  = float(getattr(CFG, "RECONCILE_SIZE_TOL_PCT", 30.0))
+PRICE_TICK              = float(getattr(CFG, "PRICE_TICK", 0.000001))
+
+# режимы, которые ведёт сам тик buy/sell (BUCKET / MANUAL_AVG1 не трогаем)
+MANAGED_MODES = ("GRID",)
+
+def level(price: float, tick: float = PRICE_TICK) -> int:
+    """Квантованный уровень цены (целое число шагов)."""
+    return int(round(float(price) / tick))
+
+def diff(target: Sequence[Tuple[float, float]], current: Iterable[Tuple[object, float, float]],
+         price_tol_pct: float = None, size_tol_pct: float = None,
+         tick: float = PRICE_TICK) -> Tuple[List[object], List[object], list]:
+    """
+    target  — [(price, qty, ...)] желаемые ордера (хвост кортежа не смотрим, вернём как есть);
+    current — [(key, price, remaining_qty)] открытые ордера той же стороны.
+    Возвращает (keep_keys, cancel_keys, to_place[(price, qty)]).
+    Пары подбираются жадно по близости уровня: каждый ордер закрывает не более одной цели.
+    """
+    ptol = RECONCILE_PRICE_TOL_PCT if price_tol_pct is None else float(price_tol_pct)
+    stol = RECONCILE_SIZE_TOL_PCT if size_tol_pct is None else float(size_tol_pct)
+    cur = list(current)
+    cand = []
+    for ti, t in enumerate(target):
+        tp, tq = float(t[0]), float(t[1])
+        tl = level(tp, tick)
+        max_steps = max(1, int(abs(tp) * ptol / 100.0 / tick))
+        for ci, (_, cp, cq) in enumerate(cur):
+            d = abs(level(cp, tick) - tl)
+            if d > max_steps:
+                continue
+            if tq > 0 and abs(float(cq) - tq) > tq * stol / 100.0:
+                continue
+            cand.append((d, ti, ci))
+    cand.sort()
+    t_used, c_used = set(), set()
+    for _, ti, ci in cand:
+        if ti in t_used or ci in c_used:
+            continue
+        t_used.add(ti); c_used.add(ci)
+    keep = [cur[ci][0] for ci in sorted(c_used)]
+    cancel = [cur[ci][0] for ci in range(len(cur)) if ci not in c_used]
+    place = [target[ti] for ti in range(len(target)) if ti not in t_used]
+    return keep, cancel, place
+
+def cancel_orders(cli, sess, pair: str, orders, on_error=None, book=None) -> int:
+    """
+    Снимает ордера (models_trading.Order) на бирже и помечает CANCELED локально
+    (и убирает из orderbook.OrderBook, если передан). Локальный статус меняется только
+    при успешной отмене: если ордер уже исполнился, его закроет sync. Возвращает число снятых.
+    Отмены идут параллельно через cancels.cancel_orders.
+    """
+    rep = cancels.cancel_orders(cli, sess, pair, orders)
+    for oid, r in rep.results.items():
+        if r.ok:
+            if book is not None:
+                book.remove(oid)
+        elif on_error:
+            on_error(r.error)
+    return len(rep.canceled)
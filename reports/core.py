@@ -5,6 +5,11 @@ from typing import List, Optional
 from statistics import mean
 from datetime import datetime, timezone, timedelta
 
+import order_stats
+import rollups
+import tracing
+from orderbook import OrderBook
+
 try:
     from config import DB_PATH, PAIR, START_CAPITAL_USD
 except Exception:
@@ -118,20 +123,39 @@ def fetch_position_from_orders(conn, pair: str):
         qty = max(0.0, qty)
     return (qty, avg), True
 
-def fetch_open_buy_reserve(conn, pair: str):
-    if not _table_exists(conn, "orders"):
-        return 0.0
+def fetch_realized_pnl(conn, pair: str, since_sec: Optional[int] = None):
+    """Сумма реализованного PnL из pnl_ledger (см. sync.update_realized_pnl); None — журнала нет."""
+    if not _table_exists(conn, "pnl_ledger"):
+        return None
     cur = conn.cursor()
+    if since_sec is None:
+        cur.execute("SELECT realized_cum FROM pnl_ledger WHERE pair=? ORDER BY ts DESC, fill_id DESC LIMIT 1", (pair,))
+    else:
+        cur.execute("SELECT COALESCE(SUM(realized), 0) FROM pnl_ledger WHERE pair=? AND ts>=?", (pair, int(since_sec)))
+    r = cur.fetchone()
+    return float(r[0] or 0.0) if r else 0.0
+
+def fetch_open_book(conn, pair: str) -> OrderBook:
+    if not _table_exists(conn, "orders"):
+        return OrderBook()
     try:
-        cur.execute("""
-            SELECT COALESCE(SUM(price*qty),0)
-            FROM orders
-            WHERE pair=? AND side='BUY' AND status IN ('NEW','PARTIALLY_FILLED')
-        """, (pair,))
-        r = cur.fetchone()
-        return float(r[0] or 0.0)
+        return OrderBook.from_sqlite(conn, pair)
     except Exception:
-        return 0.0
+        return OrderBook()
+
+def fetch_order_stats(conn, pair: str):
+    """{side: order_stats.Stats} — одна строка на сторону; None — сводки нет (старая БД)."""
+    if not _table_exists(conn, "orders"):
+        return None
+    return order_stats.get(conn, pair)
+
+def fetch_open_buy_reserve(conn, pair: str, book: Optional[OrderBook] = None, stats=None):
+    if book is None:
+        stats = stats if stats is not None else fetch_order_stats(conn, pair)
+        if stats is not None:
+            return stats["BUY"].open_notional
+        book = fetch_open_book(conn, pair)
+    return book.buys.notional()
 
 def compute_channel_24h(candles):
     if not candles:
@@ -148,6 +172,20 @@ def compute_channel_24h(candles):
     upper = max(0.0, mid_avg + spread / 4.0)
     return dict(lower=lower, upper=upper, mid=mid_avg, spread=spread)
 
+def fetch_channel(conn, pair: str, since_sec: int, until_sec: int):
+    """
+    Канал как compute_channel_24h, но по агрегатам rollups (десятки строк вместо минуток).
+    None — агрегатов нет (старая БД) или окно пустое.
+    """
+    if not _table_exists(conn, "minmax_5m"):
+        return None
+    agg = rollups.stats(conn, pair, since_sec, until_sec)
+    if agg is None:
+        return None
+    spread = max(0.0, agg.max - agg.min)
+    return dict(lower=max(0.0, agg.mean - spread / 4.0), upper=max(0.0, agg.mean + spread / 4.0),
+                mid=agg.mean, spread=spread)
+
 def calc_pnl_blocks(last_px: float, qty: float, avg: float, px_1h: Optional[float], px_24h: Optional[float]):
     def _pnl_win(p0):
         if p0 is None or last_px is None:
@@ -163,19 +201,21 @@ def calc_pnl_blocks(last_px: float, qty: float, avg: float, px_1h: Optional[floa
     total_pct = (total_abs / max(1e-9, START_CAPITAL_USD)) * 100.0
     return (pnl1_abs, pnl1_pct, pnl24_abs, pnl24_pct, total_abs, total_pct)
 
+@tracing.traced("report.build")
 def build_report_text(mode: str = "daily") -> str:
     conn = sqlite3.connect(DB_PATH)
     conn.row_factory = sqlite3.Row
 
     now = _now_utc_ts()
-    rows24 = fetch_candles(conn, PAIR, now - 24*3600)
     _, last_px = fetch_last_close(conn, PAIR)
     t1h = now - 3600
     t24h = now - 24*3600
     _, px_1h = fetch_close_at_or_before(conn, PAIR, t1h)
     _, px_24h = fetch_close_at_or_before(conn, PAIR, t24h)
 
-    ch = compute_channel_24h(rows24)
+    ch = fetch_channel(conn, PAIR, now - 24*3600, now + 60)
+    if ch is None:
+        ch = compute_channel_24h(fetch_candles(conn, PAIR, now - 24*3600))
 
     pos = fetch_position_from_positions_table(conn, PAIR)
     used_synthetic = False
@@ -184,7 +224,9 @@ def build_report_text(mode: str = "daily") -> str:
     else:
         qty, avg = pos
 
-    reserve_usd = fetch_open_buy_reserve(conn, PAIR)
+    stats = fetch_order_stats(conn, PAIR)
+    book = fetch_open_book(conn, PAIR) if stats is None else None
+    reserve_usd = fetch_open_buy_reserve(conn, PAIR, book, stats)
 
     position_val = (last_px or 0.0) * qty
     total_equity_est = START_CAPITAL_USD + (last_px - avg) * qty if avg and last_px else START_CAPITAL_USD
@@ -224,7 +266,16 @@ def build_report_text(mode: str = "daily") -> str:
     lines.append(_fmt_pnl("24 часа", pnl24_abs, pnl24_pct))
     lines.append(_fmt_pnl("Всего", total_abs, total_pct))
 
-    if _table_exists(conn, "orders"):
+    realized_24h = fetch_realized_pnl(conn, PAIR, t24h)
+    if realized_24h is not None:
+        realized_all = fetch_realized_pnl(conn, PAIR) or 0.0
+        lines.append(f"Реализовано: 24ч {realized_24h:+.2f}$ | всего {realized_all:+.2f}$")
+
+    if stats is not None:
+        lines.append("📊 Статистика")
+        lines.append(f"BUY={stats['BUY'].total_n} | SELL={stats['SELL'].total_n}")
+        lines.append(f"Открыто: BUY={stats['BUY'].open_n} | SELL={stats['SELL'].open_n}")
+    elif _table_exists(conn, "orders"):
         try:
             cur = conn.cursor()
             cur.execute("SELECT COUNT(*) FROM orders WHERE pair=? AND side='BUY'", (PAIR,))
@@ -233,6 +284,7 @@ def build_report_text(mode: str = "daily") -> str:
             sell_cnt = int(cur.fetchone()[0])
             lines.append("📊 Статистика")
             lines.append(f"BUY={buy_cnt} | SELL={sell_cnt}")
+            lines.append(f"Открыто: BUY={len(book.buys)} | SELL={len(book.sells)}")
         except Exception:
             pass
 
@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Свечи старших таймфреймов (5m/15m/1h/4h/1d) поверх minmax.
+
+Таблицы minmax_<tf>(pair, time, min, max, open, close, mid_sum, n) ведут триггеры SQLite:
+вставка/исправление минутки пересчитывает её 5m-корзину из минуток, та — 15m из 5m
+и так далее до 1d (каждый шаг читает 3–6 строк). Так их ведёт любой писатель minmax:
+candles.py (ORM), backfill.py (sqlite3), ручные правки. Среднее mid окна = Σmid_sum / Σn.
+Очистка minmax по сроку хранения агрегаты не трогает — старшие ТФ живут дольше минуток.
+
+Запрос окна [start, end) собирается из самых крупных корзин, целиком лежащих внутри,
+и всё более мелких по краям: сутки по 4h/1h/15m/5m/1m — порядка 20–30 строк вместо 1440.
+
+  agg = rollups.stats(conn, "KASUSDC", now - 86400, now)     # Agg(n, min, max, open, close, mean, rows)
+  rows = rollups.series(conn, "KASUSDC", now - 7*86400, now) # свечи ТФ, где строк ≤ max_rows
+
+  python3 rollups.py --rebuild            # пересчитать агрегаты из имеющихся минуток
+  python3 rollups.py --hours 24           # статистика окна и сколько строк прочитано
+"""
+import sys
+import time
+import sqlite3
+import argparse
+from typing import List, NamedTuple, Optional, Tuple
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+DB_PATH = getattr(CFG, "DB_PATH", "ebot.db")
+
+# (имя, секунд) от мелкого к крупному; каждый следующий кратен предыдущему
+RESOLUTIONS: Tuple[Tuple[str, int], ...] = (("5m", 300), ("15m", 900), ("1h", 3600), ("4h", 14400), ("1d", 86400))
+SECONDS = dict(RESOLUTIONS)
+
+def table(res: str) -> str:
+    return "minmax" if res == "1m" else f"minmax_{res}"
+
+def _refresh_sql(src: str, dst: str, sec: int, src_is_minute: bool) -> str:
+    b = f"(NEW.time / {sec}) * {sec}"
+    where = f"pair = NEW.pair AND time >= {b} AND time < {b} + {sec}"
+    mid_sum, n = ("SUM(mid)", "COUNT(*)") if src_is_minute else ("SUM(mid_sum)", "SUM(n)")
+    return (f"INSERT OR REPLACE INTO {dst}(pair, time, min, max, open, close, mid_sum, n) "
+            f"SELECT NEW.pair, {b}, MIN(min), MAX(max), "
+            f"(SELECT open FROM {src} WHERE {where} ORDER BY time LIMIT 1), "
+            f"(SELECT close FROM {src} WHERE {where} ORDER BY time DESC LIMIT 1), "
+            f"{mid_sum}, {n} FROM {src} WHERE {where};")
+
+def ensure(conn) -> None:
+    """Создать таблицы и триггеры (идемпотентно). conn — sqlite3/DBAPI соединение."""
+    cur = conn.cursor()
+    src, src_min = "minmax", True
+    for res, sec in RESOLUTIONS:
+        dst = table(res)
+        cur.execute(f"CREATE TABLE IF NOT EXISTS {dst}(pair VARCHAR NOT NULL, time INTEGER NOT NULL, "
+                    f"min FLOAT, max FLOAT, open FLOAT, close FLOAT, mid_sum FLOAT, n INTEGER, "
+                    f"PRIMARY KEY (pair, time))")
+        body = _refresh_sql(src, dst, sec, src_min)
+        events = ("INSERT", "UPDATE") if src_min else ("INSERT",)   # агрегаты пишутся только REPLACE
+        for ev in events:
+            cur.execute(f"CREATE TRIGGER IF NOT EXISTS trg_{dst}_{ev.lower()} AFTER {ev} ON {src} "
+                        f"BEGIN {body} END")
+        src, src_min = dst, False
+    conn.commit()
+
+def rebuild(conn, pair: Optional[str] = None) -> int:
+    """Пересчитать агрегаты из minmax (после миграции или ручной чистки). Возвращает число 5m-корзин."""
+    ensure(conn)
+    cur = conn.cursor()
+    flt, args = ("WHERE pair = ?", (pair,)) if pair else ("", ())
+    for res, _ in RESOLUTIONS:
+        cur.execute(f"DELETE FROM {table(res)} {flt}", args)
+    # по одной минутке на 5m-корзину: триггер пересчитает корзину и всю цепочку вверх
+    cur.execute(f"UPDATE minmax SET time = time WHERE rowid IN "
+                f"(SELECT MIN(rowid) FROM minmax {flt} GROUP BY pair, time / 300)", args)
+    conn.commit()
+    return cur.execute(f"SELECT COUNT(*) FROM minmax_5m {flt}", args).fetchone()[0]
+
+# ---------------- запросы ----------------
+def _ceil(t: int, sec: int) -> int:
+    return -(-int(t) // sec) * sec
+
+def cover(start: int, end: int) -> List[Tuple[str, int, int]]:
+    """[start, end) -> [(res, a, b)]: крупные корзины внутри окна, мелкие по краям (по времени)."""
+    levels = [("1m", 60)] + list(RESOLUTIONS)
+
+    def rec(a: int, b: int, i: int) -> list:
+        if a >= b:
+            return []
+        res, sec = levels[i]
+        if i == 0:
+            return [(res, a, b)]
+        lo, hi = _ceil(a, sec), b // sec * sec
+        if lo >= hi:
+            return rec(a, b, i - 1)
+        return rec(a, lo, i - 1) + [(res, lo, hi)] + rec(hi, b, i - 1)
+
+    return rec(_ceil(start, 60), _ceil(end, 60), len(levels) - 1)
+
+class Agg(NamedTuple):
+    n: int            # минуток в окне
+    min: float
+    max: float
+    open: float
+    close: float
+    mean: float       # среднее mid минуток
+    rows: int         # строк прочитано
+
+def _select(res: str) -> str:
+    mid_sum, n = ("mid", "1") if res == "1m" else ("mid_sum", "n")
+    return f"SELECT time, min, max, open, close, {mid_sum}, {n} FROM {table(res)} WHERE pair = ? AND time >= ? AND time < ?"
+
+def stats(conn, pair: str, start: int, end: int) -> Optional[Agg]:
+    """Агрегат окна [start, end) по minmax и агрегатам; None — в окне нет свечей."""
+    segs = cover(start, end)
+    if not segs:
+        return None
+    sql = " UNION ALL ".join(_select(res) for res, _, _ in segs) + " ORDER BY 1"
+    args = [x for _, a, b in segs for x in (pair, a, b)]
+    rows = conn.execute(sql, args).fetchall()
+    rows = [r for r in rows if r[1] is not None and r[2] is not None]
+    if not rows:
+        return None
+    n = sum(int(r[6]) for r in rows)
+    return Agg(n, min(r[1] for r in rows), max(r[2] for r in rows), rows[0][3], rows[-1][4],
+               sum(r[5] for r in rows) / n if n else 0.0, len(rows))
+
+def resolution_for(start: int, end: int, max_rows: int = 100) -> str:
+    """Самый мелкий ТФ, при котором окно укладывается в max_rows свечей."""
+    span = max(0, int(end) - int(start))
+    for res, sec in (("1m", 60),) + RESOLUTIONS:
+        if span / sec <= max_rows:
+            return res
+    return RESOLUTIONS[-1][0]
+
+def series(conn, pair: str, start: int, end: int, res: Optional[str] = None, max_rows: int = 100) -> list:
+    """Свечи (time, min, max, open, close, mean_mid) ТФ res (по умолчанию — resolution_for)."""
+    res = res or resolution_for(start, end, max_rows)
+    sec = 60 if res == "1m" else SECONDS[res]
+    rows = conn.execute(_select(res) + " ORDER BY time", (pair, start // sec * sec, int(end))).fetchall()
+    return [(t, lo, hi, o, c, (ms / n if n else 0.0)) for t, lo, hi, o, c, ms, n in rows]
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Агрегаты minmax по старшим таймфреймам")
+    ap.add_argument("--db", default=DB_PATH)
+    ap.add_argument("--pair", default=getattr(CFG, "PAIR", "KASUSDC"))
+    ap.add_argument("--rebuild", action="store_true", help="пересчитать из минуток")
+    ap.add_argument("--hours", type=float, default=24.0, help="окно для статистики")
+    args = ap.parse_args(argv)
+    conn = sqlite3.connect(args.db)
+    try:
+        if args.rebuild:
+            t0 = time.perf_counter()
+            n = rebuild(conn, args.pair)
+            print(f"[rollups] {args.pair}: rebuilt {n} 5m buckets in {time.perf_counter() - t0:.2f}s")
+        else:
+            ensure(conn)
+        now = int(time.time())
+        t0 = time.perf_counter()
+        agg = stats(conn, args.pair, now - int(args.hours * 3600), now)
+        ms = (time.perf_counter() - t0) * 1000
+        if agg is None:
+            print(f"[rollups] {args.pair}: no candles in the last {args.hours:g}h")
+        else:
+            print(f"[rollups] {args.pair} {args.hours:g}h: n={agg.n} min={agg.min:.6f} max={agg.max:.6f} "
+                  f"mean={agg.mean:.6f} open={agg.open:.6f} close={agg.close:.6f} | rows={agg.rows} {ms:.2f}ms")
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
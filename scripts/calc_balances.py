@@ -1,9 +1,31 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
+"""
+Агрегаты по fills за один проход: по дням / неделям / итого, BUY vs SELL,
+комиссии, VWAP по стороне, нетто KAS/USDC.
+
+Считаем не по строкам fills, а по дневному своду fills_daily (pair, day, side),
+который поддерживают триггеры на fills (fills_daily.py; ставит их
+models_trading.init_trading_db). Неполные крайние дни диапазона --from/--to
+досчитываются по fills через индекс ts; нет свода — всё по fills.
+"""
 import argparse
+import csv
+import json
+import os
 import sqlite3
+import sys
 import time
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import fills_daily  # noqa: E402
+
+DAY = 86400
+
+FIELDS = ("period", "start", "n_buys", "n_sells", "buy_qty", "sell_qty", "usdc_out_to_buys",
+          "usdc_in_from_sells", "vwap_buy", "vwap_sell", "fee_quote_total", "kas_net", "usdc_net_after_fee")
 
 def _period_from_args(ts_from: int|None, ts_to: int|None, last_days: int|None):
     if last_days:
@@ -12,46 +34,106 @@ def _period_from_args(ts_from: int|None, ts_to: int|None, last_days: int|None):
         ts_to = now
     return ts_from, ts_to
 
-def calc_aggregates(conn: sqlite3.Connection, pair: str, ts_from: int|None, ts_to: int|None) -> dict:
-    cur = conn.cursor()
-    q = "SELECT side, price, qty, COALESCE(fee,0.0) AS fee FROM fills WHERE pair=?"
-    params = [pair]
-    if ts_from is not None:
-        q += " AND ts>=?"; params.append(int(ts_from))
-    if ts_to is not None:
-        q += " AND ts<=?"; params.append(int(ts_to))
-    q += " ORDER BY ts ASC, id ASC"
-    usdc_in_from_sells = 0.0
-    usdc_out_to_buys = 0.0
-    fee_quote_total = 0.0
-    kas_net = 0.0
-    try:
-        for side, price, qty, fee in cur.execute(q, params):
-            side = str(side or "").upper()
-            price = float(price or 0.0)
-            qty = float(qty or 0.0)
-            fee = float(fee or 0.0)
-            if side == "BUY":
-                usdc_out_to_buys += price * qty
-                kas_net += qty
-                fee_quote_total += fee
-            elif side == "SELL":
-                usdc_in_from_sells += price * qty
-                kas_net -= qty
-                fee_quote_total += fee
-    except Exception:
-        pass
-    usdc_net_after_fee = usdc_in_from_sells - usdc_out_to_buys - fee_quote_total
+def has_fills_daily(conn: sqlite3.Connection) -> bool:
+    """Есть ли свод fills_daily. Схему и триггеры ставит models_trading.init_trading_db, не отчёт."""
+    return fills_daily.exists(conn)
+
+def _day_rows(conn: sqlite3.Connection, pair: str, ts_from: Optional[int], ts_to: Optional[int],
+              use_rollup: bool) -> Dict[Tuple[int, str], List[float]]:
+    """{(day, side): [n, qty, quote, fee]} за [ts_from, ts_to] (включительно)."""
+    out: Dict[Tuple[int, str], List[float]] = {}
+
+    def add(day, side, n, qty, quote, fee):
+        acc = out.setdefault((int(day), str(side or "").upper()), [0, 0.0, 0.0, 0.0])
+        acc[0] += int(n or 0); acc[1] += float(qty or 0.0); acc[2] += float(quote or 0.0); acc[3] += float(fee or 0.0)
+
+    def from_fills(lo: Optional[int], hi: Optional[int]):
+        q = ("SELECT ts / 86400, UPPER(side), COUNT(*), SUM(qty), SUM(price * qty), SUM(COALESCE(fee, 0)) "
+             "FROM fills WHERE pair=?")
+        params: list = [pair]
+        if lo is not None:
+            q += " AND ts>=?"; params.append(int(lo))
+        if hi is not None:
+            q += " AND ts<=?"; params.append(int(hi))
+        q += " GROUP BY ts / 86400, UPPER(side)"
+        for r in conn.execute(q, params):
+            add(*r)
+
+    if not use_rollup:
+        from_fills(ts_from, ts_to)
+        return out
+
+    # полные дни — из свода, неполные края — из fills
+    d_lo = None if ts_from is None else (ts_from + DAY - 1) // DAY      # первый полный день
+    d_hi = None if ts_to is None else (ts_to + 1) // DAY - 1             # последний полный день
+    if d_lo is not None and d_hi is not None and d_lo > d_hi:
+        # диапазон не покрывает ни одних полных суток — только fills
+        from_fills(ts_from, ts_to)
+        return out
+    q = "SELECT day, side, n, qty, quote, fee FROM fills_daily WHERE pair=? AND n>0"
+    params: list = [pair]
+    if d_lo is not None:
+        q += " AND day>=?"; params.append(d_lo)
+    if d_hi is not None:
+        q += " AND day<=?"; params.append(d_hi)
+    for r in conn.execute(q, params):
+        add(*r)
+    if ts_from is not None and ts_from % DAY:
+        from_fills(ts_from, d_lo * DAY - 1)
+    if ts_to is not None and (ts_to + 1) % DAY:
+        from_fills((d_hi + 1) * DAY, ts_to)
+    return out
+
+def _summarize(period: str, start: Optional[int], parts: List[Tuple[str, List[float]]]) -> dict:
+    b = [0, 0.0, 0.0, 0.0]; s = [0, 0.0, 0.0, 0.0]
+    for side, v in parts:
+        acc = b if side == "BUY" else s if side == "SELL" else None
+        if acc is None:
+            continue
+        for i in range(4):
+            acc[i] += v[i]
+    fee = b[3] + s[3]
     return dict(
-        usdc_in_from_sells=usdc_in_from_sells,
-        usdc_out_to_buys=usdc_out_to_buys,
-        fee_quote_total=fee_quote_total,
-        kas_net=kas_net,
-        usdc_net_after_fee=usdc_net_after_fee,
+        period=period,
+        start=(datetime.fromtimestamp(start, tz=timezone.utc).strftime("%Y-%m-%d") if start is not None else ""),
+        n_buys=b[0], n_sells=s[0],
+        buy_qty=b[1], sell_qty=s[1],
+        usdc_out_to_buys=b[2], usdc_in_from_sells=s[2],
+        vwap_buy=(b[2] / b[1]) if b[1] > 0 else 0.0,
+        vwap_sell=(s[2] / s[1]) if s[1] > 0 else 0.0,
+        fee_quote_total=fee,
+        kas_net=b[1] - s[1],
+        usdc_net_after_fee=s[2] - b[2] - fee,
     )
 
+def calc_periods(conn: sqlite3.Connection, pair: str, ts_from: int|None, ts_to: int|None,
+                 periods: Tuple[str, ...] = ("day", "week", "total"), use_rollup: bool = True) -> List[dict]:
+    """Все запрошенные периоды за один проход по дневным строкам."""
+    # без свода (БД ещё не мигрирована торговыми процессами) — напрямую по fills
+    use_rollup = use_rollup and has_fills_daily(conn)
+    days = _day_rows(conn, pair, ts_from, ts_to, use_rollup)
+    out: List[dict] = []
+    if "day" in periods:
+        by_day: Dict[int, list] = {}
+        for (d, side), v in days.items():
+            by_day.setdefault(d, []).append((side, v))
+        out += [_summarize("day", d * DAY, by_day[d]) for d in sorted(by_day)]
+    if "week" in periods:
+        by_week: Dict[int, list] = {}
+        for (d, side), v in days.items():
+            wk = d - ((d + 3) % 7)  # 1970-01-01 — четверг; неделя с понедельника
+            by_week.setdefault(wk, []).append((side, v))
+        out += [_summarize("week", w * DAY, by_week[w]) for w in sorted(by_week)]
+    if "total" in periods:
+        out.append(_summarize("total", None, [(side, v) for (_, side), v in days.items()]))
+    return out
+
+def calc_aggregates(conn: sqlite3.Connection, pair: str, ts_from: int|None, ts_to: int|None) -> dict:
+    """Итог за период (совместимо со старым форматом)."""
+    return calc_periods(conn, pair, ts_from, ts_to, periods=("total",))[0]
+
 def main():
-    ap = argparse.ArgumentParser(description="Aggregates from fills: USDC in/out, fees, KAS/USDC net")
+    ap = argparse.ArgumentParser(description="Aggregates from fills: USDC in/out, fees, VWAP, KAS/USDC net (day/week/total)")
     ap.add_argument("--db", default="ebot.db")
     ap.add_argument("--pair", default="KASUSDC")
     ap.add_argument("--from", dest="ts_from", type=int, default=None, help="unix ts from (inclusive)")
@@ -60,13 +142,34 @@ def main():
     group.add_argument("--last-day", action="store_true", help="последние 24 часа")
     group.add_argument("--last-week", action="store_true", help="последние 7 дней")
     ap.add_argument("--last-days", type=int, default=None, help="последние N дней (альтернатива --from/--to)")
+    ap.add_argument("--periods", default="total", help="через запятую: day,week,total (по умолчанию total)")
+    ap.add_argument("--format", choices=("text", "csv", "json"), default="text")
+    ap.add_argument("--no-rollup", action="store_true", help="считать напрямую по fills (без свода fills_daily)")
     args = ap.parse_args()
 
     last_days = args.last_days or (1 if args.last_day else 7 if args.last_week else None)
     ts_from, ts_to = _period_from_args(args.ts_from, args.ts_to, last_days)
+    periods = tuple(p.strip() for p in args.periods.split(",") if p.strip())
+    bad = [p for p in periods if p not in ("day", "week", "total")]
+    if bad:
+        ap.error(f"unknown period(s): {', '.join(bad)}")
 
     conn = sqlite3.connect(args.db)
-    agg = calc_aggregates(conn, args.pair, ts_from, ts_to)
+    try:
+        rows = calc_periods(conn, args.pair, ts_from, ts_to, periods, use_rollup=not args.no_rollup)
+    finally:
+        conn.close()
+
+    if args.format == "json":
+        json.dump({"pair": args.pair, "from": ts_from, "to": ts_to, "rows": rows}, sys.stdout, ensure_ascii=False, indent=1)
+        print()
+        return
+    if args.format == "csv":
+        w = csv.DictWriter(sys.stdout, fieldnames=FIELDS)
+        w.writeheader()
+        for r in rows:
+            w.writerow(r)
+        return
 
     header = f"Summary @ {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
     period = (
@@ -75,11 +178,19 @@ def main():
     )
     print(header)
     print(f"PAIR={args.pair} ({period})")
-    print(f"usdc_in_from_sells={agg['usdc_in_from_sells']:.2f}")
-    print(f"usdc_out_to_buys={agg['usdc_out_to_buys']:.2f}")
-    print(f"fee_quote_total={agg['fee_quote_total']:.2f}")
-    print(f"kas_net={agg['kas_net']:.6f}")
-    print(f"usdc_net_after_fee={agg['usdc_net_after_fee']:.2f}")
+    for agg in rows:
+        if agg["period"] != "total":
+            print(f"[{agg['period']} {agg['start']}] buys={agg['n_buys']} sells={agg['n_sells']} "
+                  f"out={agg['usdc_out_to_buys']:.2f} in={agg['usdc_in_from_sells']:.2f} "
+                  f"vwap_buy={agg['vwap_buy']:.6f} vwap_sell={agg['vwap_sell']:.6f} "
+                  f"fee={agg['fee_quote_total']:.2f} kas_net={agg['kas_net']:.6f} net={agg['usdc_net_after_fee']:.2f}")
+            continue
+        print(f"usdc_in_from_sells={agg['usdc_in_from_sells']:.2f}")
+        print(f"usdc_out_to_buys={agg['usdc_out_to_buys']:.2f}")
+        print(f"fee_quote_total={agg['fee_quote_total']:.2f}")
+        print(f"vwap_buy={agg['vwap_buy']:.6f} vwap_sell={agg['vwap_sell']:.6f}")
+        print(f"kas_net={agg['kas_net']:.6f}")
+        print(f"usdc_net_after_fee={agg['usdc_net_after_fee']:.2f}")
 
 if __name__ == "__main__":
     main()
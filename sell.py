@@ -3,9 +3,7 @@
 
 import math
 import time
-from statistics import mean
 from datetime import timezone, timedelta
-from sqlalchemy import and_
 
 from config import (
     PAIR,
@@ -16,16 +14,22 @@ from config import (
     SELL_MIN_GAIN,     # минимум avg + gain
     SELL_MICROSHIFT,   # микросдвиг, если уровень занят
 
-    # опционально (не критично для логики, но полезно)
-    # BASE_ASSET, QUOTE_ASSET
+    BASE_ASSET,
 )
 
-from models import SessionLocal, MinMax
+import channels
+from channels import SELL_CHANNEL_WINDOW, SELL_CHANNEL_ESTIMATOR
 from models_trading import (
-    SessionT, Order, Position, init_trading_db
+    SessionT, Position, init_trading_db
 )
-from mexc_client import MexcClient
+from mexc_client import MexcClient, get_client
 from notify import send_error
+import intents
+import marketdata
+import reconcile
+import tracing
+from orderbook import OrderBook
+from pairs import get_pair, strategy_params
 
 MSK = timezone(timedelta(hours=3))
 def now_ts():
@@ -34,89 +38,68 @@ def now_ts():
 def _floor6(x: float) -> float:
     return math.floor(float(x) * 1_000_000) / 1_000_000
 
-def last_price(cli: MexcClient) -> float:
-    return float(cli.price(PAIR))
+def last_price(cli: MexcClient, pair: str = PAIR) -> float:
+    # локальная запись candles.py (shared memory), REST — если она устарела
+    return marketdata.last_price(cli, pair)
 
-def channel_24h() -> tuple[float, float, float]:
+def channel(pair: str = PAIR) -> tuple[float, float, float]:
     """
-    Возвращает (lower, upper, mid24) как mid±spread/4 по таблице minmax за 24ч.
-    Если данных нет — (0,0,0).
+    (lower, upper, mid) канала по окну SELL_CHANNEL_WINDOW и оценщику SELL_CHANNEL_ESTIMATOR
+    (по умолчанию 24h, mid±spread/4). Если данных нет — (0,0,0). См. channels.py.
     """
-    s = SessionLocal()
-    try:
-        cutoff = now_ts() - 86400
-        rows = (s.query(MinMax)
-                  .filter(and_(MinMax.pair == PAIR, MinMax.time >= cutoff))
-                  .all())
-        if not rows:
-            return 0.0, 0.0, 0.0
-        min24 = min(r.min for r in rows)
-        max24 = max(r.max for r in rows)
-        mid24 = mean(r.mid for r in rows)
-        spread = max(0.0, max24 - min24)
-        lower = max(0.0, mid24 - spread/4.0)
-        upper = max(0.0, mid24 + spread/4.0)
-        return lower, upper, mid24
-    finally:
-        s.close()
+    return channels.channel(pair, SELL_CHANNEL_WINDOW, SELL_CHANNEL_ESTIMATOR)
+
+channel_24h = channel   # прежнее имя
 
-def get_position(sessT: SessionT) -> tuple[float, float]:
-    pos = sessT.query(Position).filter(Position.pair == PAIR).first()
+def get_position(sessT: SessionT, pair: str = PAIR) -> tuple[float, float]:
+    pos = sessT.query(Position).filter(Position.pair == pair).first()
     if not pos:
         return 0.0, 0.0
     return float(pos.qty or 0.0), float(pos.avg or 0.0)
 
-def get_open_sells(sessT: SessionT) -> list[Order]:
-    return (sessT.query(Order)
-            .filter(and_(Order.pair == PAIR,
-                         Order.side == "SELL",
-                         Order.status.in_(("NEW", "PARTIALLY_FILLED"))))
-            .all())
-
-def exchange_free_base(cli: MexcClient) -> float:
+def exchange_free_base(cli: MexcClient, asset: str = BASE_ASSET) -> float:
     """
-    Возвращает свободный базовый ассет (KAS) по данным биржи.
+    Возвращает свободный базовый ассет пары (asset, по умолчанию BASE_ASSET) по данным биржи.
     """
+    asset = str(asset).upper()
     acct = cli.account() or {}
     for b in (acct.get("balances") or []):
         # Некоторые клиенты отдают как {'asset': 'KAS', 'free': '...', 'locked': '...'}
-        if str(b.get("asset")).upper() in ("KAS",):
+        if str(b.get("asset")).upper() == asset:
             try:
                 return float(b.get("free") or 0.0)
             except Exception:
                 return 0.0
     return 0.0
 
-def place_limit_sell(cli: MexcClient, sessT: SessionT, price: float, qty: float) -> bool:
-    """
-    Отправляет лимитную продажу и фиксирует в локальной БД.
-    """
+def sell_intent(price: float, qty: float):
+    """Намерение лимитной продажи или None (мельче MIN_ORDER_USD / нулевое кол-во)."""
     price = max(0.0, float(price))
     qty = max(0.0, float(qty))
     if price <= 0 or qty <= 0:
-        return False
+        return None
 
     # проверка минимального номинала
     notional = price * qty
     if notional < MIN_ORDER_USD:
-        return False
+        return None
 
     # квантование количества (6 знаков)
     qty = _floor6(qty)
     if qty <= 0:
-        return False
+        return None
+    return intents.new("SELL", price, qty, mode="GRID")
 
-    resp = cli.place_order(PAIR, "SELL", price=price, qty=qty)
-    oid = str(resp.get("orderId") or f"SELL_{now_ts()}")
-
-    o = Order(
-        id=oid, pair=PAIR, side="SELL",
-        price=float(price), qty=float(qty),
-        status="NEW", created=now_ts(), updated=now_ts(),
-        paper=False, reserved=0.0, filled_qty=0.0, mode="GRID",
-    )
-    sessT.merge(o)
-    sessT.commit()
+def place_limit_sell(cli: MexcClient, sessT: SessionT, price: float, qty: float, pair: str = PAIR) -> bool:
+    """
+    Отправляет лимитную продажу и фиксирует в локальной БД.
+    """
+    it = sell_intent(price, qty)
+    if it is None:
+        return False
+    r, = intents.place_batch(cli, sessT, pair, [it])
+    if r.error is not None:
+        raise r.error
     return True
 
 def build_sell_prices(pos_avg: float, last: float, upper: float) -> tuple[float, float]:
@@ -137,90 +120,105 @@ def build_sell_prices(pos_avg: float, last: float, upper: float) -> tuple[float,
     p_upper = max(upper, floor_price)
     return p_mid, p_upper
 
-def main():
+def plan_sells(last: float, upper: float, pos_qty: float, pos_avg: float,
+               free_base: float, open_prices: set) -> list[tuple[float, float]]:
+    """
+    Чистая логика тика SELL: [(price, qty)] к постановке.
+    open_prices — занятые уровни: set округлённых до 6 знаков цен или orderbook.SideBook.
+    Используется и в main(), и в backtest.py.
+    """
+    if pos_qty <= 0 or free_base <= 0:
+        return []  # нечего продавать / защита от "Oversold"
+    sellable_qty = min(pos_qty, free_base)
+
+    # считаем целевые цены
+    p_mid, p_upper = build_sell_prices(pos_avg, last, upper)
+
+    # подвинем на SELL_MICROSHIFT, если уровень занят
+    def shift_if_taken(price: float) -> float:
+        p = float(price)
+        # ограничим число сдвигов, чтобы не уйти далеко
+        for _ in range(3):
+            r = round(p, 6)
+            if r not in open_prices:
+                return p
+            p += float(SELL_MICROSHIFT)
+        return p
+
+    p_mid   = shift_if_taken(p_mid)
+    p_upper = shift_if_taken(p_upper)
+
+    # делим количество на две части
+    split = min(max(float(SELL_SPLIT), 0.0), 1.0)
+    q_upper = _floor6(sellable_qty * split)
+    q_mid   = _floor6(sellable_qty - q_upper)
+
+    # проверка минимального номинала для каждой заявки
+    def notional_ok(p, q) -> bool:
+        return (p * q) >= MIN_ORDER_USD and q > 0
+
+    # если обе не проходят — попробуем объединить в одну заявку на p_mid (ближе к рынку)
+    if (not notional_ok(p_mid, q_mid)) and (not notional_ok(p_upper, q_upper)):
+        q_one = _floor6(sellable_qty)
+        return [(p_mid, q_one)] if notional_ok(p_mid, q_one) else []
+
+    # если одна не проходит — переложим объём во вторую
+    if not notional_ok(p_mid, q_mid) and notional_ok(p_upper, q_upper):
+        q_upper = _floor6(q_upper + q_mid)
+        q_mid   = 0.0
+    elif not notional_ok(p_upper, q_upper) and notional_ok(p_mid, q_mid):
+        q_mid   = _floor6(q_mid + q_upper)
+        q_upper = 0.0
+
+    return [(p, q) for p, q in [(p_upper, q_upper), (p_mid, q_mid)] if notional_ok(p, q)]
+
+@tracing.traced("sell.main")
+def main(pair: str = PAIR, base: str = BASE_ASSET, cli: MexcClient = None):
+    """Тик SELL по паре pair (engine.py передаёт общий клиент)."""
     init_trading_db()
-    cli   = MexcClient()
+    cli   = cli or get_client()
     sessT = SessionT()
 
     try:
-        last = last_price(cli)
-        lower, upper, _ = channel_24h()
+        intents.recover(cli, sessT, pair)
+        last = last_price(cli, pair)
+        lower, upper, _ = channel(pair)
 
-        pos_qty, pos_avg = get_position(sessT)
+        pos_qty, pos_avg = get_position(sessT, pair)
         if pos_qty <= 0:
             return  # нечего продавать
 
-        # берём реальный свободный KAS на бирже (защита от "Oversold")
-        free_kas = exchange_free_base(cli)
-        if free_kas <= 0:
-            return
-
-        sellable_qty = min(pos_qty, free_kas)
-
-        # считаем целевые цены
-        p_mid, p_upper = build_sell_prices(pos_avg, last, upper)
-
-        # микросдвиг, если уже есть SELL на этих уровнях
-        open_sells = get_open_sells(sessT)
-        open_prices = {round(float(o.price or 0.0), 6) for o in open_sells}
-
-        # подвинем на SELL_MICROSHIFT, если уровень занят
-        def shift_if_taken(price: float) -> float:
-            p = float(price)
-            # ограничим число сдвигов, чтобы не уйти далеко
-            for _ in range(3):
-                r = round(p, 6)
-                if r not in open_prices:
-                    return p
-                p += float(SELL_MICROSHIFT)
-            return p
-
-        p_mid   = shift_if_taken(p_mid)
-        p_upper = shift_if_taken(p_upper)
-
-        # делим количество на две части
-        split = min(max(float(SELL_SPLIT), 0.0), 1.0)
-        q_upper = _floor6(sellable_qty * split)
-        q_mid   = _floor6(sellable_qty - q_upper)
-
-        # проверка минимального номинала для каждой заявки
-        def notional_ok(p, q) -> bool:
-            return (p * q) >= MIN_ORDER_USD and q > 0
-
-        # если обе не проходят — попробуем объединить в одну заявку на p_mid (ближе к рынку)
-        both_fail = (not notional_ok(p_mid, q_mid)) and (not notional_ok(p_upper, q_upper))
-        if both_fail:
-            q_one = _floor6(sellable_qty)
-            if notional_ok(p_mid, q_one):
-                try:
-                    place_limit_sell(cli, sessT, p_mid, q_one)
-                except Exception as e:
-                    try:
-                        send_error("sell.place", e)
-                    except Exception:
-                        pass
-            return
-
-        # если одна не проходит — переложим объём во вторую
-        if not notional_ok(p_mid, q_mid) and notional_ok(p_upper, q_upper):
-            q_upper = _floor6(q_upper + q_mid)
-            q_mid   = 0.0
-        elif not notional_ok(p_upper, q_upper) and notional_ok(p_mid, q_mid):
-            q_mid   = _floor6(q_mid + q_upper)
-            q_upper = 0.0
-
-        # ставим, что получилось
-        for price, qty in [(p_upper, q_upper), (p_mid, q_mid)]:
-            if notional_ok(price, qty):
+        # берём реальный свободный базовый ассет на бирже (защита от "Oversold")
+        free_base = exchange_free_base(cli, base)
+        book = OrderBook.load(sessT, pair)
+
+        if reconcile.ORDER_RECONCILE:
+            # желаемые SELL на всю позицию: наши стоящие SELL можно переставить
+            managed = book.sells.filter(lambda o: o.mode in reconcile.MANAGED_MODES)
+            rem = {o.id: max(0.0, float(o.qty or 0.0) - float(o.filled_qty or 0.0)) for o in managed}
+            # микросдвиг — только от чужих уровней (avg1, ручные)
+            others = OrderBook(o for o in book.sells if o.id not in rem).sells
+            target = plan_sells(last, upper, pos_qty, pos_avg, free_base + sum(rem.values()), others)
+            _, cancel, place = reconcile.diff(target, [(o.id, float(o.price or 0.0), rem[o.id]) for o in managed])
+            by_id = {o.id: o for o in managed}
+            if cancel:
+                n = reconcile.cancel_orders(cli, sessT, pair, [by_id[k] for k in cancel],
+                                            on_error=lambda e: send_error("sell.cancel", e), book=book)
+                if n < len(cancel):
+                    return  # объём не освободился целиком — доставим на следующем тике после sync
+            orders = place
+        else:
+            # микросдвиг, если уже есть SELL на этих уровнях (book.sells: «уровень занят» за O(1))
+            orders = plan_sells(last, upper, pos_qty, pos_avg, free_base, book.sells)
+
+        # ставим, что получилось (журнал намерений + один коммит результатов на пачку)
+        batch = [it for it in (sell_intent(p, q) for p, q, *_ in orders) if it is not None]
+        for r in intents.place_batch(cli, sessT, pair, batch):
+            if r.error is not None:
                 try:
-                    placed = place_limit_sell(cli, sessT, price, qty)
-                    if not placed:
-                        continue
-                except Exception as e:
-                    try:
-                        send_error("sell.place", e)
-                    except Exception:
-                        pass
+                    send_error("sell.place", r.error)
+                except Exception:
+                    pass
 
     except Exception as e:
         try:
@@ -232,4 +230,10 @@ def main():
         sessT.close()
 
 if __name__ == "__main__":
-    main()
+    import argparse
+    ap = argparse.ArgumentParser(description="SELL tick")
+    ap.add_argument("--pair", default=PAIR, help="символ пары (по умолчанию config.PAIR)")
+    args = ap.parse_args()
+    pc = get_pair(args.pair)
+    with strategy_params(pc.params):
+        main(pc.pair, pc.base)
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Перебор параметров стратегии через backtest.run на пуле процессов.
+
+Пространство поиска — сетка и/или случайные выборки по ключам config
+(BUY_INCHANNEL_LEVELS, BUY_BELOW_OFFSETS, BUY_SIZE_*, SELL_SPLIT, SELL_MIN_GAIN, ...):
+
+  python3 sweep.py --grid SELL_SPLIT=[0.3,0.5,0.7] --grid SELL_MIN_GAIN=[0.005,0.01,0.02]
+  python3 sweep.py --rand SELL_MIN_GAIN=uniform:0.003:0.03 \
+                   --rand "BUY_BELOW_OFFSETS=choice:[[0.005,0.01,0.015],[0.01,0.02,0.03]]" --samples 64
+  python3 sweep.py --space space.json      # {"grid": {...}, "random": {...}, "samples": N}
+
+Свечи один раз выгружаются в .npy и открываются воркерами через mmap (общие
+страницы, без копий на процесс). Каждый результат дописывается в results.jsonl
+под sha1(параметры + настройки прогона + id датасета): повторный запуск берёт
+готовое из кэша и досчитывает только недостающее (resume).
+"""
+import os
+import ast
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+import numpy as np
+
+import backtest
+
+SWEEP_DIR = os.path.join(os.getenv("EBOT_LOG_DIR", "/opt/Ebot/logs"), "sweep")
+COLS = ("t", "lo", "hi", "mid", "close")
+
+# ключ сортировки -> (поле summary, по убыванию?)
+RANK_KEYS = {
+    "pnl":    ("return_pct", True),
+    "dd":     ("max_drawdown_pct", False),
+    "util":   ("utilization_pct", True),
+    "orders": ("max_open_orders", False),
+}
+
+# ---------------- dataset (mmap) ----------------
+def dataset_id(c: Dict[str, np.ndarray], pair: str) -> str:
+    t = c["t"]
+    raw = f"{pair}:{len(t)}:{int(t[0]) if len(t) else 0}:{int(t[-1]) if len(t) else 0}:{float(c['close'].sum()):.10g}"
+    return hashlib.sha1(raw.encode()).hexdigest()[:16]
+
+def dump_dataset(c: Dict[str, np.ndarray], out_dir: str) -> str:
+    os.makedirs(out_dir, exist_ok=True)
+    for k in COLS:
+        p = os.path.join(out_dir, f"{k}.npy")
+        if not os.path.exists(p):
+            tmp = p + ".tmp.npy"
+            np.save(tmp, np.ascontiguousarray(c[k]))
+            os.replace(tmp, p)
+    return out_dir
+
+def open_dataset(path: str) -> Dict[str, np.ndarray]:
+    return {k: np.load(os.path.join(path, f"{k}.npy"), mmap_mode="r") for k in COLS}
+
+# ---------------- search space ----------------
+def _literal(v: str):
+    try:
+        return ast.literal_eval(v)
+    except (ValueError, SyntaxError):
+        return v
+
+def parse_grid(items) -> Dict[str, list]:
+    """NAME=[v1,v2,...]"""
+    out = {}
+    for it in items or []:
+        k, _, v = it.partition("=")
+        vals = _literal(v.strip())
+        out[k.strip()] = list(vals) if isinstance(vals, (list, tuple)) else [vals]
+    return out
+
+def parse_random(items) -> Dict[str, list]:
+    """NAME=uniform:a:b | loguniform:a:b | int:a:b | choice:[...]"""
+    out = {}
+    for it in items or []:
+        k, _, v = it.partition("=")
+        kind, _, rest = v.strip().partition(":")
+        if kind == "choice":
+            out[k.strip()] = ["choice", list(_literal(rest))]
+        else:
+            a, _, b = rest.partition(":")
+            out[k.strip()] = [kind, float(a), float(b)]
+    return out
+
+def _draw(rng: random.Random, spec: list):
+    kind = spec[0]
+    if kind == "choice":
+        return rng.choice(spec[1])
+    a, b = float(spec[1]), float(spec[2])
+    if kind == "uniform":
+        return round(rng.uniform(a, b), 6)
+    if kind == "loguniform":
+        return round(float(np.exp(rng.uniform(np.log(a), np.log(b)))), 6)
+    if kind == "int":
+        return rng.randint(int(a), int(b))
+    raise ValueError(f"unknown distribution: {kind}")
+
+def expand_space(grid: Dict[str, list], rand: Dict[str, list], samples: int, seed: int = 0) -> List[dict]:
+    """Декартово произведение сетки × samples случайных точек (если rand задан)."""
+    keys = sorted(grid)
+    combos = [dict(zip(keys, vals)) for vals in itertools.product(*(grid[k] for k in keys))] or [{}]
+    if not rand:
+        return combos
+    rng = random.Random(seed)
+    out = []
+    for base in combos:
+        for _ in range(max(1, samples)):
+            d = dict(base)
+            for k in sorted(rand):
+                d[k] = _draw(rng, rand[k])
+            out.append(d)
+    return out
+
+def config_hash(params: dict, opts: dict, ds: str) -> str:
+    raw = json.dumps({"params": params, "opts": opts, "ds": ds}, sort_keys=True, default=str)
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def check_params(candidates: List[dict]) -> None:
+    """Только ключи из backtest.STRATEGY_PARAMS — иначе перебор молча ничего не меняет."""
+    unknown = sorted({k for p in candidates for k in p if k not in backtest.STRATEGY_PARAMS})
+    if unknown:
+        raise SystemExit(f"unknown strategy params (not used by backtest): {', '.join(unknown)}")
+
+# ---------------- workers ----------------
+_DATA: Optional[Dict[str, np.ndarray]] = None
+
+def _init_worker(ds_path: str) -> None:
+    global _DATA
+    os.environ.setdefault("EBOT_METRICS", "0")
+    _DATA = open_dataset(ds_path)
+
+def _run_one(h: str, params: dict, opts: dict) -> dict:
+    t0 = time.perf_counter()
+    res = backtest.run(_DATA, params=params, **opts)
+    return {"hash": h, "params": params, "opts": opts, "summary": res["summary"],
+            "sec": round(time.perf_counter() - t0, 3), "ts": int(time.time())}
+
+# ---------------- cache / ranking ----------------
+def load_cache(path: str) -> Dict[str, dict]:
+    out = {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    r = json.loads(line)
+                    out[r["hash"]] = r
+                except (ValueError, KeyError):
+                    continue  # недописанная строка прерванного прогона
+    except OSError:
+        pass
+    return out
+
+def rank(rows: List[dict], key: str) -> List[dict]:
+    field, desc = RANK_KEYS[key]
+    return sorted(rows, key=lambda r: float(r["summary"].get(field, 0.0)), reverse=desc)
+
+def _fmt_params(p: dict) -> str:
+    return " ".join(f"{k}={json.dumps(v)}" for k, v in sorted(p.items()))
+
+def main():
+    ap = argparse.ArgumentParser(description="Перебор параметров стратегии на бэктесте (пул процессов)")
+    ap.add_argument("--db", default=getattr(backtest.CFG, "DB_PATH", "ebot.db"))
+    ap.add_argument("--pair", default=getattr(backtest.CFG, "PAIR", "KASUSDC"))
+    ap.add_argument("--days", type=float, default=0, help="последние N дней (0 — всё)")
+    ap.add_argument("--space", default="", help="JSON: {grid: {K: [..]}, random: {K: [kind, a, b]}, samples: N}")
+    ap.add_argument("--grid", action="append", metavar="NAME=[...]")
+    ap.add_argument("--rand", action="append", metavar="NAME=uniform:a:b")
+    ap.add_argument("--samples", type=int, default=32, help="случайных точек на узел сетки")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    ap.add_argument("--capital", type=float, default=None)
+    ap.add_argument("--fee-pct", type=float, default=None)
+    ap.add_argument("--touch", action="store_true")
+    ap.add_argument("--out", default=SWEEP_DIR, help="каталог кэша (датасеты + results.jsonl)")
+    ap.add_argument("--sort", choices=sorted(RANK_KEYS), default="pnl")
+    ap.add_argument("--top", type=int, default=20)
+    args = ap.parse_args()
+
+    grid, rand, samples = {}, {}, args.samples
+    if args.space:
+        with open(args.space, "r", encoding="utf-8") as f:
+            sp = json.load(f)
+        grid.update(sp.get("grid") or {})
+        rand.update(sp.get("random") or {})
+        samples = int(sp.get("samples", samples))
+    grid.update(parse_grid(args.grid))
+    rand.update(parse_random(args.rand))
+    candidates = expand_space(grid, rand, samples, args.seed)
+    check_params(candidates)
+
+    db = args.db
+    if "/" not in db and not os.path.exists(db):
+        db = os.path.join("/opt/Ebot", db)
+    ts_from = int(time.time() - args.days * backtest.DAY) if args.days > 0 else None
+    c = backtest.load_candles(db, args.pair, ts_from)
+    ds = dataset_id(c, args.pair)
+    ds_path = dump_dataset(c, os.path.join(args.out, "data", ds))
+    del c
+
+    opts = {"capital": args.capital, "fee_pct": args.fee_pct, "touch": args.touch, "seed": args.seed,
+            "reconcile_orders": backtest.reconcile.ORDER_RECONCILE}
+    res_path = os.path.join(args.out, "results.jsonl")
+    cache = load_cache(res_path)
+    jobs = []
+    for p in candidates:
+        h = config_hash(p, opts, ds)
+        if h not in cache:
+            jobs.append((h, p))
+    print(f"SWEEP {args.pair}: candidates={len(candidates)} cached={len(candidates) - len(jobs)} "
+          f"to_run={len(jobs)} workers={args.workers} dataset={ds}")
+
+    t0 = time.perf_counter()
+    if jobs:
+        with open(res_path, "a", encoding="utf-8") as out, \
+             ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker, initargs=(ds_path,)) as ex:
+            futs = {ex.submit(_run_one, h, p, opts): h for h, p in jobs}
+            for i, fut in enumerate(as_completed(futs), 1):
+                try:
+                    r = fut.result()
+                except Exception as e:
+                    print(f"  [{i}/{len(jobs)}] FAIL {futs[fut][:10]}: {e}", file=sys.stderr)
+                    continue
+                cache[r["hash"]] = r
+                out.write(json.dumps(r, ensure_ascii=False) + "\n")
+                out.flush()  # прерванный прогон продолжится с этого места
+                s = r["summary"]
+                print(f"  [{i}/{len(jobs)}] {s['return_pct']:+.2f}% dd={s['max_drawdown_pct']:.1f}% "
+                      f"{r['sec']:.1f}s {_fmt_params(r['params'])}")
+    print(f"done in {time.perf_counter() - t0:.1f}s")
+
+    wanted = {config_hash(p, opts, ds) for p in candidates}
+    rows = rank([cache[h] for h in wanted if h in cache], args.sort)
+    print(f"\n{'#':>3} {'pnl%':>8} {'maxDD%':>8} {'util%':>7} {'peakOO':>7} {'fills':>6}  params")
+    for i, r in enumerate(rows[:args.top], 1):
+        s = r["summary"]
+        print(f"{i:>3} {s['return_pct']:>8.2f} {s['max_drawdown_pct']:>8.2f} {s.get('utilization_pct', 0.0):>7.1f} "
+              f"{s['max_open_orders']:>7} {s['fills']:>6}  {_fmt_params(r['params'])}")
+
+if __name__ == "__main__":
+    main()
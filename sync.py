@@ -2,10 +2,12 @@
 # -*- coding: utf-8 -*-
 """
 Тихий синк раз в минуту:
-1) Импорт последних сделок (SYNC_WINDOW_MIN) -> fills (без дублей)
-2) Обновление открытых ордеров -> orders (upsert + filled_qty)
+1) Импорт новых сделок по курсору (trade_import.py) -> fills (без дублей)
+2) Обновление открытых ордеров -> orders (upsert + filled_qty); пропавшие —
+   финальный статус из allOrders (order_history.py)
 3) Баланс биржи -> capital.available_usd (limit_usd не трогаем)
-4) Пересчёт позиции qty/avg из всех fills -> position
+4) Инкрементальный журнал реализованного PnL (pnl_ledger) -> capital.realized_pnl,
+   позиция qty/avg — из его хвоста -> position
 Никаких сообщений в TG. Только БД.
 """
 import time
@@ -13,16 +15,25 @@ import math
 import re
 import logging
 from typing import Dict, List, Tuple
-from sqlalchemy import and_, func
+from sqlalchemy import and_, or_, func
 from models_trading import (
-    SessionT, Fill, Order, Position, Capital, init_trading_db
+    SessionT, Fill, Order, Position, Capital, PnlLedger, init_trading_db
 )
-from mexc_client import MexcClient
+from accounting import apply_fill
+from trade_import import import_trades
+import order_history
+from mexc_client import MexcClient, get_client
+from pairs import PairConfig, get_pair
+import events
+import metrics
+import tracing
 from config import (
     PAIR, QUOTE_ASSET,
     SYNC_WINDOW_MIN, SYNC_OPEN_LIMIT,
 )
 
+log = logging.getLogger("sync")
+
 def now_s():
     return int(time.time())
 def now_ms():
@@ -43,43 +54,18 @@ def _index_by(items: List[dict], key: str) -> Dict[str, dict]:
     return out
 
 # -------- TRADES -> fills --------
-def sync_trades(sess: SessionT, cli: MexcClient, window_min: int) -> int:
-    end   = now_ms()
-    start = end - window_min*60*1000
-    trades = cli.my_trades(PAIR, start, end, 1000) or []
-    inserted = 0
-    for t in trades:
-        fid = str(t.get("id") or t.get("tradeId") or t.get("orderId") or "")
-        if not fid:
-            continue
-        if sess.query(Fill).filter(Fill.id == fid).first():
-            continue
-        side  = str(t.get("side","")).upper() or ("BUY" if bool(t.get("isBuyer")) else "SELL")
-        price = _to_float(t.get("price") or t.get("p"))
-        qty   = _to_float(t.get("qty")   or t.get("q"))
-        fee   = _to_float(t.get("commission") or 0.0)
-        ts_ms = int(t.get("time") or t.get("T") or end)
-        row = Fill(
-            id=fid,
-            order_id=str(t.get("orderId") or ""),
-            pair=PAIR,
-            side=side,
-            price=price,
-            qty=qty,
-            fee=fee,
-            ts=ts_ms//1000,
-            mode=""
-        )
-        sess.add(row)
-        inserted += 1
-    if inserted:
-        sess.commit()
-    return inserted
+def sync_trades(sess: SessionT, cli: MexcClient, window_min: int, pair: str = PAIR) -> int:
+    """
+    Новые сделки пары -> fills по курсору (trade_import.py): страницы до «сейчас»,
+    без потерь при >1000 сделок или простое дольше окна. window_min — глубина
+    только для первого импорта пары (курсора ещё нет, fills пусты).
+    """
+    return import_trades(sess, cli, pair, lookback_min=window_min).inserted
 
 # ---- OPEN ORDERS -> orders (upsert + filled_qty) ----
-def _fills_by_order(sess: SessionT) -> Dict[str, Dict[str, float]]:
+def _fills_by_order(sess: SessionT, pair: str = PAIR) -> Dict[str, Dict[str, float]]:
     rows = (sess.query(Fill.order_id, Fill.side, func.sum(Fill.qty))
-                .filter(and_(Fill.pair == PAIR, Fill.order_id is not None))
+                .filter(and_(Fill.pair == pair, Fill.order_id is not None))
                 .group_by(Fill.order_id, Fill.side)
                 .all())
     agg: Dict[str, Dict[str, float]] = {}
@@ -90,16 +76,28 @@ def _fills_by_order(sess: SessionT) -> Dict[str, Dict[str, float]]:
         d[side] = float(s or 0.0)
     return agg
 
-def sync_open_orders(sess: SessionT, cli: MexcClient, limit: int) -> None:
-    data = cli.open_orders(PAIR, limit) or []
+_M_OPEN = metrics.gauge("open_orders", "Open orders on the exchange per side", ("pair", "side"))
+
+def _orders_by_id(sess: SessionT, ids) -> Dict[str, Order]:
+    ids, out = list(ids), {}
+    for i in range(0, len(ids), 500):
+        for o in sess.query(Order).filter(Order.id.in_(ids[i:i + 500])).all():
+            out[o.id] = o
+    return out
+
+def sync_open_orders(sess: SessionT, cli: MexcClient, limit: int, pair: str = PAIR) -> None:
+    data = cli.open_orders(pair, limit) or []
     ex_by_id = _index_by(data, "orderId")
+    for side in ("BUY", "SELL"):
+        _M_OPEN.set(sum(1 for it in data if str(it.get("side", "")).upper() == side), pair=pair, side=side)
 
     local_open = (sess.query(Order)
-                    .filter(and_(Order.pair == PAIR,
+                    .filter(and_(Order.pair == pair,
                                  Order.status.in_(("NEW","PARTIALLY_FILLED"))))
                     .all())
 
     # upsert по бирже
+    known = _orders_by_id(sess, ex_by_id.keys())
     for it in data:
         oid   = str(it.get("orderId"))
         side  = str(it.get("side","")).upper()
@@ -109,14 +107,15 @@ def sync_open_orders(sess: SessionT, cli: MexcClient, limit: int) -> None:
         status= str(it.get("status","NEW"))
         created = int(it.get("time") or it.get("transactTime") or now_ms())//1000
         updated = int(it.get("updateTime") or now_ms())//1000
-        o = sess.query(Order).filter(Order.id == oid).first()
+        o = known.get(oid)
         if not o:
             o = Order(
-                id=oid, pair=PAIR, side=side, price=price, qty=qty,
+                id=oid, pair=pair, side=side, price=price, qty=qty,
                 status=status, created=created, updated=updated,
-                paper=False, reserved=0.0, filled_qty=fqty, mode=""
+                paper=getattr(cli, "paper", False), reserved=0.0, filled_qty=fqty, mode=""
             )
             sess.add(o)
+            known[oid] = o
         else:
             o.price = price; o.qty = qty
             o.status = status
@@ -124,14 +123,13 @@ def sync_open_orders(sess: SessionT, cli: MexcClient, limit: int) -> None:
             o.filled_qty = fqty
     sess.commit()
 
-    # reconcile filled_qty из fills
-    fagg = _fills_by_order(sess)
+    # reconcile filled_qty из fills; сверенные с allOrders (quote_qty > 0) уже точные
+    fagg = _fills_by_order(sess, pair)
     touched = False
-    for oid, sums in fagg.items():
-        o = sess.query(Order).filter(Order.id == oid).first()
-        if not o:
+    for oid, o in _orders_by_id(sess, fagg.keys()).items():
+        if (o.quote_qty or 0.0) > 0:
             continue
-        exp = sums.get(o.side, 0.0)
+        exp = fagg[oid].get(o.side, 0.0)
         if abs((o.filled_qty or 0.0) - exp) > 1e-12:
             o.filled_qty = exp
             o.updated = now_s()
@@ -139,25 +137,34 @@ def sync_open_orders(sess: SessionT, cli: MexcClient, limit: int) -> None:
     if touched:
         sess.commit()
 
-    # закрыть локально те, которых нет на бирже
+    # пропавшие с биржи: предварительно по filled_qty, точный статус — из allOrders
     still_open_ids = set(ex_by_id.keys())
-    for o in local_open:
-        if o.id not in still_open_ids:
-            rem = max(0.0, (o.qty or 0.0) - (o.filled_qty or 0.0))
-            o.status = "FILLED" if rem <= 1e-12 else "CANCELED"
-            o.updated = now_s()
+    gone = [o for o in local_open if o.id not in still_open_ids]
+    for o in gone:
+        rem = max(0.0, (o.qty or 0.0) - (o.filled_qty or 0.0))
+        o.status = "FILLED" if rem <= 1e-12 else "CANCELED"
+        o.updated = now_s()
+    order_history.enqueue(sess, gone)
     sess.commit()
+    rep = order_history.resolve(sess, cli, pair)
+    if rep.queued:
+        log.info(rep.summary())
 
 # -------- BALANCE -> capital.available_usd --------
-def sync_balance(sess: SessionT, cli: MexcClient) -> None:
+def sync_balance(sess: SessionT, cli: MexcClient, pair: str = PAIR, quote: str = QUOTE_ASSET,
+                 share: float = 1.0) -> None:
+    """
+    Свободный QUOTE -> capital.available_usd пары. Несколько пар на одной котировке
+    делят её по share (pairs.PairConfig.quote_share).
+    """
     acct = cli.account() or {}
     bals = acct.get("balances") or []
     by_asset = {b.get("asset"): b for b in bals}
-    usdc = by_asset.get(QUOTE_ASSET, {})
-    avail_usd = _to_float(usdc.get("free"))
-    cap = sess.query(Capital).filter(Capital.pair == PAIR).first()
+    usdc = by_asset.get(quote, {})
+    avail_usd = _to_float(usdc.get("free")) * float(share)
+    cap = sess.query(Capital).filter(Capital.pair == pair).first()
     if not cap:
-        cap = Capital(pair=PAIR, limit_usd=1000.0, available_usd=avail_usd,
+        cap = Capital(pair=pair, limit_usd=1000.0, available_usd=avail_usd,
                       realized_pnl=0.0, updated=now_s())
         sess.add(cap)
     else:
@@ -165,54 +172,126 @@ def sync_balance(sess: SessionT, cli: MexcClient) -> None:
         cap.updated = now_s()
     sess.commit()
 
+# -------- Realized PnL ledger (incremental) --------
+
+def _ledger_tail(sess: SessionT, pair: str):
+    return (sess.query(PnlLedger)
+                .filter(PnlLedger.pair == pair)
+                .order_by(PnlLedger.ts.desc(), PnlLedger.fill_id.desc())
+                .first())
+
+def update_realized_pnl(sess: SessionT, pair: str = PAIR, full: bool = False) -> Tuple[float, float, float]:
+    """
+    Досчитывает pnl_ledger по новым fills (порядок ts, id — как recompute_position)
+    и пишет нарастающий итог в capital.realized_pnl. Если появились fills старше
+    хвоста журнала (поздний импорт) — журнал откатывается до них и доигрывается.
+    full=True — полная перестройка. Возвращает (qty, cost, realized_total).
+    """
+    if full:
+        sess.query(PnlLedger).filter(PnlLedger.pair == pair).delete(synchronize_session=False)
+        tail = None
+    else:
+        tail = _ledger_tail(sess, pair)
+        if tail is not None:
+            # без ограничения по возрасту: trade_import --since / перечитывание после простоя
+            # вставляют fills сколь угодно старше хвоста; anti-join идёт по PK fill_id
+            late = (sess.query(Fill.ts, Fill.id)
+                        .outerjoin(PnlLedger, PnlLedger.fill_id == Fill.id)
+                        .filter(Fill.pair == pair, PnlLedger.fill_id.is_(None))
+                        .order_by(Fill.ts.asc(), Fill.id.asc())
+                        .first())
+            if late is not None and (int(late.ts), str(late.id)) < (int(tail.ts), str(tail.fill_id)):
+                (sess.query(PnlLedger)
+                     .filter(PnlLedger.pair == pair,
+                             or_(PnlLedger.ts > late.ts,
+                                 and_(PnlLedger.ts == late.ts, PnlLedger.fill_id > late.id)))
+                     .delete(synchronize_session=False))
+                tail = _ledger_tail(sess, pair)
+
+    qty  = float(tail.pos_qty) if tail else 0.0
+    cost = float(tail.pos_cost) if tail else 0.0
+    cum  = float(tail.realized_cum) if tail else 0.0
+
+    q = sess.query(Fill).filter(Fill.pair == pair)
+    if tail is not None:
+        q = q.filter(or_(Fill.ts > tail.ts, and_(Fill.ts == tail.ts, Fill.id > tail.fill_id)))
+    rows = []
+    for f in q.order_by(Fill.ts.asc(), Fill.id.asc()).all():
+        side = str(f.side or "").upper()
+        qty, cost, realized = apply_fill(qty, cost, side, float(f.qty or 0.0),
+                                         float(f.price or 0.0), float(f.fee or 0.0))
+        cum += realized
+        rows.append(dict(fill_id=f.id, pair=pair, ts=int(f.ts), side=side,
+                         qty=float(f.qty or 0.0), price=float(f.price or 0.0), fee=float(f.fee or 0.0),
+                         realized=realized, realized_cum=cum, pos_qty=qty, pos_cost=cost))
+    if rows:
+        sess.bulk_insert_mappings(PnlLedger, rows)
+
+    cap = sess.query(Capital).filter(Capital.pair == pair).first()
+    if not cap:
+        cap = Capital(pair=pair, limit_usd=1000.0, available_usd=0.0, realized_pnl=cum, updated=now_s())
+        sess.add(cap)
+    elif abs(float(cap.realized_pnl or 0.0) - cum) > 1e-12:
+        cap.realized_pnl = cum
+        cap.updated = now_s()
+    sess.commit()
+    return qty, cost, cum
+
+def realized_pnl_between(sess: SessionT, ts_from: int, ts_to: int, pair: str = PAIR) -> float:
+    """Реализованный PnL за окно [ts_from, ts_to] — диапазонная сумма по индексу (pair, ts)."""
+    r = (sess.query(func.coalesce(func.sum(PnlLedger.realized), 0.0))
+             .filter(PnlLedger.pair == pair, PnlLedger.ts >= int(ts_from), PnlLedger.ts <= int(ts_to))
+             .scalar())
+    return float(r or 0.0)
+
 # -------- Recompute position from fills --------
-def recompute_position(sess: SessionT) -> Tuple[float, float]:
-    fills = (sess.query(Fill)
-                .filter(Fill.pair == PAIR)
-                .order_by(Fill.ts.asc(), Fill.id.asc())
-                .all())
-    qty = 0.0
-    cost = 0.0
-    for f in fills:
-        if f.side == "BUY":
-            qty  += f.qty
-            cost += f.qty * f.price + (f.fee or 0.0)
-        else:
-            if qty <= 0:
-                qty = 0.0; cost = 0.0
-                continue
-            sell_q = min(qty, f.qty)
-            avg = (cost/qty) if qty > 1e-12 else 0.0
-            cost -= avg * sell_q
-            qty  -= sell_q
+def recompute_position(sess: SessionT, full: bool = False, pair: str = PAIR) -> Tuple[float, float]:
+    """Позиция = хвост pnl_ledger (та же avg-cost логика), без полного прохода по fills."""
+    qty, cost, _ = update_realized_pnl(sess, pair, full=full)
+    if qty <= 0:
+        qty = 0.0
     avg = (cost/qty) if qty > 1e-12 else 0.0
-    p = sess.query(Position).filter(Position.pair == PAIR).first()
+    p = sess.query(Position).filter(Position.pair == pair).first()
     if not p:
-        p = Position(pair=PAIR, qty=qty, avg=avg, updated=now_s())
+        p = Position(pair=pair, qty=qty, avg=avg, updated=now_s())
         sess.add(p)
     else:
         p.qty = qty; p.avg = avg; p.updated = now_s()
     sess.commit()
     return qty, avg
 
-def main(window_min: int = SYNC_WINDOW_MIN, open_limit: int = SYNC_OPEN_LIMIT):
+def sync_pair(cli: MexcClient, pc: PairConfig, window_min: int = SYNC_WINDOW_MIN,
+              open_limit: int = SYNC_OPEN_LIMIT, rebuild_pnl: bool = False) -> None:
+    """Полный синк одной пары (engine.py зовёт его с общим клиентом)."""
+    with tracing.span("sync.main", window_min=window_min, pair=pc.pair):
+        init_trading_db()
+        sess = SessionT()
+        try:
+            with tracing.span("sync.trades"):
+                n_new = sync_trades(sess, cli, window_min, pc.pair)
+            with tracing.span("sync.open_orders"):
+                sync_open_orders(sess, cli, open_limit, pc.pair)
+            with tracing.span("sync.balance"):
+                sync_balance(sess, cli, pc.pair, pc.quote, pc.quote_share)
+            with tracing.span("sync.position"):
+                recompute_position(sess, full=rebuild_pnl, pair=pc.pair)
+        finally:
+            sess.close()
+    if n_new:
+        # событийный режим engine.py: новые сделки будят buy/sell пары
+        events.bus.publish("fill", pair=pc.pair, n=n_new)
+
+def main(window_min: int = SYNC_WINDOW_MIN, open_limit: int = SYNC_OPEN_LIMIT, rebuild_pnl: bool = False,
+         pair: str = None):
     try:
         from logging_config import setup_logging
         setup_logging()
     except Exception:
         pass
     log = logging.getLogger(__name__)
-    log.info("sync start window_min=%s open_limit=%s", window_min, open_limit)
-    init_trading_db()
-    sess = SessionT()
-    cli  = MexcClient()
-    try:
-        sync_trades(sess, cli, window_min)
-        sync_open_orders(sess, cli, open_limit)
-        sync_balance(sess, cli)
-        recompute_position(sess)
-    finally:
-        sess.close()
+    pc = get_pair(pair)
+    log.info("sync start pair=%s window_min=%s open_limit=%s", pc.pair, window_min, open_limit)
+    sync_pair(get_client(), pc, window_min, open_limit, rebuild_pnl)
 
 def _parse_window_to_minutes(val) -> int:
     """
@@ -257,7 +336,10 @@ if __name__ == "__main__":
         default=SYNC_OPEN_LIMIT,
         help="Максимум открытых ордеров за раз (по умолчанию из config.SYNC_OPEN_LIMIT)",
     )
+    ap.add_argument("--pair", default=None, help="символ пары (по умолчанию config.PAIR)")
+    ap.add_argument("--rebuild-pnl", action="store_true",
+                    help="Перестроить pnl_ledger/позицию с нуля по всем fills")
     args = ap.parse_args()
     window_min = _parse_window_to_minutes(args.window)
     open_limit = max(10, min(2000, int(args.open_limit)))
-    main(window_min=window_min, open_limit=open_limit)
+    main(window_min=window_min, open_limit=open_limit, rebuild_pnl=args.rebuild_pnl, pair=args.pair)
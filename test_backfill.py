@@ -0,0 +1,53 @@
+import sqlite3
+
+import backfill
+
+
+def _klines(pair, a_ms, b_ms, limit, skip=()):
+    out = []
+    for t in range(a_ms // 1000, b_ms // 1000 + 60, 60):
+        if t in skip:
+            continue
+        p = 1.0 + t % 7 / 100
+        out.append([t * 1000, str(p), str(p + 0.01), str(p - 0.01), str(p), "1", t * 1000 + 59999, "1"])
+    return out[:limit]
+
+
+def test_chunks_cover_range_without_overlap():
+    parts = backfill.chunks(60 * 10 + 5, 60 * 2510, size=1000)
+    assert parts == [(600, 60600), (60600, 120600), (120600, 150600)]
+    assert backfill.chunks(600, 600) == []
+
+
+def test_backfill_pages_validates_and_upserts(tmp_path):
+    db = str(tmp_path / "m.db")
+    start, end = 1_700_000_040, 1_700_000_040 + 2500 * 60
+    hole = start + 234 * 60
+    calls = []
+
+    def fetch(pair, a_ms, b_ms, limit):
+        calls.append((a_ms, b_ms, limit))
+        rows = _klines(pair, a_ms, b_ms, limit, skip={hole})
+        if a_ms // 1000 == start:
+            rows.append(rows[0])                                  # дубль
+            rows.append([(end + 60) * 1000, "1", "1", "1", "1"])  # чужая минута
+        if len(calls) == 2:
+            raise RuntimeError("429")
+        return rows
+
+    seen = []
+    rep = backfill.backfill("P", start, end, db_path=db, fetch=fetch, workers=1, rate=0, size=1000,
+                            progress=lambda *a: seen.append(a))
+    assert rep.chunks == 3 and len(calls) == 3 and len(seen) == 3
+    assert all(limit <= 1000 for _, _, limit in calls)
+    assert [a for a, _ in rep.errors] == [start + 1000 * 60]
+    assert rep.candles == 1500 - 1 and rep.missing == [hole]
+
+    # повтор только упавшего куска — upsert без дублей
+    rep2 = backfill.backfill("P", start + 1000 * 60, start + 2000 * 60, db_path=db,
+                             fetch=lambda *a: _klines(*a), rate=0)
+    assert rep2.candles == 1000 and not rep2.errors
+    conn = sqlite3.connect(db)
+    n, lo, hi = conn.execute("SELECT COUNT(*), MIN(time), MAX(time) FROM minmax WHERE pair='P'").fetchone()
+    assert (n, lo, hi) == (2499, start, end - 60)
+    assert backfill.last_saved_time(conn, "P") == end - 60
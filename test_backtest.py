@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+
+import backtest
+
+
+def _candles(n=3 * 1440, seed=3):
+    rng = np.random.default_rng(seed)
+    t = 1_700_000_000 + 60 * np.arange(n, dtype=np.int64)
+    close = 0.1 * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    hi = close * (1 + np.abs(rng.normal(0, 0.001, n)))
+    lo = close * (1 - np.abs(rng.normal(0, 0.001, n)))
+    return {"t": t, "lo": lo, "hi": hi, "mid": (lo + hi) / 2, "close": close}
+
+
+def test_channel_matches_bruteforce():
+    c = _candles()
+    idx = np.array([1440, 2000, len(c["t"]) - 1])
+    lower, upper = backtest.channel_at(c["t"], c["lo"], c["hi"], c["mid"], idx)
+    for k, i in enumerate(idx):
+        w = c["t"] >= c["t"][i] - backtest.DAY
+        w[i + 1:] = False
+        mid24 = c["mid"][w].mean()
+        spread = c["hi"][w].max() - c["lo"][w].min()
+        assert lower[k] == pytest.approx(mid24 - spread / 4)
+        assert upper[k] == pytest.approx(mid24 + spread / 4)
+
+
+def test_run_is_consistent_and_reproducible():
+    c = _candles()
+    r1 = backtest.run(c, capital=100.0, buy_interval=300, sell_interval=300, fee_pct=0.1, seed=7)
+    r2 = backtest.run(c, capital=100.0, buy_interval=300, sell_interval=300, fee_pct=0.1, seed=7)
+    s = r1["summary"]
+    assert s == r2["summary"]
+    assert s["buys"] > 0
+    assert s["end_cash"] >= -1e-9 and s["end_base"] >= -1e-9
+    assert s["end_equity"] == pytest.approx(s["end_cash"] + s["end_base"] * c["close"][-1])
+    assert s["realized_pnl"] == pytest.approx(float(np.sum(r1["fills"]["realized"])))
+
+    with backtest.patched({"SELL_MIN_GAIN": 0.5}):
+        assert backtest.sell.SELL_MIN_GAIN == 0.5
+    assert backtest.sell.SELL_MIN_GAIN != 0.5
+
+
+@pytest.mark.parametrize("estimator", ["spread4", "minmax", "ewma", "quantile"])
+def test_channel_matches_channel_engine(estimator):
+    c = _candles(n=1440)
+    idx = np.array([60, 300, 301, 1000, len(c["t"]) - 1])
+    lower, upper = backtest.channel_at(c["t"], c["lo"], c["hi"], c["mid"], idx, 3600, estimator)
+    eng = backtest.channels.ChannelEngine("P", {"1h": 60})
+    for k, i in enumerate(idx):
+        for j in range(int(i) + 1):
+            eng.push(int(c["t"][j]), c["lo"][j], c["hi"][j], c["mid"][j])
+        exp = eng.channel("1h", estimator)[:2]
+        assert (lower[k], upper[k]) == pytest.approx(exp, rel=1e-9)
+    with pytest.raises(ValueError):
+        backtest.channel_at(c["t"], c["lo"], c["hi"], c["mid"], idx, 3600, "nope")
+
+
+def test_run_uses_side_channel_window_and_estimator():
+    c = _candles()
+    kw = dict(capital=100.0, buy_interval=300, sell_interval=300, fee_pct=0.1, seed=7)
+    base = backtest.run(c, **kw)["summary"]
+    same = backtest.run(c, params={"BUY_CHANNEL_WINDOW": "24h", "BUY_CHANNEL_ESTIMATOR": "spread4"}, **kw)
+    assert same["summary"] == base
+    buy_only = backtest.run(c, params={"BUY_CHANNEL_WINDOW": "1h", "BUY_CHANNEL_ESTIMATOR": "minmax"}, **kw)
+    both = backtest.run(c, params={"BUY_CHANNEL_WINDOW": "1h", "BUY_CHANNEL_ESTIMATOR": "minmax",
+                                   "SELL_CHANNEL_WINDOW": "1h", "SELL_CHANNEL_ESTIMATOR": "ewma"}, **kw)
+    assert buy_only["summary"] != base and both["summary"] != buy_only["summary"]
+    assert backtest.buy.BUY_CHANNEL_WINDOW == "24h"                  # подмена снята
+    with pytest.raises(ValueError):
+        backtest.run(c, params={"SELL_CHANNEL_WINDOW": "5m"}, **kw)
@@ -0,0 +1,35 @@
+import importlib.util
+import os
+
+import candles
+import channels
+import reports.core as core
+
+_p = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools", "bench.py")
+_spec = importlib.util.spec_from_file_location("bench", _p)
+bench = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(bench)
+
+
+def test_all_cases_run_on_small_db(tmp_path, monkeypatch):
+    # кейсы переназначают БД модулей — вернуть после теста
+    for mod, attr in ((channels, "DB_PATH"), (candles, "SessionLocal"), (candles, "CANDLE_RETENTION_SEC"),
+                      (core, "DB_PATH"), (core, "PAIR")):
+        monkeypatch.setattr(mod, attr, getattr(mod, attr))
+    monkeypatch.setattr(channels, "_ENGINES", {})
+    data = bench.run(sizes=[500], repeat=1, cache_dir=str(tmp_path), log=lambda *_: None)
+    res = data["results"]
+    assert set(res) == {f"{k}@500" for k in bench.CASES}
+    assert all(r["runs"] == 1 and r["median"] > 0 for r in res.values())
+    assert not [f for f in os.listdir(tmp_path) if f.startswith("work_")]
+
+
+def test_compare_flags_only_real_regressions():
+    base = {"results": {"a@1": {"median": 0.100}, "b@1": {"median": 0.0001}, "c@1": {"median": 0.1},
+                        "d@1": {"median": 0.1}}}
+    new = {"results": {"a@1": {"median": 0.150}, "b@1": {"median": 0.0005}, "c@1": {"median": 0.05},
+                       "e@1": {"median": 0.1}}}
+    rows = {r["key"]: r["status"] for r in bench.compare(base, new, threshold=20, min_ms=1)}
+    assert rows == {"a@1": "REGRESSION", "b@1": "ok", "c@1": "faster", "d@1": "gone", "e@1": "new"}
+    assert bench.print_compare(bench.compare(base, new)) == 1
+    assert bench.print_compare(bench.compare(base, base)) == 0
@@ -0,0 +1,97 @@
+import importlib.util
+import os
+import random
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+
+import fills_daily
+import models_trading as mt
+
+_p = os.path.join(os.path.dirname(os.path.abspath(__file__)), "scripts", "calc_balances.py")
+_spec = importlib.util.spec_from_file_location("calc_balances", _p)
+calc = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(calc)
+
+DAY = 86400
+T0 = 1_700_000_000 // DAY * DAY
+
+
+@pytest.fixture
+def conn(tmp_path):
+    path = str(tmp_path / "t.db")
+    eng = create_engine(f"sqlite:///{path}")
+    mt.Base.metadata.create_all(eng)
+    eng.dispose()
+    c = sqlite3.connect(path)
+    yield c
+    c.close()
+
+
+def _fills(c, rng, lo, hi, n, start=0):
+    rows = [(f"F{start + i}", "O", "P", rng.choice(("BUY", "SELL", "buy")), round(rng.uniform(0.08, 0.1), 6),
+             round(rng.uniform(1, 100), 2), round(rng.uniform(0, 0.05), 4), rng.randrange(lo, hi), "")
+            for i in range(n)]
+    c.executemany("INSERT INTO fills(id, order_id, pair, side, price, qty, fee, ts, mode) VALUES(?,?,?,?,?,?,?,?,?)", rows)
+    c.commit()
+
+
+RANGES = [(None, None), (T0, T0 + 5 * DAY - 1), (T0 + 3600, T0 + 4 * DAY + 7200),
+          (T0 + 100, T0 + 200), (T0 - DAY, T0 + DAY // 2), (T0 + 2 * DAY + 1, None), (None, T0 + 3 * DAY - 2)]
+
+
+def _check(c):
+    assert fills_daily.verify(c) == []
+    for lo, hi in RANGES:
+        rolled = calc.calc_periods(c, "P", lo, hi, ("day", "week", "total"))
+        direct = calc.calc_periods(c, "P", lo, hi, ("day", "week", "total"), use_rollup=False)
+        assert len(rolled) == len(direct), (lo, hi)
+        for a, b in zip(rolled, direct):
+            assert a.keys() == b.keys()
+            for k in a:
+                assert a[k] == pytest.approx(b[k], abs=1e-9), (lo, hi, a["period"], k)
+
+
+def test_rollup_matches_scan_after_insert_update_delete(conn):
+    rng = random.Random(5)
+    _fills(conn, rng, T0 - DAY, T0 + 6 * DAY, 400)               # до триггеров — ensure заполнит свод
+    assert fills_daily.ensure(conn) is True and fills_daily.ensure(conn) is False
+    _check(conn)
+
+    _fills(conn, rng, T0, T0 + 5 * DAY, 300, start=400)
+    _check(conn)
+    for i in rng.sample(range(700), 150):                          # сдвиг через границу дня, цена, сторона
+        conn.execute("UPDATE fills SET ts = ts + ?, price = price * 1.01, side = ? WHERE id = ?",
+                     (rng.randrange(-DAY, DAY), rng.choice(("BUY", "SELL")), f"F{i}"))
+    conn.commit()
+    _check(conn)
+    conn.execute("DELETE FROM fills WHERE id IN (SELECT id FROM fills ORDER BY RANDOM() LIMIT 200)")
+    conn.commit()
+    _check(conn)
+
+    conn.execute("UPDATE fills_daily SET qty = qty + 1 WHERE rowid = (SELECT MIN(rowid) FROM fills_daily)")
+    conn.commit()
+    assert len(fills_daily.verify(conn)) == 1
+    fills_daily.rebuild(conn)
+    _check(conn)
+
+
+def test_report_does_not_install_schema(conn):
+    _fills(conn, random.Random(1), T0, T0 + 2 * DAY, 50)
+    rows = calc.calc_periods(conn, "P", None, None, ("total",))
+    assert rows[0]["n_buys"] + rows[0]["n_sells"] == 50
+    assert not fills_daily.exists(conn)
+    assert conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type='trigger'").fetchone()[0] == 0
+
+
+def test_init_trading_db_owns_the_rollup(tmp_path, monkeypatch):
+    eng = create_engine(f"sqlite:///{tmp_path / 'ebot.db'}")
+    monkeypatch.setattr(mt, "_engine", eng)
+    mt.init_trading_db()
+    c = sqlite3.connect(str(tmp_path / "ebot.db"))
+    names = {r[0] for r in c.execute("SELECT name FROM sqlite_master")}
+    assert {"fills_daily", "trg_fills_daily_ins", "trg_fills_daily_upd", "trg_fills_daily_del",
+            "order_stats"} <= names
+    c.close()
+    eng.dispose()
@@ -0,0 +1,66 @@
+import sqlite3
+import time
+
+import pytest
+
+import cancels
+import models_trading as mt
+import paper_client
+
+
+@pytest.fixture
+def cli(tmp_path):
+    market = tmp_path / "market.db"
+    m = sqlite3.connect(market)
+    m.execute("CREATE TABLE minmax(pair TEXT, time INTEGER, min REAL, max REAL, mid REAL, open REAL, close REAL)")
+    m.execute("INSERT INTO minmax VALUES('KASUSDC', ?, 1.0, 1.0, 1.0, 1.0, 1.0)", (int(time.time()) // 60 * 60 - 600,))
+    m.commit()
+    m.close()
+    return paper_client.PaperMexcClient(db_path=str(tmp_path / "paper.db"), market_db=str(market),
+                                        price_source="db", start_usd=100.0)
+
+
+def _local(s, resp, side, price, qty):
+    s.add(mt.Order(id=str(resp["orderId"]), pair="KASUSDC", side=side, price=price, qty=qty,
+                   status="NEW", created=0, updated=0))
+    s.commit()
+
+
+def test_cancel_side_filters_side_and_marks_in_one_pass(cli, sess):
+    buys = [cli.place_order("KASUSDC", "BUY", price=0.9 - i * 0.01, qty=10) for i in range(5)]
+    cli.place_order("KASUSDC", "BUY", price=0.5, qty=10)          # биржевой, но не в нашей БД
+    for i, r in enumerate(buys):
+        _local(sess, r, "BUY", 0.9 - i * 0.01, 10)
+    _local(sess, {"orderId": "ghost"}, "BUY", 0.8, 1)              # локальный, на бирже нет
+    rep = cancels.cancel_side(cli, sess, "KASUSDC", "BUY")
+    assert rep.method == "bulk" and len(rep.canceled) == 6 and rep.failed == []
+    assert rep.marked == 5 and rep.released_sec is not None
+    assert cli.open_orders("KASUSDC") == []
+    st = dict(sess.query(mt.Order.id, mt.Order.status).all())
+    assert st.pop("ghost") == "NEW"                                # исчезнувшие закрывает sync
+    assert set(st.values()) == {"CANCELED"}
+    assert cancels.cancel_side(cli, sess, "KASUSDC", "BUY").method == "none"
+
+
+def test_cancel_side_keeps_other_side_and_confirms_once():
+    class Cli:
+        book = {"1": "BUY", "2": "BUY", "3": "SELL", "4": "BUY"}
+        listed = 0
+
+        def open_orders(self, pair):
+            Cli.listed += 1
+            return [{"orderId": k, "side": v, "symbol": pair} for k, v in self.book.items()]
+
+        def cancel_order(self, pair, oid, side=""):
+            if oid == "2":
+                self.book.pop(oid)                 # успел исполниться
+                raise RuntimeError("Unknown order")
+            if oid == "4":
+                raise RuntimeError("busy")         # так и висит
+            self.book.pop(oid)
+
+    rep = cancels.cancel_side(Cli(), None, "KASUSDC", "BUY", workers=2)
+    assert rep.method == "each" and Cli.listed == 2
+    assert {k: r.state for k, r in rep.results.items()} == {"1": "CANCELED", "2": "GONE", "4": "OPEN"}
+    assert rep.failed == ["4"] and rep.released_sec is None
+    assert Cli.book == {"3": "SELL", "4": "BUY"}
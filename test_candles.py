@@ -0,0 +1,105 @@
+import asyncio
+import json
+import time
+import types
+
+import websockets
+
+import candles
+import marketdata
+
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if not n:
+            out.append(b)
+            return bytes(out)
+        out.append(b | 0x80)
+
+
+def _ld(no, payload):
+    payload = payload.encode() if isinstance(payload, str) else payload
+    return _varint(no << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _deal(price):
+    item = _ld(1, price) + _ld(2, "1") + _varint(3 << 3) + _varint(1) + _varint(4 << 3) + _varint(1700000000123)
+    return _ld(1, "spot@public.aggre.deals.v3.api.pb@100ms@KASUSDC") + _ld(314, _ld(1, item)) + _ld(3, "KASUSDC")
+
+
+def test_backoff_grows_with_jitter_and_cap():
+    d = [candles.backoff_delay(a, base=1.0, cap=8.0) for a in range(1, 7)]
+    assert 0.5 <= d[0] <= 1.0 and 2.0 <= d[2] <= 4.0 and all(4.0 <= x <= 8.0 for x in d[4:])
+    assert candles.pong_for({"method": "PING", "id": 7}) == {"method": "PONG", "id": 7}
+    assert candles.pong_for({"code": 0, "id": 1}) is None
+
+
+def test_service_replays_subscription_and_writes_off_loop(tmp_path, monkeypatch):
+    monkeypatch.setattr(candles, "WS_BACKOFF_BASE_SEC", 0.01)
+    monkeypatch.setattr(candles, "WS_BACKOFF_MAX_SEC", 0.02)
+    subs, pongs = [], []
+    written = []
+
+    def slow_write(rows, pair):
+        time.sleep(0.3)                            # «медленный SQLite»
+        written.append((pair, len(rows)))
+
+    async def scenario():
+        async def handler(conn):
+            sub = json.loads(await conn.recv())
+            subs.append(sub["params"])
+            await conn.send(json.dumps({"code": 0, "id": 1, "msg": "ok"}))
+            if len(subs) == 1:
+                await conn.send(json.dumps({"method": "PING", "id": 5}))
+                pongs.append(json.loads(await conn.recv()))
+                await conn.send(_deal("0.0861"))
+                return                             # обрыв -> переподключение
+            svc.writes.put_nowait(("KASUSDC", [[0, "1", "1", "1", "1"]]))
+            await asyncio.sleep(0.05)              # запись идёт, кадры обрабатываются
+            await conn.send(_deal("0.0862"))
+            await asyncio.sleep(0.05)
+            assert marketdata.Reader("KASUSDC", str(tmp_path)).read().last == 0.0862
+            assert written == []
+            svc.stop.set()
+            await conn.wait_closed()
+
+        async with websockets.serve(handler, "127.0.0.1", 0) as server:
+            port = server.sockets[0].getsockname()[1]
+            svc = candles.CandleService(["KASUSDC"], url=f"ws://127.0.0.1:{port}", fetch=lambda p: [],
+                                        write=slow_write, startup=None, md_dir=str(tmp_path))
+            await asyncio.wait_for(svc.run(), 10)
+            return svc
+
+    svc = asyncio.run(scenario())
+    assert svc.connects == 2 and svc.subscribed == 2
+    assert subs[0] == subs[1] and "spot@public.kline.v3.api.pb@KASUSDC@Min1" in subs[0]
+    assert pongs == [{"method": "PONG", "id": 5}]
+    assert written == [("KASUSDC", 1)]             # очередь дописана при остановке
+
+
+def test_metrics_flush_once_per_minute_cycle(monkeypatch):
+    flushes, fetched = [], []
+    monkeypatch.setattr(candles.metrics, "flush", lambda *a, **k: flushes.append(len(fetched)))
+    # «сейчас» всегда 59.9 -> до следующей минуты (+MINUTE_FETCH_DELAY) 0.3 с
+    monkeypatch.setattr(candles, "time", types.SimpleNamespace(time=lambda: 59.9, monotonic=time.monotonic))
+
+    def fetch(pair):
+        fetched.append(pair)
+        return [[0, "1", "1", "1", "1"]]
+
+    async def scenario():
+        svc = candles.CandleService(["KASUSDC", "ALPHUSDC"], fetch=fetch, write=lambda rows, pair: None,
+                                    startup=None)
+        task = asyncio.create_task(svc.minute_loop())
+        while svc.writes.qsize() < 4:              # два цикла по двум парам
+            await asyncio.sleep(0.01)
+        svc.stop.set()
+        await task
+        return svc
+
+    svc = asyncio.run(scenario())
+    assert flushes == [0, 2]                   # одно слияние на цикл, до опроса пар
+    assert svc.writes.qsize() == 4
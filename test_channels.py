@@ -0,0 +1,64 @@
+import random
+import sqlite3
+import statistics
+
+import pytest
+
+import channels
+
+
+def _candles(n, t0=1_700_000_000, seed=0):
+    rng = random.Random(seed)
+    out, t, p = [], t0, 0.09
+    for _ in range(n):
+        t += 60 * (1 if rng.random() > 0.05 else rng.randint(2, 30))   # с дырами
+        p *= 1.0 + rng.gauss(0.0, 0.002)
+        lo, hi = p * (1 - rng.uniform(0, 0.003)), p * (1 + rng.uniform(0, 0.003))
+        out.append((t, lo, hi, (lo + hi) / 2))
+    return out
+
+
+def test_windows_match_bruteforce():
+    rows = _candles(3000)
+    eng = channels.ChannelEngine("P", {"1h": 60, "4h": 240, "24h": 1440}, step_pct=0.01)
+    for i, (t, lo, hi, mid) in enumerate(rows):
+        eng.push(t, lo, hi, mid)
+        if i % 97:
+            continue
+        for name, minutes in (("1h", 60), ("4h", 240), ("24h", 1440)):
+            win = [r for r in rows[:i + 1] if r[0] >= t - minutes * 60]
+            st = eng.stats(name)
+            assert st["n"] == len(win)
+            assert st["min"] == min(r[1] for r in win) and st["max"] == max(r[2] for r in win)
+            assert st["mean"] == pytest.approx(statistics.fmean(r[3] for r in win), rel=1e-9)
+            med = sorted(r[3] for r in win)[(len(win) - 1) // 2]
+            assert eng.quantile(name, 0.5) == pytest.approx(med, rel=2e-4)
+    assert not eng.push(rows[-1][0], 1, 1, 1)                      # повтор минуты — игнор
+
+
+def test_spread4_equals_old_channel_and_refresh_is_incremental(tmp_path):
+    db = str(tmp_path / "m.db")
+    conn = sqlite3.connect(db)
+    conn.execute("CREATE TABLE minmax(pair TEXT, time INTEGER, min REAL, max REAL, mid REAL, open REAL, close REAL)")
+    rows = _candles(2500, seed=1)
+    conn.executemany("INSERT INTO minmax VALUES('P', ?, ?, ?, ?, 0, 0)", rows[:2000])
+    conn.commit()
+    now = rows[1999][0] + 30
+    eng = channels.ChannelEngine("P", {"24h": 1440, "7d": 10080})
+    assert eng.refresh(now, db) == 2000
+    win = [r for r in rows[:2000] if r[0] >= now - 86400]
+    mid = statistics.fmean(r[3] for r in win)
+    spread = max(r[2] for r in win) - min(r[1] for r in win)
+    lower, upper, m = eng.channel("24h", "spread4")
+    assert (lower, upper, m) == pytest.approx((mid - spread / 4, mid + spread / 4, mid), rel=1e-9)
+
+    conn.executemany("INSERT INTO minmax VALUES('P', ?, ?, ?, ?, 0, 0)", rows[2000:])
+    conn.commit()
+    conn.close()
+    assert eng.refresh(rows[-1][0] + 30, db) == 500
+    assert eng.refresh(rows[-1][0] + 30, db) == 0
+    assert eng.stats("7d")["n"] == len([r for r in rows if r[0] >= rows[-1][0] + 30 - 7 * 86400])
+    lo, hi, _ = eng.channel("24h", "ewma")
+    assert 0 < lo < hi
+    with pytest.raises(ValueError):
+        eng.channel("24h", "nope")
@@ -0,0 +1,58 @@
+import random
+
+import cancels
+import consolidate
+from orderbook import OrderBook, _Row
+
+
+def _book(n, seed=0):
+    rng = random.Random(seed)
+    rows = []
+    for i in range(n):
+        p = round(rng.uniform(0.05, 0.10), 6)
+        rows.append((f"b{i}", "BUY", p, round(rng.uniform(20, 200), 2), 0.0, "GRID"))
+    return OrderBook.from_rows(rows)
+
+
+def test_cluster_is_contiguous_and_covers_everything():
+    prices = [1.0, 1.01, 1.02, 2.0, 2.01, 3.0, 3.02, 3.03]
+    cuts = consolidate.cluster(prices, [1.0] * len(prices), 3)
+    assert cuts == [(0, 3), (3, 5), (5, 8)]          # плотные группы по цене
+    cuts = consolidate.cluster(prices, [1.0] * len(prices), 8)
+    assert all(b - a == 1 for a, b in cuts)
+
+
+def test_plan_preserves_qty_and_notional():
+    book = _book(300)
+    plan = consolidate.plan_side(book, "BUY", to_cancel=120, place_count=20)
+    far_ids = {o.id for o in book.buys.far(120)}
+    assert {o.id for o in plan.cancel} <= far_ids
+    assert 0 < len(plan.buckets) <= 20
+    for b in plan.buckets:
+        qty = sum(o.qty for o in b.orders)
+        usd = sum(o.price * o.qty for o in b.orders)
+        assert abs(b.usd - usd) < 1e-9
+        assert abs(b.price * qty - usd) < qty * 1e-6          # VWAP: notional сохраняется
+        assert min(o.price for o in b.orders) <= b.price <= max(o.price for o in b.orders)
+    # нечего сводить
+    assert consolidate.plan_side(book, "BUY", to_cancel=1, place_count=5).buckets == []
+
+
+def test_sell_floor_and_execute_marks_only_canceled():
+    rows = [(f"s{i}", "SELL", 1.0 + i * 0.001, 10.0, 0.0, "GRID") for i in range(6)]
+    plan = consolidate.plan_side(OrderBook.from_rows(rows), "SELL", 6, 2, price_floor=1.5)
+    assert [b.price for b in plan.buckets] == [1.5, 1.5]
+
+    class Cli:
+        paper = True
+
+        def cancel_order(self, pair, oid, side=""):
+            if oid == "s5":
+                raise RuntimeError("unknown order")
+
+    rep = cancels.cancel_orders(Cli(), None, "KASUSDC", plan.cancel)
+    assert set(rep.results) == {f"s{i}" for i in range(6)}
+    assert isinstance(rep.results["s5"].error, RuntimeError) and rep.results["s0"].ok
+    assert rep.failed == ["s5"] and rep.results["s5"].state == "ERROR"
+    part = consolidate.make_bucket("SELL", [_Row("a", "SELL", 1.0, 1.0), _Row("b", "SELL", 3.0, 1.0)])
+    assert part.price == 2.0 and part.qty == 2.0
@@ -0,0 +1,113 @@
+import random
+
+import engine
+import pairs
+import sell
+
+
+def test_load_pairs_splits_symbols_and_shares_quote():
+    ps = pairs.load_pairs([
+        "KASUSDC",
+        {"pair": "alphusdc", "params": {"SELL_MIN_GAIN": 0.02}},
+        {"pair": "KASUSDT", "quote_share": 0.5},
+    ])
+    assert [(p.pair, p.base, p.quote) for p in ps] == [
+        ("KASUSDC", "KAS", "USDC"), ("ALPHUSDC", "ALPH", "USDC"), ("KASUSDT", "KAS", "USDT")]
+    assert [p.quote_share for p in ps] == [0.5, 0.5, 0.5]
+    assert ps[1].params == {"SELL_MIN_GAIN": 0.02}
+    assert pairs.get_pair("alphusdc", ps) is ps[1]
+    assert pairs.load_pairs([])[0].pair == pairs.CFG.PAIR
+
+
+def test_strategy_params_are_restored():
+    old = sell.SELL_MIN_GAIN
+    with pairs.strategy_params({"SELL_MIN_GAIN": 0.5}):
+        assert sell.SELL_MIN_GAIN == 0.5
+    assert sell.SELL_MIN_GAIN == old
+
+
+def test_scheduler_staggers_pairs_and_keeps_min_gap():
+    sch = engine.Scheduler(min_gap=2.0, rng=random.Random(0))
+    sch.add("buy", 60.0, 3, start=0.0)
+    sch.add("sync", 60.0, 3, start=1.0)
+    fired = []
+    for t in range(0, 125):
+        job = sch.due(float(t))
+        if job:
+            fired.append((t, *job))
+    assert fired[:6] == [(0, "buy", 0), (2, "sync", 0), (20, "buy", 1), (22, "sync", 1),
+                         (40, "buy", 2), (42, "sync", 2)]
+    assert [t for t, task, i in fired if task == "buy" and i == 0] == [0, 60, 120]
+    gaps = [b[0] - a[0] for a, b in zip(fired, fired[1:])]
+    assert min(gaps) >= 2
+
+
+def test_exchange_free_base_uses_pair_asset():
+    class Cli:
+        def account(self):
+            return {"balances": [{"asset": "KAS", "free": "5"}, {"asset": "ALPH", "free": "7.5"}]}
+    assert sell.exchange_free_base(Cli(), "alph") == 7.5
+    assert sell.exchange_free_base(Cli()) == 5.0
+
+
+def test_scheduler_kick_respects_debounce_and_keeps_fallback():
+    sch = engine.Scheduler(min_gap=0.0)
+    sch.add("buy", 900.0, 1, start=0.0)
+    assert sch.due(0.0) == ("buy", 0)
+    assert sch.kick("buy", 0, now=5.0, debounce=20.0)     # перенос на 20 (0 + debounce)
+    assert sch.due(10.0) is None
+    assert sch.due(20.0) == ("buy", 0)
+    assert not sch.kick("sell", 0, now=21.0)              # задача не запланирована
+    assert sch.kick("buy", 0, now=100.0, debounce=20.0)
+    assert sch.due(100.0) == ("buy", 0)
+    assert sch.next_at() == 1000.0                        # страховочный таймер — от последнего тика
+
+
+def test_price_feed_and_triggers():
+    import events
+    bus = events.Bus()
+    trig = engine.Triggers(move_pct=1.0)
+    trig.attach(bus)
+    prices = iter([1.00, 1.005, 1.02, 1.20])
+    feed = events.PriceFeed(bus, ["KASUSDC"], lambda p: next(prices), lambda p: (0.9, 1.1, 1.0))
+    got = []
+    for _ in range(4):
+        feed.poll_once(now=0.0)
+        while not trig.pending.empty():
+            got.append(trig.pending.get_nowait())
+    assert got == [("KASUSDC", "move"), ("KASUSDC", "move"), ("KASUSDC", "channel_above")]
+    bus.publish("fill", pair="KASUSDC", n=2)
+    assert trig.pending.get_nowait() == ("KASUSDC", "fill")
+
+
+def test_feed_channels_use_each_pairs_window(monkeypatch):
+    import channels
+    import events
+    ps = pairs.load_pairs([
+        {"pair": "KASUSDC", "params": {"BUY_CHANNEL_WINDOW": "1h", "SELL_CHANNEL_ESTIMATOR": "ewma"}},
+        {"pair": "ALPHUSDC", "params": {"BUY_CHANNEL_WINDOW": "4h", "BUY_CHANNEL_ESTIMATOR": "minmax"}},
+    ])
+    calls = []
+    bands = {"1h": (0.9, 1.1, 1.0), "4h": (0.5, 2.0, 1.0), "24h": (0.8, 1.15, 1.0)}
+
+    def fake_channel(pair, window=None, estimator=None, now=None):
+        calls.append((pair, window, estimator))
+        return bands[window]
+
+    monkeypatch.setattr(channels, "channel", fake_channel)
+    bus = events.Bus()
+    trig = engine.Triggers(move_pct=0.0)
+    trig.attach(bus)
+    prices = {"KASUSDC": iter([1.0, 1.12, 1.2]), "ALPHUSDC": iter([1.0, 1.12, 1.2])}
+    feed = events.PriceFeed(bus, [p.pair for p in ps], lambda s: next(prices[s]), engine.feed_channels(ps),
+                            channel_ttl=0.0)
+    with pairs.strategy_params(ps[1].params):     # главный поток посреди тика ALPHUSDC
+        for _ in range(3):
+            feed.poll_once(now=0.0)
+    assert set(calls) == {("KASUSDC", "1h", "spread4"), ("KASUSDC", "24h", "ewma"),
+                          ("ALPHUSDC", "4h", "minmax"), ("ALPHUSDC", "24h", "spread4")}
+    got = []
+    while not trig.pending.empty():
+        got.append(trig.pending.get_nowait())
+    assert got == [("KASUSDC", "channel_buy_above"), ("KASUSDC", "channel_sell_above"),
+                   ("ALPHUSDC", "channel_sell_above")]
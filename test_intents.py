@@ -0,0 +1,77 @@
+import sqlite3
+import time
+
+import pytest
+from sqlalchemy import event
+
+import intents
+import models_trading as mt
+import paper_client
+from mexc_client import MexcHTTPError
+
+
+@pytest.fixture
+def sess(sess):
+    # общая сессия из conftest + счётчик коммитов
+    commits = []
+    event.listen(sess, "after_commit", lambda _s: commits.append(1))
+    sess.commits = commits
+    return sess
+
+
+@pytest.fixture
+def cli(tmp_path):
+    market = tmp_path / "market.db"
+    m = sqlite3.connect(market)
+    m.execute("CREATE TABLE minmax(pair TEXT, time INTEGER, min REAL, max REAL, mid REAL, open REAL, close REAL)")
+    m.execute("INSERT INTO minmax VALUES('KASUSDC', ?, 1.0, 1.0, 1.0, 1.0, 1.0)", (int(time.time()) // 60 * 60 - 600,))
+    m.commit()
+    m.close()
+    return paper_client.PaperMexcClient(db_path=str(tmp_path / "paper.db"), market_db=str(market),
+                                        price_source="db", start_usd=100.0)
+
+
+class _Flaky:
+    """Обёртка: заданные client_id падают с заданной ошибкой (после отправки — как таймаут)."""
+    def __init__(self, cli, fail):
+        self.cli, self.fail, self.paper = cli, fail, True
+
+    def place_order(self, symbol, side, price, qty, client_id=None):
+        e = self.fail.get(client_id)
+        if e is not None and getattr(e, "status", None) is None:
+            self.cli.place_order(symbol, side, price=price, qty=qty, client_id=client_id)
+        if e is not None:
+            raise e
+        return self.cli.place_order(symbol, side, price=price, qty=qty, client_id=client_id)
+
+    def open_orders(self, symbol):
+        return self.cli.open_orders(symbol)
+
+
+def test_ladder_costs_two_commits_and_journal_is_cleared(cli, sess):
+    items = [intents.new("BUY", 0.9 - i * 0.01, 5, reserved=5 * (0.9 - i * 0.01)) for i in range(20)]
+    res = intents.place_batch(cli, sess, "KASUSDC", items)
+    assert len(sess.commits) == 2
+    assert all(r.error is None for r in res)
+    assert sess.query(mt.Order).count() == 20 and sess.query(mt.OrderIntent).count() == 0
+    ex = {o["clientOrderId"]: str(o["orderId"]) for o in cli.open_orders("KASUSDC")}
+    assert {r.intent.client_id: r.order_id for r in res} == ex
+
+
+def test_reject_dropped_unknown_kept_and_recovered(cli, sess):
+    a, b, c = (intents.new("BUY", p, 5, reserved=5 * p) for p in (0.8, 0.7, 0.6))
+    flaky = _Flaky(cli, {b.client_id: MexcHTTPError("rejected", status=400),
+                         c.client_id: MexcHTTPError("timeout")})
+    res = intents.place_batch(flaky, sess, "KASUSDC", [a, b, c])
+    assert [r.order_id is not None for r in res] == [True, False, False]
+    pend = sess.query(mt.OrderIntent).all()
+    assert [i.client_id for i in pend] == [c.client_id] and "timeout" in pend[0].error
+
+    assert intents.recover(cli, sess, "KASUSDC") == {"restored": 0, "lost": 0}   # ещё в грации
+    sess.add(mt.OrderIntent(client_id="ebghost", pair="KASUSDC", side="BUY", price=0.5, qty=5,
+                            status="PENDING", created=0, updated=0))
+    sess.commit()
+    assert intents.recover(cli, sess, "KASUSDC", grace=0) == {"restored": 1, "lost": 1}
+    prices = sorted(o.price for o in sess.query(mt.Order))
+    assert prices == [0.6, 0.8]
+    assert [(i.client_id, i.status) for i in sess.query(mt.OrderIntent)] == [("ebghost", "LOST")]
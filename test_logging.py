@@ -0,0 +1,108 @@
+import json
+import sys
+import logging
+import logging.handlers
+import types
+
+import pytest
+
+import ebot
+import logging_config
+
+
+@pytest.fixture
+def fresh_root(monkeypatch):
+    root = logging.getLogger()
+    saved, level = list(root.handlers), root.level
+    monkeypatch.setattr(logging_config, "_root_configured", False)
+    monkeypatch.setattr(logging_config, "_listeners", [])
+    yield root
+    logging_config._stop_listeners()
+    for h in list(root.handlers):
+        root.removeHandler(h)
+    for h in saved:
+        root.addHandler(h)
+    root.setLevel(level)
+
+
+class _Collect(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.msgs = []
+
+    def emit(self, record):
+        self.msgs.append(record.getMessage())
+
+
+def test_async_handler_delivers_via_queue_listener(monkeypatch):
+    monkeypatch.setattr(logging_config, "_listeners", [])
+    target = _Collect()
+    qh = logging_config.make_async_handler(target)
+    assert isinstance(qh, logging.handlers.QueueHandler) and len(logging_config._listeners) == 1
+    lg = logging.getLogger("test.async")
+    lg.propagate = False
+    lg.handlers = [qh]
+    for i in range(100):
+        lg.warning("m%d", i)
+    logging_config._stop_listeners()                 # остановка дописывает хвост очереди
+    assert target.msgs == [f"m{i}" for i in range(100)] and logging_config._listeners == []
+    lg.handlers = []
+
+
+def test_setup_logging_is_idempotent_and_routes_files(fresh_root, tmp_path):
+    logging_config.setup_logging(str(tmp_path), service="svc", json_format=True)
+    qh = fresh_root.handlers
+    assert len(qh) == 1 and isinstance(qh[0], logging.handlers.QueueHandler)
+    logging_config.setup_logging(str(tmp_path), service="svc")     # повторный вызов — ничего
+    assert fresh_root.handlers == qh and len(logging_config._listeners) == 1
+
+    logging.getLogger("svc.sub").info("svc line")
+    logging.getLogger("other").error("boom %d", 1)
+    logging_config._stop_listeners()
+    info = [json.loads(x) for x in (tmp_path / "info.log").read_text().splitlines()]
+    assert [(r["logger"], r["msg"], r["level"]) for r in info] == [("svc.sub", "svc line", "INFO"),
+                                                                   ("other", "boom 1", "ERROR")]
+    assert set(info[0]) == {"ts", "level", "logger", "msg", "pid"}
+    assert [json.loads(x)["msg"] for x in (tmp_path / "error.log").read_text().splitlines()] == ["boom 1"]
+    assert [json.loads(x)["msg"] for x in (tmp_path / "svc.log").read_text().splitlines()] == ["svc line"]
+
+
+def test_json_formatter_includes_exception():
+    try:
+        raise ValueError("bad")
+    except ValueError:
+        rec = logging.getLogger("x").makeRecord("x", logging.ERROR, __file__, 1, "oops %s", ("й",),
+                                                 sys.exc_info())
+    d = json.loads(logging_config.JsonFormatter().format(rec))
+    assert d["msg"] == "oops й" and d["level"] == "ERROR" and d["logger"] == "x"
+    assert "ValueError: bad" in d["exc"]
+
+
+def test_clip_truncates_long_output():
+    assert ebot._clip("a\nb", 2) == "a\nb"
+    out = ebot._clip("\n".join(str(i) for i in range(10)), 3)
+    assert out.splitlines() == ["0", "1", "2", "... (+7 lines)"]
+
+
+def test_child_output_dedup_within_window(monkeypatch, caplog):
+    now = [1000.0]
+    monkeypatch.setattr(ebot, "time", types.SimpleNamespace(time=lambda: now[0]))
+    monkeypatch.setattr(ebot, "_child_seen", {})
+    monkeypatch.setattr(ebot, "CHILD_LOG_DEDUP_SEC", 600)
+    caplog.set_level(logging.INFO, logger="ebot")
+
+    ebot._log_child_output("buy", "STDOUT", "placed 3 orders at 0.091", 0.5)
+    ebot._log_child_output("buy", "STDOUT", "placed 5 orders at 0.092", 0.5)    # та же форма — молча
+    now[0] += 10
+    ebot._log_child_output("buy", "STDOUT", "placed 7 orders at 0.093", 0.5)
+    ebot._log_child_output("buy", "STDERR", "warn 1", 0.5)                        # другой поток — свой учёт
+    now[0] += 600
+    ebot._log_child_output("buy", "STDOUT", "placed 9 orders at 0.094", 0.5)     # окно истекло
+    ebot._log_child_output("buy", "STDOUT", "cancelled all", 0.5)                # другая форма — сразу
+    ebot._log_child_output("buy", "STDOUT", "", 0.5)
+
+    msgs = [(r.levelno, r.getMessage()) for r in caplog.records]
+    assert len(msgs) == 4
+    assert "placed 3 orders" in msgs[0][1] and msgs[1][0] == logging.WARNING
+    assert "(2 repeats of previous output suppressed)" in msgs[2][1] and "placed 9" in msgs[2][1]
+    assert "cancelled all" in msgs[3][1] and "suppressed" not in msgs[3][1]
@@ -0,0 +1,75 @@
+import time
+
+import marketdata
+
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        b = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(b | 0x80)
+        else:
+            out.append(b)
+            return bytes(out)
+
+
+def _ld(no, payload):
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return _varint(no << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _vi(no, v):
+    return _varint(no << 3) + _varint(v)
+
+
+def test_decode_push_deals_and_book():
+    item = _ld(1, "0.0861") + _ld(2, "120.5") + _vi(3, 1) + _vi(4, 1700000000123)
+    deals = _ld(1, item) + _ld(1, _ld(1, "0.0862") + _ld(2, "1") + _vi(3, 2) + _vi(4, 1700000000456)) + _ld(2, "x")
+    frame = _ld(1, "spot@public.aggre.deals.v3.api.pb@100ms@KASUSDC") + _ld(314, deals) + _ld(3, "KASUSDC") + _vi(6, 1700000000500)
+    m = marketdata.decode_push(frame)
+    assert m["symbol"] == "KASUSDC" and m["send_ms"] == 1700000000500
+    assert m["deals"] == [(0.0861, 120.5, 1, 1700000000123), (0.0862, 1.0, 2, 1700000000456)]
+
+    book = _ld(1, "0.0860") + _ld(2, "10") + _ld(3, "0.0863") + _ld(4, "20")
+    m = marketdata.decode_push(_ld(1, "spot@public.aggre.bookTicker.v3.api.pb@100ms@KASUSDC") + _ld(315, book))
+    assert m["symbol"] == "KASUSDC" and m["book"] == (0.086, 10.0, 0.0863, 20.0) and m["deals"] == []
+
+
+def test_shm_record_roundtrip(tmp_path):
+    r = marketdata.Reader("KASUSDC", str(tmp_path))
+    assert r.read() is None                       # писателя ещё нет
+    w = marketdata.Writer("KASUSDC", str(tmp_path))
+    assert r.read() is None                       # файл есть, но пустой
+    w.update(last=0.09, trade_ms=123)
+    w.update(bid=0.0899, bid_qty=5, ask=0.0901, ask_qty=7)
+    q = r.read()
+    assert (q.last, q.trade_ms, q.bid, q.ask, q.ask_qty) == (0.09, 123, 0.0899, 0.0901, 7.0)
+    assert q.age() < 5
+    # перезапуск писателя сохраняет последние значения
+    w.close()
+    marketdata.Writer("KASUSDC", str(tmp_path)).update(last=0.091)
+    assert r.read().bid == 0.0899 and r.read().last == 0.091
+
+
+def test_last_price_falls_back_to_rest_when_stale(tmp_path, monkeypatch):
+    class Cli:
+        paper = False
+        calls = 0
+
+        def price(self, symbol):
+            Cli.calls += 1
+            return 1.5
+
+    monkeypatch.setattr(marketdata, "_READERS", {"KASUSDC": marketdata.Reader("KASUSDC", str(tmp_path))})
+    w = marketdata.Writer("KASUSDC", str(tmp_path))
+    w.update(last=1.2)
+    assert marketdata.last_price(Cli(), "KASUSDC") == 1.2 and Cli.calls == 0
+    w.update(ts_ms=int((time.time() - 60) * 1000))
+    assert marketdata.last_price(Cli(), "KASUSDC") == 1.5 and Cli.calls == 1
+    cli = Cli()
+    cli.paper = True
+    w.update(last=1.2)
+    assert marketdata.last_price(cli, "KASUSDC") == 1.5
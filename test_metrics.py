@@ -0,0 +1,50 @@
+import metrics
+
+
+def test_flush_merges_counters_and_renders(tmp_path, monkeypatch):
+    monkeypatch.setattr(metrics, "METRICS_ENABLED", True)
+    reg = metrics.Registry()
+    monkeypatch.setattr(metrics, "REGISTRY", reg)
+
+    c = reg.counter("t_orders_total", "orders", ("side",))
+    h = reg.histogram("t_latency_seconds", "latency", ("endpoint",), buckets=(0.1, 1.0))
+    g = reg.gauge("t_open", "open", ("side",))
+
+    c.inc(side="BUY")
+    h.observe(0.05, endpoint="/x")
+    g.set(5, side="BUY")
+    metrics.flush("job1", metrics_dir=str(tmp_path))
+
+    c.inc(2, side="BUY")
+    h.observe(3.0, endpoint="/x")
+    g.set(7, side="BUY")
+    metrics.flush("job1", metrics_dir=str(tmp_path))
+
+    text = (tmp_path / "ebot.prom").read_text()
+    assert '# TYPE ebot_t_orders_total counter' in text
+    assert 'ebot_t_orders_total{side="BUY",job="job1"} 3' in text
+    assert 'ebot_t_open{side="BUY",job="job1"} 7' in text
+    assert 'ebot_t_latency_seconds_bucket{endpoint="/x",le="0.1",job="job1"} 1' in text
+    assert 'ebot_t_latency_seconds_bucket{endpoint="/x",le="+Inf",job="job1"} 2' in text
+    assert 'ebot_t_latency_seconds_count{endpoint="/x",job="job1"} 2' in text
+
+
+def test_render_groups_jobs_under_one_type_line():
+    st = {"type": "counter", "help": "h", "labelnames": [], "series": {"[]": 1.0}}
+    text = metrics.render({"a": {"ebot_x": st}, "b": {"ebot_x": st}})
+    assert text.count("# TYPE ebot_x counter") == 1
+    assert 'ebot_x{job="a"} 1' in text and 'ebot_x{job="b"} 1' in text
+
+
+def test_engine_timing_stack_survives_failing_statements():
+    from sqlalchemy import create_engine, text
+    eng = create_engine("sqlite://")
+    metrics.instrument_engine(eng, "t")
+    with eng.connect() as conn:
+        for _ in range(5):
+            try:
+                conn.execute(text("SELECT * FROM no_such_table"))
+            except Exception:
+                pass
+        conn.execute(text("SELECT 1"))
+        assert conn.info.get("_ebot_t0") == []
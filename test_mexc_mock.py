@@ -0,0 +1,88 @@
+import asyncio
+import json
+import time
+
+import pytest
+import websockets
+
+import backfill
+import candles
+import marketdata
+import mexc_client
+import mexc_mock
+from mexc_client import MexcClient, MexcHTTPError
+
+
+@pytest.fixture
+def mock(monkeypatch):
+    monkeypatch.setattr(mexc_client, "RETRY_MAX_ATTEMPTS", 2)
+    monkeypatch.setattr(mexc_client, "RETRY_BACKOFF_BASE", 0.01)
+    ex = mexc_mock.MockExchange(["KASUSDC"], {"KASUSDC": mexc_mock.PricePath("walk", 0.09, seed=1)},
+                                usd=100.0, history_min=120, seed=1)
+    srv = mexc_mock.MockServer(ex)
+    srv.start()
+    yield ex, srv, MexcClient(api_key="k", api_secret="s", base_url=srv.api_url)
+    srv.stop()
+
+
+def test_rest_orders_partial_fills_and_faults(mock):
+    ex, srv, cli = mock
+    assert cli.price("KASUSDC") > 0
+    kl = cli.klines("KASUSDC", "1m", limit=1000)
+    assert len(kl) >= 119 and kl[-1][0] < time.time() * 1000
+    rows, missing = backfill.validate(kl, kl[0][0] // 1000, kl[-1][0] // 1000 + 60)
+    assert len(rows) == len(kl) and missing == []
+
+    ex.faults.update({"partial": 1.0, "speed": 0.0})     # цена стоит, пока её не двинем
+    ex.jump("KASUSDC", 0.10)
+    buy = cli.place_order("KASUSDC", "BUY", price=0.095, qty=100, client_id="eb1")
+    far = cli.place_order("KASUSDC", "BUY", price=0.05, qty=100)
+    with pytest.raises(MexcHTTPError) as e:
+        cli.place_order("KASUSDC", "BUY", price=0.09, qty=10_000)
+    assert e.value.status == 400
+    with ex.lock:                                        # касание без тика рынка посередине
+        assert ex.jump("KASUSDC", 0.094) and not ex.jump("KASUSDC", 0.10)
+    o = {x["orderId"]: x for x in cli.open_orders("KASUSDC")}
+    assert o[buy["orderId"]]["status"] == "PARTIALLY_FILLED" and o[buy["orderId"]]["clientOrderId"] == "eb1"
+    tr = cli.my_trades("KASUSDC")
+    assert len(tr) == 1 and tr[0]["isBuyer"] and 0 < float(tr[0]["qty"]) < 100
+    assert [x["orderId"] for x in cli.cancel_open_orders("KASUSDC")] == [buy["orderId"], far["orderId"]]
+    hist = {x["orderId"]: x for x in cli.all_orders("KASUSDC", 1, None)}
+    assert hist[buy["orderId"]]["status"] == "CANCELED" and float(hist[buy["orderId"]]["executedQty"]) > 0
+    assert cli.query_order("KASUSDC", far["orderId"])["status"] == "CANCELED"
+    bal = {b["asset"]: b for b in cli.account()["balances"]}
+    assert float(bal["USDC"]["locked"]) == pytest.approx(0.0, abs=1e-9)
+    assert float(bal["USDC"]["free"]) == pytest.approx(100.0 - 0.095 * float(tr[0]["qty"]))
+
+    ex.faults.update({"p429": 1.0})
+    with pytest.raises(MexcHTTPError) as e:
+        cli.price("KASUSDC")
+    assert e.value.status == 429 and ex.stats["injected_429"] == 2     # ретрай клиента тоже получил 429
+    snap = ex.snapshot()
+    assert snap["calls"]["POST /api/v3/order"] == 3 and snap["calls"]["GET /api/v3/ticker/price 429"] == 2
+
+
+def test_ws_subscription_ping_and_pb_frames(mock):
+    ex, srv, _ = mock
+
+    async def scenario():
+        async with websockets.connect(srv.ws_url) as ws:
+            streams = candles._streams(["KASUSDC"])
+            await ws.send(json.dumps({"method": "SUBSCRIPTION", "params": streams, "id": 1}))
+            ack = json.loads(await ws.recv())
+            await ws.send(json.dumps({"method": "PING", "id": 999}))
+            frames, pong = [], None
+            while len(frames) < 4 or pong is None:
+                m = await asyncio.wait_for(ws.recv(), 5)
+                if isinstance(m, bytes):
+                    frames.append(marketdata.decode_push(m))
+                else:
+                    pong = json.loads(m)
+            return ack, pong, frames
+
+    ack, pong, frames = asyncio.run(scenario())
+    assert ack["code"] == 0 and ack["id"] == 1 and pong["msg"] == "PONG"
+    assert any(f["deals"] for f in frames) and any(f["book"] for f in frames)
+    assert all(f["symbol"] == "KASUSDC" for f in frames)
+    px = [f["deals"][0][0] for f in frames if f["deals"]]
+    assert all(p == pytest.approx(0.09, rel=0.2) for p in px)
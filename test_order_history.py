@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+import models_trading as mt
+import order_history
+import sync
+from mexc_client import MexcHTTPError
+
+DAY = 86_400_000
+NOW = 1_700_000_000_000
+
+
+class FakeHistory:
+    """openOrders / allOrders (по времени создания, с лимитом) / order по id из памяти."""
+    def __init__(self, orders):
+        self.orders = {o["orderId"]: o for o in orders}
+        self.pages, self.lookups = [], []
+
+    def open_orders(self, symbol, limit=None):
+        rows = [o for o in self.orders.values() if o["status"] in ("NEW", "PARTIALLY_FILLED")]
+        return rows[:limit] if limit else rows
+
+    def all_orders(self, symbol, startTime=None, endTime=None, limit=1000):
+        self.pages.append((startTime, endTime))
+        rows = sorted((o for o in self.orders.values() if startTime <= o["time"] <= endTime), key=lambda o: o["time"])
+        return rows[:limit]
+
+    def query_order(self, symbol, order_id):
+        self.lookups.append(order_id)
+        if order_id not in self.orders:
+            raise MexcHTTPError("GET /api/v3/order API error: {'code': -2013}", status=400)
+        return self.orders[order_id]
+
+
+def _ex(oid, t, status, exe, price=0.09, qty=100.0):
+    return {"orderId": oid, "side": "BUY", "price": str(price), "origQty": str(qty), "executedQty": str(exe),
+            "cummulativeQuoteQty": str(exe * price), "status": status, "time": t, "updateTime": t + 1000}
+
+
+def test_vanished_orders_get_exchange_status_in_bounded_requests(sess):
+    rng = random.Random(0)
+    ex = []
+    for i in range(3000):                                   # чужая история за 3 суток — полные страницы
+        ex.append(_ex(f"N{i}", rng.randrange(NOW - 3 * DAY, NOW), "CANCELED", 0.0))
+    mine = {}
+    for i in range(120):
+        t = rng.randrange(NOW - 3 * DAY, NOW) if i else NOW - 6 * DAY
+        status, exe = [("FILLED", 100.0), ("CANCELED", 40.0), ("CANCELED", 0.0), ("PARTIALLY_FILLED", 10.0)][i % 4]
+        ex.append(_ex(f"M{i}", t, status, exe))
+        mine[f"M{i}"] = (status, exe)
+        # локально время создания своё (секунды); у M0 — на сутки мимо биржевого
+        local_t = (t if i else t + DAY) // 1000
+        sess.add(mt.Order(id=f"M{i}", pair="P", side="BUY", price=0.09, qty=100.0, filled_qty=0.0,
+                          status="NEW", created=local_t, updated=local_t))
+    sess.add(mt.Order(id="GHOST", pair="P", side="BUY", price=0.09, qty=100.0, filled_qty=0.0,
+                      status="NEW", created=(NOW - DAY) // 1000, updated=0))
+    sess.commit()
+    cli = FakeHistory(ex)
+
+    sync.sync_open_orders(sess, cli, limit=5, pair="P")     # openOrders обрезан — часть «пропадает» ложно
+    listed = {o["orderId"] for o in cli.open_orders("P", 5)}
+    got = {o.id: (o.status, o.filled_qty, o.quote_qty) for o in sess.query(mt.Order)}
+    for oid, (status, exe) in mine.items():
+        quote = 0.0 if oid in listed else exe * 0.09             # открытые обновляет сам openOrders
+        assert got[oid] == (status, pytest.approx(exe), pytest.approx(quote)), oid
+    assert got["GHOST"][0] == "CANCELED"                     # истории нет — осталась догадка
+    assert sorted(cli.lookups) == ["GHOST", "M0"]            # M0: локальное время мимо окна — по id
+    assert len(cli.pages) <= order_history.ALLORDERS_MAX_PAGES and all(b - a < DAY for a, b in cli.pages)
+    q = sess.query(mt.VanishedOrder).all()
+    assert [(v.order_id, v.attempts) for v in q] == [("GHOST", 1)]
+
+    cli.pages.clear(); cli.lookups.clear()
+    for _ in range(order_history.ORDER_RESOLVE_MAX_TRIES - 1):
+        rep = order_history.resolve(sess, cli, "P")
+    assert rep.dropped == 1 and rep.left == 0 and not cli.pages
+    assert cli.lookups == ["GHOST"] * (order_history.ORDER_RESOLVE_MAX_TRIES - 1)
+    rep = order_history.resolve(sess, cli, "P")
+    assert rep.queued == 0 and rep.pages == rep.lookups == 0
+
+
+def test_lookups_per_run_are_capped(sess):
+    for i in range(10):
+        sess.add(mt.Order(id=f"X{i}", pair="P", side="SELL", price=0.1, qty=5.0, filled_qty=0.0,
+                          status="NEW", created=(NOW - i * 60_000) // 1000, updated=0))
+    sess.commit()
+    cli = FakeHistory([])
+    sync.sync_open_orders(sess, cli, limit=50, pair="P")
+    assert len(cli.lookups) == 10
+    rep = order_history.resolve(sess, cli, "P", max_lookups=3)
+    assert rep.lookups == 3 and rep.left == 10
@@ -0,0 +1,102 @@
+import random
+import sqlite3
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import cons
+import models_trading as mt
+import order_stats
+import reports.core as core
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / "t.db")
+    eng = create_engine(f"sqlite:///{path}")
+    mt.Base.metadata.create_all(eng)
+    yield path, sessionmaker(bind=eng)
+    eng.dispose()
+
+
+def _order(i, rng, pair="P"):
+    return mt.Order(id=f"O{i}", pair=pair, side=rng.choice(order_stats.SIDES), price=round(rng.uniform(0.08, 0.1), 6),
+                    qty=round(rng.uniform(10, 500), 2), status=rng.choice(("NEW", "NEW", "PARTIALLY_FILLED", "FILLED")),
+                    reserved=round(rng.uniform(1, 40), 2), created=i, updated=i)
+
+
+def test_triggers_follow_every_writer_exactly(db):
+    path, Session = db
+    rng = random.Random(3)
+    s = Session()
+    s.add_all([_order(i, rng) for i in range(200)])       # строки до триггеров — ensure заполнит сводку
+    s.commit()
+    conn = sqlite3.connect(path)
+    order_stats.ensure(conn)
+    assert order_stats.verify(conn) == []
+
+    s.add_all([_order(i, rng, pair=rng.choice(("P", "Q"))) for i in range(200, 400)])
+    s.commit()
+    for _ in range(600):                                   # ORM: статусы, цены, переносы, удаления
+        o = s.get(mt.Order, f"O{rng.randrange(400)}")
+        if o is None:
+            continue
+        op = rng.random()
+        if op < 0.4:
+            o.status = rng.choice(("NEW", "PARTIALLY_FILLED", "FILLED", "CANCELED"))
+        elif op < 0.6:
+            o.price, o.qty = round(rng.uniform(0.08, 0.1), 6), round(rng.uniform(10, 500), 2)
+        elif op < 0.7:
+            o.side = "SELL" if o.side == "BUY" else "BUY"
+        elif op < 0.8:
+            o.filled_qty, o.updated = o.qty / 2, o.updated + 1  # не входит в сводку — триггер молчит
+        else:
+            s.delete(o)
+        s.commit()
+    conn.execute("UPDATE orders SET status='CANCELED' WHERE pair='Q' AND side='BUY'")   # сырой sqlite3
+    conn.execute("DELETE FROM orders WHERE id IN (SELECT id FROM orders WHERE pair='P' LIMIT 20)")
+    conn.commit()
+    assert order_stats.verify(conn) == []
+    st = order_stats.get(conn, "Q")
+    assert st["BUY"].open_n == 0 and st["BUY"].open_notional == 0.0 and st["BUY"].reserved_usd == 0.0
+
+    exp = conn.execute("SELECT COUNT(*), SUM(price*qty) FROM orders WHERE pair='P' AND side='BUY' "
+                       "AND status IN ('NEW','PARTIALLY_FILLED')").fetchone()
+    assert cons._count_open_orders(path, "P", "BUY") == exp[0]
+    assert core.fetch_open_buy_reserve(conn, "P") == pytest.approx(exp[1])
+    assert order_stats.open_count(conn, "NOPE", "SELL") == 0
+    s.close()
+    conn.close()
+
+
+def test_verify_finds_drift_and_rebuild_fixes_it(db):
+    path, Session = db
+    conn = sqlite3.connect(path)
+    order_stats.ensure(conn)
+    rng = random.Random(1)
+    s = Session()
+    s.add_all([_order(i, rng) for i in range(50)])
+    s.commit()
+    conn.execute("UPDATE order_stats SET open_n = open_n + 1 WHERE side='SELL'")
+    conn.commit()
+    bad = order_stats.verify(conn)
+    assert len(bad) == 1 and bad[0].startswith("P SELL")
+    assert order_stats.main(["--db", path, "--verify"]) == 1
+    assert order_stats.main(["--db", path, "--rebuild", "--verify"]) == 0
+    assert order_stats.rebuild(conn, "P") == 2 and order_stats.verify(conn) == []
+    s.close()
+    conn.close()
+
+
+def test_readers_fall_back_without_stats_table(db):
+    path, Session = db
+    s = Session()
+    s.add_all([_order(i, random.Random(i)) for i in range(10)])
+    s.commit()
+    conn = sqlite3.connect(path)
+    exp = conn.execute("SELECT COUNT(*) FROM orders WHERE side='BUY' AND status IN ('NEW','PARTIALLY_FILLED')").fetchone()[0]
+    assert order_stats.get(conn, "P") is None
+    assert cons._count_open_orders(path, "P", "BUY") == exp
+    s.close()
+    conn.close()
@@ -0,0 +1,50 @@
+import sqlite3
+
+from orderbook import OrderBook
+
+
+def _book():
+    return OrderBook.from_rows([
+        ("b1", "BUY", 0.100000, 10, 0, "GRID"),
+        ("b2", "BUY", 0.095000, 10, 4, "GRID"),
+        ("b3", "BUY", 0.095000, 5, 0, "BUCKET"),
+        ("s1", "SELL", 0.120000, 7, 0, "GRID"),
+        ("s2", "SELL", 0.130000, 3, 0, "MANUAL_AVG1"),
+    ])
+
+
+def test_levels_queries():
+    book = _book()
+    assert len(book) == 5 and len(book.buys) == 3
+    assert book.sells.is_taken(0.12) and 0.1200004 in book.sells
+    assert 0.1201 not in book.sells
+    price, orders = book.buys.nearest(0.096)
+    assert abs(price - 0.095) < 1e-12 and {o.id for o in orders} == {"b2", "b3"}
+    assert [o.id for o in book.buys.between(0.09, 0.0999)] == ["b2", "b3"]
+    assert [o.id for o in book.buys.far(1)] == ["b2"]
+    assert [o.id for o in book.sells.far()] == ["s2", "s1"]
+    assert book.buys.best() == 0.1 and abs(book.sells.best() - 0.12) < 1e-12
+    assert abs(book.buys.remaining_qty() - 21) < 1e-12
+
+
+def test_remove_and_readd_keeps_index_consistent():
+    book = _book()
+    assert book.remove("b2").id == "b2"
+    assert book.buys.is_taken(0.095)  # b3 ещё стоит
+    book.remove("b3")
+    assert not book.buys.is_taken(0.095) and book.remove("nope") is None
+    book.add(book.sells.remove("s1"))
+    assert [o.id for o in book.sells] == ["s1", "s2"]
+
+
+def test_from_sqlite_only_open(tmp_path):
+    conn = sqlite3.connect(tmp_path / "t.db")
+    conn.execute("CREATE TABLE orders(id TEXT, pair TEXT, side TEXT, price REAL, qty REAL, filled_qty REAL, status TEXT, mode TEXT)")
+    conn.executemany("INSERT INTO orders VALUES(?,?,?,?,?,?,?,?)", [
+        ("1", "P", "BUY", 1.0, 2.0, 0, "NEW", "GRID"),
+        ("2", "P", "BUY", 0.9, 2.0, 2, "FILLED", "GRID"),
+        ("3", "Q", "SELL", 1.1, 1.0, 0, "NEW", "GRID"),
+    ])
+    book = OrderBook.from_sqlite(conn, "P")
+    assert [o.id for o in book.buys] == ["1"] and len(book.sells) == 0
+    assert book.buys.notional() == 2.0
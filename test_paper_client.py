@@ -0,0 +1,67 @@
+import sqlite3
+import time
+
+import pytest
+
+import paper_client
+from mexc_client import MexcHTTPError
+
+
+@pytest.fixture
+def cli(tmp_path):
+    market = tmp_path / "market.db"
+    m = sqlite3.connect(market)
+    m.execute("CREATE TABLE minmax(pair TEXT, time INTEGER, min REAL, max REAL, mid REAL, open REAL, close REAL)")
+    m.execute("INSERT INTO minmax VALUES('KASUSDC', ?, 1.0, 1.0, 1.0, 1.0, 1.0)", (int(time.time()) // 60 * 60 - 600,))
+    m.commit()
+    m.close()
+    c = paper_client.PaperMexcClient(db_path=str(tmp_path / "paper.db"), market_db=str(market),
+                                     price_source="db", start_usd=100.0)
+    c._m = market
+    return c
+
+
+def _candle(c, t, lo, hi):
+    m = sqlite3.connect(c._m)
+    m.execute("INSERT INTO minmax VALUES('KASUSDC', ?, ?, ?, ?, ?, ?)", (t, lo, hi, (lo + hi) / 2, hi, lo))
+    m.commit()
+    m.close()
+
+
+def _bal(c, asset):
+    b = {x["asset"]: x for x in c.account()["balances"]}.get(asset, {"free": "0", "locked": "0"})
+    return float(b["free"]), float(b["locked"])
+
+
+def test_limit_lifecycle(cli):
+    assert cli.price("KASUSDC") == 1.0
+    buy = cli.place_order("KASUSDC", "BUY", price=0.9, qty=50)
+    sell_rej = pytest.raises(MexcHTTPError, cli.place_order, "KASUSDC", "SELL", 1.2, 1)
+    assert "Oversold" in str(sell_rej.value)
+    assert _bal(cli, "USDC") == pytest.approx((55.0, 45.0))
+    assert [o["orderId"] for o in cli.open_orders("KASUSDC")] == [buy["orderId"]]
+
+    # свеча до постановки не исполняет, после — исполняет по цене ордера
+    now = int(time.time())
+    _candle(cli, now // 60 * 60 - 720, 0.5, 1.0)
+    assert cli.open_orders("KASUSDC")
+    cli._conn.execute("UPDATE paper_orders SET time=time-300000")
+    _candle(cli, now // 60 * 60 - 120, 0.85, 1.0)
+    assert cli.open_orders("KASUSDC") == []
+    assert _bal(cli, "KAS") == pytest.approx((50.0, 0.0))
+    tr = cli.my_trades("KASUSDC")
+    assert len(tr) == 1 and tr[0]["isBuyer"] and float(tr[0]["price"]) == 0.9
+
+    s = cli.place_order("KASUSDC", "SELL", price=1.5, qty=20)
+    assert _bal(cli, "KAS") == pytest.approx((30.0, 20.0))
+    cli.cancel_order("KASUSDC", s["orderId"])
+    assert _bal(cli, "KAS") == pytest.approx((50.0, 0.0))
+    with pytest.raises(MexcHTTPError):
+        cli.cancel_order("KASUSDC", s["orderId"])
+
+
+def test_marketable_limit_fills_as_taker(cli):
+    cli.place_order("KASUSDC", "BUY", price=1.1, qty=10)
+    assert cli.open_orders("KASUSDC") == []
+    assert _bal(cli, "USDC")[0] == pytest.approx(90.0)
+    assert cli.my_trades("KASUSDC")[0]["isMaker"] is False
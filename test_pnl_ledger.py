@@ -0,0 +1,46 @@
+import pytest
+
+import models_trading as mt
+import sync
+from accounting import compute_position_from_fills
+
+
+def _fill(s, fid, ts, side, qty, price, fee=0.0):
+    s.add(mt.Fill(id=fid, order_id="o" + fid, pair="P", side=side, price=price,
+                  qty=qty, fee=fee, ts=ts))
+    s.commit()
+
+
+def test_incremental_matches_full_and_handles_late_fill(sess):
+    _fill(sess, "1", 100, "BUY", 10, 1.0)
+    _fill(sess, "2", 200, "BUY", 10, 2.0)
+    _fill(sess, "3", 300, "SELL", 5, 3.0, fee=0.1)
+    qty, cost, cum = sync.update_realized_pnl(sess, "P")
+    assert qty == pytest.approx(15)
+    assert cum == pytest.approx((3.0 - 1.5) * 5 - 0.1)
+
+    _fill(sess, "4", 400, "SELL", 5, 1.0)
+    _fill(sess, "0", 250, "BUY", 10, 4.0)  # поздний импорт раньше хвоста журнала
+    qty, cost, cum = sync.update_realized_pnl(sess, "P")
+
+    fills = sess.query(mt.Fill).order_by(mt.Fill.ts, mt.Fill.id).all()
+    ref_qty, ref_avg = compute_position_from_fills(
+        [{"side": f.side, "qty": f.qty, "price": f.price, "fee": f.fee} for f in fills])
+    assert qty == pytest.approx(ref_qty)
+    assert cost / qty == pytest.approx(ref_avg)
+    assert sess.query(mt.PnlLedger).count() == 5
+    assert sess.query(mt.Capital).filter_by(pair="P").one().realized_pnl == pytest.approx(cum)
+
+    full = sync.update_realized_pnl(sess, "P", full=True)
+    assert full == pytest.approx((qty, cost, cum))
+    assert sync.realized_pnl_between(sess, 0, 10**9, "P") == pytest.approx(cum)
+
+
+def test_fill_older_than_any_window_is_replayed(sess):
+    day = 86400
+    _fill(sess, "b", 30 * day, "BUY", 10, 1.0)
+    sync.update_realized_pnl(sess, "P")
+    _fill(sess, "a", 1 * day, "BUY", 10, 5.0)              # импорт --since за месяц до хвоста
+    assert sync.update_realized_pnl(sess, "P") == pytest.approx((20, 60, 0))
+    assert sync.update_realized_pnl(sess, "P", full=True) == pytest.approx((20, 60, 0))
+    assert [r.fill_id for r in sess.query(mt.PnlLedger).order_by(mt.PnlLedger.ts)] == ["a", "b"]
@@ -0,0 +1,23 @@
+import reconcile
+
+
+def test_diff_keeps_close_levels_and_replaces_the_rest():
+    target = [(1.0000, 10.0, "a"), (0.9900, 20.0, "b"), (0.9800, 30.0, "c")]
+    current = [
+        ("o1", 1.0010, 10.0),   # в пределах 0.3% — оставляем
+        ("o2", 0.9901, 50.0),   # цена рядом, но размер вне допуска
+        ("o3", 0.9000, 30.0),   # далеко
+    ]
+    keep, cancel, place = reconcile.diff(target, current, price_tol_pct=0.3, size_tol_pct=30)
+    assert keep == ["o1"]
+    assert cancel == ["o2", "o3"]
+    assert place == [(0.9900, 20.0, "b"), (0.9800, 30.0, "c")]
+
+
+def test_diff_matches_each_order_once_and_prefers_nearest():
+    target = [(1.0, 5.0), (1.001, 5.0)]
+    current = [("x", 1.0009, 5.0)]
+    keep, cancel, place = reconcile.diff(target, current, price_tol_pct=0.3, size_tol_pct=30)
+    assert keep == ["x"] and cancel == []
+    assert place == [(1.0, 5.0)]
+    assert reconcile.diff([], current) == ([], ["x"], [])
@@ -0,0 +1,75 @@
+import random
+import sqlite3
+import statistics
+
+import pytest
+
+import rollups
+
+T0 = 1_700_006_400   # полночь UTC
+
+
+@pytest.fixture
+def conn():
+    c = sqlite3.connect(":memory:")
+    c.execute("CREATE TABLE minmax(pair VARCHAR NOT NULL, time INTEGER NOT NULL, min FLOAT, max FLOAT, "
+              "mid FLOAT, open FLOAT, close FLOAT, PRIMARY KEY (pair, time))")
+    rollups.ensure(c)
+    yield c
+    c.close()
+
+
+def _rows(n, seed=0):
+    rng = random.Random(seed)
+    out, p = [], 1.0
+    for i in range(n):
+        if rng.random() < 0.03:
+            continue                                  # дыры в минутках
+        p *= 1 + rng.gauss(0, 0.001)
+        out.append(("P", T0 + i * 60, p * 0.999, p * 1.001, p, p * 1.0002, p * 0.9998))
+    return out
+
+
+def _check(conn, rows, s, e):
+    w = [r for r in rows if s <= r[1] < e]
+    a = rollups.stats(conn, "P", s, e)
+    assert a.n == len(w)
+    assert (a.min, a.max, a.open, a.close) == (min(r[2] for r in w), max(r[3] for r in w), w[0][5], w[-1][6])
+    assert a.mean == pytest.approx(statistics.fmean(r[4] for r in w), rel=1e-12)
+    return a
+
+
+def test_stats_match_minutes_and_read_few_rows(conn):
+    rows = _rows(3 * 1440)
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO minmax VALUES(?,?,?,?,?,?,?)", rows)
+    a = _check(conn, rows, T0 + 7 * 60 + 13, T0 + 7 * 60 + 86400)
+    assert a.rows <= 30
+    _check(conn, rows, T0 + 3600, T0 + 2 * 86400 + 60)
+    assert rollups.stats(conn, "P", T0 - 600, T0) is None
+    # одна 1d-свеча == все минутки суток
+    d = rollups.series(conn, "P", T0, T0 + 86400, "1d")
+    assert len(d) == 1 and d[0][1] == min(r[2] for r in rows if r[1] < T0 + 86400)
+
+
+def test_late_correction_propagates_and_rebuild_is_idempotent(conn):
+    rows = _rows(1440, seed=1)
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO minmax VALUES(?,?,?,?,?,?,?)", rows)
+    t = rows[500][1]
+    with conn:
+        conn.execute("UPDATE minmax SET min = 0.5 WHERE pair='P' AND time=?", (t,))
+    rows[500] = rows[500][:2] + (0.5,) + rows[500][3:]
+    _check(conn, rows, T0, T0 + 86400)
+    assert [r[1] for r in rollups.series(conn, "P", T0, T0 + 86400, "4h") if r[1] == 0.5] == [0.5]
+    before = conn.execute("SELECT * FROM minmax_1h ORDER BY time").fetchall()
+    assert rollups.rebuild(conn, "P") == len({r[1] // 300 for r in rows})
+    assert conn.execute("SELECT * FROM minmax_1h ORDER BY time").fetchall() == before
+
+
+def test_cover_and_resolution_for():
+    segs = rollups.cover(T0 + 61, T0 + 86400 + 3600 * 5 + 120)
+    assert [s[0] for s in segs] == ["1m", "5m", "15m", "1h", "4h", "1h", "1m"]
+    assert [s[0] for s in rollups.cover(T0 - 3600, T0 + 2 * 86400)] == ["1h", "1d"]
+    assert all(a < b for _, a, b in segs) and all(segs[i][2] == segs[i + 1][1] for i in range(len(segs) - 1))
+    assert rollups.resolution_for(0, 86400, 100) == "15m" and rollups.resolution_for(0, 3600) == "1m"
@@ -0,0 +1,37 @@
+import json
+
+import pytest
+
+import backtest
+import sweep
+
+
+def test_expand_space_grid_times_random():
+    grid = sweep.parse_grid(["SELL_SPLIT=[0.3,0.7]", "SELL_MIN_GAIN=0.01"])
+    rand = sweep.parse_random(["BUY_BELOW_OFFSETS=choice:[[0.01],[0.02]]", "BUY_SIZE_BELOW_FIXED_USD=uniform:2:5"])
+    a = sweep.expand_space(grid, rand, samples=3, seed=1)
+    assert len(a) == 6
+    assert {p["SELL_SPLIT"] for p in a} == {0.3, 0.7}
+    assert all(2 <= p["BUY_SIZE_BELOW_FIXED_USD"] <= 5 for p in a)
+    assert a == sweep.expand_space(grid, rand, samples=3, seed=1)
+    assert sweep.expand_space(grid, {}, 10) == [{"SELL_MIN_GAIN": 0.01, "SELL_SPLIT": 0.3},
+                                                {"SELL_MIN_GAIN": 0.01, "SELL_SPLIT": 0.7}]
+
+
+def test_cache_resume_skips_partial_lines(tmp_path):
+    h1 = sweep.config_hash({"SELL_SPLIT": 0.5}, {"seed": 0}, "ds")
+    assert h1 == sweep.config_hash({"SELL_SPLIT": 0.5}, {"seed": 0}, "ds")
+    assert h1 != sweep.config_hash({"SELL_SPLIT": 0.5}, {"seed": 1}, "ds")
+    p = tmp_path / "results.jsonl"
+    p.write_text(json.dumps({"hash": h1, "summary": {"return_pct": 1.0}}) + "\n{\"hash\": \"trunc")
+    cache = sweep.load_cache(str(p))
+    assert list(cache) == [h1]
+
+
+def test_check_params_whitelist():
+    sweep.check_params([{"SELL_SPLIT": 0.5, "BUY_CHANNEL_WINDOW": "1h", "SELL_CHANNEL_ESTIMATOR": "ewma"}])
+    for bad in ({"main": 1}, {"channels": 1}, {"PAIR": "X"}, {"SELL_SPLT": 0.5}):
+        with pytest.raises(SystemExit, match=next(iter(bad))):
+            sweep.check_params([{"SELL_SPLIT": 0.5}, bad])
+    missing = [k for k in backtest.STRATEGY_PARAMS if not (hasattr(backtest.buy, k) or hasattr(backtest.sell, k))]
+    assert missing == []                                          # список не разошёлся с buy/sell
@@ -0,0 +1,130 @@
+import importlib.util
+import json
+import logging
+import os
+import sys
+
+import pytest
+
+import tracing
+
+_p = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tools", "trace_summary.py")
+_spec = importlib.util.spec_from_file_location("trace_summary", _p)
+trace_summary = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(trace_summary)
+
+
+class _Sink(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.recs = []
+
+    def emit(self, record):
+        self.recs.append(json.loads(record.getMessage()))
+
+
+@pytest.fixture
+def sink(monkeypatch):
+    h = _Sink()
+    lg = logging.getLogger("test.trace")
+    lg.propagate = False
+    lg.handlers = [h]
+    lg.setLevel(logging.INFO)
+    monkeypatch.setattr(tracing, "_log", lg)
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", True)
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 1.0)
+    return h.recs
+
+
+def test_nesting_and_context_reset(sink):
+    assert tracing._current.get() is None
+    with tracing.span("root", pair="P") as root:
+        with tracing.span("child") as ch:
+            assert tracing._current.get() is ch
+            with tracing.child_span("db", op="select"):
+                pass
+        assert tracing._current.get() is root
+    assert tracing._current.get() is None
+    by = {r["name"]: r for r in sink}
+    assert [r["name"] for r in sink] == ["db", "child", "root"]          # пишутся при закрытии
+    assert by["root"]["parent"] is None and by["root"]["attrs"] == {"pair": "P"}
+    assert by["child"]["parent"] == by["root"]["span"] and by["db"]["parent"] == by["child"]["span"]
+    assert len({r["trace"] for r in sink}) == 1
+    assert by["root"]["dur_ms"] >= by["child"]["dur_ms"] >= by["db"]["dur_ms"] >= 0
+
+
+def test_unsampled_root_silences_subtree(sink, monkeypatch):
+    monkeypatch.setattr(tracing, "TRACE_SAMPLE_RATE", 0.0)
+    with tracing.span("root") as root:
+        assert root is tracing._NOOP and tracing._current.get() is tracing._UNSAMPLED
+        assert tracing.span("child") is tracing._NOOP
+        assert tracing.child_span("db") is tracing._NOOP
+    assert tracing._current.get() is None and sink == []
+    assert tracing.child_span("db") is tracing._NOOP                    # без трейса мелочь не пишется
+    monkeypatch.setattr(tracing, "TRACE_ENABLED", False)
+    assert tracing.span("x") is tracing._NOOP
+
+
+def test_traced_records_error_and_reraises(sink):
+    @tracing.traced("job.tick")
+    def boom():
+        raise KeyError("x")
+
+    @tracing.traced()
+    def ok(a, b=1):
+        return a + b
+
+    with pytest.raises(KeyError):
+        boom()
+    assert ok(1, b=2) == 3
+    assert sink[0]["name"] == "job.tick" and sink[0]["err"] == "KeyError"
+    assert sink[1]["name"].endswith("ok") and "err" not in sink[1]
+    assert tracing._current.get() is None
+
+
+def _span(trace, sid, parent, name, mono, dur_ms):
+    return {"trace": trace, "span": sid, "parent": parent, "name": name, "mono": mono, "dur_ms": dur_ms}
+
+
+def test_summary_percentiles_and_critical_path(tmp_path, monkeypatch, capsys):
+    # тик 100ms: a 0..40, b 50..90 (внутри b — c 60..70, параллельный d 55..65 — мимо пути)
+    spans = [
+        _span("t1", "r", None, "tick", 0.0, 100.0),
+        _span("t1", "a", "r", "a", 0.0, 40.0),
+        _span("t1", "b", "r", "b", 0.05, 40.0),
+        _span("t1", "c", "b", "c", 0.06, 10.0),
+        _span("t1", "d", "b", "d", 0.055, 10.0),
+    ] + [_span(f"x{i}", f"x{i}", None, "other", 0.0, float(i)) for i in range(1, 101)]
+    path = tmp_path / "trace.jsonl"
+    path.write_text("\n".join(json.dumps(s) for s in spans) + "\nnot json\n")
+
+    loaded = trace_summary.load_spans([str(path)])
+    assert len(loaded) == len(spans)
+    stats = {r[0]: r for r in trace_summary.span_stats(loaded)}
+    assert stats["other"][1] == 100
+    assert stats["other"][2] == pytest.approx(50.5) and stats["other"][3] == pytest.approx(95.05)
+
+    parts = trace_summary.critical_breakdown(loaded, "tick")["tick"]["parts"]
+    assert set(parts) == {"tick", "a", "b", "c"}
+    assert parts["a"] == pytest.approx(40.0) and parts["c"] == pytest.approx(10.0)
+    assert parts["b"] == pytest.approx(30.0) and parts["tick"] == pytest.approx(20.0)
+
+    monkeypatch.setattr(sys, "argv", ["trace_summary", str(path), "--root", "tick"])
+    trace_summary.main()
+    out = capsys.readouterr().out
+    assert "spans=5" in out and "== critical path: tick (ticks=1, avg=100.0ms)" in out
+    assert "other" not in out
+
+
+def test_finish_in_other_context_restores_parent(sink):
+    import contextvars
+    with tracing.span("root") as root:
+        ch = contextvars.copy_context().run(lambda: tracing.span("db.exec").start())
+        ch.finish()                                   # reset чужого токена -> ValueError -> откат к root
+        assert tracing._current.get() is root
+        with tracing.span("next") as nxt:
+            assert nxt.parent == root.id and nxt.trace == root.trace
+    assert tracing._current.get() is None
+    orphan = contextvars.copy_context().run(lambda: tracing.span("o").start())
+    orphan.finish()                                   # до start переменной не было -> None
+    assert tracing._current.get() is None
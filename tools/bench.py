@@ -0,0 +1,373 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарки горячих путей на синтетических БД (fills / orders / minmax по N строк).
+
+  python3 tools/bench.py run --save bench/base.json                  # N = 10k, 100k
+  python3 tools/bench.py run --sizes 1000000 --only sync. --save bench/1m.json
+  python3 tools/bench.py run --compare bench/base.json               # прогон + сравнение
+  python3 tools/bench.py compare bench/base.json bench/new.json --threshold 20
+
+Синтетическая БД собирается один раз на (N, seed) в --cache-dir; кейсы, которые пишут
+(ledger, sync, свечи, лестница), работают на своей копии. Каждый кейс гоняется --repeat
+раз (долгие — до --budget сек), в JSON пишутся median/min/mean по кейсу.
+
+compare помечает регрессией кейс, у которого median вырос больше чем на --threshold %
+и больше чем на --min-ms (шум мелких кейсов); код выхода 1, если такие есть.
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import sqlite3
+import argparse
+import platform
+import statistics
+import subprocess
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("EBOT_METRICS", "0")
+os.environ.setdefault("EBOT_TRACE", "0")
+
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import models  # noqa: E402
+import models_trading as mt  # noqa: E402
+import order_stats  # noqa: E402
+import rollups  # noqa: E402
+
+PAIR = "KASUSDC"
+SIZES = (10_000, 100_000)
+OPEN_SHARE = 0.01          # доля открытых ордеров (и размер лестницы / open_orders биржи)
+T0 = 1_700_000_000         # начало синтетической истории (минутная сетка)
+
+# ---------------- синтетические БД ----------------
+def make_db(path: str, n: int, seed: int = 0, pair: str = PAIR) -> str:
+    """БД с n fills, n orders (OPEN_SHARE открытых) и n минутных свечей, заканчивающихся «сейчас»."""
+    rng = random.Random(seed)
+    if os.path.exists(path):
+        os.remove(path)
+    eng = create_engine(f"sqlite:///{path}")
+    mt.Base.metadata.create_all(eng)
+    models.Base.metadata.create_all(eng)
+    eng.dispose()
+
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    end = int(time.time()) // 60 * 60
+    start = end - n * 60
+    price, candles = 0.09, []
+    for i in range(n):
+        price *= 1.0 + rng.gauss(0.0, 0.002)
+        lo, hi = price * (1 - rng.uniform(0, 0.003)), price * (1 + rng.uniform(0, 0.003))
+        candles.append((pair, start + i * 60, lo, hi, (lo + hi) / 2, price, price))
+    conn.executemany("INSERT INTO minmax(pair, time, min, max, mid, open, close) VALUES(?,?,?,?,?,?,?)", candles)
+
+    n_open = max(1, int(n * OPEN_SHARE))
+    orders, fills, pos = [], [], 0.0
+    for i in range(n):
+        t = T0 + i * 30
+        side = "BUY" if pos <= 0 or rng.random() < 0.55 else "SELL"
+        p = round(candles[i][4] * (1 + rng.uniform(-0.01, 0.01)), 6)
+        q = round(rng.uniform(20, 400), 2) if side == "BUY" else round(min(pos, rng.uniform(20, 400)), 2)
+        if q <= 0:
+            side, q = "BUY", round(rng.uniform(20, 400), 2)
+        pos += q if side == "BUY" else -q
+        is_open = i >= n - n_open
+        orders.append((f"O{i}", pair, side, p, q, 0.0 if is_open else q, "NEW" if is_open else "FILLED",
+                       t, t, 1, p * q if side == "BUY" and is_open else 0.0, "GRID"))
+        if not is_open:
+            fills.append((f"F{i}", f"O{i}", pair, side, p, q, p * q * 0.0005, t, "GRID"))
+    conn.executemany("INSERT INTO orders(id, pair, side, price, qty, filled_qty, status, created, updated, paper, "
+                     "reserved, mode) VALUES(?,?,?,?,?,?,?,?,?,?,?,?)", orders)
+    conn.executemany("INSERT INTO fills(id, order_id, pair, side, price, qty, fee, ts, mode) "
+                     "VALUES(?,?,?,?,?,?,?,?,?)", fills)
+    conn.execute("INSERT INTO capital(pair, limit_usd, available_usd, realized_pnl, updated) VALUES(?, 1000, 500, 0, 0)",
+                 (pair,))
+    conn.commit()
+    rollups.rebuild(conn, pair)        # агрегаты одним проходом, дальше — триггеры
+    order_stats.ensure(conn)           # сводка ордеров заполняется из orders, дальше — триггеры
+    conn.close()
+    return path
+
+def cached_db(cache_dir: str, n: int, seed: int = 0) -> str:
+    os.makedirs(cache_dir, exist_ok=True)
+    path = os.path.join(cache_dir, f"bench_{n}_{seed}.db")
+    if not os.path.exists(path):
+        t0 = time.perf_counter()
+        make_db(path, n, seed)
+        print(f"[bench] built {path} in {time.perf_counter() - t0:.1f}s", file=sys.stderr)
+    return path
+
+class Ctx:
+    """Исходная БД уровня N и копии для пишущих кейсов."""
+    def __init__(self, src: str, n: int, work_dir: str):
+        self.src, self.n, self.work_dir = src, n, work_dir
+        self._copies = 0
+
+    @property
+    def n_open(self) -> int:
+        return max(1, int(self.n * OPEN_SHARE))
+
+    def copy(self) -> str:
+        self._copies += 1
+        dst = os.path.join(self.work_dir, f"work_{self.n}_{self._copies}.db")
+        src = sqlite3.connect(self.src)
+        out = sqlite3.connect(dst)
+        src.backup(out)                 # с WAL: копия без «хвоста» в -wal
+        src.close()
+        out.close()
+        return dst
+
+    def session(self, path: str):
+        return sessionmaker(bind=create_engine(f"sqlite:///{path}"), autoflush=False)()
+
+class FakeClient:
+    """Ответы биржи из памяти: open_orders — заданный список, place_order — счётчик id."""
+    paper = True
+
+    def __init__(self, open_orders: Optional[list] = None):
+        self._open, self._next = list(open_orders or []), 0
+
+    def open_orders(self, symbol: str, limit: int = None) -> list:
+        return self._open
+
+    def all_orders(self, symbol: str, startTime: int = None, endTime: int = None, limit: int = 1000) -> list:
+        return []
+
+    def query_order(self, symbol: str, order_id: str) -> dict:
+        return {}
+
+    def place_order(self, symbol, side, price, qty, tif="GTC", client_id=None) -> dict:
+        self._next += 1
+        return {"orderId": f"X{self._next}", "clientOrderId": client_id}
+
+# ---------------- кейсы ----------------
+# fn(ctx) -> (setup|None, op): setup() не измеряется и вызывается перед каждым op()
+CASES: Dict[str, Callable] = {}
+
+def case(name: str):
+    def deco(fn):
+        CASES[name] = fn
+        return fn
+    return deco
+
+@case("sync.recompute_position.full")
+def _recompute_full(ctx):
+    import sync
+    s = ctx.session(ctx.copy())
+    return None, lambda: sync.recompute_position(s, full=True, pair=PAIR)
+
+@case("sync.recompute_position.tail")
+def _recompute_tail(ctx):
+    import sync
+    s = ctx.session(ctx.copy())
+    sync.recompute_position(s, full=True, pair=PAIR)
+    k = [0]
+
+    def setup():
+        k[0] += 1
+        s.add_all([mt.Fill(id=f"N{k[0]}_{i}", order_id="", pair=PAIR, side="BUY", price=0.09, qty=10.0,
+                           fee=0.0, ts=int(time.time()) + k[0], mode="") for i in range(10)])
+        s.commit()
+    return setup, lambda: sync.recompute_position(s, pair=PAIR)
+
+@case("sync.sync_open_orders")
+def _sync_open(ctx):
+    import sync
+    s = ctx.session(ctx.copy())
+    rows = s.query(mt.Order).filter(mt.Order.status == "NEW").all()
+    ex = [{"orderId": o.id, "symbol": PAIR, "side": o.side, "price": str(o.price), "origQty": str(o.qty),
+           "executedQty": "0", "status": "NEW", "time": o.created * 1000, "updateTime": o.updated * 1000}
+          for o in rows]
+    cli = FakeClient(ex[: len(ex) // 2])          # половина исчезла с биржи -> сверка по fills
+    s.close()
+
+    def setup():
+        nonlocal s
+        s = ctx.session(ctx.copy())
+    return setup, lambda: sync.sync_open_orders(s, cli, len(ex), pair=PAIR)
+
+@case("channels.channel_24h.cold")
+def _channel_cold(ctx):
+    import buy
+    import channels
+    channels.DB_PATH = ctx.src
+    return channels._ENGINES.clear, lambda: buy.channel_24h(PAIR)
+
+@case("channels.channel_24h.warm")
+def _channel_warm(ctx):
+    import buy
+    import channels
+    channels.DB_PATH = ctx.src
+    channels._ENGINES.clear()
+    buy.channel_24h(PAIR)
+    return None, lambda: buy.channel_24h(PAIR)
+
+@case("candles.insert_candles_rest")
+def _insert_candles(ctx):
+    import candles
+    path = ctx.copy()
+    candles.SessionLocal = sessionmaker(bind=create_engine(f"sqlite:///{path}"))
+    candles.CANDLE_RETENTION_SEC = 10 ** 9       # меряем upsert + триггеры, не разовую чистку
+    end = int(time.time()) // 60 * 60
+    rows = [[(end - i * 60) * 1000, "0.09", "0.0902", "0.0898", "0.0901", "100", 0] for i in range(1000)]
+    return None, lambda: candles.insert_candles_rest(rows, PAIR)
+
+@case("reports.build_report_text")
+def _report(ctx):
+    import reports.core as core
+    core.DB_PATH, core.PAIR = ctx.src, PAIR
+    return None, lambda: core.build_report_text("daily")
+
+@case("buckets.build_grid")
+def _grid(ctx):
+    import buckets
+    k = ctx.n_open
+    return None, lambda: (buckets.build_grid(0.08, 0.09, k, 1.3), buckets.build_sizes(k, 2.0, 1.0, 1.3))
+
+@case("buckets.place_ladder")
+def _ladder(ctx):
+    import buckets
+    s = ctx.session(ctx.copy())
+    k = ctx.n_open
+    prices, sizes = buckets.build_grid(0.08, 0.09, k, 1.3), buckets.build_sizes(k, 2.0, 1.0, 1.3)
+    return None, lambda: buckets.place_ladder(s, FakeClient(), prices, sizes, budget_usd=10.0 ** 9)
+
+@case("consolidate.plan_side")
+def _consolidate(ctx):
+    import consolidate
+    from orderbook import OrderBook
+    s = ctx.session(ctx.src)
+
+    def op():
+        book = OrderBook.load(s, PAIR)
+        return consolidate.plan_side(book, "BUY", to_cancel=max(2, len(book.buys) // 2),
+                                     place_count=max(1, len(book.buys) // 20))
+    return None, op
+
+# ---------------- прогон ----------------
+def measure(setup: Optional[Callable], op: Callable, repeat: int, budget: float) -> List[float]:
+    out, spent = [], 0.0
+    for _ in range(max(1, repeat)):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        op()
+        dt = time.perf_counter() - t0
+        out.append(dt)
+        spent += dt
+        if spent >= budget:
+            break
+    return out
+
+def _git_rev() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip()
+    except Exception:
+        return ""
+
+def run(sizes=SIZES, only: Optional[List[str]] = None, repeat: int = 5, budget: float = 10.0,
+        cache_dir: str = "/tmp/ebot-bench", seed: int = 0, log=print) -> dict:
+    results = {}
+    names = [k for k in CASES if not only or any(k.startswith(p) for p in only)]
+    for n in sizes:
+        src = cached_db(cache_dir, n, seed)
+        work = os.path.join(cache_dir, f"work_{os.getpid()}")
+        os.makedirs(work, exist_ok=True)
+        try:
+            ctx = Ctx(src, n, work)
+            for name in names:
+                setup, op = CASES[name](ctx)
+                ts = measure(setup, op, repeat, budget)
+                r = {"case": name, "n": n, "median": statistics.median(ts), "min": min(ts),
+                     "mean": statistics.fmean(ts), "runs": len(ts)}
+                results[f"{name}@{n}"] = r
+                log(f"{name:<32} {n:>8} {r['median'] * 1000:>10.2f} ms  (min {r['min'] * 1000:.2f}, runs {r['runs']})")
+        finally:
+            shutil.rmtree(work, ignore_errors=True)
+    return {"meta": {"time": int(time.time()), "git": _git_rev(), "python": platform.python_version(),
+                     "machine": platform.node(), "seed": seed}, "results": results}
+
+def compare(base: dict, new: dict, threshold: float = 20.0, min_ms: float = 1.0) -> List[dict]:
+    """Строки сравнения по общим ключам; status: ok | REGRESSION | faster | new | gone."""
+    b, c = base.get("results", {}), new.get("results", {})
+    out = []
+    for key in sorted(set(b) | set(c)):
+        if key not in b or key not in c:
+            out.append({"key": key, "base": b.get(key, {}).get("median"), "new": c.get(key, {}).get("median"),
+                        "pct": None, "status": "new" if key in c else "gone"})
+            continue
+        mb, mc = b[key]["median"], c[key]["median"]
+        pct = (mc - mb) / mb * 100 if mb > 0 else 0.0
+        if pct > threshold and (mc - mb) * 1000 > min_ms:
+            status = "REGRESSION"
+        elif pct < -threshold and (mb - mc) * 1000 > min_ms:
+            status = "faster"
+        else:
+            status = "ok"
+        out.append({"key": key, "base": mb, "new": mc, "pct": pct, "status": status})
+    return out
+
+def print_compare(rows: List[dict]) -> int:
+    def ms(x):
+        return f"{x * 1000:>10.2f}" if x is not None else f"{'-':>10}"
+    print(f"{'case@N':<42} {'base ms':>10} {'new ms':>10} {'diff':>8}  status")
+    for r in rows:
+        pct = f"{r['pct']:+7.1f}%" if r["pct"] is not None else f"{'':>8}"
+        print(f"{r['key']:<42} {ms(r['base'])} {ms(r['new'])} {pct}  {r['status']}")
+    bad = [r for r in rows if r["status"] == "REGRESSION"]
+    print(f"[bench] {len(rows)} cases, {len(bad)} regressions")
+    return 1 if bad else 0
+
+def _load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+def _save(path: str, data: dict) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    print(f"[bench] saved {path}")
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Бенчмарки горячих путей (sync, каналы, свечи, отчёт, лестница, консолидация)")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    r = sub.add_parser("run", help="прогнать кейсы")
+    r.add_argument("--sizes", type=int, nargs="+", default=list(SIZES), help="строк в БД (10000 100000 1000000)")
+    r.add_argument("--only", nargs="+", help="префиксы имён кейсов")
+    r.add_argument("--repeat", type=int, default=5)
+    r.add_argument("--budget", type=float, default=10.0, help="сек на кейс (повторы обрываются)")
+    r.add_argument("--cache-dir", default="/tmp/ebot-bench", help="кэш синтетических БД")
+    r.add_argument("--seed", type=int, default=0)
+    r.add_argument("--save", help="записать результаты в JSON")
+    r.add_argument("--compare", help="сравнить с этим baseline")
+    r.add_argument("--threshold", type=float, default=20.0, help="порог регрессии, %%")
+    r.add_argument("--min-ms", type=float, default=1.0, help="минимальный абсолютный рост, мс")
+    r.add_argument("--list", action="store_true", help="только показать кейсы")
+    c = sub.add_parser("compare", help="сравнить два JSON")
+    c.add_argument("base")
+    c.add_argument("new")
+    c.add_argument("--threshold", type=float, default=20.0)
+    c.add_argument("--min-ms", type=float, default=1.0)
+    args = ap.parse_args(argv)
+
+    if args.cmd == "compare":
+        return print_compare(compare(_load(args.base), _load(args.new), args.threshold, args.min_ms))
+    if args.list:
+        print("\n".join(CASES))
+        return 0
+    data = run(args.sizes, args.only, args.repeat, args.budget, args.cache_dir, args.seed)
+    if args.save:
+        _save(args.save, data)
+    if args.compare:
+        return print_compare(compare(_load(args.compare), data, args.threshold, args.min_ms))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Бенчмарк планировщика консолидации (consolidate.plan_side) на синтетических книгах:
+время построения OrderBook и плана, сохранность notional, число ордеров до/после.
+
+  python3 tools/bench_consolidate.py                   # 1k, 2k, 5k, 10k
+  python3 tools/bench_consolidate.py --sizes 1000 10000 --cancel-share 0.5 --place-share 0.1
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import consolidate  # noqa: E402
+from orderbook import OrderBook  # noqa: E402
+
+def make_rows(n: int, side: str, seed: int = 0) -> list:
+    """Сетка с кластерами: половина ордеров — плотные «полки», остальное — равномерно."""
+    rng = random.Random(seed)
+    rows = []
+    shelves = [rng.uniform(0.05, 0.10) for _ in range(max(1, n // 200))]
+    for i in range(n):
+        if i % 2:
+            p = rng.choice(shelves) * (1.0 + rng.gauss(0.0, 0.002))
+        else:
+            p = rng.uniform(0.05, 0.10)
+        rows.append((f"{side[0]}{i}", side, round(p, 6), round(rng.uniform(20, 400), 2), 0.0, "GRID"))
+    return rows
+
+def bench(n: int, side: str, cancel_share: float, place_share: float, repeat: int) -> dict:
+    rows = make_rows(n, side)
+    to_cancel = max(2, int(n * cancel_share))
+    place = max(1, int(to_cancel * place_share))
+    t_book = t_plan = 0.0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        book = OrderBook.from_rows(rows)
+        t1 = time.perf_counter()
+        plan = consolidate.plan_side(book, side, to_cancel, place, price_floor=0.0)
+        t2 = time.perf_counter()
+        t_book += t1 - t0
+        t_plan += t2 - t1
+    usd_in = sum(o.price * o.qty for o in plan.cancel)
+    usd_out = sum(b.price * b.qty for b in plan.buckets)
+    return {"n": n, "cancel": len(plan.cancel), "place": len(plan.buckets),
+            "book_ms": t_book / repeat * 1000, "plan_ms": t_plan / repeat * 1000,
+            "drift_pct": (usd_out - usd_in) / usd_in * 100 if usd_in else 0.0}
+
+def main():
+    ap = argparse.ArgumentParser(description="Бенчмарк consolidate.plan_side")
+    ap.add_argument("--sizes", type=int, nargs="+", default=[1000, 2000, 5000, 10000])
+    ap.add_argument("--side", choices=("BUY", "SELL"), default="BUY")
+    ap.add_argument("--cancel-share", type=float, default=0.6, help="доля ордеров под консолидацию")
+    ap.add_argument("--place-share", type=float, default=0.1, help="замен на снятый ордер")
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+    print(f"{'orders':>7} {'cancel':>7} {'place':>6} {'book ms':>9} {'plan ms':>9} {'notional drift %':>17}")
+    for n in args.sizes:
+        r = bench(n, args.side, args.cancel_share, args.place_share, args.repeat)
+        print(f"{r['n']:>7} {r['cancel']:>7} {r['place']:>6} {r['book_ms']:>9.2f} {r['plan_ms']:>9.2f} {r['drift_pct']:>17.6f}")
+
+if __name__ == "__main__":
+    main()
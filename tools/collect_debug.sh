@@ -47,6 +47,9 @@ banner "Сервисы — краткий статус"
 systemctl is-active --quiet ebot.service && echo "ebot: active" || echo "ebot: NOT active"
 systemctl is-active --quiet ebot-candles.service && echo "candles: active" || echo "candles: NOT active"
 
+banner "Метрики (logs/metrics/ebot.prom, без гистограммных корзин)"
+grep -vE '_bucket\{|^# ' "$ROOT/logs/metrics/ebot.prom" 2>/dev/null || echo "no metrics"
+
 banner "Журналы (последние 40 строк) ebot.service — consolidate/report"
 journalctl -u ebot.service -n 200 --no-pager | egrep -i 'consolidate|report|ERROR|STDOUT|STDERR' || true
 
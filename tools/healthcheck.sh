@@ -25,4 +25,15 @@ PY
 else
   echo "No ebot.db yet"
 fi
+PROM="$ROOT/logs/metrics/ebot.prom"
+if [ -f "$PROM" ]; then
+  AGE=$(( $(date +%s) - $(stat -c %Y "$PROM") ))
+  echo "Metrics: $PROM (age ${AGE}s)"
+  grep -E '^ebot_(candle_ingest_lag_seconds|open_orders|orders_total|api_retries_total|task_runs_total)' "$PROM" || true
+  LAG=$(awk '/^ebot_candle_ingest_lag_seconds/{print int($2); exit}' "$PROM")
+  if [[ "${LAG:-}" =~ ^[0-9]+$ ]] && (( LAG > 300 )); then echo "WARNING: candle ingest lag ${LAG}s"; fi
+  if (( AGE > 900 )); then echo "WARNING: metrics not updated for ${AGE}s"; fi
+else
+  echo "No metrics yet ($PROM)"
+fi
 echo "Healthcheck finished."
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Сводка по trace.jsonl (см. tracing.py):
+  - p50/p95/p99/mean/total по имени спана;
+  - разбивка критического пути по корневым спанам (тикам): где реально уходит время.
+
+  python3 tools/trace_summary.py /opt/Ebot/logs/trace.jsonl [--root buy.main] [--top 20]
+"""
+import argparse
+import glob
+import json
+import math
+import os
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+def load_spans(paths: List[str]) -> List[dict]:
+    out = []
+    for p in paths:
+        try:
+            with open(p, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        out.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except OSError:
+            continue
+    return out
+
+def percentile(sorted_vals: List[float], q: float) -> float:
+    """Линейная интерполяция (как numpy 'linear')."""
+    if not sorted_vals:
+        return 0.0
+    k = (len(sorted_vals) - 1) * q
+    lo, hi = math.floor(k), math.ceil(k)
+    if lo == hi:
+        return sorted_vals[int(k)]
+    return sorted_vals[lo] + (sorted_vals[hi] - sorted_vals[lo]) * (k - lo)
+
+def span_stats(spans: List[dict]) -> List[Tuple[str, int, float, float, float, float, float]]:
+    by_name: Dict[str, List[float]] = defaultdict(list)
+    for s in spans:
+        by_name[s.get("name", "?")].append(float(s.get("dur_ms") or 0.0))
+    rows = []
+    for name, vals in by_name.items():
+        vals.sort()
+        rows.append((name, len(vals), percentile(vals, 0.50), percentile(vals, 0.95),
+                     percentile(vals, 0.99), sum(vals) / len(vals), sum(vals)))
+    rows.sort(key=lambda r: r[-1], reverse=True)
+    return rows
+
+def _end(s: dict) -> float:
+    return float(s["mono"]) + float(s.get("dur_ms") or 0.0) / 1000.0
+
+def critical_path(span: dict, children: Dict[str, List[dict]]) -> List[Tuple[str, float]]:
+    """
+    Сегменты (имя, сек) критического пути спана: идём от конца назад, каждый раз
+    спускаясь в ребёнка, который завершился последним до текущего курсора.
+    Параллельные (перекрытые) дети в путь не попадают.
+    """
+    segs: List[Tuple[str, float]] = []
+    start = float(span["mono"])
+    cursor = _end(span)
+    for ch in sorted(children.get(span["span"], []), key=_end, reverse=True):
+        ch_end = _end(ch)
+        if ch_end > cursor + 1e-9 or ch_end <= start:
+            continue  # пересекается с уже учтённым — параллельная ветка
+        segs.append((span["name"], max(0.0, cursor - ch_end)))
+        segs.extend(critical_path(ch, children))
+        cursor = float(ch["mono"])
+    segs.append((span["name"], max(0.0, cursor - start)))
+    return segs
+
+def critical_breakdown(spans: List[dict], root_filter: str = "") -> Dict[str, Dict[str, object]]:
+    """{root_name: {"ticks": n, "total_ms": x, "parts": {name: ms}}} — суммарно по всем тикам."""
+    by_trace: Dict[str, List[dict]] = defaultdict(list)
+    for s in spans:
+        if "mono" in s and "span" in s:
+            by_trace[s.get("trace", "")].append(s)
+    out: Dict[str, Dict[str, object]] = {}
+    for items in by_trace.values():
+        children: Dict[str, List[dict]] = defaultdict(list)
+        roots = []
+        for s in items:
+            if s.get("parent"):
+                children[s["parent"]].append(s)
+            else:
+                roots.append(s)
+        for r in roots:
+            if root_filter and r.get("name") != root_filter:
+                continue
+            agg = out.setdefault(r["name"], {"ticks": 0, "total_ms": 0.0, "parts": defaultdict(float)})
+            agg["ticks"] += 1
+            agg["total_ms"] += float(r.get("dur_ms") or 0.0)
+            for name, sec in critical_path(r, children):
+                agg["parts"][name] += sec * 1000.0
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Сводка trace.jsonl: перцентили по спанам и критический путь тика")
+    ap.add_argument("path", nargs="?", default=os.path.join(os.getenv("EBOT_LOG_DIR", "/opt/Ebot/logs"), "trace.jsonl"))
+    ap.add_argument("--rotated", action="store_true", help="учитывать и ротированные файлы (.1, .2, ...)")
+    ap.add_argument("--root", default="", help="только тики с этим корневым спаном (buy.main, sync.main, ...)")
+    ap.add_argument("--top", type=int, default=30)
+    args = ap.parse_args()
+
+    paths = [args.path]
+    if args.rotated:
+        paths += sorted(glob.glob(args.path + ".*"), reverse=True)
+    spans = load_spans(paths)
+    if args.root:
+        keep = {s.get("trace") for s in spans if not s.get("parent") and s.get("name") == args.root}
+        spans = [s for s in spans if s.get("trace") in keep]
+    print(f"spans={len(spans)} files={len(paths)}")
+
+    print(f"\n{'span':<28}{'n':>8}{'p50ms':>10}{'p95ms':>10}{'p99ms':>10}{'mean':>10}{'total_s':>10}")
+    for name, n, p50, p95, p99, avg, tot in span_stats(spans)[:args.top]:
+        print(f"{name:<28}{n:>8}{p50:>10.2f}{p95:>10.2f}{p99:>10.2f}{avg:>10.2f}{tot/1000.0:>10.2f}")
+
+    for root, agg in sorted(critical_breakdown(spans, args.root).items()):
+        ticks = int(agg["ticks"]) or 1
+        total = float(agg["total_ms"]) or 1e-9
+        print(f"\n== critical path: {root} (ticks={ticks}, avg={total/ticks:.1f}ms)")
+        for name, ms in sorted(agg["parts"].items(), key=lambda kv: kv[1], reverse=True)[:args.top]:
+            print(f"  {name:<26}{ms/ticks:>10.2f}ms {100.0*ms/total:>6.1f}%")
+
+if __name__ == "__main__":
+    main()
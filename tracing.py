@@ -0,0 +1,208 @@
+# -*- coding: utf-8 -*-
+"""
+Лёгкая трассировка горячих путей: вложенные спаны с монотонным временем -> JSONL.
+
+    with tracing.span("sync.trades", window=5): ...
+    @tracing.traced("buy.main")
+    def main(): ...
+
+Включение/сэмплинг: EBOT_TRACE=1 / EBOT_TRACE_SAMPLE=0.1 или TRACE_ENABLED /
+TRACE_SAMPLE_RATE в config. Решение о сэмплинге принимается на корневом спане
+(тик), дочерние наследуют его. Выключенный трейсер — одна проверка флага.
+
+Сводка: python3 tools/trace_summary.py logs/trace.jsonl
+"""
+import os
+import json
+import time
+import random
+import logging
+import functools
+import contextvars
+from logging.handlers import RotatingFileHandler
+from typing import Optional
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+def _env(name: str, default):
+    v = os.getenv(name)
+    return default if v is None or v == "" else v
+
+TRACE_ENABLED     = str(_env("EBOT_TRACE", getattr(CFG, "TRACE_ENABLED", False))).strip().lower() in ("1", "true", "yes", "on")
+TRACE_SAMPLE_RATE = float(_env("EBOT_TRACE_SAMPLE", getattr(CFG, "TRACE_SAMPLE_RATE", 1.0)))
+TRACE_FILE        = _env("EBOT_TRACE_FILE", getattr(CFG, "TRACE_FILE", None)) or \
+                    os.path.join(os.getenv("EBOT_LOG_DIR", "/opt/Ebot/logs"), "trace.jsonl")
+TRACE_MAX_BYTES   = int(getattr(CFG, "TRACE_MAX_BYTES", 20 * 1024 * 1024))
+TRACE_BACKUPS     = int(getattr(CFG, "TRACE_BACKUPS", 5))
+
+# текущий спан (или _UNSAMPLED, если корень не попал в выборку)
+_current: contextvars.ContextVar = contextvars.ContextVar("ebot_span", default=None)
+_UNSAMPLED = object()
+
+_log: Optional[logging.Logger] = None
+
+def _writer() -> logging.Logger:
+    global _log
+    if _log is None:
+        lg = logging.getLogger("ebot.trace")
+        lg.propagate = False
+        lg.setLevel(logging.INFO)
+        if not lg.handlers:
+            try:
+                os.makedirs(os.path.dirname(TRACE_FILE) or ".", exist_ok=True)
+                h = RotatingFileHandler(TRACE_FILE, maxBytes=TRACE_MAX_BYTES,
+                                        backupCount=TRACE_BACKUPS, encoding="utf-8")
+            except Exception:
+                h = logging.NullHandler()
+            h.setFormatter(logging.Formatter("%(message)s"))
+            try:
+                from logging_config import make_async_handler
+                lg.addHandler(make_async_handler(h))  # запись на диск — вне горячего потока
+            except Exception:
+                lg.addHandler(h)
+        _log = lg
+    return _log
+
+def _new_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+class _NoopSpan:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def set(self, **attrs): pass
+    def start(self): return self
+    def finish(self, err: Optional[BaseException] = None): pass
+
+_NOOP = _NoopSpan()
+
+class Span:
+    __slots__ = ("name", "attrs", "trace", "id", "parent", "_t0", "_ts", "_token")
+
+    def __init__(self, name: str, trace: str, parent: Optional[str], attrs: dict):
+        self.name = name
+        self.attrs = attrs
+        self.trace = trace
+        self.id = _new_id()
+        self.parent = parent
+        self._t0 = 0.0
+        self._ts = 0.0
+        self._token = None
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def start(self) -> "Span":
+        self._ts = time.time()
+        self._t0 = time.monotonic()
+        self._token = _current.set(self)
+        return self
+
+    def finish(self, err: Optional[BaseException] = None) -> None:
+        dur = time.monotonic() - self._t0
+        if self._token is not None:
+            try:
+                _current.reset(self._token)
+            except ValueError:
+                # закрыт в другом контексте (SQLAlchemy-события) — вернуть то, что было до start
+                old = self._token.old_value
+                _current.set(None if old is contextvars.Token.MISSING else old)
+            self._token = None
+        rec = {
+            "trace": self.trace, "span": self.id, "parent": self.parent, "name": self.name,
+            "ts": round(self._ts, 6), "mono": round(self._t0, 6), "dur_ms": round(dur * 1000.0, 3),
+            "pid": os.getpid(),
+        }
+        if self.attrs:
+            rec["attrs"] = self.attrs
+        if err is not None:
+            rec["err"] = type(err).__name__
+        try:
+            _writer().info(json.dumps(rec, ensure_ascii=False, default=str))
+        except Exception:
+            pass
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.finish(exc)
+        return False
+
+class _UnsampledRoot:
+    """Корень вне выборки: глушит всё поддерево одной проверкой."""
+    __slots__ = ("_token",)
+    def __enter__(self):
+        self._token = _current.set(_UNSAMPLED)
+        return _NOOP
+    def __exit__(self, *exc):
+        _current.reset(self._token)
+        return False
+    def set(self, **attrs): pass
+
+def span(name: str, **attrs):
+    """Контекст-менеджер спана. При выключенной трассировке — общий no-op."""
+    if not TRACE_ENABLED:
+        return _NOOP
+    parent = _current.get()
+    if parent is _UNSAMPLED:
+        return _NOOP
+    if parent is None:
+        if TRACE_SAMPLE_RATE < 1.0 and random.random() >= TRACE_SAMPLE_RATE:
+            return _UnsampledRoot()
+        return Span(name, _new_id(), None, attrs)
+    return Span(name, parent.trace, parent.id, attrs)
+
+def child_span(name: str, **attrs):
+    """Спан только внутри уже идущего (сэмплированного) трейса — для частых мелких операций."""
+    if not TRACE_ENABLED:
+        return _NOOP
+    parent = _current.get()
+    if not isinstance(parent, Span):
+        return _NOOP
+    return Span(name, parent.trace, parent.id, attrs)
+
+def traced(name: Optional[str] = None):
+    """Декоратор: оборачивает вызов функции в спан."""
+    def deco(fn):
+        sname = name or f"{fn.__module__}.{fn.__qualname__}"
+
+        @functools.wraps(fn)
+        def wrapper(*a, **kw):
+            if not TRACE_ENABLED:
+                return fn(*a, **kw)
+            with span(sname):
+                return fn(*a, **kw)
+        return wrapper
+    return deco
+
+def instrument_engine(engine, db: str) -> None:
+    """Спан "db" на каждый SQL-запрос (только при включённой трассировке)."""
+    if not TRACE_ENABLED:
+        return
+    try:
+        from sqlalchemy import event
+    except Exception:
+        return
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        op = (statement.lstrip().split(None, 1) or ["?"])[0].lower()
+        conn.info.setdefault("_ebot_spans", []).append(child_span("db", db=db, op=op).__enter__())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        stack = conn.info.get("_ebot_spans")
+        if stack:
+            stack.pop().__exit__(None, None, None)
+
+    @event.listens_for(engine, "handle_error")
+    def _err(ctx):
+        stack = ctx.connection.info.get("_ebot_spans") if ctx.connection is not None else None
+        if stack:
+            e = ctx.original_exception
+            stack.pop().__exit__(type(e), e, None)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Импорт myTrades -> fills по курсору пары (trade_cursors).
+
+Курсор — граница (ms), до которой все сделки уже в fills. Прогон идёт от курсора
+(минус TRADES_OVERLAP_SEC) до «сейчас» кусками не длиннее TRADES_MAX_SPAN_SEC; если
+ответ упёрся в TRADES_PAGE_LIMIT, страница сохраняется, а дочитываются её кромки — это
+верно, отдаёт ли биржа начало или конец интервала (одна из кромок пустая). Каждый полностью прочитанный кусок пишется вместе со
+сдвигом курсора одной транзакцией, поэтому прерванный прогон продолжается с того же места.
+Запросов за прогон — не больше TRADES_MAX_PAGES: после дней простоя догоняем за несколько
+прогонов, ничего не теряя. Дубли отсекаются по id одним запросом на страницу.
+
+  python3 trade_import.py                       # догнать все PAIRS
+  python3 trade_import.py --pair KASUSDC --since 2024-05-01   # перечитать с даты (курсор назад)
+  python3 trade_import.py --status
+"""
+import sys
+import time
+import logging
+import argparse
+from datetime import datetime, timezone
+from typing import List, NamedTuple, Optional
+
+from models_trading import Fill, TradeCursor
+import metrics
+
+try:
+    import config as CFG
+except Exception:
+    class _C: pass
+    CFG = _C()
+
+SYNC_WINDOW_MIN     = int(getattr(CFG, "SYNC_WINDOW_MIN", 5))
+TRADES_PAGE_LIMIT   = int(getattr(CFG, "TRADES_PAGE_LIMIT", 1000))
+TRADES_MAX_SPAN_SEC = int(getattr(CFG, "TRADES_MAX_SPAN_SEC", 86400))
+TRADES_MAX_PAGES    = int(getattr(CFG, "TRADES_MAX_PAGES", 100))
+TRADES_OVERLAP_SEC  = int(getattr(CFG, "TRADES_OVERLAP_SEC", 60))
+_IN_CHUNK = 500
+
+log = logging.getLogger("trade_import")
+
+_M_PAGES = metrics.counter("trade_import_pages_total", "myTrades requests made by the importer", ("pair",))
+_M_LAG   = metrics.gauge("trade_import_lag_seconds", "Now minus the trade import cursor", ("pair",))
+
+class ImportReport(NamedTuple):
+    pair: str
+    start: int            # ms, откуда читали
+    cursor: int           # ms, курсор после прогона
+    pages: int
+    inserted: int
+    last_id: str
+    caught_up: bool       # дошли до «сейчас»
+
+    def summary(self) -> str:
+        return (f"[trades] {self.pair} {_fmt(self.start)}..{_fmt(self.cursor)}: +{self.inserted} "
+                f"pages={self.pages}{'' if self.caught_up else ' (not caught up)'}")
+
+def _fmt(ms: int) -> str:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+def _to_float(x) -> float:
+    try:
+        return float(x)
+    except (TypeError, ValueError):
+        return 0.0
+
+def _fill(pair: str, t: dict, default_ms: int) -> Optional[Fill]:
+    fid = str(t.get("id") or t.get("tradeId") or t.get("orderId") or "")
+    if not fid:
+        return None
+    side = str(t.get("side", "")).upper() or ("BUY" if bool(t.get("isBuyer")) else "SELL")
+    ts_ms = int(t.get("time") or t.get("T") or default_ms)
+    return Fill(id=fid, order_id=str(t.get("orderId") or ""), pair=pair, side=side,
+                price=_to_float(t.get("price") or t.get("p")), qty=_to_float(t.get("qty") or t.get("q")),
+                fee=_to_float(t.get("commission") or 0.0), ts=ts_ms // 1000, mode="")
+
+def store(sess, pair: str, trades: list, default_ms: int) -> List[Fill]:
+    """Новые (по id) сделки -> sess.add; без commit. Возвращает добавленные."""
+    rows = {}
+    for t in trades or []:
+        f = _fill(pair, t, default_ms)
+        if f is not None:
+            rows.setdefault(f.id, f)
+    ids = list(rows)
+    for i in range(0, len(ids), _IN_CHUNK):
+        for (fid,) in sess.query(Fill.id).filter(Fill.id.in_(ids[i:i + _IN_CHUNK])).all():
+            rows.pop(fid, None)
+    new = sorted(rows.values(), key=lambda f: (f.ts, f.id))
+    sess.add_all(new)
+    return new
+
+def get_cursor(sess, pair: str) -> Optional[TradeCursor]:
+    return sess.query(TradeCursor).filter(TradeCursor.pair == pair).first()
+
+def _initial_ms(sess, pair: str, now_ms: int, lookback_min: int) -> int:
+    """Без курсора: от последней сделки в fills, иначе lookback_min назад."""
+    last = sess.query(Fill.ts).filter(Fill.pair == pair).order_by(Fill.ts.desc()).first()
+    if last and last[0]:
+        return int(last[0]) * 1000
+    return now_ms - int(lookback_min) * 60_000
+
+def import_trades(sess, cli, pair: str, since_ms: Optional[int] = None, now_ms: Optional[int] = None,
+                  lookback_min: int = SYNC_WINDOW_MIN, limit: int = TRADES_PAGE_LIMIT,
+                  span_sec: int = TRADES_MAX_SPAN_SEC, max_pages: int = TRADES_MAX_PAGES,
+                  overlap_sec: int = TRADES_OVERLAP_SEC) -> ImportReport:
+    """
+    Догнать fills пары до now_ms. since_ms — начать отсюда (перечитать: курсор назад);
+    иначе от курсора, а без него — см. _initial_ms.
+    """
+    now_ms = int(time.time() * 1000) if now_ms is None else int(now_ms)
+    cur = get_cursor(sess, pair)
+    if cur is None:
+        cur = TradeCursor(pair=pair, last_time=0, last_id="", updated=0)
+        sess.add(cur)
+    if since_ms is not None:
+        start = int(since_ms)
+    elif cur.last_time:
+        start = int(cur.last_time) - overlap_sec * 1000
+    else:
+        start = _initial_ms(sess, pair, now_ms, lookback_min)
+    span = max(1, int(span_sec)) * 1000
+
+    # стек (a, b, до куда сдвинуть курсор) — сверху самый ранний; b исключается
+    # (endTime у myTrades включительный)
+    stack = [(a, min(a + span, now_ms), min(a + span, now_ms)) for a in range(start, now_ms, span)][::-1]
+    pages = inserted = 0
+    while stack and pages < max_pages:
+        a, b, upto = stack.pop()
+        rows = cli.my_trades(pair, a, b - 1, limit) or []
+        pages += 1
+        new = store(sess, pair, rows, b - 1)
+        inserted += len(new)
+        if new:
+            cur.last_id = new[-1].id
+        if len(rows) >= limit:
+            # полная страница покрывает [t0, t1]; биржа отдала либо начало, либо конец интервала —
+            # одна из оставшихся кромок пустая (один запрос), дочитываем обе
+            ts = [int(t.get("time") or a) for t in rows]
+            t0, t1 = max(min(ts), a), min(max(ts), b - 1)
+            if t0 == t1:
+                log.warning("trade import %s: %d trades in 1ms at %s — page limit hit", pair, len(rows), _fmt(t0))
+                t1 += 1
+            stack += [(t1, b, upto), (a, t0 + 1, t1)]
+            continue
+        cur.last_time, cur.updated = upto, int(time.time())
+        sess.commit()
+    if pages:
+        _M_PAGES.inc(pages, pair=pair)
+    _M_LAG.set(max(0.0, (now_ms - int(cur.last_time or start)) / 1000.0), pair=pair)
+    return ImportReport(pair, start, int(cur.last_time or start), pages, inserted, cur.last_id or "", not stack)
+
+def _parse_ts(s: str) -> int:
+    if s.isdigit():
+        return int(s) * 1000
+    dt = datetime.fromisoformat(s)
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp() * 1000)
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="Импорт сделок MEXC в fills по курсору")
+    ap.add_argument("--pair", action="append", help="пара (можно несколько); по умолчанию все PAIRS")
+    ap.add_argument("--since", type=_parse_ts, help="перечитать с момента (UTC, ISO или unix)")
+    ap.add_argument("--max-pages", type=int, default=TRADES_MAX_PAGES)
+    ap.add_argument("--status", action="store_true", help="только показать курсоры")
+    args = ap.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    metrics.set_job("trade_import")
+
+    from models_trading import SessionT, init_trading_db
+    from mexc_client import get_client
+    if args.pair:
+        pairs = args.pair
+    else:
+        from pairs import load_pairs
+        pairs = [pc.pair for pc in load_pairs()]
+    init_trading_db()
+    sess = SessionT()
+    try:
+        if args.status:
+            for p in pairs:
+                c = get_cursor(sess, p)
+                print(f"[trades] {p}: " + (f"cursor={_fmt(c.last_time)} last_id={c.last_id or '-'}" if c else "no cursor"))
+            return 0
+        cli = get_client()
+        behind = 0
+        for p in pairs:
+            rep = import_trades(sess, cli, p, since_ms=args.since, max_pages=args.max_pages)
+            print(rep.summary())
+            behind += not rep.caught_up
+    finally:
+        sess.close()
+    metrics.flush()
+    return 1 if behind else 0
+
+if __name__ == "__main__":
+    sys.exit(main())